@@ -0,0 +1,42 @@
+"""Add file_contents table for content-addressed upload deduplication
+
+Revision ID: add_file_contents_table
+Revises: add_task_queue_table
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_file_contents_table"
+down_revision: Union[str, None] = "add_task_queue_table"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "file_contents",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("size", sa.Integer, nullable=False),
+        sa.Column("storage_path", sa.String(500), nullable=False),
+        sa.Column("mime_type", sa.String(100), nullable=True),
+        sa.Column("extracted_text", sa.Text, nullable=True),
+        sa.Column("text_metadata", postgresql.JSONB, nullable=True),
+        sa.Column("ref_count", sa.Integer, nullable=False, server_default="1"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    op.add_column("files", sa.Column("content_hash", sa.String(64), nullable=True))
+    op.create_index("ix_files_content_hash", "files", ["content_hash"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_files_content_hash", table_name="files")
+    op.drop_column("files", "content_hash")
+    op.drop_table("file_contents")
@@ -0,0 +1,28 @@
+"""Add (tenant_id, user_id, uploaded_at) index on files for file retrieval
+
+Revision ID: add_files_user_uploaded_index
+Revises: add_indexed_web_pages_table
+Create Date: 2026-10-18 17:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_files_user_uploaded_index"
+down_revision: Union[str, None] = "add_indexed_web_pages_table"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_files_tenant_user_uploaded",
+        "files",
+        ["tenant_id", "user_id", "uploaded_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_files_tenant_user_uploaded", table_name="files")
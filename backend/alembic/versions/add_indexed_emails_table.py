@@ -0,0 +1,37 @@
+"""Add indexed_emails lookup table for bulk email indexing
+
+Revision ID: add_indexed_emails_table
+Revises: add_file_contents_table
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_indexed_emails_table"
+down_revision: Union[str, None] = "add_file_contents_table"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "indexed_emails",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("message_id", sa.String(255), primary_key=True),
+        sa.Column(
+            "memory_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("memory_long.id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("indexed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("indexed_emails")
@@ -0,0 +1,46 @@
+"""Add indexed_web_pages lookup table for web result deduplication
+
+Revision ID: add_indexed_web_pages_table
+Revises: add_indexed_emails_table
+Create Date: 2026-10-18 15:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_indexed_web_pages_table"
+down_revision: Union[str, None] = "add_indexed_emails_table"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "indexed_web_pages",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("url_hash", sa.String(64), primary_key=True),
+        sa.Column("canonical_url", sa.Text, nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column(
+            "memory_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("memory_long.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column("indexed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_indexed_web_pages_content_hash",
+        "indexed_web_pages",
+        ["tenant_id", "content_hash"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_indexed_web_pages_content_hash", table_name="indexed_web_pages")
+    op.drop_table("indexed_web_pages")
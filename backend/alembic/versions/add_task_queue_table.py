@@ -0,0 +1,51 @@
+"""Add task_queue table for the durable TaskQueue backend
+
+Revision ID: add_task_queue_table
+Revises: add_session_indexing
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_task_queue_table"
+down_revision: Union[str, None] = "add_session_indexing"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_queue",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("session_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("type", sa.String(100), nullable=False),
+        sa.Column("origin", sa.String(100), nullable=False),
+        sa.Column("priority", sa.String(20), nullable=False),
+        sa.Column("priority_rank", sa.Integer, nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("payload", postgresql.JSONB, nullable=True),
+        sa.Column("claimed_by", sa.String(64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+    )
+
+    # Claim query: WHERE session_id = ? AND status = 'queued' ORDER BY priority_rank DESC, created_at
+    op.create_index(
+        "ix_task_queue_claim",
+        "task_queue",
+        ["session_id", "status", "priority_rank", "created_at"],
+        unique=False,
+    )
+    op.create_index("ix_task_queue_status", "task_queue", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_queue_status", table_name="task_queue")
+    op.drop_index("ix_task_queue_claim", table_name="task_queue")
+    op.drop_table("task_queue")
@@ -0,0 +1,297 @@
+"""
+Intent Router - decide locally whether a message needs the planner LLM.
+
+Every non-acknowledgement message used to go through an LLM planning call,
+even greetings. The router classifies the message first:
+
+- "no_tools": answer directly (greetings, small talk, thanks...);
+- "single_tool": one obvious tool with arguments extracted from the text
+  (unread emails, tomorrow's agenda, an explicit web search);
+- "planner": anything else - actions with side effects, multi-step or
+  ambiguous requests - goes to the full planner as before.
+
+Keyword rules decide the clear-cut cases. Otherwise the message embedding
+is compared with the centroids of a few labeled examples per intent; a
+route is only taken when the best similarity and its margin over the
+runner-up clear the configured thresholds. Every decision is counted in
+`intent_router_decisions_total{route,source}`.
+"""
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import increment_counter, observe_histogram
+
+logger = logging.getLogger(__name__)
+
+ROUTE_NO_TOOLS = "no_tools"
+ROUTE_SINGLE_TOOL = "single_tool"
+ROUTE_PLANNER = "planner"
+
+# Explicit search requests: imperatives and "fai una ricerca", not the noun alone
+# ("la ricerca operativa") nor words that merely contain a keyword ("ritrovare")
+SEARCH_REGEX = re.compile(
+    r"\b(cerca(mi)?|trova(mi)?|search|find|look ?up|google scholar|"
+    r"(fai|fammi) una ricerca|ricerca (su|sul|sulla|online|in rete))\b",
+    re.IGNORECASE,
+)
+
+SMALL_TALK_REGEX = re.compile(
+    r"^(ciao|salve|buongiorno|buonasera|buonanotte|hey|hello|hi|grazie( mille)?|thanks|thank you|"
+    r"come stai|come va|tutto bene|chi sei|cosa sai fare|che cosa sai fare)\b[\w\s,'!?.]{0,30}$",
+    re.IGNORECASE,
+)
+
+# Verbs of actions with side effects or multi-step work: always planned (and confirmed)
+ACTION_REGEX = re.compile(
+    r"\b(invia|inviare|manda|mandare|spedisci|rispondi|inoltra|archivia|elimina|cancella|"
+    r"crea|creare|aggiungi|sposta|modifica|aggiorna|prenota|organizza|pianifica|"
+    r"send|reply|forward|archive|delete|remove|create|schedule|move|update|book)\b",
+    re.IGNORECASE,
+)
+
+EMAIL_REGEX = re.compile(r"\b(e-?mails?|mails?|posta|inbox|gmail|messaggi di posta)\b", re.IGNORECASE)
+UNREAD_REGEX = re.compile(r"\b(non lett[ea]|nuov[ea]|unread|new)\b", re.IGNORECASE)
+# Email filters the rules cannot turn into a Gmail query (sender, date, subject):
+# such requests go to the planner, which extracts them
+EMAIL_QUALIFIER_REGEX = re.compile(
+    r"@|\d|\b(da|di|dal|dalla|dallo|del|della|su|sul|sulla|riguardo|oggetto|con|from|by|about|subject|with|"
+    r"oggi|ieri|settimana|mese|lunedì|martedì|mercoledì|giovedì|venerdì|sabato|domenica|"
+    r"today|yesterday|week|month)\b",
+    re.IGNORECASE,
+)
+# Calendar words; both these and the generic "evento"/"events" only mean the
+# calendar together with a personal/time cue ("verbale di riunione", "impegni
+# di spesa" and "l'evento più importante della storia" are not calendar requests)
+CALENDAR_REGEX = re.compile(
+    r"\b(calendario|agenda|appuntament[oi]|riunion[ei]|meeting|impegn[oi]|event[oi]|"
+    r"cosa ho (oggi|domani|dopodomani|questa settimana|la prossima settimana)|calendar|events?)\b",
+    re.IGNORECASE,
+)
+# The user asks about *their* data: possessives, "cosa ho/ci sono", read/show verbs, dates
+PERSONAL_REGEX = re.compile(
+    r"\b(mi[ae]i?|mio|cosa ho|che cosa ho|ho ricevuto|ci sono|c'è|leggi|leggimi|mostra(mi)?|dimmi|controlla|"
+    r"ricevut[aeio]|arrivat[aeio]|non lett[ea]|nuov[ea]|oggi|domani|dopodomani|stasera|"
+    r"settimana|lunedì|martedì|mercoledì|giovedì|venerdì|sabato|domenica|"
+    r"my|do i have|read|show|check|unread|today|tomorrow|week)\b",
+    re.IGNORECASE,
+)
+# How-to and definition questions mention emails or meetings without asking for them
+KNOWLEDGE_REGEX = re.compile(
+    r"\b(come si|come (posso|faccio|funziona|configur\w*)|cos'è|che cos'è|cosa significa|spiegami|"
+    r"problema|template|modello di|esempio di|how (do|to|can|does)|what is|what's a|explain)\b",
+    re.IGNORECASE,
+)
+# Files, documents and code: "cerca nel documento", "trova il file" are about the
+# user's uploads (file context), not a web search
+FILE_REGEX = re.compile(
+    r"\b(file|documento|documenti|document|documents|pdf|allegat[oi]|caricat[oi]|upload\w*|"
+    r"foglio|slide|presentazione|codice|code|funzione|function|script|bug)\b",
+    re.IGNORECASE,
+)
+
+# Labeled examples for the nearest-centroid classifier
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    ROUTE_NO_TOOLS: [
+        "ciao, come stai?",
+        "buongiorno!",
+        "grazie mille per l'aiuto",
+        "chi sei e cosa sai fare?",
+        "spiegami cos'è la fotosintesi",
+        "scrivi una breve poesia sull'autunno",
+        "qual è la differenza tra una lista e una tupla in Python?",
+        "hello, how are you?",
+    ],
+    "get_emails": [
+        "ci sono email non lette?",
+        "leggi le mie ultime email",
+        "ho ricevuto nuove mail oggi?",
+        "mostrami la posta in arrivo",
+        "do I have unread emails?",
+    ],
+    "get_calendar_events": [
+        "cosa ho in agenda domani?",
+        "quali riunioni ho questa settimana?",
+        "ho appuntamenti oggi pomeriggio?",
+        "mostrami gli eventi del calendario di venerdì",
+        "what meetings do I have tomorrow?",
+    ],
+    "web_search": [
+        "cerca le ultime notizie sull'intelligenza artificiale",
+        "trova informazioni sul meteo a Milano",
+        "quali sono le novità su Python 3.13?",
+        "search the web for the latest news on the election",
+    ],
+    ROUTE_PLANNER: [
+        "invia una mail a Marco con il riepilogo della riunione",
+        "archivia tutte le email promozionali e poi dimmi cosa resta",
+        "crea un evento domani alle 10 con il team",
+        "leggi le mail di oggi e aggiungi al calendario gli appuntamenti citati",
+        "rispondi all'ultima email di Giulia dicendo che confermo",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    route: str
+    confidence: float
+    source: str  # rule | centroid | default
+    reason: str
+    tool: Optional[str] = None
+    inputs: Dict[str, Any] = field(default_factory=dict)
+
+    def to_analysis(self) -> Dict[str, Any]:
+        """Same shape as the planner's analysis (needs_plan / reason / steps)"""
+        reason = f"Intent router ({self.source}, {self.confidence:.2f}): {self.reason}"
+        if self.route == ROUTE_SINGLE_TOOL and self.tool:
+            return {
+                "needs_plan": True,
+                "reason": reason,
+                "steps": [{
+                    "description": self.reason,
+                    "action": "tool",
+                    "tool": self.tool,
+                    "inputs": dict(self.inputs),
+                }],
+            }
+        return {"needs_plan": False, "reason": reason, "steps": []}
+
+
+def _search_tool(available: Sequence[str]) -> Optional[str]:
+    for name in ("customsearch_search", "web_search"):
+        if name in available:
+            return name
+    return None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IntentRouter:
+    """Rules + embedding nearest-centroid classifier in front of the planner"""
+
+    def __init__(self, embedding_service: Any, examples: Optional[Dict[str, List[str]]] = None) -> None:
+        self.embedding_service = embedding_service
+        self.examples = examples or INTENT_EXAMPLES
+        self._labels: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+
+    def _ensure_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            labels = list(self.examples)
+            centroids = []
+            for label in labels:
+                vectors = _normalize(np.asarray(
+                    self.embedding_service.generate_embeddings(self.examples[label]), dtype=np.float32
+                ))
+                centroids.append(vectors.mean(axis=0))
+            self._labels = labels
+            self._centroids = _normalize(np.stack(centroids))
+        return self._centroids
+
+    def rule_decision(self, message: str, available: Sequence[str]) -> Optional[RouteDecision]:
+        text = re.sub(r"\s+", " ", message.strip())
+        lower = text.lower()
+        if not text:
+            return RouteDecision(ROUTE_NO_TOOLS, 1.0, "rule", "empty message")
+        if ACTION_REGEX.search(lower):
+            return RouteDecision(ROUTE_PLANNER, 1.0, "rule", "action verb")
+
+        personal = bool(PERSONAL_REGEX.search(lower)) and not KNOWLEDGE_REGEX.search(lower)
+        wants_email = bool(EMAIL_REGEX.search(lower)) and personal
+        wants_calendar = bool(CALENDAR_REGEX.search(lower)) and personal
+        wants_search = bool(SEARCH_REGEX.search(lower))
+        if wants_search and FILE_REGEX.search(lower):
+            return RouteDecision(ROUTE_PLANNER, 1.0, "rule", "search in files or documents")
+        if wants_email + wants_calendar + wants_search > 1:
+            return RouteDecision(ROUTE_PLANNER, 1.0, "rule", "multiple intents")
+
+        if wants_email and "get_emails" in available:
+            # Only "unread" is extracted; a sender, date or subject needs the planner
+            rest = UNREAD_REGEX.sub(" ", EMAIL_REGEX.sub(" ", lower))
+            if EMAIL_QUALIFIER_REGEX.search(rest):
+                return RouteDecision(ROUTE_PLANNER, 1.0, "rule", "email filter")
+            inputs = {"query": "is:unread"} if UNREAD_REGEX.search(lower) else {}
+            return RouteDecision(ROUTE_SINGLE_TOOL, 0.9, "rule", "Recupero le email", "get_emails", inputs)
+        if wants_calendar and "get_calendar_events" in available:
+            return RouteDecision(
+                ROUTE_SINGLE_TOOL, 0.9, "rule", "Recupero gli eventi del calendario",
+                "get_calendar_events", {"query": text},
+            )
+        search_tool = _search_tool(available)
+        if wants_search and search_tool:
+            return RouteDecision(
+                ROUTE_SINGLE_TOOL, 0.9, "rule", "Cerco sul web", search_tool, {"query": text},
+            )
+        if len(text) <= 60 and SMALL_TALK_REGEX.match(lower):
+            return RouteDecision(ROUTE_NO_TOOLS, 0.95, "rule", "small talk")
+        return None
+
+    def centroid_decision(self, message: str, available: Sequence[str]) -> RouteDecision:
+        centroids = self._ensure_centroids()
+        query = _normalize(np.asarray(self.embedding_service.generate_embedding(message), dtype=np.float32))
+        scores = centroids @ query
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+        label = self._labels[int(order[0])]
+        if best < settings.intent_router_min_confidence or best - runner_up < settings.intent_router_min_margin:
+            return RouteDecision(ROUTE_PLANNER, best, "centroid", f"low confidence ({label})")
+        if label == ROUTE_NO_TOOLS:
+            return RouteDecision(ROUTE_NO_TOOLS, best, "centroid", "no external data needed")
+        if label == ROUTE_PLANNER:
+            return RouteDecision(ROUTE_PLANNER, best, "centroid", "complex request")
+
+        tool = _search_tool(available) if label == "web_search" else label
+        if not tool or tool not in available:
+            return RouteDecision(ROUTE_PLANNER, best, "centroid", f"{label} not available")
+        inputs = {"query": message.strip()}
+        if tool == "get_emails":
+            inputs = {"query": "is:unread"} if UNREAD_REGEX.search(message) else {}
+        return RouteDecision(ROUTE_SINGLE_TOOL, best, "centroid", f"Uso {tool}", tool, inputs)
+
+    def classify(self, message: str, available_tools: Sequence[str]) -> RouteDecision:
+        """Route a message (synchronous: the centroid step embeds the message)"""
+        decision = self.rule_decision(message, available_tools)
+        if decision is None:
+            decision = self.centroid_decision(message, available_tools)
+        return decision
+
+    async def route(self, message: str, available_tools: Sequence[str]) -> RouteDecision:
+        """Route a message; falls back to the planner on any error"""
+        loop = asyncio.get_running_loop()
+        try:
+            decision = await loop.run_in_executor(None, self.classify, message, list(available_tools))
+        except Exception as e:
+            logger.warning(f"⚠️  Intent router failed, using the planner: {e}")
+            decision = RouteDecision(ROUTE_PLANNER, 0.0, "default", f"router error: {e}")
+        increment_counter(
+            "intent_router_decisions_total",
+            labels={"route": decision.route, "source": decision.source},
+        )
+        observe_histogram("intent_router_confidence", decision.confidence, labels={"route": decision.route})
+        logger.info(
+            f"🧭 Intent router: {decision.route} ({decision.source}, {decision.confidence:.2f})"
+            + (f" → {decision.tool}" if decision.tool else "")
+        )
+        return decision
+
+
+_intent_router: Optional[IntentRouter] = None
+
+
+def get_intent_router(embedding_service: Any) -> IntentRouter:
+    """Process-wide router (example centroids are computed once)"""
+    global _intent_router
+    if _intent_router is None:
+        _intent_router = IntentRouter(embedding_service)
+    return _intent_router
@@ -11,7 +11,9 @@ from uuid import UUID, uuid4
 from langgraph.graph import END, StateGraph
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.ollama_client import OllamaClient
+from app.core.response_cache import build_cache_key, get_response_cache
 from app.models.notifications import (
     Notification,
     NotificationChannel,
@@ -21,8 +23,11 @@ from app.models.notifications import (
 )
 from app.models.schemas import ChatRequest, ChatResponse, ToolExecutionDetail
 from app.agents.main_agent import run_main_agent_pipeline
+from app.agents.intent_router import ROUTE_PLANNER, get_intent_router
 from app.core.memory_manager import MemoryManager
 from app.core.tool_manager import ToolManager
+from app.core.tool_index import shortlist_tools
+from app.core.latency_profile import stage, staged
 from app.services.agent_activity_stream import AgentActivityStream
 from app.services.notification_center import NotificationCenter
 from app.services.task_queue import TaskQueue, Task, TaskStatus
@@ -135,6 +140,11 @@ def should_force_web_search(request: ChatRequest, acknowledgement: bool) -> bool
     return any(keyword in message for keyword in keywords)
 
 
+def _embedding_service(state: LangGraphChatState) -> Any:
+    memory_manager = state.get("memory_manager")
+    return getattr(memory_manager, "embedding_service", None)
+
+
 def build_tool_catalog(tools: List[Dict[str, Any]]) -> str:
     catalog_lines = []
     for tool in tools:
@@ -1288,24 +1298,55 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
         is_auto_task = message_content.startswith("[auto-task]")
         should_plan = not plan and not acknowledgement and message_content and not is_auto_task and not planner_failed
         
-        if should_plan:
+        route = None
+        if should_plan and settings.intent_router_enabled and _embedding_service(state) is not None:
+            # Fast path: greetings and single obvious tool calls skip the planner LLM round trip
+            with stage("intent_router"):
+                route = await get_intent_router(_embedding_service(state)).route(
+                    request.message, available_tool_names
+                )
+            if route.route == ROUTE_PLANNER:
+                route = None
+
+        if route is not None:
+            analysis = route.to_analysis()
+            state["plan_analysis"] = analysis
+            if analysis.get("needs_plan"):
+                plan = normalize_plan_steps(analysis["steps"], available_tool_names)
+                state["plan"] = plan
+                state["plan_index"] = 0
+                state["plan_dirty"] = True
+                state["plan_completed"] = False
+                state["plan_origin"] = request.message
+                log_planning_status(
+                    state,
+                    status="generated",
+                    reason=str(analysis.get("reason", "")),
+                    plan=plan,
+                )
+        elif should_plan:
             planner_client = state.get("planner_client") or state["ollama"]
             log_agent_activity(state, agent_id="planner", status="started")
             try:
                 logger.info(f"🔍 Planning for message: {request.message[:100]}")
                 logger.info(f"   Message length: {len(message_content)}, is_auto_task: {is_auto_task}, acknowledgement: {acknowledgement}")
-                logger.info(f"   Available tools for planner: {len(available_tools)} (already filtered by user preferences)")
+                # available_tools are already filtered by get_available_tools() based on
+                # user preferences (enabled_tools, mcp_tools_preferences); the planner only
+                # sees the ones relevant to this message
+                with stage("tool_shortlist"):
+                    planner_tools = await shortlist_tools(
+                        request.message, available_tools, _embedding_service(state)
+                    )
+                logger.info(f"   Available tools for planner: {len(planner_tools)}/{len(available_tools)} (shortlisted, already filtered by user preferences)")
                 
-                # Use available_tools as-is - they are already filtered by get_available_tools()
-                # based on user preferences (enabled_tools, mcp_tools_preferences)
-                # If no MCP tools are activated, they won't be in available_tools
-                analysis = await analyze_message_for_plan(
-                    planner_client,
-                    request,
-                    available_tools,  # Use tools as filtered by user preferences
-                    state.get("session_context", []),
-                    ollama_client=state.get("ollama"),
-                )
+                with stage("planner"):
+                    analysis = await analyze_message_for_plan(
+                        planner_client,
+                        request,
+                        planner_tools,
+                        state.get("session_context", []),
+                        ollama_client=state.get("ollama"),
+                    )
                 logger.info(f"📋 Planner analysis: needs_plan={analysis.get('needs_plan')}, reason={analysis.get('reason')}, steps_count={len(analysis.get('steps', []))}")
                 if analysis.get("steps"):
                     for idx, step in enumerate(analysis.get("steps", [])):
@@ -1442,14 +1483,15 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
                 else:
                     final_text = "Ho completato le azioni richieste."
             else:
-                final_text = await summarize_plan_results(
-                    state["ollama"],
-                    request,
-                    state.get("session_context", []),
-                    state.get("retrieved_memory", []),
-                    execution["plan"],
-                    execution_summaries,
-                )
+                with stage("plan_summary"):
+                    final_text = await summarize_plan_results(
+                        state["ollama"],
+                        request,
+                        state.get("session_context", []),
+                        state.get("retrieved_memory", []),
+                        execution["plan"],
+                        execution_summaries,
+                    )
 
             logger.debug(f"🔍 Final response generated: {len(final_text) if final_text else 0} characters")
             state["response"] = final_text
@@ -1516,6 +1558,9 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
             logger.info(f"✅ current_user found in state: {current_user.email if hasattr(current_user, 'email') else 'unknown'}")
         tool_manager = ToolManager(db=state["db"], tenant_id=tenant_id)
         available_tools = await tool_manager.get_available_tools(current_user=current_user)
+        # Native tool schemas are part of the prompt: send only the relevant ones
+        with stage("tool_shortlist"):
+            available_tools = await shortlist_tools(request.message, available_tools, _embedding_service(state))
         
         # Generate response using Ollama with tool calling capability
         # This allows Ollama to decide if it needs tools or can respond directly
@@ -1599,7 +1644,6 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
                 message=f"LLM connection failed: {str(llm_error)}",
             )
             # For connection/configuration errors, set error response
-            from app.core.config import settings
             llm_provider = settings.llm_provider.upper() if hasattr(settings, 'llm_provider') else "LLM"
             state["response"] = f"Mi dispiace, ma al momento non posso rispondere perché il servizio di intelligenza artificiale ({llm_provider}) non è disponibile. Verifica la configurazione."
             state["tools_used"] = []
@@ -1803,7 +1847,6 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
                 try:
                     # Limit tool results to avoid Vertex AI function call limits
                     # Vertex AI has limits on the number of function calls per request
-                    from app.core.config import settings
                     max_tool_results = settings.max_tool_results_per_response
                     
                     if len(tool_results) > max_tool_results:
@@ -1998,7 +2041,6 @@ async def tool_loop_node(state: LangGraphChatState) -> LangGraphChatState:
             logger.debug(f"🔍 Tool results found: {len(tool_results)}. Generating final response...")
             
             # Limit tool results to avoid Vertex AI function call limits
-            from app.core.config import settings
             max_tool_results = settings.max_tool_results_per_response
             
             if len(tool_results) > max_tool_results:
@@ -2509,6 +2551,22 @@ def _routing_router(state: LangGraphChatState) -> str:
     return "tool_loop"
 
 
+_GRAPH_NODES = (
+    ("event_handler", event_handler_node),
+    ("orchestrator", orchestrator_node),
+    ("tool_loop", tool_loop_node),
+    ("knowledge_agent", knowledge_agent_node),
+    ("notification_collector", notification_collector_node),
+    ("response_formatter", response_formatter_node),
+)
+
+
+def _add_graph_nodes(graph: StateGraph) -> None:
+    """Add the nodes, each timed as a `graph.<name>` latency stage"""
+    for name, node in _GRAPH_NODES:
+        graph.add_node(name, staged(f"graph.{name}", node))
+
+
 def build_langgraph_app() -> StateGraph:
     """Build and compile the LangGraph application with all nodes and edges"""
     logger = logging.getLogger(__name__)
@@ -2518,12 +2576,7 @@ def build_langgraph_app() -> StateGraph:
     
     # Add all nodes
     logger.info("   Adding nodes...")
-    graph.add_node("event_handler", event_handler_node)
-    graph.add_node("orchestrator", orchestrator_node)
-    graph.add_node("tool_loop", tool_loop_node)
-    graph.add_node("knowledge_agent", knowledge_agent_node)
-    graph.add_node("notification_collector", notification_collector_node)
-    graph.add_node("response_formatter", response_formatter_node)
+    _add_graph_nodes(graph)
     
     # Set entry point
     logger.info("   Setting entry point: event_handler")
@@ -2575,9 +2628,46 @@ async def run_langgraph_chat(
     pending_plan: Optional[Dict[str, Any]] = None,
     current_user: Optional[Any] = None,  # User model for tool filtering
 ) -> LangGraphResult:
+    # Semantic response cache (opt-in): an equivalent, self-contained question over
+    # the same memory on the same day is answered without running planner and generation
+    cache_key = None
+    if (
+        settings.response_cache_enabled
+        and current_user is not None
+        and not pending_plan
+        and not is_acknowledgement(request.message)
+    ):
+        with stage("response_cache.lookup"):
+            cache_key = await build_cache_key(
+                memory_manager.embedding_service,
+                current_user.id,
+                request.message,
+                retrieved_memory,
+            )
+            cached_response = get_response_cache().lookup(cache_key) if cache_key else None
+        if cached_response is not None:
+            return LangGraphResult(
+                chat_response=cached_response.model_copy(
+                    update={
+                        "session_id": session_id,
+                        "agent_activity": [
+                            {
+                                "agent_id": "response_cache",
+                                "agent_name": "Response Cache",
+                                "status": "completed",
+                                "message": "Risposta riutilizzata dalla cache",
+                            }
+                        ],
+                    }
+                ),
+                plan_metadata=None,
+                assistant_message_saved=False,
+            )
+
     # Build app once and reuse (or build each time if needed)
     try:
-        app = build_langgraph_app()
+        with stage("graph.build"):
+            app = build_langgraph_app()
     except TypeError as e:
         if "recursion_limit" in str(e):
             logger.error(f"❌ LangGraph version doesn't support recursion_limit: {e}")
@@ -2585,12 +2675,7 @@ async def run_langgraph_chat(
             from langgraph.graph import StateGraph, END
             graph = StateGraph(LangGraphChatState)
             # Rebuild graph without recursion_limit
-            graph.add_node("event_handler", event_handler_node)
-            graph.add_node("orchestrator", orchestrator_node)
-            graph.add_node("tool_loop", tool_loop_node)
-            graph.add_node("knowledge_agent", knowledge_agent_node)
-            graph.add_node("notification_collector", notification_collector_node)
-            graph.add_node("response_formatter", response_formatter_node)
+            _add_graph_nodes(graph)
             graph.set_entry_point("event_handler")
             graph.add_edge("event_handler", "orchestrator")
             graph.add_conditional_edges(
@@ -2741,6 +2826,9 @@ async def run_langgraph_chat(
     elif pending_plan and not final_state.get("plan_completed"):
         plan_metadata = pending_plan
 
+    if cache_key is not None and plan_metadata is None:
+        get_response_cache().store(cache_key, chat_response)
+
     return LangGraphResult(
         chat_response=chat_response,
         plan_metadata=plan_metadata,
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
 from typing import List, Optional
+import asyncio
 import shutil
 from pathlib import Path
 
@@ -12,13 +13,17 @@ from app.models.schemas import File as FileSchema
 from app.core.config import settings
 from app.services.file_processor import FileProcessor
 from app.services.embedding_service import EmbeddingService
+from app.services.upload_spooler import UploadTooLargeError, spool_upload
+from app.services.file_content_store import FileContentStore
+from app.services.file_retrieval import FileRetriever
 from app.services.cloud_storage_service import (
-    upload_file_to_cloud_storage,
+    upload_path_to_cloud_storage,
     is_cloud_storage_path,
     delete_file_from_cloud_storage,
 )
 from app.core.dependencies import get_memory_manager
 from app.core.memory_manager import MemoryManager
+from app.core.response_cache import invalidate_user_responses
 from app.core.tenant_context import get_tenant_id
 from app.core.user_context import get_current_user
 
@@ -53,64 +58,88 @@ async def upload_file(
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
     
-    # Check file size
-    file_content = await file.read()
-    if len(file_content) > settings.max_file_size:
+    # Reject early when the client declared a size over the limit
+    if file.size is not None and file.size > settings.max_file_size:
         raise HTTPException(
             status_code=413,
             detail=f"File too large. Max size: {settings.max_file_size} bytes",
         )
     
+    # Stream the body to a spool file in chunks (size limit + sha256 computed on the fly)
+    try:
+        spooled = await spool_upload(file.file, file.filename, file.content_type)
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    
     # Generate unique file ID for the file record
     import uuid as uuid_lib
     file_id = uuid_lib.uuid4()
+    loop = asyncio.get_running_loop()
+    kept_on_disk = False
+    content_store = FileContentStore(db)
     
-    # Save file: use Cloud Storage only if enabled (Cloud Run), otherwise use filesystem (local)
-    if settings.use_cloud_storage:
-        # Upload to Cloud Storage (Cloud Run only)
-        logger.info(f"☁️  Using Cloud Storage for file upload (Cloud Run deployment)")
-        gcs_path = await upload_file_to_cloud_storage(
-            file_content=file_content,
-            user_id=current_user.id,
-            file_id=file_id,
-            filename=file.filename,
-            content_type=file.content_type,
-        )
-        
-        if gcs_path:
-            # Successfully uploaded to Cloud Storage
-            filepath = gcs_path
-            logger.info(f"✅ File uploaded to Cloud Storage: {gcs_path}")
-            
-            # Extract text from bytes (FileProcessor supports bytes extraction)
-            file_data = file_processor.extract_text_from_bytes(file_content, file.content_type, file.filename)
+    try:
+        # Same bytes already uploaded in this tenant: reuse stored copy and text
+        stored_content = await content_store.acquire(tenant_id, spooled.sha256)
+        if stored_content is not None:
+            filepath = stored_content.storage_path
+            file_data = {
+                "text": stored_content.extracted_text or "",
+                "metadata": {**(stored_content.text_metadata or {}), "deduplicated": True},
+            }
+            logger.info(f"♻️  Upload {file.filename} matches stored content, skipping extraction and storage")
         else:
-            # Cloud Storage upload failed, fallback to filesystem with warning
-            logger.error("❌ Cloud Storage upload failed, falling back to filesystem (files will be lost on container restart)")
-            user_dir = settings.upload_dir / "users" / str(current_user.id)
-            user_dir.mkdir(parents=True, exist_ok=True)
-            file_extension = Path(file.filename).suffix
-            unique_filename = f"{file_id}{file_extension}"
-            filepath = user_dir / unique_filename
+            # Extract text from the spooled file off the event loop (before it is moved or uploaded)
+            file_data = await loop.run_in_executor(
+                None, file_processor.extract_text, str(spooled.path), file.content_type
+            )
+            file_data["metadata"] = {**(file_data.get("metadata") or {}), "sha256": spooled.sha256, "size": spooled.size}
             
-            with open(filepath, "wb") as f:
-                f.write(file_content)
+            # Save file: use Cloud Storage only if enabled (Cloud Run), otherwise use filesystem (local)
+            gcs_path = None
+            if settings.use_cloud_storage:
+                # Upload to Cloud Storage (Cloud Run only), resumable upload streamed from the spool file
+                logger.info(f"☁️  Using Cloud Storage for file upload (Cloud Run deployment)")
+                gcs_path = await upload_path_to_cloud_storage(
+                    local_path=spooled.path,
+                    user_id=current_user.id,
+                    file_id=file_id,
+                    filename=file.filename,
+                    content_type=file.content_type,
+                )
+                if not gcs_path:
+                    # Cloud Storage upload failed, fallback to filesystem with warning
+                    logger.error("❌ Cloud Storage upload failed, falling back to filesystem (files will be lost on container restart)")
+            else:
+                # Use filesystem (local development - default)
+                logger.info(f"💾 Using local filesystem for file upload (local development)")
             
-            file_data = file_processor.extract_text(str(filepath), file.content_type)
-    else:
-        # Use filesystem (local development - default)
-        logger.info(f"💾 Using local filesystem for file upload (local development)")
-        user_dir = settings.upload_dir / "users" / str(current_user.id)
-        user_dir.mkdir(parents=True, exist_ok=True)
-        file_extension = Path(file.filename).suffix
-        unique_filename = f"{file_id}{file_extension}"
-        filepath = user_dir / unique_filename
-        
-        with open(filepath, "wb") as f:
-            f.write(file_content)
-        
-        # Process file
-        file_data = file_processor.extract_text(str(filepath), file.content_type)
+            if gcs_path:
+                filepath = gcs_path
+            else:
+                user_dir = settings.upload_dir / "users" / str(current_user.id)
+                file_extension = Path(file.filename).suffix
+                filepath = await spooled.move_to(user_dir / f"{file_id}{file_extension}")
+                kept_on_disk = True
+            
+            stored_content = await content_store.register(
+                tenant_id,
+                spooled.sha256,
+                size=spooled.size,
+                storage_path=str(filepath),
+                mime_type=file.content_type,
+                extracted_text=file_data["text"] or None,
+                text_metadata=file_data["metadata"],
+            )
+            if stored_content.storage_path != str(filepath):
+                # A concurrent upload of the same bytes won the race: use its copy
+                logger.info(f"♻️  Concurrent upload stored the same content, discarding duplicate copy")
+                await _delete_stored_bytes(str(filepath), logger)
+                filepath = stored_content.storage_path
+    finally:
+        # The spool file is only kept when it was moved into place on the local filesystem
+        if not kept_on_disk:
+            spooled.cleanup()
     
     # Create file record - file belongs to user, not session
     file_record = FileModel(
@@ -122,43 +151,30 @@ async def upload_file(
         filepath=str(filepath),  # Will be GCS path (gs://...) if Cloud Storage enabled
         mime_type=file.content_type,
         metadata=file_data["metadata"],
+        content_hash=spooled.sha256,
     )
     db.add(file_record)
     await db.commit()
     await db.refresh(file_record)
     
-    # Generate embeddings and store in ChromaDB if text was extracted
+    # Index the text passages in ChromaDB (passage embeddings reused for identical content)
     if file_data["text"]:
         try:
-            embedding = embedding_service.generate_embedding(file_data["text"])
-            embedding_id = f"file_{file_record.id}"
-            
-            # Truncate text if too long (ChromaDB has limits)
-            text_content = file_data["text"]
-            if len(text_content) > 20000:  # ChromaDB document limit
-                text_content = text_content[:20000] + "... [truncated]"
-            
-            # Get tenant-specific collection
-            file_collection = memory._get_collection("file_embeddings", tenant_id)
-            file_collection.add(
-                ids=[embedding_id],
-                embeddings=[embedding],
-                documents=[text_content],
-                metadatas=[
-                    {
-                        "user_id": str(current_user.id),  # Store user_id instead of session_id
-                        "file_id": str(file_record.id),
-                        "filename": file.filename,
-                        "session_id": str(session_id) if session_id else None,  # Optional: keep for backward compatibility
-                    }
-                ],
+            await FileRetriever(memory).index_file(
+                tenant_id=tenant_id,
+                user_id=current_user.id,
+                file_id=file_record.id,
+                filename=file.filename,
+                text=file_data["text"],
+                content_hash=spooled.sha256,
+                session_id=session_id,
             )
-            logger.info(f"File embedding stored: {file.filename}, user: {current_user.id}, text length: {len(file_data['text'])}")
         except Exception as e:
-            logger.error(f"Error storing file embedding: {e}", exc_info=True)
-            # Continue even if embedding fails
+            logger.error(f"Error indexing file passages: {e}", exc_info=True)
+            # Continue even if indexing fails
     else:
         logger.warning(f"No text extracted from file: {file.filename}")
+    invalidate_user_responses(current_user.id)
     
     return FileSchema(
         id=file_record.id,
@@ -288,7 +304,7 @@ async def delete_file(
     logger = logging.getLogger(__name__)
     
     # Get tenant-specific collection
-    file_collection = memory._get_collection("file_embeddings", tenant_id)
+    file_collection = await memory._get_collection("file_embeddings", tenant_id)
     
     embedding_id = f"file_{file_id}"
     deleted_from_chroma = False
@@ -297,7 +313,7 @@ async def delete_file(
     embedding_ids_to_delete = []
     try:
         # Try to find embeddings by file_id in metadata
-        existing_embeddings = file_collection.get(
+        existing_embeddings = await file_collection.get(
             where={"file_id": str(file_id)}
         )
         embedding_ids_to_delete = existing_embeddings.get('ids', [])
@@ -308,7 +324,7 @@ async def delete_file(
         logger.warning(f"Could not check existing embeddings by file_id: {e}")
         # Try alternative method
         try:
-            existing_embeddings = file_collection.get(
+            existing_embeddings = await file_collection.get(
                 where={"session_id": str(file.session_id)}
             )
             # Filter by file_id in metadata manually
@@ -332,7 +348,7 @@ async def delete_file(
         # Strategy 1: Delete all found IDs
         if embedding_ids_to_delete:
             try:
-                result = file_collection.delete(ids=embedding_ids_to_delete)
+                result = await file_collection.delete(ids=embedding_ids_to_delete)
                 logger.info(f"Deleted {len(embedding_ids_to_delete)} file embeddings by IDs: {embedding_ids_to_delete}")
                 deleted_from_chroma = True
             except Exception as e:
@@ -341,7 +357,7 @@ async def delete_file(
         # Strategy 2: Delete by ID (standard format) - fallback if batch delete failed
         if not deleted_from_chroma:
             try:
-                result = file_collection.delete(ids=[embedding_id])
+                result = await file_collection.delete(ids=[embedding_id])
                 logger.info(f"Deleted file embedding by ID: {embedding_id}, result: {result}")
                 deleted_from_chroma = True
             except Exception as e:
@@ -351,7 +367,7 @@ async def delete_file(
         if not deleted_from_chroma:
             try:
                 # ChromaDB where clause needs $eq operator for equality
-                file_collection.delete(
+                await file_collection.delete(
                     where={"file_id": {"$eq": str(file_id)}}
                 )
                 logger.info(f"Deleted file embeddings by file_id metadata ($eq): {file_id}")
@@ -359,7 +375,7 @@ async def delete_file(
             except Exception as e1:
                 # Try with simple equality (older ChromaDB versions)
                 try:
-                    file_collection.delete(
+                    await file_collection.delete(
                         where={"file_id": str(file_id)}
                     )
                     logger.info(f"Deleted file embeddings by file_id metadata (simple): {file_id}")
@@ -371,7 +387,7 @@ async def delete_file(
         if not deleted_from_chroma:
             try:
                 # ChromaDB where clause with multiple conditions
-                file_collection.delete(
+                await file_collection.delete(
                     where={"$and": [{"user_id": {"$eq": str(file.user_id)}}, {"file_id": {"$eq": str(file_id)}}]}
                 )
                 logger.info(f"Deleted file embeddings by user_id and file_id ($and): {file.user_id}, {file_id}")
@@ -379,7 +395,7 @@ async def delete_file(
             except Exception as e1:
                 # Try with simple equality
                 try:
-                    file_collection.delete(
+                    await file_collection.delete(
                         where={"user_id": str(file.user_id), "file_id": str(file_id)}
                     )
                     logger.info(f"Deleted file embeddings by user_id and file_id (simple): {file.user_id}, {file_id}")
@@ -391,7 +407,7 @@ async def delete_file(
         if not deleted_from_chroma and file.session_id:
             try:
                 # ChromaDB where clause with multiple conditions
-                file_collection.delete(
+                await file_collection.delete(
                     where={"$and": [{"session_id": {"$eq": str(file.session_id)}}, {"file_id": {"$eq": str(file_id)}}]}
                 )
                 logger.info(f"Deleted file embeddings by session_id and file_id ($and): {file.session_id}, {file_id}")
@@ -399,7 +415,7 @@ async def delete_file(
             except Exception as e1:
                 # Try with simple equality
                 try:
-                    file_collection.delete(
+                    await file_collection.delete(
                         where={"session_id": str(file.session_id), "file_id": str(file_id)}
                     )
                     logger.info(f"Deleted file embeddings by session_id and file_id (simple): {file.session_id}, {file_id}")
@@ -413,31 +429,43 @@ async def delete_file(
         logger.error(f"Error deleting file embedding from ChromaDB: {e}", exc_info=True)
         # Continue with file deletion even if ChromaDB deletion fails
     
-    # Delete physical file from storage (Cloud Storage or filesystem)
+    # Release the content reference: the bytes are shared with identical uploads
+    storage_path_to_delete = file.filepath
+    if file.content_hash:
+        storage_path_to_delete = await FileContentStore(db).release(tenant_id, file.content_hash)
+    
+    # Delete from database
+    await db.delete(file)
+    await db.commit()
+    invalidate_user_responses(current_user.id)
+    
+    # Delete physical file from storage only when no other file references it
+    if storage_path_to_delete:
+        await _delete_stored_bytes(storage_path_to_delete, logger)
+    return None
+
+
+async def _delete_stored_bytes(filepath: str, logger) -> None:
+    """Delete a stored file from Cloud Storage or the filesystem"""
     try:
-        if is_cloud_storage_path(file.filepath):
+        if is_cloud_storage_path(filepath):
             # Delete from Cloud Storage
-            logger.info(f"☁️  Deleting file from Cloud Storage: {file.filepath}")
-            deleted = await delete_file_from_cloud_storage(file.filepath)
+            logger.info(f"☁️  Deleting file from Cloud Storage: {filepath}")
+            deleted = await delete_file_from_cloud_storage(filepath)
             if deleted:
-                logger.info(f"✅ Deleted file from Cloud Storage: {file.filepath}")
+                logger.info(f"✅ Deleted file from Cloud Storage: {filepath}")
             else:
-                logger.warning(f"⚠️  Failed to delete file from Cloud Storage (may not exist): {file.filepath}")
+                logger.warning(f"⚠️  Failed to delete file from Cloud Storage (may not exist): {filepath}")
         else:
             # Delete from filesystem (local development)
-            file_path = Path(file.filepath)
+            file_path = Path(filepath)
             if file_path.exists():
                 file_path.unlink()
-                logger.info(f"💾 Deleted physical file from filesystem: {file.filepath}")
+                logger.info(f"💾 Deleted physical file from filesystem: {filepath}")
             else:
-                logger.warning(f"⚠️  Physical file not found (may have been already deleted): {file.filepath}")
+                logger.warning(f"⚠️  Physical file not found (may have been already deleted): {filepath}")
     except Exception as e:
-        logger.warning(f"⚠️  Error deleting physical file {file.filepath}: {e}")
-    
-    # Delete from database
-    await db.delete(file)
-    await db.commit()
-    return None
+        logger.warning(f"⚠️  Error deleting physical file {filepath}: {e}")
 
 
 @router.post("/cleanup-orphans", status_code=200)
@@ -452,10 +480,10 @@ async def cleanup_orphan_embeddings(
     
     try:
         # Get tenant-specific collection
-        file_collection = memory._get_collection("file_embeddings", tenant_id)
+        file_collection = await memory._get_collection("file_embeddings", tenant_id)
         
         # Get all embeddings from ChromaDB (for this tenant)
-        all_embeddings = file_collection.get()
+        all_embeddings = await file_collection.get()
         embedding_ids = all_embeddings.get('ids', [])
         metadatas = all_embeddings.get('metadatas', [])
         
@@ -499,7 +527,7 @@ async def cleanup_orphan_embeddings(
             batch_size = 100
             for i in range(0, len(orphaned_ids), batch_size):
                 batch = orphaned_ids[i:i + batch_size]
-                file_collection.delete(ids=batch)
+                await file_collection.delete(ids=batch)
                 deleted_count += len(batch)
                 logger.info(f"Deleted batch {i//batch_size + 1}: {len(batch)} orphaned embeddings")
         
@@ -526,11 +554,11 @@ async def search_files(
 ):
     """Search user files using semantic search (for current tenant and user)"""
     # Get tenant-specific collection
-    file_collection = memory._get_collection("file_embeddings", tenant_id)
+    file_collection = await memory._get_collection("file_embeddings", tenant_id)
     
     query_embedding = embedding_service.generate_embedding(query)
     
-    results = file_collection.query(
+    results = await file_collection.query(
         query_embeddings=[query_embedding],
         n_results=n_results,
         where={"user_id": str(current_user.id)},  # Files are user-scoped now
@@ -365,7 +365,7 @@ async def index_internal_knowledge(
                     logger.info(f"   Split into {len(chunks)} chunks")
                     
                     # Get collection (shared)
-                    collection = memory_manager._get_collection("internal_knowledge", shared=True)
+                    collection = await memory_manager._get_collection("internal_knowledge", shared=True)
                     
                     if collection is None:
                         error_msg = f"Could not get internal_knowledge collection"
@@ -375,12 +375,12 @@ async def index_internal_knowledge(
                     
                     # Delete existing chunks for this document first (re-index)
                     try:
-                        existing_results = collection.get(
+                        existing_results = await collection.get(
                             where={"document": {"$eq": filename}, "type": {"$eq": "internal_knowledge"}},
                         )
                         existing_ids = existing_results.get("ids", []) if existing_results else []
                         if existing_ids:
-                            collection.delete(ids=existing_ids)
+                            await collection.delete(ids=existing_ids)
                             logger.info(f"   Deleted {len(existing_ids)} existing chunks")
                     except Exception as e:
                         logger.warning(f"   Could not delete existing chunks: {e}")
@@ -395,7 +395,7 @@ async def index_internal_knowledge(
                         embedding = memory_manager.embedding_service.generate_embedding(chunk_content)
                         embedding_id = f"internal_{filename}_{i}_{datetime.now().isoformat()}"
                         
-                        collection.add(
+                        await collection.add(
                             ids=[embedding_id],
                             embeddings=[embedding],
                             documents=[chunk_content],
@@ -9,7 +9,7 @@ from sqlalchemy import select
 
 from app.db.database import get_db
 from app.models.database import Integration
-from app.services.calendar_service import CalendarService
+from app.services.calendar_service import CalendarService, invalidate_google_event_cache
 from app.services.exceptions import IntegrationAuthError
 from app.services.date_parser import DateParser
 from app.core.tenant_context import get_tenant_id
@@ -257,6 +257,8 @@ async def oauth_callback(
                         logger.info(f"OAuth callback (Calendar) - Updated purpose to user_calendar for integration {integration_id}")
                 
                 await db.commit()
+                # New credentials may belong to another Google account: drop the synced events
+                invalidate_google_event_cache(integration_id)
             else:
                 raise HTTPException(status_code=404, detail="Integration not found")
         else:
@@ -700,6 +702,7 @@ async def delete_calendar_integration(
     # Delete using session
     await db.delete(integration)
     await db.commit()
+    invalidate_google_event_cache(integration_id)
     
     return {"message": "Integration deleted successfully"}
 
@@ -240,8 +240,8 @@ async def delete_long_term_memory_batch(
     for mem in memories_to_delete:
         if mem.embedding_id:
             try:
-                collection = memory.long_term_memory_collection
-                collection.delete(ids=[mem.embedding_id])
+                collection = await memory.long_term_memory_collection()
+                await collection.delete(ids=[mem.embedding_id])
                 deleted_from_chroma += 1
             except Exception as e:
                 import logging
@@ -10,6 +10,7 @@ from typing import Optional, List
 import logging
 
 from app.core.metrics import get_metrics_export
+from app.core.tracing import get_simple_tracer
 from app.db.database import get_db, AsyncSessionLocal
 from app.models.database import Session as SessionModel, User, Tenant
 from app.core.user_context import get_current_user, require_admin
@@ -60,6 +61,21 @@ async def get_metrics():
     return Response(content=metrics_bytes, media_type=content_type)
 
 
+
+@router.get("/traces")
+async def get_traces(
+    trace_id: Optional[str] = Query(None, description="Return only the spans of this trace"),
+    current_user: User = Depends(require_admin),
+):
+    """
+    Recent spans of the fallback tracer in OTLP/JSON format (admin only).
+    Can be fed to any OTLP-compatible viewer without a collector.
+    """
+    tracer = get_simple_tracer()
+    if tracer is None:
+        raise HTTPException(status_code=404, detail="Span buffer not available (OpenTelemetry exporter in use)")
+    return tracer.export_otlp(trace_id=trace_id)
+
 async def run_agent_for_evaluation(
     message: str,
     session_id: UUID,
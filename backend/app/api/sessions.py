@@ -34,6 +34,8 @@ from app.core.dependencies import (
 from app.core.ollama_client import OllamaClient
 from app.core.memory_manager import MemoryManager
 from app.core.config import settings
+from app.core.llm_scheduler import bind_disconnect_check
+from app.core.latency_profile import get_current_profile, record_stage, stage
 from app.agents import run_langgraph_chat
 from app.services.agent_activity_stream import AgentActivityStream
 from app.services.background_task_manager import BackgroundTaskManager
@@ -984,6 +986,7 @@ async def get_pending_notifications(
 async def chat(
     session_id: UUID,
     request: ChatRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     ollama: OllamaClient = Depends(get_ollama_client),
     planner_client: OllamaClient = Depends(get_planner_client),
@@ -999,6 +1002,8 @@ async def chat(
     import sys
     import time
     start_time = time.time()
+    # Stop queued/running LLM calls of this request if the client goes away
+    bind_disconnect_check(http_request.is_disconnected)
     try:
         print(f"[CHAT ENDPOINT] ===== CHAT REQUEST RECEIVED =====", file=sys.stderr, flush=True)
         print(f"[CHAT ENDPOINT] session_id={session_id}, message_length={len(request.message) if request else 'None'}, user={current_user.email if current_user else 'None'}", file=sys.stderr, flush=True)
@@ -1020,21 +1025,23 @@ async def chat(
     
     # Check for day transition
     daily_session_manager = get_daily_session_manager(db)
-    day_transition, new_session = await daily_session_manager.check_day_transition(
-        user_id=current_user.id,
-        tenant_id=tenant_id,
-        current_session_id=session_id,
-    )
+    with stage("day_transition"):
+        day_transition, new_session = await daily_session_manager.check_day_transition(
+            user_id=current_user.id,
+            tenant_id=tenant_id,
+            current_session_id=session_id,
+        )
     
     # Verify current session exists and belongs to user (needed for both day transition and normal flow)
     logger.info(f"🔍 Checking session {session_id} for user {current_user.id}, tenant {tenant_id}")
-    result = await db.execute(
-        select(SessionModel).where(
-            SessionModel.id == session_id,
-            SessionModel.tenant_id == tenant_id,
-            SessionModel.user_id == current_user.id
+    with stage("session.load"):
+        result = await db.execute(
+            select(SessionModel).where(
+                SessionModel.id == session_id,
+                SessionModel.tenant_id == tenant_id,
+                SessionModel.user_id == current_user.id
+            )
         )
-    )
     current_session = result.scalar_one_or_none()
     logger.info(f"🔍 Current session found: {current_session.id if current_session else 'None'}, day_transition: {day_transition}, new_session: {new_session.id if new_session else 'None'}")
     
@@ -1119,6 +1126,7 @@ async def chat(
     # The scheduler will pick up any pending contradiction notifications and process them.
     
     # Get session context (previous messages) - filtered by tenant
+    messages_load_start = time.perf_counter()
     messages_result = await db.execute(
         select(MessageModel)
         .where(
@@ -1178,6 +1186,7 @@ async def chat(
                         "role": str(msg.role),
                         "content": f"[SESSION:{other_session.id}] {str(msg.content)}"
                     })
+    record_stage("messages.load", time.perf_counter() - messages_load_start)
     
     # Use conversation summarizer to optimize context if needed
     from app.services.conversation_summarizer import ConversationSummarizer
@@ -1199,14 +1208,15 @@ async def chat(
     
     # Always retrieve file content for the user (files are user-scoped, not session-scoped)
     # Pass db to filter out embeddings for deleted files
-    file_content = await memory.retrieve_file_content(
-        user_id=current_user.id,  # Files are user-scoped now
-        query=request.message, 
-        n_results=5, 
-        db=db, 
-        tenant_id=tenant_id,
-        session_id=session_id  # Optional: for backward compatibility and context
-    )
+    with stage("memory.files"):
+        file_content = await memory.retrieve_file_content(
+            user_id=current_user.id,  # Files are user-scoped now
+            query=request.message, 
+            n_results=5, 
+            db=db, 
+            tenant_id=tenant_id,
+            session_id=session_id  # Optional: for backward compatibility and context
+        )
     memory_used["files"] = file_content
     
     # Add information about the most recent file to context
@@ -1265,7 +1275,8 @@ async def chat(
     
     if request.use_memory and not is_explicit_search_request:
         # Short-term memory
-        short_term = await memory.get_short_term_memory(db, session_id)
+        with stage("memory.short_term"):
+            short_term = await memory.get_short_term_memory(db, session_id)
         if short_term:
             memory_used["short_term"] = True
             # Extract tool_results from short-term memory if available
@@ -1277,20 +1288,22 @@ async def chat(
                 retrieved_memory.insert(0, f"Risultati tool precedenti:\n{tool_results_text}")
         
         # Medium-term memory
-        medium_mem = await memory.retrieve_medium_term_memory(
-            session_id, request.message, n_results=3, tenant_id=tenant_id
-        )
+        with stage("memory.medium_term"):
+            medium_mem = await memory.retrieve_medium_term_memory(
+                session_id, request.message, n_results=3, tenant_id=tenant_id
+            )
         memory_used["medium_term"] = medium_mem
         retrieved_memory.extend(medium_mem)
         
         # Always retrieve internal knowledge (lightweight, LLM will decide if relevant)
         # This allows the LLM to intelligently determine if the query is meta-level
         # or user-task related, rather than using rigid keyword matching
-        internal_knowledge = await memory.retrieve_internal_knowledge(
-            query=request.message,
-            n_results=2,  # Lightweight retrieval - only top 2 results
-            tenant_id=None,  # Will use shared collection
-        )
+        with stage("memory.internal_knowledge"):
+            internal_knowledge = await memory.retrieve_internal_knowledge(
+                query=request.message,
+                n_results=2,  # Lightweight retrieval - only top 2 results
+                tenant_id=None,  # Will use shared collection
+            )
         if internal_knowledge:
             # Format internal knowledge for context
             # LLM will use this only if relevant to the query
@@ -1305,9 +1318,10 @@ async def chat(
         
         # Long-term memory (from archived sessions)
         # Use include_metadata=True to get session information
-        long_mem_raw = await memory.retrieve_long_term_memory(
-            request.message, n_results=3, tenant_id=tenant_id, include_metadata=True
-        )
+        with stage("memory.long_term"):
+            long_mem_raw = await memory.retrieve_long_term_memory(
+                request.message, n_results=3, tenant_id=tenant_id, include_metadata=True
+            )
         memory_used["long_term"] = long_mem_raw
         
         # Format retrieved memories with session metadata
@@ -1340,7 +1354,8 @@ async def chat(
         logger.info("🔍 Explicit search request detected - skipping memory retrieval to force fresh search")
         # Still get short-term memory for context, but skip medium/long-term that might contain old search results
         if request.use_memory:
-            short_term = await memory.get_short_term_memory(db, session_id)
+            with stage("memory.short_term"):
+                short_term = await memory.get_short_term_memory(db, session_id)
             if short_term:
                 memory_used["short_term"] = True
                 # Only add non-search-related short-term memory
@@ -1364,15 +1379,16 @@ async def chat(
         )
     
     # Now get optimized context AFTER retrieving memory (to consider it in size calculation)
-    session_context = await summarizer.get_optimized_context(
-        db=db,
-        session_id=session_id,
-        all_messages=all_messages_dict,
-        system_prompt="",  # Will be added by ollama client
-        retrieved_memory=retrieved_memory,
-        max_tokens=settings.max_context_tokens,
-        keep_recent=settings.context_keep_recent_messages,
-    )
+    with stage("context.summarize"):
+        session_context = await summarizer.get_optimized_context(
+            db=db,
+            session_id=session_id,
+            all_messages=all_messages_dict,
+            system_prompt="",  # Will be added by ollama client
+            retrieved_memory=retrieved_memory,
+            max_tokens=settings.max_context_tokens,
+            keep_recent=settings.context_keep_recent_messages,
+        )
     
     # Validate session_id again before saving message (in case it was modified by get_optimized_context)
     if session_id is None:
@@ -1390,7 +1406,8 @@ async def chat(
         content=request.message,
     )
     db.add(user_message)
-    await db.commit()
+    with stage("message.save"):
+        await db.commit()
     
     # Get current date/time and location for context
     from datetime import datetime
@@ -1488,21 +1505,22 @@ Giorno della settimana: {day_name}
                 )
             
             ollama._time_context = time_context
-            langgraph_result = await run_langgraph_chat(
-                db=db,
-                session_id=session_id,
-                request=request,
-                ollama=ollama,
-                planner_client=planner_client,
-                agent_activity_stream=agent_activity_stream,
-                memory_manager=memory,
-                session_context=session_context,
-                retrieved_memory=retrieved_memory,
-                memory_used=memory_used,
-                previous_messages=all_messages_dict,
-                pending_plan=pending_plan,
-                current_user=current_user,
-            )
+            with stage("agent"):
+                langgraph_result = await run_langgraph_chat(
+                    db=db,
+                    session_id=session_id,
+                    request=request,
+                    ollama=ollama,
+                    planner_client=planner_client,
+                    agent_activity_stream=agent_activity_stream,
+                    memory_manager=memory,
+                    session_context=session_context,
+                    retrieved_memory=retrieved_memory,
+                    memory_used=memory_used,
+                    previous_messages=all_messages_dict,
+                    pending_plan=pending_plan,
+                    current_user=current_user,
+                )
             logger.debug("✅ LangGraph completed successfully")
             print(f"[SESSIONS] LangGraph completed successfully", file=sys.stderr)
         except Exception as e:
@@ -1548,8 +1566,9 @@ Giorno della settimana: {day_name}
         # Commit MUST complete before returning response to ensure message is persisted
         try:
             print(f"[CHAT ENDPOINT] Committing assistant message to database...", file=sys.stderr, flush=True)
-            await db.commit()
-            await db.refresh(session)
+            with stage("response.save"):
+                await db.commit()
+                await db.refresh(session)
             logger.info(f"✅ Assistant message saved to database for session {session_id}")
             print(f"[CHAT ENDPOINT] Assistant message committed successfully", file=sys.stderr, flush=True)
         except Exception as commit_error:
@@ -1591,6 +1610,9 @@ Giorno della settimana: {day_name}
         _publish_agent_events(agent_activity_stream, session_id, agent_events)
 
         final_response = chat_response.model_copy(update={"agent_activity": agent_events})
+        profile = get_current_profile()
+        if profile is not None and settings.latency_profile_in_response:
+            final_response = final_response.model_copy(update={"timings": profile.breakdown()})
         
         # Log before returning to verify response is correct
         logger.info(f"📤 Returning ChatResponse to frontend:")
@@ -2316,8 +2338,7 @@ async def stream_agent_activity(
 
         queue = await agent_activity_stream.register(session_id)
         active_sessions = agent_activity_stream.get_active_sessions()
-        logger.info(f"📡 Registered subscriber for session {session_id}, active sessions: {len(active_sessions)} - {active_sessions}")
-        print(f"[SSE] Registered subscriber, active sessions: {len(active_sessions)} - {active_sessions}", file=sys.stderr)
+        logger.info(f"📡 Registered subscriber for session {session_id}, active sessions: {len(active_sessions)}")
         try:
             while True:
                 if await request.is_disconnected():
@@ -2326,11 +2347,6 @@ async def stream_agent_activity(
                 try:
                     event = await asyncio.wait_for(queue.get(), timeout=1.0)
                     # event is a dict (serialized), not a Pydantic model
-                    agent_id = event.get('agent_id', 'unknown') if isinstance(event, dict) else getattr(event, 'agent_id', 'unknown')
-                    status = event.get('status', 'unknown') if isinstance(event, dict) else getattr(event, 'status', 'unknown')
-                    logger.info(f"📨 Sending event to session {session_id}: {agent_id} ({status})")
-                    import sys
-                    print(f"[SSE] Sending event: {agent_id} ({status}) to session {session_id}", file=sys.stderr)
                     yield agent_activity_stream.as_sse_payload(event)
                 except asyncio.TimeoutError:
                     continue
@@ -2690,7 +2706,7 @@ async def create_session_from_notification(
         try:
             ollama_client = get_ollama_client()
             email_analyzer = EmailAnalyzer(ollama_client=ollama_client)
-            analysis = await email_analyzer.analyze_email(email_data)
+            analysis = await email_analyzer.analyze_email(email_data, integration_id=str(integration.id))
         except Exception as e:
             logger.warning(f"Error analyzing email: {e}")
             # Use default analysis
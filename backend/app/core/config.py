@@ -59,6 +59,10 @@ class Settings(BaseSettings):
     chromadb_cloud_tenant: Optional[str] = None  # Tenant ID for ChromaDB Cloud
     chromadb_cloud_database: Optional[str] = None  # Database name for ChromaDB Cloud
     chromadb_use_cloud: bool = False  # Set to True to use ChromaDB Cloud instead of HttpClient
+    vector_store_backend: str = "chroma"  # "chroma" o "memory" (in-process, per test e load test)
+    vector_store_max_workers: int = 8  # Thread dedicati alle chiamate ChromaDB (mai sull'event loop)
+    vector_store_batch_window_ms: int = 5  # Add/delete concorrenti sulla stessa collection uniti in una richiesta (0 = disabilitato)
+    vector_store_max_batch_size: int = 256  # Elementi massimi per richiesta di add/delete
 
     # LLM Provider Selection
     llm_provider: str = "ollama"  # Options: "ollama", "gemini"
@@ -76,6 +80,7 @@ class Settings(BaseSettings):
     google_cloud_location: str = "us-central1"  # Google Cloud location (default: us-central1)
     google_service_account_email: Optional[str] = None  # Service Account email per Vertex AI
     google_service_account_key: Optional[str] = None  # Service Account access token per Vertex AI
+    tool_schema_cache_max_entries: int = 64  # Dichiarazioni dei tool Gemini/Vertex già convertite, riusate tra le richieste
 
     # Ollama Main (per chat)
     ollama_base_url: str = "http://localhost:11434"
@@ -95,6 +100,52 @@ class Settings(BaseSettings):
     ollama_planner_base_url: Optional[str] = None  # Se None, usa ollama_base_url (LLM principale)
     ollama_planner_model: Optional[str] = None  # Se None, usa ollama_model (LLM principale)
 
+    # Connessioni HTTP verso i backend LLM (pool condiviso per backend, vedi app/core/http_clients.py)
+    llm_http_max_connections: int = 20  # Connessioni massime verso Ollama main/planner
+    llm_background_http_max_connections: int = 4  # Connessioni massime verso il background LLM (Ollama o llama.cpp)
+    llm_http_max_keepalive_connections: int = 10  # Connessioni tenute aperte (keep-alive) per backend
+    llm_http_keepalive_expiry_seconds: float = 60.0  # Chiusura delle connessioni inattive
+    llm_http2_enabled: bool = True  # Usa HTTP/2 se il pacchetto h2 è installato (solo backend HTTPS)
+    llm_http_connect_timeout_seconds: float = 5.0  # Timeout di connessione
+    llm_chat_timeout_seconds: float = 300.0  # Timeout di lettura per chat e planner (5 minuti)
+    llm_background_timeout_seconds: float = 600.0  # Timeout di lettura per il background LLM (modelli locali lenti)
+    llm_metadata_timeout_seconds: float = 10.0  # Timeout per lista modelli e health check
+
+    # Scheduler delle richieste LLM (priorità: interattive > planner > background)
+    llm_scheduler_enabled: bool = True  # Controllo di ammissione davanti a Ollama/llama.cpp
+    llm_max_concurrency: int = 2  # Richieste contemporanee verso Ollama main/planner
+    llm_background_max_concurrency: int = 1  # Richieste contemporanee verso il background LLM
+    llm_background_lane_max_concurrency: int = 1  # Slot massimi per il lavoro in background su ogni backend (il resto resta alle richieste interattive)
+
+    # Riuso del prefisso del prompt (KV cache) sui backend LLM
+    ollama_keep_alive: Optional[str] = "30m"  # Tiene il modello (e la cache del prompt) in memoria tra i turni; None = default di Ollama
+    llama_cpp_cache_prompt: bool = True  # llama.cpp riusa la KV cache del prefisso comune tra le richieste
+
+    # Cache semantica delle risposte (salta planner e generazione per domande equivalenti)
+    response_cache_enabled: bool = False  # Opt-in: riusa la risposta se query simile e stessa memoria/contesto
+    response_cache_similarity_threshold: float = 0.95  # Similarità coseno minima tra le query normalizzate
+    response_cache_ttl_seconds: int = 600  # Validità di una risposta senza tool
+    response_cache_tool_ttl_seconds: int = 120  # Validità di una risposta che ha usato tool (email, calendario, web)
+    response_cache_max_entries_per_user: int = 200  # Risposte mantenute per utente (LRU)
+    response_cache_min_query_words: int = 3  # Messaggi più brevi (follow-up ambigui) non vengono messi in cache
+
+    # Selezione dei tool per messaggio (embedding delle descrizioni, vedi app/core/tool_index.py)
+    tool_shortlist_enabled: bool = True  # Passa a planner e modello solo i tool pertinenti al messaggio
+    tool_shortlist_top_k: int = 8  # Tool scelti per similarità, oltre a quelli fissi
+    tool_shortlist_pinned_tools: List[str] = [  # Tool sempre inclusi (se abilitati per l'utente)
+        "get_calendar_events",
+        "get_emails",
+        "send_email",
+        "web_search",
+        "customsearch_search",
+        "web_fetch",
+    ]
+
+    # Router di intenti locale (regole + centroidi di esempi) prima del planner LLM
+    intent_router_enabled: bool = True  # Saluti e richieste con un solo tool evidente saltano il planner
+    intent_router_min_confidence: float = 0.55  # Similarità minima con il centroide dell'intento
+    intent_router_min_margin: float = 0.05  # Distacco minimo dal secondo intento, altrimenti planner
+
     # MCP Gateway (default, can be overridden per integration)
     # Default: localhost:8080 (if backend runs on host)
     # Use host.docker.internal:8080 if backend runs inside Docker
@@ -134,10 +185,22 @@ class Settings(BaseSettings):
     # File Storage
     upload_dir: Path = Path("./uploads")
     max_file_size: int = 10485760  # 10MB
+    upload_chunk_size: int = 1048576  # Upload letti/scritti a blocchi da 1MB (mai interamente in memoria)
+    upload_spool_dir: Optional[Path] = None  # Directory temporanea per gli upload (default: upload_dir/tmp)
+
+    # Recupero dei contenuti dei file (passaggi indicizzati in ChromaDB, file vivi da Postgres)
+    file_passage_chars: int = 1200  # Lunghezza dei passaggi indicizzati per file
+    file_passage_overlap_chars: int = 200  # Sovrapposizione tra passaggi consecutivi
+    file_retrieval_max_files: int = 200  # File più recenti considerati per utente
+    file_retrieval_candidates: int = 20  # Passaggi candidati chiesti a ChromaDB prima del ranking
+    file_retrieval_recency_weight: float = 0.2  # Peso della recenza nel ranking (0 = solo rilevanza)
+    file_retrieval_recency_half_life_days: float = 30.0  # Dopo questi giorni il bonus di recenza si dimezza
+    file_retrieval_max_document_chars: int = 15000  # Testo massimo restituito per richieste sul file intero
     
     # Cloud Storage (for persistent file storage on Cloud Run)
     use_cloud_storage: bool = False  # Set to True to use Cloud Storage instead of filesystem
     cloud_storage_bucket_name: Optional[str] = None  # GCS bucket name (e.g., "knowledge-navigator-files")
+    cloud_storage_upload_chunk_size: int = 8388608  # Chunk dell'upload resumable su GCS (multiplo di 256KB)
 
     # Memory Settings
     short_term_memory_ttl: int = 3600  # 1 hour
@@ -153,10 +216,24 @@ class Settings(BaseSettings):
     integrity_max_similar_memories: int = 5  # Numero memorie simili da controllare (ridotto per efficienza e precisione)
     integrity_check_exhaustive: bool = False  # Se True, controlla tutte (più lento)
     integrity_min_importance: float = 0.7  # Importanza minima delle memorie da controllare (filtra memorie poco importanti)
+    integrity_llm_concurrency: int = 2  # Chiamate LLM concorrenti massime per backend background (allineare agli slot di llama.cpp --parallel)
+    integrity_pairs_per_prompt: int = 1  # Coppie (nuova, esistente) giudicate in una singola chiamata LLM (>1 abilita il prompt multi-coppia)
+    integrity_pair_cache_size: int = 2048  # Coppie già giudicate tenute in cache LRU (0 = cache disabilitata)
+    integrity_prefilter_enabled: bool = True  # Scarta prima dell'LLM le coppie che non possono contraddirsi (similarità + entità)
+    integrity_prefilter_min_similarity: float = 0.35  # Similarità coseno minima per inviare la coppia all'LLM...
+    integrity_prefilter_min_entity_overlap: float = 0.5  # ...oppure sovrapposizione minima delle parole chiave (0.0-1.0)
     
     # Tool calling limits (for Vertex AI compatibility)
     max_tool_results_per_response: int = 5  # Maximum number of tool results to pass to LLM when generating final response (Vertex AI has limits on function calls)
     
+    # Tracing (fallback senza OpenTelemetry)
+    tracing_max_spans: int = 2000  # Span conclusi tenuti in memoria (buffer circolare, i più vecchi vengono scartati)
+    tracing_sample_rate: float = 1.0  # Frazione di trace registrate (decisa sullo span radice, 1.0 = tutte)
+    tracing_export_path: Optional[str] = None  # File OTLP/JSON (una riga per export) scritto allo shutdown, utile offline
+    latency_profile_enabled: bool = True  # Tempi per fase della richiesta (memoria, planner, tool, generazione) come istogrammi
+    latency_profile_server_timing: bool = False  # Aggiunge l'header Server-Timing con le fasi (visibile nei DevTools del browser)
+    latency_profile_in_response: bool = False  # Solo debug: allega il dettaglio dei tempi a ChatResponse (campo timings)
+
     # Feature flags
     use_langgraph_prototype: bool = True  # Enable LangGraph by default for proper agent telemetry
     
@@ -178,6 +255,14 @@ class Settings(BaseSettings):
     # Support both GOOGLE_PSE_API_KEY and GOOGLE_CSE_API_KEY (CSE = Custom Search Engine, PSE = Programmable Search Engine)
     google_pse_api_key: Optional[str] = None  # Google Programmable Search Engine API key
     google_pse_cx: Optional[str] = None  # Custom Search Engine ID
+
+    # Indicizzazione dei risultati web in memoria a lungo termine
+    web_index_async: bool = True  # Indicizza in background (fuori dal percorso della richiesta)
+    web_index_queue_size: int = 500  # Pagine in attesa di indicizzazione (oltre vengono scartate)
+    web_index_batch_size: int = 20  # Pagine scritte per batch (un embedding batch + una transazione)
+    web_index_flush_interval_seconds: float = 2.0  # Attesa massima per riempire un batch
+    web_index_freshness_hours: int = 24  # Una pagina già indicizzata viene reindicizzata solo dopo questo intervallo (override per tenant: metadata "web_index_freshness_hours")
+    web_index_similarity_threshold: float = 0.9  # Pagine con contenuto quasi identico a una memoria esistente (o a un'altra pagina del batch) non vengono riscritte
     
     def model_post_init(self, __context):
         """Load API keys from environment if not set, supporting both naming conventions"""
@@ -226,7 +311,17 @@ class Settings(BaseSettings):
     # Service health monitoring
     service_health_monitor_enabled: bool = True
     service_health_check_interval_seconds: int = 60
-    agent_scheduler_tick_seconds: int = 30
+    agent_scheduler_tick_seconds: int = 30  # Granularità delle scadenze: quelle vicine condividono un solo risveglio
+    agent_scheduler_waiting_task_timeout_seconds: int = 300  # Dopo questo tempo un task in attesa dell'utente viene ripresentato
+    agent_activity_history_size: int = 200  # Eventi di attività mantenuti per sessione (replay per nuovi client)
+    agent_activity_history_ttl_seconds: int = 1800  # Storico rimosso dopo questo tempo senza attività né subscriber
+    agent_activity_overflow_policy: str = "coalesce"  # "coalesce" (sostituisce l'evento pendente dello stesso agente) o "drop_oldest"
+    agent_activity_backend: str = "memory"  # "memory" (solo questo worker) o "postgres" (LISTEN/NOTIFY tra worker)
+    
+    # Task queue
+    task_queue_backend: str = "memory"  # "memory" (per-process) o "postgres" (durevole, condiviso tra worker)
+    task_queue_max_finished_per_session: int = 50  # Task completati/falliti mantenuti per sessione
+    task_queue_finished_ttl_seconds: int = 3600  # Dopo questo tempo i task completati/falliti vengono rimossi
     integrity_scheduler_interval_seconds: int = 30  # Temporaneamente ridotto per test
 
     # Proactivity / Event Monitoring
@@ -234,6 +329,9 @@ class Settings(BaseSettings):
     event_monitor_poll_interval_seconds: int = 60  # Check for events every minute
     email_poller_enabled: bool = True  # Enable email polling
     calendar_watcher_enabled: bool = True  # Enable calendar watching
+    calendar_cache_enabled: bool = True  # Cache eventi per integrazione, aggiornata con syncToken incrementale
+    calendar_cache_ttl_seconds: int = 60  # Età massima della cache prima di una sincronizzazione incrementale
+    calendar_cache_horizon_days: int = 30  # Giorni futuri mantenuti in cache (query oltre vanno direttamente a Google)
     
     # Email Intelligent Analysis
     email_analysis_enabled: bool = True  # Enable intelligent email analysis
@@ -241,6 +339,10 @@ class Settings(BaseSettings):
     email_analysis_auto_session_enabled: bool = True  # Auto-create sessions for actionable emails
     email_analysis_min_urgency_for_session: str = "medium"  # Only create sessions for medium+ urgency
     email_analysis_learn_from_responses: bool = True  # Update memory from user responses
+    email_analysis_batch_size: int = 10  # Email classificate per singola chiamata LLM (1 = una chiamata per email)
+    email_analysis_prefilter_enabled: bool = True  # Salta l'LLM per email ovviamente promozionali/mailing list
+    email_analysis_cache_size: int = 1000  # Analisi mantenute in cache per (integrazione, message id)
+    email_index_batch_size: int = 64  # Email indicizzate per batch (un embedding batch + una transazione per batch)
 
 
 settings = Settings()
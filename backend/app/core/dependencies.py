@@ -5,6 +5,7 @@ from typing import Optional
 from app.core.config import settings
 from app.core.mcp_client import MCPClient
 from app.core.memory_manager import MemoryManager
+from app.core.llm_scheduler import LANE_PLANNER
 from app.core.ollama_client import OllamaClient
 from app.core.health_check import get_health_check_service
 from app.services.agent_activity_stream import AgentActivityStream
@@ -31,6 +32,7 @@ _service_health_agent: ServiceHealthAgent = None
 _task_queue: TaskQueue = None
 _agent_scheduler: AgentScheduler = None
 _task_dispatcher: TaskDispatcher = None
+_web_index_queue = None  # WebIndexQueue (created lazily, see get_web_index_queue)
 
 logger = logging.getLogger(__name__)
 
@@ -99,12 +101,14 @@ def init_clients():
                     _planner_client = LlamaCppClient(
                         base_url=planner_url,
                         model=planner_model,
+                        lane=LANE_PLANNER,
                     )
                 else:
                     logger.info(f"Initializing Ollama client (planner): URL={planner_url}, model={planner_model}")
                     _planner_client = OllamaClient(
                         base_url=planner_url,
                         model=planner_model,
+                        lane=LANE_PLANNER,
                     )
         except Exception as exc:
             logger.error("Failed to initialize planner LLM client: %s", exc, exc_info=True)
@@ -131,7 +135,18 @@ def init_clients():
             _memory_manager = None
 
     if _agent_activity_stream is None:
-        _agent_activity_stream = AgentActivityStream()
+        activity_backend = None
+        if settings.agent_activity_backend == "postgres":
+            from app.services.agent_activity_stream import PostgresActivityBackend
+            activity_backend = PostgresActivityBackend(
+                dsn=settings.database_url.replace("postgresql+asyncpg://", "postgresql://"),
+            )
+        _agent_activity_stream = AgentActivityStream(
+            history_size=settings.agent_activity_history_size,
+            history_ttl_seconds=settings.agent_activity_history_ttl_seconds,
+            overflow_policy=settings.agent_activity_overflow_policy,
+            backend=activity_backend,
+        )
 
     if _background_task_manager is None:
         _background_task_manager = BackgroundTaskManager()
@@ -140,13 +155,23 @@ def init_clients():
         _notification_center = NotificationCenter()
 
     if _task_queue is None:
-        _task_queue = TaskQueue()
+        task_store = None
+        if settings.task_queue_backend == "postgres":
+            from app.services.task_store import PostgresTaskStore
+            task_store = PostgresTaskStore(session_factory=AsyncSessionLocal)
+            logger.info("Using durable Postgres backend for the task queue")
+        _task_queue = TaskQueue(
+            store=task_store,
+            max_finished_per_session=settings.task_queue_max_finished_per_session,
+            finished_ttl_seconds=settings.task_queue_finished_ttl_seconds,
+        )
 
     if _agent_scheduler is None:
         _agent_scheduler = AgentScheduler(
             task_queue=_task_queue,
             tick_seconds=settings.agent_scheduler_tick_seconds,
             agent_activity_stream=_agent_activity_stream,
+            waiting_task_timeout_seconds=settings.agent_scheduler_waiting_task_timeout_seconds,
         )
 
         async def integrity_poller():
@@ -173,9 +198,13 @@ def init_clients():
         )
         _agent_scheduler.register_dispatcher(_task_dispatcher)
         
-        # Recreate tasks from pending notifications on startup
+        # Restore durable tasks, then recreate any missing ones from pending notifications on startup
         async def _recreate_tasks_on_startup():
             try:
+                restored = await _task_queue.restore()
+                for session_id in {session_id for session_id, _ in restored}:
+                    _task_dispatcher.schedule_dispatch(session_id)
+
                 from app.services.background_agent import fetch_pending_contradiction_tasks
                 tasks = await fetch_pending_contradiction_tasks(_task_queue)
                 if tasks:
@@ -331,6 +360,21 @@ def get_task_dispatcher() -> TaskDispatcher:
     return _task_dispatcher
 
 
+def get_web_index_queue():
+    """Get the background queue used to index web results into long-term memory."""
+    global _web_index_queue
+    if _web_index_queue is None:
+        from app.services.web_indexer import WebIndexQueue, WebIndexer
+        _web_index_queue = WebIndexQueue(
+            indexer_factory=lambda: WebIndexer(get_memory_manager()),
+            session_factory=AsyncSessionLocal,
+            max_size=settings.web_index_queue_size,
+            batch_size=settings.web_index_batch_size,
+            flush_interval=settings.web_index_flush_interval_seconds,
+        )
+    return _web_index_queue
+
+
 def get_daily_session_manager(db) -> DailySessionManager:
     """Get DailySessionManager instance for managing day-based sessions"""
     return DailySessionManager(
@@ -8,6 +8,11 @@ import logging
 from typing import List, Dict, Optional, Any
 from app.core.config import settings
 from app.core.system_prompts import get_base_self_awareness_prompt
+from app.core.tool_schema_cache import (
+    convert_parameters_to_gemini_schema,
+    get_tool_declaration_cache,
+    tools_fingerprint,
+)
 import json
 import time
 
@@ -82,7 +87,8 @@ class GeminiClient:
         Returns:
             Response in Ollama-compatible format
         """
-        from app.core.tracing import trace_span, set_trace_attribute, add_trace_event
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute, add_trace_event
         from app.core.metrics import increment_counter, observe_histogram
         
         start_time = time.time()
@@ -111,7 +117,7 @@ class GeminiClient:
         # Add current prompt
         messages.append({"role": "user", "parts": [prompt]})
         
-        with trace_span("llm.generate", {
+        with stage("llm.generate", {
             "llm.model": self.model_name,
             "llm.provider": "gemini",
             "llm.stream": str(stream),
@@ -377,7 +383,8 @@ class GeminiClient:
         Returns:
             Response text or raw dict if return_raw=True
         """
-        from app.core.tracing import trace_span, set_trace_attribute, add_trace_event
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute, add_trace_event
         from app.core.metrics import increment_counter, observe_histogram
         
         start_time = time.time()
@@ -404,12 +411,12 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
         # Add self-awareness prompt
         self_awareness_prompt = get_base_self_awareness_prompt()
         
-        # Add time/location context if provided
-        time_context = getattr(self, '_time_context', None)
-        if time_context:
-            enhanced_system = self_awareness_prompt + "\n\n" + time_context + "\n\n" + enhanced_system
-        else:
-            enhanced_system = self_awareness_prompt + "\n\n" + enhanced_system
+        # Static parts first (self-awareness, instructions, tools) so requests share a
+        # stable prefix that Gemini's implicit context caching can reuse; the
+        # volatile parts (memory, time) are appended at the end
+        enhanced_system = self_awareness_prompt + "\n\n" + enhanced_system
+        if tools_description:
+            enhanced_system += tools_description
         
         if retrieved_memory:
             # Format memory context - neutral, factual language (no imperatives)
@@ -486,9 +493,10 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
             enhanced_system += memory_context
             logger.debug(f"📊 Memory context added: {len(retrieved_memory)} items, {total_memory_chars} chars total (limited to reduce safety filter triggers)")
         
-        # Add tools description if provided
-        if tools_description:
-            enhanced_system += tools_description
+        # Add time/location context if provided
+        time_context = getattr(self, '_time_context', None)
+        if time_context:
+            enhanced_system += "\n\n" + time_context
         
         # Prepare messages for Gemini
         # Gemini supports system instructions via system_instruction parameter in GenerativeModel
@@ -563,29 +571,11 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
                     continue
                 filtered_tools.append(tool)
             
-            # Convert to Gemini function declarations format
-            gemini_tools = []
-            for tool in filtered_tools:
-                tool_name = tool.get("name", "")
-                tool_desc = tool.get("description", "")
-                tool_params = tool.get("parameters", {})
-                
-                try:
-                    # Convert parameters to Gemini schema format
-                    gemini_schema = self._convert_parameters_to_gemini_schema(tool_params)
-                    
-                    gemini_tools.append({
-                        "function_declarations": [{
-                            "name": tool_name,
-                            "description": tool_desc,
-                            "parameters": gemini_schema
-                        }]
-                    })
-                except Exception as e:
-                    logger.error(f"❌ Error converting tool {tool_name} to Gemini schema: {e}", exc_info=True)
-                    logger.error(f"   Tool params: {tool_params}")
-                    # Skip this tool but continue with others
-                    continue
+            # Convert to Gemini function declarations format (cached per tool list)
+            gemini_tools = get_tool_declaration_cache().get_or_build(
+                ("gemini_tools", tools_fingerprint(filtered_tools)),
+                lambda: self._build_gemini_tools(filtered_tools),
+            )
             
             if gemini_tools:
                 logger.info(f"Passing {len(gemini_tools)} tools to Gemini (filtered from {len(tools)} original tools)")
@@ -764,7 +754,7 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
             logger.error(f"❌ Could not configure safety settings: {e}", exc_info=True)
             logger.warning(f"   Using default safety settings (may cause blocks)")
         
-        with trace_span("llm.generate_with_context", {
+        with stage("llm.generate_with_context", {
             "llm.model": self.model_name,
             "llm.provider": "gemini",
             "llm.has_tools": str(tools is not None),
@@ -900,9 +890,10 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
                     logger.info(f"🛡️  Passing safety_settings ({threshold_name}) to GenerativeModel")
                 
                 try:
-                    # Create a NEW configured instance of the model with all parameters
+                    # The system instruction changes every turn (retrieved memory, time context),
+                    # so the model is built per call; only the converted tools are cached
                     configured_model = genai.GenerativeModel(self.model_name, **model_config)
-                    logger.info(f"✅ Created configured Gemini model with: system_instruction={'yes' if system_content else 'no'}, tools={len(gemini_tools) if gemini_tools else 0}, safety_settings={'yes' if safety_settings else 'default'}")
+                    logger.info(f"✅ Configured Gemini model with: system_instruction={'yes' if system_content else 'no'}, tools={len(gemini_tools) if gemini_tools else 0}, safety_settings={'yes' if safety_settings else 'default'}")
                     
                     # Use the CONFIGURED model to start chat
                     if history:
@@ -1513,87 +1504,26 @@ When the user asks a question, use the appropriate tool to find the answer. Resp
     
     def _convert_parameters_to_gemini_schema(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Convert JSON Schema parameters to Gemini function calling schema"""
-        # Gemini uses a simplified schema format
-        # Convert from JSON Schema to Gemini format
-        properties = params.get("properties", {})
-        required = params.get("required", [])
-        
-        gemini_properties = {}
-        gemini_required = []
-        
-        for prop_name, prop_schema in properties.items():
-            prop_type = prop_schema.get("type", "string")
-            prop_desc = prop_schema.get("description", "")
-            
-            # Map JSON Schema types to Gemini types
-            gemini_type = "STRING"
-            if prop_type == "integer" or prop_type == "number":
-                gemini_type = "NUMBER"
-            elif prop_type == "boolean":
-                gemini_type = "BOOLEAN"
-            elif prop_type == "array":
-                gemini_type = "ARRAY"
-            elif prop_type == "object":
-                gemini_type = "OBJECT"
-            
-            gemini_prop = {
-                "type": gemini_type,
-                "description": prop_desc
-            }
-            
-            # For arrays, preserve the items schema (required by Gemini)
-            if prop_type == "array":
-                if "items" in prop_schema:
-                    items_schema = prop_schema["items"]
-                    items_type = items_schema.get("type", "string")
-                    
-                    # Map items type to Gemini type
-                    if items_type == "array":
-                        # Nested array - preserve items recursively
-                        # For nested arrays, we need to create an ARRAY type with its own items
-                        nested_items_schema = {}
-                        if "items" in items_schema:
-                            nested_items_type = items_schema["items"].get("type", "string")
-                            nested_gemini_type = "STRING"
-                            if nested_items_type == "integer" or nested_items_type == "number":
-                                nested_gemini_type = "NUMBER"
-                            elif nested_items_type == "boolean":
-                                nested_gemini_type = "BOOLEAN"
-                            elif nested_items_type == "object":
-                                nested_gemini_type = "OBJECT"
-                            nested_items_schema = {"type": nested_gemini_type}
-                        else:
-                            # Nested array without items - default to STRING
-                            nested_items_schema = {"type": "STRING"}
-                        # Create ARRAY with nested items
-                        gemini_prop["items"] = {
-                            "type": "ARRAY",
-                            "items": nested_items_schema
-                        }
-                    else:
-                        # Simple array (not nested)
-                        gemini_items_type = "STRING"
-                        if items_type == "integer" or items_type == "number":
-                            gemini_items_type = "NUMBER"
-                        elif items_type == "boolean":
-                            gemini_items_type = "BOOLEAN"
-                        elif items_type == "object":
-                            gemini_items_type = "OBJECT"
-                        gemini_prop["items"] = {"type": gemini_items_type}
-                else:
-                    # Array without items specified - default to STRING array (required by Gemini)
-                    gemini_prop["items"] = {"type": "STRING"}
-            
-            gemini_properties[prop_name] = gemini_prop
-            
-            if prop_name in required:
-                gemini_required.append(prop_name)
-        
-        return {
-            "type": "OBJECT",
-            "properties": gemini_properties,
-            "required": gemini_required
-        }
+        return convert_parameters_to_gemini_schema(params)
+    
+    def _build_gemini_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Gemini function declarations for a tool list (tools that fail to convert are skipped)"""
+        gemini_tools = []
+        for tool in tools:
+            tool_name = tool.get("name", "")
+            tool_params = tool.get("parameters", {})
+            try:
+                gemini_tools.append({
+                    "function_declarations": [{
+                        "name": tool_name,
+                        "description": tool.get("description", ""),
+                        "parameters": self._convert_parameters_to_gemini_schema(tool_params),
+                    }]
+                })
+            except Exception as e:
+                logger.error(f"❌ Error converting tool {tool_name} to Gemini schema: {e}", exc_info=True)
+                logger.error(f"   Tool params: {tool_params}")
+        return gemini_tools
     
     async def list_models(self) -> List[str]:
         """List available Gemini models"""
@@ -6,6 +6,14 @@ import logging
 from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from app.core.config import settings
+from app.core.http_clients import (
+    BACKEND_LLAMA_CPP,
+    BACKEND_OLLAMA,
+    BACKEND_OLLAMA_BACKGROUND,
+    CALL_METADATA,
+    get_http_client,
+    llm_timeout,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -132,12 +140,10 @@ class HealthCheckService:
         """Check ChromaDB connection"""
         try:
             if settings.chromadb_use_cloud and settings.chromadb_cloud_api_key:
-                # ChromaDB Cloud - test connection by trying to list collections
-                from app.core.memory_manager import MemoryManager
-                memory_manager = MemoryManager()
-                # Try to access a collection (this will fail if connection is bad)
+                # ChromaDB Cloud - test connection through the shared vector store client
+                from app.core.vector_store import get_vector_store
                 try:
-                    _ = memory_manager.long_term_memory_collection
+                    await get_vector_store().heartbeat()
                     return {
                         "healthy": True,
                         "message": "ChromaDB Cloud connection successful",
@@ -172,26 +178,27 @@ class HealthCheckService:
     async def _check_ollama_main(self) -> Dict[str, Any]:
         """Check Ollama Main connection and model availability"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # Check if Ollama is running
-                response = await client.get(f"{settings.ollama_base_url}/api/tags")
-                if response.status_code != 200:
-                    return {"healthy": False, "error": f"Ollama main returned status {response.status_code}"}
-                
-                # Check if model is available
-                models = response.json().get("models", [])
-                model_names = [m.get("name", "") for m in models]
-                
-                if settings.ollama_model not in model_names:
-                    return {
-                        "healthy": False,
-                        "error": f"Model '{settings.ollama_model}' not found. Available: {model_names}"
-                    }
-                
+            client = get_http_client(BACKEND_OLLAMA)
+            timeout = llm_timeout(CALL_METADATA)
+            # Check if Ollama is running
+            response = await client.get(f"{settings.ollama_base_url}/api/tags", timeout=timeout)
+            if response.status_code != 200:
+                return {"healthy": False, "error": f"Ollama main returned status {response.status_code}"}
+            
+            # Check if model is available
+            models = response.json().get("models", [])
+            model_names = [m.get("name", "") for m in models]
+            
+            if settings.ollama_model not in model_names:
                 return {
-                    "healthy": True,
-                    "message": f"Ollama main connection successful, model '{settings.ollama_model}' available"
+                    "healthy": False,
+                    "error": f"Model '{settings.ollama_model}' not found. Available: {model_names}"
                 }
+            
+            return {
+                "healthy": True,
+                "message": f"Ollama main connection successful, model '{settings.ollama_model}' available"
+            }
         except httpx.ConnectError:
             logger.error(f"❌ Ollama main health check failed: Connection refused")
             return {"healthy": False, "error": "Cannot connect to Ollama main (connection refused)"}
@@ -202,69 +209,72 @@ class HealthCheckService:
     async def _check_ollama_background(self) -> Dict[str, Any]:
         """Check Background LLM connection (Ollama or llama.cpp) and model availability"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                if settings.use_llama_cpp_background:
-                    # llama.cpp uses OpenAI-compatible API
-                    base_url = settings.ollama_background_base_url
-                    if not base_url.endswith('/v1'):
-                        base_url = base_url.rstrip('/') + '/v1'
-                    
-                    response = await client.get(f"{base_url}/models")
-                    if response.status_code != 200:
-                        return {
-                            "healthy": False,
-                            "error": f"llama.cpp background returned status {response.status_code}"
-                        }
-                    
-                    # Check if model is available (llama.cpp format)
-                    models_data = response.json().get("data", [])
-                    model_names = [m.get("id", "") or m.get("name", "") or m.get("model", "") for m in models_data]
-                    
-                    # llama.cpp might return model name with .gguf extension
-                    expected_model = settings.ollama_background_model
-                    # Check if model name matches (with or without .gguf extension)
-                    # llama.cpp returns model name as "Phi-3-mini-4k-instruct-q4.gguf" but we configure without .gguf
-                    model_found = (
-                        expected_model in model_names or 
-                        f"{expected_model}.gguf" in model_names or
-                        any(expected_model in name or name.replace(".gguf", "") == expected_model for name in model_names)
-                    )
-                    
-                    if not model_found:
-                        return {
-                            "healthy": False,
-                            "error": f"Model '{expected_model}' not found. Available: {model_names}. "
-                                    f"Make sure llama-server is running with the correct model."
-                        }
-                    
+            client = get_http_client(
+                BACKEND_LLAMA_CPP if settings.use_llama_cpp_background else BACKEND_OLLAMA_BACKGROUND
+            )
+            timeout = llm_timeout(CALL_METADATA)
+            if settings.use_llama_cpp_background:
+                # llama.cpp uses OpenAI-compatible API
+                base_url = settings.ollama_background_base_url
+                if not base_url.endswith('/v1'):
+                    base_url = base_url.rstrip('/') + '/v1'
+                
+                response = await client.get(f"{base_url}/models", timeout=timeout)
+                if response.status_code != 200:
                     return {
-                        "healthy": True,
-                        "message": f"llama.cpp background connection successful, model '{expected_model}' available"
+                        "healthy": False,
+                        "error": f"llama.cpp background returned status {response.status_code}"
                     }
-                else:
-                    # Ollama Docker container
-                    response = await client.get(f"{settings.ollama_background_base_url}/api/tags")
-                    if response.status_code != 200:
-                        return {
-                            "healthy": False,
-                            "error": f"Ollama background returned status {response.status_code}"
-                        }
-                    
-                    # Check if model is available
-                    models = response.json().get("models", [])
-                    model_names = [m.get("name", "") for m in models]
-                    
-                    if settings.ollama_background_model not in model_names:
-                        return {
-                            "healthy": False,
-                            "error": f"Model '{settings.ollama_background_model}' not found. Available: {model_names}. "
-                                    f"Run: docker exec knowledge-navigator-ollama-background ollama pull {settings.ollama_background_model}"
-                        }
-                    
+                
+                # Check if model is available (llama.cpp format)
+                models_data = response.json().get("data", [])
+                model_names = [m.get("id", "") or m.get("name", "") or m.get("model", "") for m in models_data]
+                
+                # llama.cpp might return model name with .gguf extension
+                expected_model = settings.ollama_background_model
+                # Check if model name matches (with or without .gguf extension)
+                # llama.cpp returns model name as "Phi-3-mini-4k-instruct-q4.gguf" but we configure without .gguf
+                model_found = (
+                    expected_model in model_names or 
+                    f"{expected_model}.gguf" in model_names or
+                    any(expected_model in name or name.replace(".gguf", "") == expected_model for name in model_names)
+                )
+                
+                if not model_found:
                     return {
-                        "healthy": True,
-                        "message": f"Ollama background connection successful, model '{settings.ollama_background_model}' available"
+                        "healthy": False,
+                        "error": f"Model '{expected_model}' not found. Available: {model_names}. "
+                                f"Make sure llama-server is running with the correct model."
+                    }
+                
+                return {
+                    "healthy": True,
+                    "message": f"llama.cpp background connection successful, model '{expected_model}' available"
+                }
+            else:
+                # Ollama Docker container
+                response = await client.get(f"{settings.ollama_background_base_url}/api/tags", timeout=timeout)
+                if response.status_code != 200:
+                    return {
+                        "healthy": False,
+                        "error": f"Ollama background returned status {response.status_code}"
+                    }
+                
+                # Check if model is available
+                models = response.json().get("models", [])
+                model_names = [m.get("name", "") for m in models]
+                
+                if settings.ollama_background_model not in model_names:
+                    return {
+                        "healthy": False,
+                        "error": f"Model '{settings.ollama_background_model}' not found. Available: {model_names}. "
+                                f"Run: docker exec knowledge-navigator-ollama-background ollama pull {settings.ollama_background_model}"
                     }
+                
+                return {
+                    "healthy": True,
+                    "message": f"Ollama background connection successful, model '{settings.ollama_background_model}' available"
+                }
         except httpx.ConnectError:
             logger.error(f"❌ Background LLM health check failed: Connection refused")
             service_name = "llama.cpp" if settings.use_llama_cpp_background else "Ollama background"
@@ -0,0 +1,106 @@
+"""
+Shared HTTP clients for LLM backends.
+
+Every LLM client (main, planner, background, llama.cpp) and the health checks
+get their `httpx.AsyncClient` from this registry instead of creating one per
+instance. There is one pooled client per backend, with explicit connection
+limits and keep-alive, so connections to the same host are reused instead of
+being opened and torn down for every client (TIME_WAIT buildup under load).
+Timeouts are chosen per call type; all clients are closed in the app lifespan.
+"""
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package (pip install 'httpx[http2]')
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+BACKEND_OLLAMA = "ollama"  # Main and planner LLM
+BACKEND_OLLAMA_BACKGROUND = "ollama_background"
+BACKEND_LLAMA_CPP = "llama_cpp"
+
+CALL_CHAT = "chat"  # Interactive generation (chat, planner)
+CALL_BACKGROUND = "background"  # Background generation (slow local models)
+CALL_METADATA = "metadata"  # Model listing, health checks
+
+
+def llm_timeout(call_type: str) -> httpx.Timeout:
+    """Timeout for a call type: short connect, read timeout depends on the call"""
+    read_timeouts = {
+        CALL_CHAT: settings.llm_chat_timeout_seconds,
+        CALL_BACKGROUND: settings.llm_background_timeout_seconds,
+        CALL_METADATA: settings.llm_metadata_timeout_seconds,
+    }
+    read = read_timeouts.get(call_type, settings.llm_chat_timeout_seconds)
+    return httpx.Timeout(read, connect=min(settings.llm_http_connect_timeout_seconds, read))
+
+
+def _limits(backend: str) -> httpx.Limits:
+    max_connections = settings.llm_http_max_connections
+    if backend in (BACKEND_OLLAMA_BACKGROUND, BACKEND_LLAMA_CPP):
+        max_connections = settings.llm_background_http_max_connections
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(settings.llm_http_max_keepalive_connections, max_connections),
+        keepalive_expiry=settings.llm_http_keepalive_expiry_seconds,
+    )
+
+
+class HttpClientRegistry:
+    """Owns one pooled AsyncClient per backend name"""
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, backend: str) -> httpx.AsyncClient:
+        client = self._clients.get(backend)
+        if client is None or client.is_closed:
+            http2 = settings.llm_http2_enabled and HTTP2_AVAILABLE
+            limits = _limits(backend)
+            client = httpx.AsyncClient(
+                limits=limits,
+                timeout=llm_timeout(CALL_CHAT),
+                http2=http2,
+            )
+            self._clients[backend] = client
+            logger.info(
+                f"🔌 HTTP pool for {backend}: max_connections={limits.max_connections}, http2={http2}"
+            )
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for backend, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:  # pragma: no cover - safeguard
+                logger.warning(f"Error closing HTTP pool for {backend}: {e}")
+
+
+_registry = HttpClientRegistry()
+
+
+def get_http_client(backend: str) -> httpx.AsyncClient:
+    """Shared HTTP client for an LLM backend (do not close it: see close_http_clients)"""
+    return _registry.get(backend)
+
+
+def backend_for_url(base_url: Optional[str]) -> str:
+    """Backend name of an Ollama base URL (main/planner share a pool, background has its own)"""
+    if base_url and base_url == settings.ollama_background_base_url:
+        return BACKEND_OLLAMA_BACKGROUND
+    return BACKEND_OLLAMA
+
+
+async def close_http_clients() -> None:
+    """Close all shared HTTP clients (app shutdown)"""
+    await _registry.aclose()
@@ -0,0 +1,138 @@
+"""
+Latency Profile - per-request breakdown of where a chat turn spends its time.
+
+HTTP and LLM durations alone don't say whether a slow turn was spent loading
+messages, querying a memory tier, planning, in a tool or in generation. A
+RequestProfile is opened per HTTP request (ObservabilityMiddleware) and
+carried in a contextvar; code marks named stages with `stage(...)`, which
+opens a trace span, feeds the `request_stage_duration_seconds{stage}`
+histogram and adds the duration to the request's profile.
+
+Stages may nest (a graph node contains its LLM and tool stages) and repeat
+(a tool called twice): the profile keeps total time and count per name, in
+first-seen order. Stage names are a metric label, so they must come from a
+fixed set: variable parts (tool names, ids) go in the span attributes. The
+profile can be rendered as a Server-Timing header and attached to
+ChatResponse when the corresponding settings are enabled.
+"""
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import observe_histogram, register_histogram
+from app.core.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+register_histogram(
+    "request_stage_duration_seconds",
+    "Duration of named stages of a request (chat phases, graph nodes, LLM calls, tools)",
+    ("stage",),
+    _STAGE_BUCKETS,
+)
+
+_SERVER_TIMING_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+
+class RequestProfile:
+    """Stage durations recorded while handling one request"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.closed = False
+        self._stages: Dict[str, List[float]] = {}  # name -> [seconds, count]
+
+    def record(self, name: str, seconds: float) -> None:
+        # Work spawned by the request may outlive it: ignore late stages
+        if self.closed:
+            return
+        entry = self._stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Stage totals in milliseconds, in first-seen order, plus the request total so far"""
+        return {
+            "total_ms": round(self.elapsed() * 1000, 2),
+            "stages": [
+                {"name": name, "duration_ms": round(seconds * 1000, 2), "count": count}
+                for name, (seconds, count) in self._stages.items()
+            ],
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (https://www.w3.org/TR/server-timing/)"""
+        entries = [
+            f"{_SERVER_TIMING_TOKEN.sub('_', name)};dur={seconds * 1000:.1f}"
+            for name, (seconds, _count) in self._stages.items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_latency_profile", default=None)
+
+
+def start_profile() -> Optional[RequestProfile]:
+    """Open a profile for the current request (None when profiling is disabled)"""
+    if not settings.latency_profile_enabled:
+        return None
+    profile = RequestProfile()
+    _current_profile.set(profile)
+    return profile
+
+
+def get_current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record an already measured stage"""
+    if not settings.latency_profile_enabled:
+        return
+    observe_histogram("request_stage_duration_seconds", seconds, labels={"stage": name})
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(name, seconds)
+
+
+@contextmanager
+def stage(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    Time a named stage: opens a trace span with the same name and records
+    the duration (also when the block raises).
+
+    Usage:
+        with stage("memory.long_term"):
+            ...
+    """
+    with trace_span(name, attributes) as span:
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            record_stage(name, time.perf_counter() - start)
+
+
+def staged(name: str, func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Wrap an async callable (e.g. a graph node) so that each call is a stage"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with stage(name):
+            return await func(*args, **kwargs)
+    return wrapper
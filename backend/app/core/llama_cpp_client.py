@@ -4,6 +4,9 @@ LlamaCppClient - Adapter for llama.cpp server (OpenAI-compatible API)
 import httpx
 from typing import List, Dict, Optional, Any
 from app.core.config import settings
+from app.core.http_clients import BACKEND_LLAMA_CPP, CALL_BACKGROUND, get_http_client, llm_timeout
+from app.core.system_prompts import build_prefix_cached_messages
+from app.core.llm_scheduler import LANE_BACKGROUND, LLMRequestCancelled, schedule_llm_call
 import json
 import logging
 
@@ -16,18 +19,19 @@ class LlamaCppClient:
     Compatible with OllamaClient interface for easy integration.
     """
     
-    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None, lane: Optional[str] = None):
         """
         Initialize llama.cpp client.
         
         Args:
             base_url: llama.cpp server URL (default: settings.ollama_background_base_url)
             model: Model name (default: settings.ollama_background_model)
+            lane: Default scheduler lane (default: background)
         """
         self.base_url = base_url or settings.ollama_background_base_url
         self.model = model or settings.ollama_background_model
-        # llama.cpp is faster, use shorter timeout
-        self.client = httpx.AsyncClient(timeout=180.0)
+        self._timeout = llm_timeout(CALL_BACKGROUND)
+        self.lane = lane or LANE_BACKGROUND
         
         # Ensure base_url has /v1 prefix for OpenAI API
         if not self.base_url.endswith('/v1'):
@@ -36,6 +40,11 @@ class LlamaCppClient:
             else:
                 self.base_url = self.base_url + '/v1'
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Shared connection pool (closed by close_http_clients() at shutdown)
+        return get_http_client(BACKEND_LLAMA_CPP)
+    
     async def generate_with_context(
         self,
         prompt: str,
@@ -64,29 +73,14 @@ class LlamaCppClient:
             Generated response text
         """
         try:
-            # Build messages list
-            messages = []
-            
-            # Add system prompt if provided
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            # Add retrieved memory as system message if provided
+            # Static instructions first and memory next to the prompt, so the
+            # server can reuse the cached prefix (cache_prompt) across requests
+            static_system = "\n\n".join(part for part in (system_prompt, tools_description) if part)
+            volatile_context = ""
             if retrieved_memory:
                 memory_text = "\n\n".join([f"- {mem}" for mem in retrieved_memory])
-                memory_system_msg = f"=== Context from Memory ===\n{memory_text}\n=== End Context ==="
-                messages.append({"role": "system", "content": memory_system_msg})
-            
-            # Add tools description as system message if provided
-            if tools_description:
-                messages.append({"role": "system", "content": tools_description})
-            
-            # Add session context
-            if session_context:
-                messages.extend(session_context)
-            
-            # Add current prompt
-            messages.append({"role": "user", "content": prompt})
+                volatile_context = f"=== Context from Memory ===\n{memory_text}\n=== End Context ==="
+            messages = build_prefix_cached_messages(static_system, session_context, prompt, volatile_context)
             
             # Prepare request payload
             payload = {
@@ -94,6 +88,8 @@ class LlamaCppClient:
                 "messages": messages,
                 "temperature": 0.7,
                 "max_tokens": 2000,
+                # Reuse the KV cache of the common prompt prefix from the previous request
+                "cache_prompt": settings.llama_cpp_cache_prompt,
             }
             
             # Add format if specified (for JSON mode)
@@ -104,9 +100,14 @@ class LlamaCppClient:
             logger.debug(f"Model: {self.model}, Messages: {len(messages)}")
             
             # Call OpenAI-compatible API
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=payload,
+            response = await schedule_llm_call(
+                BACKEND_LLAMA_CPP,
+                lambda: self.client.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    timeout=self._timeout,
+                ),
+                lane=self.lane,
             )
             response.raise_for_status()
             result = response.json()
@@ -122,6 +123,8 @@ class LlamaCppClient:
                 logger.error(f"Unexpected response format: {result}")
                 return ""
                 
+        except LLMRequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error calling llama.cpp API: {e}", exc_info=True)
             raise
@@ -172,5 +175,9 @@ class LlamaCppClient:
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        return None
+    
+    async def close(self):
+        """Nothing to release per instance: the connection pool is shared."""
+        return None
 
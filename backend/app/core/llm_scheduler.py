@@ -0,0 +1,251 @@
+"""
+LLM Scheduler - admission control in front of the local LLM backends.
+
+Every Ollama / llama.cpp request goes through `LLMScheduler.run`, which
+limits how many requests run at once per backend and, when the backend is
+busy, admits waiting requests by lane: interactive chat first, then planner
+calls, then background work (summaries, knowledge extraction, email
+analysis, integrity checks). The background lane is additionally capped per
+backend so it can never occupy every slot.
+
+The lane comes from the `llm_lane()` context (set by background services) or
+from the client's default. Interactive requests bound to an HTTP request with
+`bind_disconnect_check()` are cancelled - while queued or while generating -
+when the client disconnects.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import increment_counter, observe_histogram, set_gauge
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LANE_INTERACTIVE = "interactive"
+LANE_PLANNER = "planner"
+LANE_BACKGROUND = "background"
+
+_LANE_PRIORITY = {LANE_INTERACTIVE: 0, LANE_PLANNER: 1, LANE_BACKGROUND: 2}
+
+DisconnectCheck = Callable[[], Awaitable[bool]]
+
+_current_lane: ContextVar[Optional[str]] = ContextVar("llm_lane", default=None)
+_disconnect_check: ContextVar[Optional[DisconnectCheck]] = ContextVar("llm_disconnect_check", default=None)
+
+
+class LLMRequestCancelled(Exception):
+    """Raised when the HTTP client that requested an LLM call disconnected."""
+
+
+@contextmanager
+def llm_lane(lane: str) -> Iterator[None]:
+    """Run the LLM calls made inside this block in the given lane."""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def bind_disconnect_check(check: Optional[DisconnectCheck]) -> None:
+    """
+    Cancel interactive LLM calls of the current request when `check()` returns True
+    (typically `starlette.requests.Request.is_disconnected`).
+    """
+    _disconnect_check.set(check)
+
+
+class _BackendSlots:
+    """Concurrency slots and waiting requests of one backend"""
+
+    def __init__(self, capacity: int, background_limit: int) -> None:
+        self.capacity = max(1, capacity)
+        self.background_limit = max(1, min(background_limit, self.capacity))
+        self.active = 0
+        self.active_by_lane: Counter = Counter()
+        self.waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+
+    def can_admit(self, lane: str) -> bool:
+        if self.active >= self.capacity:
+            return False
+        return lane != LANE_BACKGROUND or self.active_by_lane[LANE_BACKGROUND] < self.background_limit
+
+    def has_waiters_before(self, lane: str) -> bool:
+        priority = _LANE_PRIORITY[lane]
+        return any(entry[0] <= priority and not entry[3].done() for entry in self.waiters)
+
+    def waiting(self) -> int:
+        return sum(1 for entry in self.waiters if not entry[3].done())
+
+    def take(self, lane: str) -> None:
+        self.active += 1
+        self.active_by_lane[lane] += 1
+
+    def give_back(self, lane: str) -> None:
+        self.active -= 1
+        self.active_by_lane[lane] -= 1
+
+
+class LLMScheduler:
+    """Per-backend concurrency caps with priority lanes"""
+
+    def __init__(
+        self,
+        capacities: Optional[Dict[str, int]] = None,
+        default_capacity: int = 1,
+        background_limit: int = 1,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self._capacities = dict(capacities or {})
+        self._default_capacity = default_capacity
+        self._background_limit = background_limit
+        self._poll_interval = poll_interval
+        self._backends: Dict[str, _BackendSlots] = {}
+        self._seq = itertools.count()
+
+    def _slots(self, backend: str) -> _BackendSlots:
+        slots = self._backends.get(backend)
+        if slots is None:
+            slots = _BackendSlots(self._capacities.get(backend, self._default_capacity), self._background_limit)
+            self._backends[backend] = slots
+        return slots
+
+    def stats(self, backend: str) -> Dict[str, int]:
+        slots = self._slots(backend)
+        return {"active": slots.active, "waiting": slots.waiting(), "capacity": slots.capacity}
+
+    async def run(self, backend: str, call: Callable[[], Awaitable[T]], lane: Optional[str] = None) -> T:
+        """
+        Run `call()` once the backend has a free slot for the lane.
+
+        Raises LLMRequestCancelled if the bound HTTP client disconnects while
+        an interactive or planner request is queued or running.
+        """
+        lane = _current_lane.get() or lane or LANE_INTERACTIVE
+        if lane not in _LANE_PRIORITY:
+            lane = LANE_INTERACTIVE
+        # Background work outlives the request that triggered it
+        check = _disconnect_check.get() if lane != LANE_BACKGROUND else None
+        labels = {"backend": backend, "lane": lane}
+
+        queued_at = time.monotonic()
+        await self._acquire(backend, lane, check)
+        observe_histogram("llm_scheduler_queue_seconds", time.monotonic() - queued_at, labels)
+        outcome = "error"
+        try:
+            if check is None:
+                result = await call()
+            else:
+                result = await self._run_watched(call, check)
+            outcome = "completed"
+            return result
+        except LLMRequestCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            self._release(backend, lane)
+            increment_counter("llm_scheduler_requests_total", labels={**labels, "outcome": outcome})
+
+    async def _acquire(self, backend: str, lane: str, check: Optional[DisconnectCheck]) -> None:
+        slots = self._slots(backend)
+        if slots.can_admit(lane) and not slots.has_waiters_before(lane):
+            slots.take(lane)
+            self._publish(backend, slots)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(slots.waiters, (_LANE_PRIORITY[lane], next(self._seq), lane, future))
+        self._publish(backend, slots)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(future),
+                        timeout=self._poll_interval if check is not None else None,
+                    )
+                    return
+                except asyncio.TimeoutError:
+                    if await check():
+                        increment_counter(
+                            "llm_scheduler_requests_total",
+                            labels={"backend": backend, "lane": lane, "outcome": "cancelled"},
+                        )
+                        raise LLMRequestCancelled("Client disconnected while waiting for the LLM")
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we gave up: hand it to the next waiter
+                self._release(backend, lane)
+            else:
+                future.cancel()
+                self._publish(backend, slots)
+            raise
+
+    async def _run_watched(self, call: Callable[[], Awaitable[T]], check: DisconnectCheck) -> T:
+        task = asyncio.ensure_future(call())
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self._poll_interval)
+                if done:
+                    return task.result()
+                if await check():
+                    task.cancel()
+                    logger.info("🛑 Client disconnected, cancelled running LLM request")
+                    raise LLMRequestCancelled("Client disconnected during LLM generation")
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _release(self, backend: str, lane: str) -> None:
+        slots = self._slots(backend)
+        slots.give_back(lane)
+        # Grant freed slots to the highest-priority waiters that may run
+        while slots.waiters:
+            _, _, waiter_lane, future = slots.waiters[0]
+            if future.done():
+                heapq.heappop(slots.waiters)
+                continue
+            if not slots.can_admit(waiter_lane):
+                break
+            heapq.heappop(slots.waiters)
+            slots.take(waiter_lane)
+            future.set_result(None)
+        self._publish(backend, slots)
+
+    def _publish(self, backend: str, slots: _BackendSlots) -> None:
+        set_gauge("llm_scheduler_active", slots.active, labels={"backend": backend})
+        set_gauge("llm_scheduler_waiting", slots.waiting(), labels={"backend": backend})
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Process-wide scheduler configured from settings"""
+    global _scheduler
+    if _scheduler is None:
+        from app.core.http_clients import BACKEND_LLAMA_CPP, BACKEND_OLLAMA, BACKEND_OLLAMA_BACKGROUND
+        _scheduler = LLMScheduler(
+            capacities={
+                BACKEND_OLLAMA: settings.llm_max_concurrency,
+                BACKEND_OLLAMA_BACKGROUND: settings.llm_background_max_concurrency,
+                BACKEND_LLAMA_CPP: settings.llm_background_max_concurrency,
+            },
+            background_limit=settings.llm_background_lane_max_concurrency,
+        )
+    return _scheduler
+
+
+async def schedule_llm_call(backend: str, call: Callable[[], Awaitable[T]], lane: Optional[str] = None) -> T:
+    """Run an LLM call through the scheduler (directly when scheduling is disabled)"""
+    if not settings.llm_scheduler_enabled:
+        return await call()
+    return await get_llm_scheduler().run(backend, call, lane=lane)
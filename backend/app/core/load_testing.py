@@ -0,0 +1,460 @@
+"""
+Load Testing - throughput and latency of the chat pipeline under concurrency.
+
+AgentEvaluator (app/core/evaluation.py) measures answer accuracy; this module
+measures how the pipeline behaves when N users chat at the same time:
+
+- in-process mode drives run_langgraph_chat against local stand-ins: a fake
+  LLM with configurable per-token latency, an in-memory vector store, a
+  deterministic embedding service and a SQLite database (or any SQLAlchemy
+  URL, e.g. a throwaway Postgres container), so it runs offline;
+- HTTP mode drives POST /api/sessions/{id}/chat of a running backend and
+  reads the per-stage breakdown from its Server-Timing header
+  (latency_profile_server_timing must be enabled on the server). Every
+  simulated user needs its own auth token (a real user) and gets its own
+  session, created before the run and deleted after it: users sharing a
+  token would all be served from the same user's sessions and memory.
+
+Reports contain p50/p95/p99 of the turn latency and of every stage recorded
+by app/core/latency_profile.py. In-process reports also contain event-loop
+lag (how late a periodic timer fires while the load runs) and the time spent
+waiting for a DB connection from the pool; in HTTP mode those happen on the
+server, so they are left out rather than measured on the client.
+
+Run it with backend/scripts/run_load_test.py.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from app.core.latency_profile import start_profile, stage
+from app.core.metrics import StreamingHistogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MESSAGES = [
+    "Ciao! Come stai oggi?",
+    "Scrivi una breve poesia sull'autunno",
+    "Riassumi in tre punti i vantaggi del lavoro da remoto",
+    "Che differenza c'è tra una lista e una tupla in Python?",
+    "Dammi qualche idea per una cena veloce",
+    "Spiegami cos'è la latenza p99",
+]
+
+
+class FakeLLMClient:
+    """
+    Stand-in for OllamaClient/GeminiClient: waits first_token_latency plus
+    token_latency per generated token, then returns a canned answer without
+    tool calls. generate() (used by the planner) answers with an empty plan.
+    """
+
+    def __init__(
+        self,
+        token_latency: float = 0.01,
+        first_token_latency: float = 0.1,
+        response_tokens: int = 60,
+        model: str = "fake-llm",
+    ):
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self.response_tokens = response_tokens
+        self.model = model
+        self.model_name = model
+        self.base_url = "fake://llm"
+        self.calls = 0
+
+    async def _simulate(self, tokens: int) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency + tokens * self.token_latency)
+
+    async def generate(self, prompt: str, context: Optional[List[Dict[str, str]]] = None, **kwargs) -> Dict[str, Any]:
+        with stage("llm.generate", {"llm.model": self.model}):
+            plan = json.dumps({"needs_plan": False, "reason": "load test", "steps": []})
+            await self._simulate(len(plan) // 4)
+            return {"message": {"role": "assistant", "content": plan}}
+
+    async def generate_with_context(
+        self,
+        prompt: str,
+        session_context: List[Dict[str, str]],
+        return_raw: bool = False,
+        **kwargs,
+    ) -> Any:
+        with stage("llm.generate_with_context", {"llm.model": self.model}):
+            await self._simulate(self.response_tokens)
+            content = " ".join(["risposta"] * self.response_tokens)
+            if return_raw:
+                return {"content": content, "raw_result": {}, "_parsed_tool_calls": [], "_raw_tool_calls": []}
+            return content
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeEmbeddingService:
+    """Deterministic hashed bag-of-words embeddings (no model download)"""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self.model_name = "fake-embeddings"
+
+    def generate_embedding(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self.generate_embedding(text) for text in texts]
+
+
+class EventLoopLagMonitor:
+    """Measures how late a periodic timer fires: a proxy for blocking work on the loop"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lag = StreamingHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag.observe(max(0.0, time.perf_counter() - expected))
+
+    async def __aenter__(self) -> "EventLoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+@dataclass
+class LoadTestConfig:
+    users: int = 10
+    turns_per_user: int = 5
+    think_time: float = 0.0  # Pause between two turns of the same user (seconds)
+    ramp_up: float = 0.0  # Users start spread over this many seconds
+    messages: List[str] = field(default_factory=lambda: list(DEFAULT_MESSAGES))
+    # In-process mode
+    token_latency: float = 0.01
+    first_token_latency: float = 0.1
+    response_tokens: int = 60
+    database_url: Optional[str] = None  # Default: temporary SQLite file
+    db_pool_size: int = 5
+    db_max_overflow: int = 0
+    # HTTP mode
+    base_url: Optional[str] = None
+    auth_tokens: List[str] = field(default_factory=list)  # One per simulated user
+    tenant_id: Optional[str] = None
+    request_timeout: float = 120.0
+    seed: int = 0
+
+
+@dataclass
+class LoadTestReport:
+    mode: str
+    config: LoadTestConfig
+    duration_seconds: float = 0.0
+    turns: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    latency: StreamingHistogram = field(default_factory=StreamingHistogram)
+    stages: Dict[str, StreamingHistogram] = field(default_factory=dict)
+    loop_lag: StreamingHistogram = field(default_factory=StreamingHistogram)
+    db_pool_wait: StreamingHistogram = field(default_factory=StreamingHistogram)
+
+    def add_error(self, error: str) -> None:
+        self.errors[error] = self.errors.get(error, 0) + 1
+
+    def observe_stages(self, stages: List[Dict[str, Any]]) -> None:
+        for entry in stages:
+            histogram = self.stages.get(entry["name"])
+            if histogram is None:
+                histogram = self.stages[entry["name"]] = StreamingHistogram()
+            histogram.observe(entry["duration_ms"] / 1000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "mode": self.mode,
+            "users": self.config.users,
+            "turns_per_user": self.config.turns_per_user,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "turns": self.turns,
+            "throughput_turns_per_second": round(self.turns / self.duration_seconds, 3) if self.duration_seconds else 0,
+            "errors": dict(self.errors),
+            "latency": self.latency.snapshot(),
+            "stages": {name: histogram.snapshot() for name, histogram in self.stages.items()},
+        }
+        if self.mode == "in-process":
+            # Server-side measurements: only meaningful when the pipeline runs in this process
+            data["event_loop_lag"] = self.loop_lag.snapshot() if self.loop_lag.count else None
+            data["db_pool_wait"] = self.db_pool_wait.snapshot() if self.db_pool_wait.count else None
+        return data
+
+    def to_text(self) -> str:
+        data = self.to_dict()
+        lines = [
+            f"Load test ({data['mode']}): {data['users']} users x {data['turns_per_user']} turns",
+            f"Duration: {data['duration_seconds']:.2f}s, turns: {data['turns']}, "
+            f"throughput: {data['throughput_turns_per_second']:.2f} turns/s, errors: {sum(self.errors.values())}",
+            "",
+            f"{'stage':<40} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}",
+        ]
+
+        def row(name: str, stats: Optional[Dict[str, float]]) -> None:
+            if stats:
+                lines.append(
+                    f"{name:<40} {stats['count']:>7} {stats['p50'] * 1000:>10.1f} "
+                    f"{stats['p95'] * 1000:>10.1f} {stats['p99'] * 1000:>10.1f}"
+                )
+
+        row("turn", data["latency"])
+        for name, stats in sorted(data["stages"].items(), key=lambda item: -item[1]["sum"]):
+            row(name, stats)
+        row("event_loop_lag", data.get("event_loop_lag"))
+        row("db_pool_wait", data.get("db_pool_wait"))
+        for error, count in data["errors"].items():
+            lines.append(f"error {error}: {count}")
+        return "\n".join(lines)
+
+
+async def _run_users(config: LoadTestConfig, report: LoadTestReport, turn, monitor_loop: bool = True) -> None:
+    """
+    Run config.users concurrent users, each doing turns_per_user calls of turn(user, index, message).
+    With monitor_loop, the event-loop lag of this process is recorded in the report.
+    """
+    rng = random.Random(config.seed)
+
+    async def user_loop(user_index: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        for turn_index in range(config.turns_per_user):
+            message = rng.choice(config.messages)
+            start = time.perf_counter()
+            try:
+                await turn(user_index, turn_index, message)
+            except Exception as e:
+                report.add_error(type(e).__name__)
+                logger.warning(f"⚠️  Load test turn failed (user {user_index}): {e}")
+            else:
+                report.turns += 1
+            finally:
+                report.latency.observe(time.perf_counter() - start)
+            if config.think_time:
+                await asyncio.sleep(config.think_time)
+
+    step = config.ramp_up / config.users if config.users else 0
+    started = time.perf_counter()
+    if monitor_loop:
+        async with EventLoopLagMonitor() as monitor:
+            await asyncio.gather(*(user_loop(i, i * step) for i in range(config.users)))
+        report.loop_lag = monitor.lag
+    else:
+        await asyncio.gather(*(user_loop(i, i * step) for i in range(config.users)))
+    report.duration_seconds = time.perf_counter() - started
+
+
+def _register_sqlite_types() -> None:
+    """Render the Postgres-only column types of the models on SQLite"""
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(JSONB, "sqlite")
+    def _jsonb_on_sqlite(type_, compiler, **kw):
+        return "JSON"
+
+
+async def run_in_process_load_test(config: LoadTestConfig) -> LoadTestReport:
+    """Drive run_langgraph_chat with simulated users against offline stand-ins"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from app.agents import run_langgraph_chat
+    from app.core.memory_manager import MemoryManager
+    from app.core.vector_store import InMemoryVectorStore, set_vector_store
+    from app.db.database import Base
+    from app.models.database import Session as SessionModel, Tenant, User
+    from app.models.schemas import ChatRequest
+    from app.services.agent_activity_stream import AgentActivityStream
+
+    report = LoadTestReport(mode="in-process", config=config)
+
+    temp_dir = None
+    database_url = config.database_url
+    if not database_url:
+        temp_dir = tempfile.TemporaryDirectory(prefix="kn-load-test-")
+        database_url = f"sqlite+aiosqlite:///{Path(temp_dir.name) / 'load_test.db'}"
+    if database_url.startswith("sqlite"):
+        _register_sqlite_types()
+
+    engine = create_async_engine(database_url, pool_size=config.db_pool_size, max_overflow=config.db_max_overflow)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    vector_store = InMemoryVectorStore()
+    set_vector_store(vector_store)
+    memory_manager = MemoryManager(vector_store=vector_store)
+    memory_manager.embedding_service = FakeEmbeddingService()
+    llm = FakeLLMClient(config.token_latency, config.first_token_latency, config.response_tokens)
+    activity_stream = AgentActivityStream()
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        # One tenant, one user and one session per simulated user
+        async with session_factory() as db:
+            tenant = Tenant(name=f"load-test-{uuid4().hex[:8]}", schema_name=f"load_test_{uuid4().hex[:8]}")
+            db.add(tenant)
+            await db.flush()
+            users = [User(tenant_id=tenant.id, email=f"load-{uuid4().hex[:8]}@example.com", name=f"user {i}")
+                     for i in range(config.users)]
+            db.add_all(users)
+            await db.flush()
+            sessions = [SessionModel(tenant_id=tenant.id, user_id=user.id, name="load test", title="load test")
+                        for user in users]
+            db.add_all(sessions)
+            await db.commit()
+
+        histories: Dict[int, List[Dict[str, str]]] = {i: [] for i in range(config.users)}
+
+        async def turn(user_index: int, turn_index: int, message: str) -> None:
+            profile = start_profile()
+            session_id: UUID = sessions[user_index].id
+            history = histories[user_index]
+            try:
+                async with session_factory() as db:
+                    wait_start = time.perf_counter()
+                    await db.connection()
+                    report.db_pool_wait.observe(time.perf_counter() - wait_start)
+                    result = await run_langgraph_chat(
+                        db=db,
+                        session_id=session_id,
+                        request=ChatRequest(session_id=session_id, message=message, use_memory=True),
+                        ollama=llm,
+                        planner_client=llm,
+                        agent_activity_stream=activity_stream,
+                        memory_manager=memory_manager,
+                        session_context=list(history[-10:]),
+                        retrieved_memory=[],
+                        memory_used={},
+                        previous_messages=list(history[-10:]),
+                        pending_plan=None,
+                        current_user=users[user_index],
+                    )
+            finally:
+                if profile is not None:
+                    profile.close()
+                    report.observe_stages(profile.breakdown()["stages"])
+            history.append({"role": "user", "content": message})
+            history.append({"role": "assistant", "content": result["chat_response"].response})
+
+        await _run_users(config, report, turn)
+    finally:
+        await engine.dispose()
+        await vector_store.close()
+        set_vector_store(None)
+        if temp_dir:
+            temp_dir.cleanup()
+    return report
+
+
+def parse_server_timing(header: Optional[str]) -> List[Dict[str, Any]]:
+    """Server-Timing header -> [{"name", "duration_ms"}] (the "total" entry is skipped)"""
+    stages = []
+    for entry in (header or "").split(","):
+        parts = [part.strip() for part in entry.split(";")]
+        if not parts[0] or parts[0] == "total":
+            continue
+        for param in parts[1:]:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                try:
+                    stages.append({"name": parts[0], "duration_ms": float(value)})
+                except ValueError:
+                    pass
+    return stages
+
+
+async def run_http_load_test(config: LoadTestConfig, transport: Optional[Any] = None) -> LoadTestReport:
+    """
+    Drive the chat endpoint of a running backend with simulated users.
+
+    Simulated user i authenticates with auth_tokens[i] and chats in a session
+    created for it before the run (and deleted after it). `transport` is
+    passed to httpx.AsyncClient (tests use httpx.MockTransport).
+    """
+    import httpx
+
+    if not config.base_url:
+        raise ValueError("base_url is required for the HTTP load test")
+    if len(config.auth_tokens) < config.users:
+        raise ValueError(
+            f"The HTTP load test needs one auth token per simulated user "
+            f"({len(config.auth_tokens)} tokens for {config.users} users)"
+        )
+
+    report = LoadTestReport(mode="http", config=config)
+    headers = {}
+    if config.tenant_id:
+        headers["X-Tenant-ID"] = config.tenant_id
+    user_headers = [{"Authorization": f"Bearer {token}"} for token in config.auth_tokens[:config.users]]
+
+    limits = httpx.Limits(max_connections=config.users, max_keepalive_connections=config.users)
+    async with httpx.AsyncClient(
+        base_url=config.base_url, headers=headers, timeout=config.request_timeout, limits=limits, transport=transport
+    ) as client:
+
+        async def create_session(user_index: int) -> str:
+            response = await client.post(
+                "/api/sessions/",
+                json={"name": f"load test {user_index}", "title": "load test"},
+                headers=user_headers[user_index],
+            )
+            response.raise_for_status()
+            return response.json()["id"]
+
+        session_ids = await asyncio.gather(*(create_session(i) for i in range(config.users)))
+
+        async def turn(user_index: int, turn_index: int, message: str) -> None:
+            session_id = session_ids[user_index]
+            response = await client.post(
+                f"/api/sessions/{session_id}/chat",
+                json={"session_id": session_id, "message": message, "use_memory": True},
+                headers=user_headers[user_index],
+            )
+            if response.status_code >= 400:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            report.observe_stages(parse_server_timing(response.headers.get("Server-Timing")))
+
+        try:
+            await _run_users(config, report, turn, monitor_loop=False)
+        finally:
+            for user_index, session_id in enumerate(session_ids):
+                try:
+                    await client.delete(f"/api/sessions/{session_id}", headers=user_headers[user_index])
+                except httpx.HTTPError as e:
+                    logger.warning(f"⚠️  Could not delete load test session {session_id}: {e}")
+    return report
+
+
+async def run_load_test(config: LoadTestConfig) -> LoadTestReport:
+    """HTTP mode when base_url is set, in-process otherwise"""
+    if config.base_url:
+        return await run_http_load_test(config)
+    return await run_in_process_load_test(config)
@@ -1,3 +1,4 @@
+import asyncio
 import numpy as np
 
 # Compatibilità NumPy 2.x: alcune librerie (es. ChromaDB<=0.4.x) usano alias rimossi
@@ -8,9 +9,7 @@ if not hasattr(np, "int_"):
 if not hasattr(np, "uint"):
     np.uint = np.uint64  # type: ignore[attr-defined]
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Any, Optional, Union
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Union
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,6 +19,7 @@ import json
 import logging
 
 from app.core.config import settings
+from app.core.vector_store import VectorCollection, VectorStore, get_vector_store
 from app.models.database import MemoryShort, MemoryMedium, MemoryLong
 from app.services.embedding_service import EmbeddingService
 
@@ -34,25 +34,10 @@ class MemoryManager:
     Supports multi-tenant isolation via tenant-specific ChromaDB collections.
     """
     
-    def __init__(self, tenant_id: Optional[UUID] = None):
-        # ChromaDB client (shared across tenants)
-        # Use CloudClient for cloud deployment, HttpClient for local
-        if settings.chromadb_use_cloud and settings.chromadb_cloud_api_key:
-            # ChromaDB Cloud (for cloud deployment)
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info("Using ChromaDB Cloud client for cloud deployment")
-            self.chroma_client = chromadb.CloudClient(
-                api_key=settings.chromadb_cloud_api_key,
-                tenant=settings.chromadb_cloud_tenant,
-                database=settings.chromadb_cloud_database,
-            )
-        else:
-            # ChromaDB HttpClient (for local development)
-            self.chroma_client = chromadb.HttpClient(
-                host=settings.chromadb_host,
-                port=settings.chromadb_port,
-            )
+    def __init__(self, tenant_id: Optional[UUID] = None, vector_store: Optional[VectorStore] = None):
+        # Vector store (shared across tenants and MemoryManager instances):
+        # ChromaDB Cloud/HttpClient behind a dedicated thread pool, see app/core/vector_store.py
+        self.vector_store = vector_store or get_vector_store()
         
         # Store tenant_id for collection naming
         self.tenant_id = tenant_id
@@ -85,7 +70,9 @@ class MemoryManager:
             return f"{base_name}_00000000_0000_0000_0000_000000000000"
 
     
-    def _get_collection(self, base_name: str, tenant_id: Optional[UUID] = None, shared: bool = False):
+    async def _get_collection(
+        self, base_name: str, tenant_id: Optional[UUID] = None, shared: bool = False
+    ) -> Optional[VectorCollection]:
         """
         Get or create collection.
         
@@ -109,7 +96,7 @@ class MemoryManager:
         
         # Strategy 1: Try to get existing collection first (without metadata requirements)
         try:
-            collection = self.chroma_client.get_collection(name=collection_name)
+            collection = await self.vector_store.get_collection(collection_name)
             if collection:
                 logger.info(
                     "✅ Successfully retrieved existing collection '%s'",
@@ -124,7 +111,7 @@ class MemoryManager:
                 # Collection exists but has corrupted metadata - try to delete it
                 logger.warning(f"⚠️  Collection '%s' exists but has corrupted metadata, attempting to delete...", collection_name)
                 try:
-                    self.chroma_client.delete_collection(name=collection_name)
+                    await self.vector_store.delete_collection(collection_name)
                     logger.info(f"✅ Successfully deleted corrupted collection '%s'", collection_name)
                 except Exception as delete_error:
                     logger.warning(f"⚠️  Could not delete collection '%s': {delete_error}", collection_name)
@@ -133,12 +120,12 @@ class MemoryManager:
         # Strategy 2: Try to create with minimal metadata (no _type)
         # ChromaDB 0.6.0 might have issues with _type in metadata
         strategies = [
-            lambda: self.chroma_client.create_collection(name=collection_name, metadata={"tenant_id": str(tenant_id or self.tenant_id) if (tenant_id or self.tenant_id) else "00000000-0000-0000-0000-000000000000"}),
-            lambda: self.chroma_client.create_collection(name=collection_name, metadata={}),
-            lambda: self.chroma_client.create_collection(name=collection_name),
+            lambda: self.vector_store.create_collection(collection_name, metadata={"tenant_id": str(tenant_id or self.tenant_id) if (tenant_id or self.tenant_id) else "00000000-0000-0000-0000-000000000000"}),
+            lambda: self.vector_store.create_collection(collection_name, metadata={}),
+            lambda: self.vector_store.create_collection(collection_name),
             # Last resort: try with _type (might work if collection was deleted)
-            lambda: self.chroma_client.create_collection(name=collection_name, metadata=metadata),
-            lambda: self.chroma_client.get_or_create_collection(name=collection_name, metadata=metadata),
+            lambda: self.vector_store.create_collection(collection_name, metadata=metadata),
+            lambda: self.vector_store.get_or_create_collection(collection_name, metadata=metadata),
         ]
         strategy_names = [
             "create with tenant_id only",
@@ -151,7 +138,7 @@ class MemoryManager:
         last_error = None
         for strategy, strategy_name in zip(strategies, strategy_names):
             try:
-                collection = strategy()
+                collection = await strategy()
                 if collection:
                     logger.info(
                         "✅ Successfully created collection '%s' using: %s",
@@ -168,11 +155,11 @@ class MemoryManager:
                     if "KeyError" in error_str and strategy_name == "create with tenant_id only":
                         try:
                             logger.warning(f"⚠️  Attempting to delete potentially corrupted collection '%s'...", collection_name)
-                            self.chroma_client.delete_collection(name=collection_name)
+                            await self.vector_store.delete_collection(collection_name)
                             logger.info(f"✅ Deleted collection '%s', retrying creation...", collection_name)
                             # Retry the same strategy after deletion
                             try:
-                                collection = strategy()
+                                collection = await strategy()
                                 if collection:
                                     logger.info(
                                         "✅ Successfully created collection '%s' after deletion using: %s",
@@ -187,7 +174,7 @@ class MemoryManager:
                 elif "already exists" in error_str.lower() or "duplicate" in error_str.lower():
                     # Collection exists but we couldn't get it - try to get it again
                     try:
-                        collection = self.chroma_client.get_collection(name=collection_name)
+                        collection = await self.vector_store.get_collection(collection_name)
                         if collection:
                             logger.info(
                                 "✅ Successfully retrieved collection '%s' after 'already exists' error",
@@ -210,20 +197,17 @@ class MemoryManager:
         return collection
 
 
-    @property
-    def file_embeddings_collection(self):
+    async def file_embeddings_collection(self) -> Optional[VectorCollection]:
         """Get file embeddings collection for current tenant"""
-        return self._get_collection("file_embeddings", self.tenant_id)
+        return await self._get_collection("file_embeddings", self.tenant_id)
     
-    @property
-    def session_memory_collection(self):
+    async def session_memory_collection(self) -> Optional[VectorCollection]:
         """Get session memory collection for current tenant"""
-        return self._get_collection("session_memory", self.tenant_id)
+        return await self._get_collection("session_memory", self.tenant_id)
     
-    @property
-    def long_term_memory_collection(self):
+    async def long_term_memory_collection(self) -> Optional[VectorCollection]:
         """Get long-term memory collection for current tenant"""
-        return self._get_collection("long_term_memory", self.tenant_id)
+        return await self._get_collection("long_term_memory", self.tenant_id)
 
     # Short-term Memory
     async def get_short_term_memory(
@@ -347,14 +331,15 @@ class MemoryManager:
         if not effective_tenant_id:
             raise ValueError(f"Cannot add medium-term memory: tenant_id is required for session {session_id}")
         
-        collection = self._get_collection("session_memory", effective_tenant_id)
+        collection = await self._get_collection("session_memory", effective_tenant_id)
         
-        # Generate embedding
-        embedding = self.embedding_service.generate_embedding(content)
+        # Generate embedding (off the event loop)
+        loop = asyncio.get_event_loop()
+        embedding = await loop.run_in_executor(None, self.embedding_service.generate_embedding, content)
         
         # Store in ChromaDB
         embedding_id = f"medium_{session_id}_{datetime.now().isoformat()}"
-        collection.add(
+        await collection.add(
             ids=[embedding_id],
             embeddings=[embedding],
             documents=[content],
@@ -393,7 +378,7 @@ class MemoryManager:
             )
             
             # Get tenant-specific collection
-            collection = self._get_collection("session_memory", tenant_id or self.tenant_id)
+            collection = await self._get_collection("session_memory", tenant_id or self.tenant_id)
             
             # Handle case where collection creation failed (e.g., ChromaDB KeyError)
             if collection is None:
@@ -401,13 +386,10 @@ class MemoryManager:
                 return []
             
             # Run ChromaDB query in thread pool (ChromaDB is synchronous)
-            results = await loop.run_in_executor(
-                None,
-                lambda: collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=n_results,
-                    where={"session_id": str(session_id)},
-                )
+            results = await collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where={"session_id": str(session_id)},
             )
             
             return results.get("documents", [[]])[0] if results else []
@@ -540,7 +522,7 @@ class MemoryManager:
         
         # Get tenant-specific collection
         effective_tenant_id = tenant_id or self.tenant_id
-        collection = self._get_collection("long_term_memory", effective_tenant_id)
+        collection = await self._get_collection("long_term_memory", effective_tenant_id)
 
         # Handle case where collection creation failed (e.g., ChromaDB KeyError)
         if collection is None:
@@ -555,7 +537,7 @@ class MemoryManager:
         embedding_id = f"long_{datetime.now().isoformat()}"
         # ChromaDB doesn't accept lists in metadata, so convert to comma-separated string
         learned_from_str = ",".join([str(sid) for sid in learned_from_sessions])
-        collection.add(
+        await collection.add(
             ids=[embedding_id],
             embeddings=[embedding],
             documents=[content],
@@ -582,6 +564,211 @@ class MemoryManager:
         logger.info(f"✅ Added new long-term memory: {content[:50]}...")
         return (True, str(memory_long.id))
 
+    async def add_long_term_memories(
+        self,
+        db: AsyncSession,
+        contents: List[str],
+        learned_from_sessions: List[UUID],
+        importance_scores: List[float],
+        tenant_id: Optional[UUID] = None,
+        before_commit: Optional[Callable[[List[MemoryLong]], Awaitable[None]]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> List[MemoryLong]:
+        """
+        Add several contents to long-term memory in one batch (for specific tenant).
+
+        Embeddings are generated with a single batched call off the event loop,
+        written to ChromaDB with one `add`, and the PostgreSQL rows are committed
+        in one transaction. `before_commit` can stage extra rows (e.g. lookup
+        entries) in the same transaction. Unlike `add_long_term_memory`, no
+        similarity-based duplicate check is done: callers dedupe by their own keys
+        or with `find_near_duplicates`, whose embeddings can be passed back in to
+        avoid embedding the same contents twice.
+        If staging, the ChromaDB add or the commit fails, the transaction is
+        rolled back and the ChromaDB entries are removed again before re-raising,
+        so nothing is left pending for a later commit on the same session.
+
+        Returns:
+            The created MemoryLong rows (empty if the collection is unavailable)
+        """
+        import asyncio
+        import logging
+        import uuid
+        logger = logging.getLogger(__name__)
+
+        if not contents:
+            return []
+
+        effective_tenant_id = tenant_id or self.tenant_id
+        collection = await self._get_collection("long_term_memory", effective_tenant_id)
+        if collection is None:
+            logger.warning(
+                "⚠️  Could not get/create long_term_memory collection for tenant %s, "
+                "skipping add_long_term_memories",
+                effective_tenant_id,
+            )
+            return []
+
+        if embeddings is None:
+            loop = asyncio.get_event_loop()
+            embeddings = await loop.run_in_executor(
+                None,
+                self.embedding_service.generate_embeddings,
+                contents,
+            )
+
+        learned_from_str = ",".join([str(sid) for sid in learned_from_sessions])
+        learned_from_sessions_str = [str(sid) for sid in learned_from_sessions]
+        batch_prefix = f"long_{datetime.now().isoformat()}"
+        embedding_ids = [f"{batch_prefix}_{index}" for index in range(len(contents))]
+
+        memories = [
+            MemoryLong(
+                id=uuid.uuid4(),
+                content=content,
+                embedding_id=embedding_id,
+                learned_from_sessions=learned_from_sessions_str,
+                importance_score=importance_score,
+                tenant_id=tenant_id,
+            )
+            for content, embedding_id, importance_score in zip(contents, embedding_ids, importance_scores)
+        ]
+        try:
+            db.add_all(memories)
+            if before_commit is not None:
+                await before_commit(memories)
+
+            await collection.add(
+                ids=embedding_ids,
+                embeddings=embeddings,
+                documents=list(contents),
+                metadatas=[
+                    {
+                        "importance_score": importance_score,
+                        "learned_from": learned_from_str,
+                    }
+                    for importance_score in importance_scores
+                ],
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            try:
+                await collection.delete(ids=embedding_ids)
+            except Exception as cleanup_error:
+                logger.warning(f"⚠️  Could not remove orphaned long-term embeddings: {cleanup_error}")
+            raise
+
+        logger.info(f"✅ Added {len(memories)} long-term memories in one batch")
+        return memories
+
+    async def delete_long_term_memories(
+        self,
+        db: AsyncSession,
+        memory_ids: List[UUID],
+        tenant_id: Optional[UUID] = None,
+    ) -> int:
+        """
+        Delete long-term memories (PostgreSQL rows and their ChromaDB entries).
+
+        Rows are deleted and committed first; a failure removing the embeddings
+        afterwards is only logged, since retrieval maps results back to rows.
+
+        Returns:
+            Number of deleted rows
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not memory_ids:
+            return 0
+
+        query = select(MemoryLong.embedding_id).where(MemoryLong.id.in_(memory_ids))
+        if tenant_id:
+            query = query.where(MemoryLong.tenant_id == tenant_id)
+        result = await db.execute(query)
+        embedding_ids = [embedding_id for embedding_id in result.scalars().all() if embedding_id]
+
+        statement = delete(MemoryLong).where(MemoryLong.id.in_(memory_ids))
+        if tenant_id:
+            statement = statement.where(MemoryLong.tenant_id == tenant_id)
+        deleted = await db.execute(statement)
+        await db.commit()
+
+        if embedding_ids:
+            collection = await self._get_collection("long_term_memory", tenant_id or self.tenant_id)
+            if collection is not None:
+                try:
+                    await collection.delete(ids=embedding_ids)
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not remove embeddings of deleted long-term memories: {e}")
+
+        count = deleted.rowcount if deleted.rowcount is not None and deleted.rowcount >= 0 else len(embedding_ids)
+        logger.info(f"🗑️  Deleted {count} long-term memories")
+        return count
+
+    async def find_near_duplicates(
+        self,
+        contents: List[str],
+        tenant_id: Optional[UUID] = None,
+        similarity_threshold: float = 0.85,
+    ) -> tuple[List[List[float]], List[Optional[Union[str, int]]]]:
+        """
+        Batched counterpart of the duplicate check in `add_long_term_memory`.
+
+        Embeds all contents with one call and queries the tenant's long-term
+        collection once for all of them. For each content the match is the
+        embedding id (str) of an existing memory, the index (int) of an earlier
+        content of the same batch, or None.
+
+        Returns:
+            (embeddings, matches), aligned with `contents`
+        """
+        import asyncio
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not contents:
+            return [], []
+
+        loop = asyncio.get_event_loop()
+        embeddings = await loop.run_in_executor(
+            None,
+            self.embedding_service.generate_embeddings,
+            contents,
+        )
+        matches: List[Optional[Union[str, int]]] = [None] * len(contents)
+
+        collection = await self._get_collection("long_term_memory", tenant_id or self.tenant_id)
+        if collection is not None:
+            try:
+                results = await collection.query(
+                    query_embeddings=embeddings,
+                    n_results=1,
+                    include=["distances"],
+                )
+                distance_space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+                for index, (ids, distances) in enumerate(zip(results.get("ids") or [], results.get("distances") or [])):
+                    if ids and distances:
+                        similarity = self._distance_to_similarity(distances[0], distance_space)
+                        if similarity is not None and similarity >= similarity_threshold:
+                            matches[index] = ids[0]
+            except Exception as e:
+                logger.warning(f"⚠️  Near-duplicate query on long-term memory failed: {e}")
+
+        # Within the batch, by cosine similarity
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0.0, 1.0, norms)
+        for index in range(1, len(contents)):
+            if matches[index] is not None:
+                continue
+            scores = vectors[:index] @ vectors[index]
+            best = int(np.argmax(scores))
+            if float(scores[best]) >= similarity_threshold:
+                matches[index] = best
+        return embeddings, matches
+
     async def retrieve_long_term_memory(
         self,
         query: str,
@@ -605,6 +792,8 @@ class MemoryManager:
             List[str] if include_metadata=False (default)
             List[Dict[str, Any]] if include_metadata=True, where each dict contains:
                 - "content": str - The memory content
+                - "distance": float - Raw vector distance from the query (None if unavailable)
+                - "similarity": float - Cosine similarity to the query derived from the distance
                 - "metadata": dict - Metadata including session_id, title, date, status, learned_from_sessions
         """
         import asyncio
@@ -622,7 +811,7 @@ class MemoryManager:
             
             # Get tenant-specific collection
             effective_tenant_id = tenant_id or self.tenant_id
-            collection = self._get_collection("long_term_memory", effective_tenant_id)
+            collection = await self._get_collection("long_term_memory", effective_tenant_id)
             
             # Handle case where collection creation failed (e.g., ChromaDB KeyError)
             if collection is None:
@@ -634,14 +823,11 @@ class MemoryManager:
                 where["importance_score"] = {"$gte": min_importance}
             
             # Run ChromaDB query in thread pool (ChromaDB is synchronous)
-            results = await loop.run_in_executor(
-                None,
-                lambda: collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=n_results,
-                    where=where if where else None,
-                    include=["documents", "metadatas"] if include_metadata else ["documents"],
-                )
+            results = await collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where if where else None,
+                include=["documents", "metadatas", "distances"] if include_metadata else ["documents"],
             )
             
             if not results:
@@ -655,6 +841,8 @@ class MemoryManager:
             
             # Return List[Dict] with metadata
             metadatas = results.get("metadatas", [[]])[0] or []
+            distances = (results.get("distances") or [[]])[0] or []
+            distance_space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
             
             # Extract session info from document content if available (format: [SESSION:...])
             result_list = []
@@ -681,8 +869,11 @@ class MemoryManager:
                     if learned_from_str:
                         learned_from_sessions = [s.strip() for s in learned_from_str.split(",") if s.strip()]
                 
+                distance = distances[idx] if idx < len(distances) else None
                 result_dict = {
                     "content": doc,
+                    "distance": distance,
+                    "similarity": self._distance_to_similarity(distance, distance_space),
                     "metadata": {
                         "session_id": session_id,
                         "session_title": session_title,
@@ -706,10 +897,24 @@ class MemoryManager:
                 logger.error(f"Error in retrieve_long_term_memory: {e}", exc_info=True)
             return []
 
-    @property
-    def internal_knowledge_collection(self):
+    @staticmethod
+    def _distance_to_similarity(distance: Optional[float], space: str = "l2") -> Optional[float]:
+        """
+        Convert a ChromaDB distance into cosine similarity.
+        
+        Embeddings from EmbeddingService are unit-normalized, so squared L2
+        distance equals 2 - 2 * cosine similarity.
+        """
+        if distance is None:
+            return None
+        if space == "l2":
+            return 1.0 - float(distance) / 2.0
+        # "cosine" and "ip" spaces both report 1 - similarity
+        return 1.0 - float(distance)
+
+    async def internal_knowledge_collection(self) -> Optional[VectorCollection]:
         """Get shared internal knowledge collection (same for all tenants)"""
-        return self._get_collection("internal_knowledge", shared=True)
+        return await self._get_collection("internal_knowledge", shared=True)
 
     async def retrieve_internal_knowledge(
         self,
@@ -744,7 +949,7 @@ class MemoryManager:
             )
             
             # Internal knowledge is shared across all tenants - always use shared collection
-            collection = self._get_collection("internal_knowledge", shared=True)
+            collection = await self._get_collection("internal_knowledge", shared=True)
             
             if collection is None:
                 logger.warning(f"⚠️  Could not get/create shared internal_knowledge collection")
@@ -753,14 +958,11 @@ class MemoryManager:
             # Query with filter for internal_knowledge type
             where = {"type": {"$eq": "internal_knowledge"}}
             
-            results = await loop.run_in_executor(
-                None,
-                lambda: collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=n_results,
-                    where=where,
-                    include=["documents", "metadatas"],
-                )
+            results = await collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"],
             )
             
             if not results:
@@ -768,13 +970,18 @@ class MemoryManager:
             
             documents = results.get("documents", [[]])[0] or []
             metadatas = results.get("metadatas", [[]])[0] or []
+            distances = (results.get("distances") or [[]])[0] or []
+            distance_space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
             
             result_list = []
             for idx, doc in enumerate(documents):
                 metadata = metadatas[idx] if idx < len(metadatas) else {}
                 
+                distance = distances[idx] if idx < len(distances) else None
                 result_dict = {
                     "content": doc,
+                    "distance": distance,
+                    "similarity": self._distance_to_similarity(distance, distance_space),
                     "metadata": {
                         "document": metadata.get("document", "unknown"),
                         "chunk_index": metadata.get("chunk_index"),
@@ -815,7 +1022,7 @@ class MemoryManager:
         logger = logging.getLogger(__name__)
         
         # Internal knowledge is shared across all tenants
-        collection = self._get_collection("internal_knowledge", shared=True)
+        collection = await self._get_collection("internal_knowledge", shared=True)
         
         if collection is None:
             logger.error(f"❌ Could not get shared internal_knowledge collection")
@@ -828,21 +1035,15 @@ class MemoryManager:
             # Query to find all chunks for this document
             loop = asyncio.get_event_loop()
             # collection.get() returns ids by default, no need to specify in include
-            existing_results = await loop.run_in_executor(
-                None,
-                lambda: collection.get(
-                    where={"document": {"$eq": filename}, "type": {"$eq": "internal_knowledge"}},
-                )
+            existing_results = await collection.get(
+                where={"document": {"$eq": filename}, "type": {"$eq": "internal_knowledge"}},
             )
             
             existing_ids = existing_results.get("ids", []) if existing_results else []
             chunks_deleted = len(existing_ids)
             
             if existing_ids:
-                await loop.run_in_executor(
-                    None,
-                    lambda: collection.delete(ids=existing_ids)
-                )
+                await collection.delete(ids=existing_ids)
                 logger.info(f"✅ Deleted {chunks_deleted} existing chunks")
             
             # Step 2: Read and re-index the document
@@ -890,24 +1091,23 @@ class MemoryManager:
                     continue
                 
                 chunk_content = f"[Document: {filename}]\n\n{chunk}"
-                embedding = self.embedding_service.generate_embedding(chunk_content)
+                embedding = await loop.run_in_executor(
+                    None, self.embedding_service.generate_embedding, chunk_content
+                )
                 embedding_id = f"internal_{filename}_{i}_{datetime.now().isoformat()}"
                 
-                await loop.run_in_executor(
-                    None,
-                    lambda: collection.add(
-                        ids=[embedding_id],
-                        embeddings=[embedding],
-                        documents=[chunk_content],
-                        metadatas=[
-                            {
-                                "type": "internal_knowledge",
-                                "document": filename,
-                                "chunk_index": i,
-                                "importance_score": "1.0",
-                            }
-                        ],
-                    )
+                await collection.add(
+                    ids=[embedding_id],
+                    embeddings=[embedding],
+                    documents=[chunk_content],
+                    metadatas=[
+                        {
+                            "type": "internal_knowledge",
+                            "document": filename,
+                            "chunk_index": i,
+                            "importance_score": "1.0",
+                        }
+                    ],
                 )
                 
                 chunks_indexed += 1
@@ -1038,583 +1238,28 @@ Messages:
         tenant_id: Optional[UUID] = None,
         session_id: Optional[UUID] = None,  # Optional: for backward compatibility and context
     ) -> List[str]:
-        """Retrieve relevant file content for a user based on query"""
+        """
+        Retrieve relevant file content for a user based on query.
+
+        Live files are listed from PostgreSQL, so `db` is required; see
+        FileRetriever for ranking and whole-file requests.
+        """
         import logging
-        import re
+        from app.services.file_retrieval import FileRetriever
         logger = logging.getLogger(__name__)
-        
-        # Check if query contains a file ID (UUID format)
-        # Pattern: UUID format (8-4-4-4-12 hex digits)
-        uuid_pattern = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
-        file_id_match = re.search(uuid_pattern, query, re.IGNORECASE)
-        requested_file_id = None
-        if file_id_match:
-            requested_file_id = file_id_match.group(0)
-            logger.info(f"Detected file ID in query: {requested_file_id}")
-        
-        # Check if query is a generic file request (summary, analyze, etc.)
-        # These queries should retrieve ALL files, not use semantic search
-        query_lower = query.lower()
-        generic_file_keywords = [
-            "riassunto", "riassumere", "summary", "summarize", "analizza", "analyze", 
-            "ultimo file", "last file", "most recent file", "latest file",
-            "il file", "the file", "questo file", "this file",
-            "contenuto del file", "file content", "contenuto file", "contenuto caricato",
-            "spiegami", "explain", "descrivi", "describe", "cosa consiste", "what is",
-            "nel documento", "in the document", "nel file", "in the file",
-            "documento", "document", "pdf", ".pdf",
-            "caricato in memoria", "uploaded file", "file caricato", "file in memoria"
-        ]
-        is_generic_file_request = any(keyword in query_lower for keyword in generic_file_keywords)
-        
-        if is_generic_file_request:
-            logger.info(f"Detected generic file request: '{query}'. Will retrieve all files for user instead of semantic search.")
-        
+
+        effective_tenant_id = tenant_id or self.tenant_id
+        if db is None or effective_tenant_id is None:
+            logger.warning("retrieve_file_content called without db/tenant: cannot resolve live files")
+            return []
         try:
-            # Get tenant-specific collection
-            effective_tenant_id = tenant_id or self.tenant_id
-            collection = self._get_collection("file_embeddings", effective_tenant_id)
-            
-            # If a specific file ID was requested, try to retrieve it directly
-            if requested_file_id and db is not None:
-                logger.info(f"Attempting to retrieve file by ID: {requested_file_id}")
-                try:
-                    # First verify the file exists in the database and belongs to this session
-                    from sqlalchemy import select
-                    from app.models.database import File as FileModel
-                    
-                    file_result = await db.execute(
-                        select(FileModel).where(
-                            FileModel.id == UUID(requested_file_id),
-                            FileModel.user_id == user_id,  # Files are user-scoped now
-                            FileModel.tenant_id == effective_tenant_id
-                        )
-                    )
-                    file_record = file_result.scalar_one_or_none()
-                    
-                    if file_record:
-                        logger.info(f"File {requested_file_id} found in database, retrieving from ChromaDB")
-                        # Try to get the file content from ChromaDB by file_id in metadata
-                        try:
-                            # Try different where clause syntaxes for ChromaDB Cloud compatibility
-                            file_embeddings = None
-                            where_clauses = [
-                                {"file_id": requested_file_id},  # Standard syntax
-                                {"file_id": {"$eq": requested_file_id}},  # MongoDB-style syntax
-                            ]
-                            
-                            for where_clause in where_clauses:
-                                try:
-                                    logger.debug(f"Trying where clause: {where_clause}")
-                                    file_embeddings = collection.get(where=where_clause)
-                                    if file_embeddings.get("documents"):
-                                        break  # Found it, exit loop
-                                except Exception as clause_error:
-                                    logger.debug(f"Where clause {where_clause} failed: {clause_error}, trying next...")
-                                    continue
-                            
-                            # If still not found, try getting all files and filtering manually
-                            if not file_embeddings or not file_embeddings.get("documents"):
-                                logger.info(f"Direct query failed, trying manual filter for file_id {requested_file_id}")
-                                user_id_str = str(user_id)
-                                all_user_files = collection.get(
-                                    where={"user_id": user_id_str}
-                                )
-                                all_ids = all_user_files.get("ids", [])
-                                all_docs = all_user_files.get("documents", [])
-                                all_metas = all_user_files.get("metadatas", [])
-                                
-                                for i, meta in enumerate(all_metas):
-                                    file_id = None
-                                    if isinstance(meta, dict):
-                                        file_id = meta.get("file_id")
-                                    if file_id == requested_file_id:
-                                        doc = all_docs[i]
-                                        logger.info(f"✅ Retrieved file {requested_file_id} from ChromaDB (manual filter), content length: {len(doc)} chars")
-                                        # Truncate if too long
-                                        if len(doc) > 15000:
-                                            doc = doc[:15000] + f"\n\n[Content truncated - original was {len(doc)} characters. This is a large file, focusing on the beginning.]"
-                                        return [doc]
-                            
-                            if file_embeddings and file_embeddings.get("documents"):
-                                # Found the file in ChromaDB
-                                doc = file_embeddings["documents"][0]
-                                logger.info(f"✅ Retrieved file {requested_file_id} from ChromaDB, content length: {len(doc)} chars")
-                                # Truncate if too long
-                                if len(doc) > 15000:
-                                    doc = doc[:15000] + f"\n\n[Content truncated - original was {len(doc)} characters. This is a large file, focusing on the beginning.]"
-                                return [doc]
-                            else:
-                                logger.warning(f"File {requested_file_id} exists in database but not found in ChromaDB embeddings. Collection has {len(collection.get().get('ids', []))} total embeddings.")
-                        except Exception as chroma_error:
-                            logger.error(f"Error retrieving file {requested_file_id} from ChromaDB: {chroma_error}", exc_info=True)
-                    else:
-                        logger.info(f"File {requested_file_id} not found in database for user {user_id}")
-                except ValueError as uuid_error:
-                    logger.warning(f"Invalid UUID format in query: {requested_file_id}, error: {uuid_error}")
-                except Exception as e:
-                    logger.warning(f"Error checking file ID {requested_file_id}: {e}")
-                    # Continue with normal retrieval flow
-            
-            # Handle case where collection creation failed (e.g., ChromaDB KeyError)
-            if collection is None:
-                logger.warning(f"⚠️  Could not get/create file_embeddings collection for tenant {effective_tenant_id}, returning empty results")
-                return []
-            
-            # First, check if there are any files for this user
-            user_id_str = str(user_id)
-            logger.info(f"🔍 Retrieving files for user {user_id_str}, tenant: {effective_tenant_id}, collection: {collection.name if hasattr(collection, 'name') else 'unknown'}")
-            
-            try:
-                # Query by user_id (files are now user-scoped)
-                all_files = collection.get(
-                    where={"user_id": user_id_str},
-                )
-                logger.info(f"✅ ChromaDB query successful: found {len(all_files.get('ids', []))} embeddings for user {user_id_str}")
-            except Exception as get_error:
-                logger.error(f"❌ Error querying ChromaDB collection: {get_error}", exc_info=True)
-                # Try without where clause to see if collection has any data
-                try:
-                    all_files_raw = collection.get()
-                    logger.warning(f"⚠️  Query with where clause failed, but collection has {len(all_files_raw.get('ids', []))} total embeddings")
-                    logger.warning(f"   Trying to filter manually...")
-                    # Filter manually
-                    all_ids = all_files_raw.get("ids", [])
-                    all_docs = all_files_raw.get("documents", [])
-                    all_metas = all_files_raw.get("metadatas", [])
-                    filtered_ids = []
-                    filtered_docs = []
-                    filtered_metas = []
-                    for i, meta in enumerate(all_metas):
-                        meta_user_id = None
-                        if isinstance(meta, dict):
-                            meta_user_id = meta.get("user_id")
-                        if meta_user_id == user_id_str:
-                            filtered_ids.append(all_ids[i])
-                            filtered_docs.append(all_docs[i])
-                            filtered_metas.append(meta)
-                    all_files = {
-                        "ids": filtered_ids,
-                        "documents": filtered_docs,
-                        "metadatas": filtered_metas,
-                    }
-                    logger.info(f"✅ Manual filter successful: found {len(filtered_ids)} embeddings for user {user_id_str}")
-                except Exception as fallback_error:
-                    logger.error(f"❌ Fallback query also failed: {fallback_error}", exc_info=True)
-                    return []
-            
-            if not all_files.get("ids"):
-                logger.warning(f"⚠️  No files found in ChromaDB for user {user_id_str} (tenant: {effective_tenant_id})")
-                # Check if there are any files in the database for this user
-                if db is not None:
-                    try:
-                        from sqlalchemy import select
-                        from app.models.database import File as FileModel
-                        from pathlib import Path
-                        from app.services.file_processor import FileProcessor
-                        from app.core.config import settings
-                        
-                        # Get file records with filepath (user-scoped now)
-                        db_file_result = await db.execute(
-                            select(FileModel.id, FileModel.filename, FileModel.filepath, FileModel.mime_type).where(
-                                FileModel.user_id == user_id,  # Files are user-scoped
-                                FileModel.tenant_id == effective_tenant_id
-                            ).order_by(FileModel.uploaded_at.desc())
-                        )
-                        db_files = db_file_result.all()
-                        
-                        if db_files:
-                            logger.warning(f"⚠️  Found {len(db_files)} files in database but 0 embeddings in ChromaDB. Attempting to retrieve content directly from files.")
-                            logger.warning(f"   Database file IDs: {[str(fid) for fid, _, _, _ in db_files[:5]]}{'...' if len(db_files) > 5 else ''}")
-                            
-                            # Try to retrieve content directly from file system
-                            file_processor = FileProcessor()
-                            retrieved_contents = []
-                            
-                            for file_id, filename, filepath, mime_type in db_files[:n_results]:
-                                try:
-                                    # Check if filepath is Cloud Storage (gs://...) or filesystem
-                                    from app.services.cloud_storage_service import is_cloud_storage_path, download_file_from_cloud_storage
-                                    
-                                    file_content_bytes = None
-                                    
-                                    if is_cloud_storage_path(filepath):
-                                        # Download from Cloud Storage
-                                        logger.info(f"☁️  File is in Cloud Storage: {filepath}, downloading...")
-                                        file_content_bytes = await download_file_from_cloud_storage(filepath)
-                                        
-                                        if file_content_bytes:
-                                            logger.info(f"✅ Downloaded file from Cloud Storage: {filename} ({len(file_content_bytes)} bytes)")
-                                            # Extract text from bytes
-                                            file_data = FileProcessor.extract_text_from_bytes(file_content_bytes, mime_type, filename)
-                                        else:
-                                            logger.error(f"❌ Failed to download file from Cloud Storage: {filepath}")
-                                            continue
-                                    else:
-                                        # Try filesystem (local development)
-                                        file_path = Path(filepath)
-                                        if file_path.exists():
-                                            logger.info(f"📄 File exists on filesystem: {filename}, attempting to extract content...")
-                                            # Extract text from file
-                                            file_data = file_processor.extract_text(str(file_path), mime_type)
-                                        else:
-                                            logger.error(f"❌ File not found on filesystem: {filepath}")
-                                            logger.error(f"   This is expected on Cloud Run (ephemeral filesystem) if Cloud Storage is not configured.")
-                                            logger.error(f"   File metadata exists in database but file content was lost.")
-                                            logger.error(f"   Solution: User needs to re-upload the file. File ID: {file_id}")
-                                            continue
-                                    
-                                    # Process extracted text (common for both Cloud Storage and filesystem)
-                                    if file_data.get("text"):
-                                        text_content = file_data["text"]
-                                        # Truncate if too long
-                                        if len(text_content) > 15000:
-                                            text_content = text_content[:15000] + f"\n\n[Content truncated - original was {len(text_content)} characters. This is a large file, focusing on the beginning.]"
-                                        retrieved_contents.append(text_content)
-                                        logger.info(f"✅ Retrieved content from file {filename}, length: {len(text_content)} chars")
-                                        
-                                        # Try to create embedding now (async, don't wait)
-                                        try:
-                                            embedding = self.embedding_service.generate_embedding(text_content)
-                                            embedding_id = f"file_{file_id}"
-                                            
-                                            # Truncate text for ChromaDB
-                                            text_for_embedding = text_content
-                                            if len(text_for_embedding) > 20000:
-                                                text_for_embedding = text_for_embedding[:20000] + "... [truncated]"
-                                            
-                                            collection.add(
-                                                ids=[embedding_id],
-                                                embeddings=[embedding],
-                                                documents=[text_for_embedding],
-                                                metadatas=[{
-                                                    "user_id": user_id_str,  # Files are user-scoped, not session-scoped
-                                                    "file_id": str(file_id),
-                                                    "filename": filename,
-                                                    "session_id": session_id_str if session_id else None,  # Optional: for backward compatibility
-                                                }],
-                                            )
-                                            logger.info(f"✅ Created embedding for file {filename} (ID: {file_id})")
-                                        except Exception as embed_error:
-                                            logger.warning(f"⚠️  Could not create embedding for file {filename}: {embed_error}")
-                                    else:
-                                        logger.warning(f"⚠️  No text extracted from file {filename}")
-                                except Exception as file_error:
-                                    logger.warning(f"⚠️  Error retrieving content from file {filename}: {file_error}")
-                            
-                            if retrieved_contents:
-                                logger.info(f"✅ Retrieved {len(retrieved_contents)} file contents directly from filesystem")
-                                return retrieved_contents
-                            else:
-                                logger.error(f"❌ Could not retrieve any file content from filesystem.")
-                                logger.error(f"   Found {len(db_files)} files in database, but:")
-                                logger.error(f"   - Files not found on filesystem (Cloud Run ephemeral storage)")
-                                logger.error(f"   - No embeddings in ChromaDB")
-                                logger.error(f"   → Files need to be re-uploaded. This is expected on Cloud Run when container restarts.")
-                                # Return empty list - the LLM will inform the user they need to re-upload
-                                return []
-                        else:
-                            logger.info(f"ℹ️  No files in database for user {user_id_str} either")
-                    except Exception as db_check_error:
-                        logger.error(f"❌ Error checking database files: {db_check_error}", exc_info=True)
-                return []
-            
-            # If db is provided, filter out embeddings for files that no longer exist
-            valid_file_ids = None
-            file_upload_times = {}  # Initialize here so it's available in outer scope
-            if db is not None:
-                logger.info(f"Database provided, will filter deleted files for user {user_id_str}")
-                try:
-                    from sqlalchemy import select
-                    from app.models.database import File as FileModel
-                    
-                    # Get all existing file IDs for this user from database
-                    from sqlalchemy.ext.asyncio import AsyncSession
-                    
-                    # Get file IDs with upload times for ordering (user-scoped now)
-                    file_result = await db.execute(
-                        select(FileModel.id, FileModel.uploaded_at)
-                        .where(FileModel.user_id == user_id)  # Files are user-scoped
-                        .order_by(FileModel.uploaded_at.desc())  # Most recent first
-                    )
-                    file_records = file_result.all()
-                    existing_file_ids = {str(fid) for fid, _ in file_records}
-                    valid_file_ids = existing_file_ids
-                    
-                    # Create a map of file_id -> upload_time for prioritization
-                    file_upload_times = {str(fid): uploaded_at for fid, uploaded_at in file_records}
-                    
-                    logger.info(f"Found {len(existing_file_ids)} valid file IDs in database for user {user_id_str}: {existing_file_ids}")
-                    
-                    # Filter embeddings to only include existing files
-                    metadata_list = all_files.get("metadatas", [])
-                    ids_list = all_files.get("ids", [])
-                    documents_list = all_files.get("documents", [])
-                    
-                    valid_indices = []
-                    for i, metadata in enumerate(metadata_list):
-                        file_id = None
-                        if isinstance(metadata, dict):
-                            file_id = metadata.get("file_id")
-                        elif metadata is not None:
-                            # Try to extract file_id from non-dict metadata
-                            try:
-                                if hasattr(metadata, 'get'):
-                                    file_id = metadata.get("file_id")
-                                elif hasattr(metadata, '__dict__'):
-                                    file_id = getattr(metadata, 'file_id', None)
-                            except:
-                                pass
-                        
-                        if file_id and str(file_id) in existing_file_ids:
-                            valid_indices.append(i)
-                        elif file_id:
-                            logger.debug(f"Filtering out embedding for deleted file_id: {file_id}")
-                    
-                    if len(valid_indices) < len(ids_list):
-                        logger.info(f"Filtered out {len(ids_list) - len(valid_indices)} embeddings for deleted files")
-                        # Update all_files to only include valid files
-                        if valid_indices:
-                            all_files = {
-                                "ids": [ids_list[i] for i in valid_indices],
-                                "documents": [documents_list[i] for i in valid_indices],
-                                "metadatas": [metadata_list[i] for i in valid_indices],
-                            }
-                        else:
-                            logger.warning("No valid files found after filtering deleted files")
-                            return []
-                except Exception as e:
-                    logger.warning(f"Could not filter deleted files: {e}, proceeding with all embeddings")
-            
-            if not all_files.get("ids"):
-                logger.warning(f"No valid files found in ChromaDB for user {user_id_str}")
-                return []
-            
-            # Strategy: Get ALL files for the user, sort by upload time (most recent first)
-            # This ensures the most recent file is ALWAYS returned first, regardless of semantic relevance
-            # Also use this strategy for generic file requests (summary, analyze, etc.)
-            if (valid_file_ids and file_upload_times) or is_generic_file_request:
-                # Get ALL files for this user from ChromaDB (not using semantic search)
-                # This ensures we have the most recent file even if it's not semantically relevant
-                all_user_files = collection.get(
-                    where={"user_id": user_id_str}  # Files are user-scoped now
-                )
-                
-                # Filter to only valid files and sort by upload time
-                all_ids = all_user_files.get("ids", [])
-                all_docs = all_user_files.get("documents", [])
-                all_metas = all_user_files.get("metadatas", [])
-                
-                # Create list of (doc, file_id, upload_time) tuples
-                file_items = []
-                for i, doc in enumerate(all_docs):
-                    if i < len(all_metas):
-                        meta = all_metas[i]
-                        file_id = None
-                        if isinstance(meta, dict):
-                            file_id = meta.get("file_id")
-                        elif meta is not None:
-                            try:
-                                if hasattr(meta, 'get'):
-                                    file_id = meta.get("file_id")
-                                elif hasattr(meta, '__dict__'):
-                                    file_id = getattr(meta, 'file_id', None)
-                            except:
-                                pass
-                        
-                        # For generic file requests, include all files even if we don't have valid_file_ids
-                        # Otherwise, only include valid files
-                        if is_generic_file_request or (file_id and str(file_id) in valid_file_ids):
-                            if file_upload_times and file_id:
-                                upload_time = file_upload_times.get(str(file_id), datetime.min.replace(tzinfo=timezone.utc))
-                            else:
-                                upload_time = datetime.min.replace(tzinfo=timezone.utc)
-                            file_items.append((doc, str(file_id) if file_id else f"unknown_{i}", upload_time))
-                
-                # Sort by upload time ONLY - most recent first (if we have upload times)
-                if file_upload_times:
-                    file_items.sort(key=lambda x: x[2], reverse=True)
-                
-                logger.info(f"Retrieved {len(file_items)} files, sorted by upload time. First file: {file_items[0][1] if file_items else 'none'}")
-                
-                # Return only the documents (without file_id and upload_time)
-                # Limit document size to avoid overwhelming the model and causing timeouts
-                filtered_docs = []
-                for doc, file_id, _ in file_items[:n_results]:
-                    # Truncate very long documents (keep first 15000 chars to allow for summaries)
-                    if len(doc) > 15000:
-                        truncated_doc = doc[:15000] + f"\n\n[Content truncated - original was {len(doc)} characters. This is a large file, focusing on the beginning.]"
-                        filtered_docs.append(truncated_doc)
-                        logger.info(f"Truncated document for file {file_id} from {len(doc)} to {len(truncated_doc)} chars")
-                    else:
-                        filtered_docs.append(doc)
-                
-                logger.info(f"Returning {len(filtered_docs)} documents, ordered by upload time (most recent first)")
-                
-                return filtered_docs
-            
-            # Fallback: if we don't have file_upload_times AND it's not a generic file request, use semantic search
-            # For generic file requests, we should still try to get all files even without upload times
-            if is_generic_file_request and all_files.get("documents"):
-                # For generic requests, return all files even without upload time sorting
-                logger.info(f"Generic file request: returning all {len(all_files.get('documents', []))} files without semantic search")
-                filtered_docs = []
-                for i, doc in enumerate(all_files.get("documents", [])[:n_results]):
-                    if len(doc) > 15000:
-                        truncated_doc = doc[:15000] + f"\n\n[Content truncated - original was {len(doc)} characters. This is a large file, focusing on the beginning.]"
-                        filtered_docs.append(truncated_doc)
-                    else:
-                        filtered_docs.append(doc)
-                return filtered_docs
-            
-            # Fallback: if we don't have file_upload_times, use semantic search
-            # Generate query embedding
-            query_embedding = self.embedding_service.generate_embedding(query)
-            
-            # Query with semantic search (with filtered file_ids if available)
-            where_clause = {"user_id": user_id_str}  # Files are user-scoped now
-            if valid_file_ids:
-                # Note: ChromaDB where clause doesn't support IN directly, so we'll filter after
-                where_clause = {"user_id": user_id_str}  # Files are user-scoped now
-            
-            # Query ALL files for this user to ensure we don't miss the most recent one
-            # We'll filter and sort by upload time after
-            query_n_results = len(all_files.get("ids", []))  # Get ALL files to ensure we have the most recent
-            
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=query_n_results if query_n_results > 0 else 1,
-                where=where_clause,
+            return await FileRetriever(self).retrieve(
+                db,
+                user_id=user_id,
+                tenant_id=effective_tenant_id,
+                query=query,
+                n_results=n_results,
             )
-            
-            documents = results.get("documents", [[]])
-            metadatas_result = results.get("metadatas", [[]])
-            
-            if documents and len(documents) > 0:
-                file_documents = documents[0]
-                metadata_list = metadatas_result[0] if metadatas_result else []
-                
-                # Final filter: ensure we only return documents for existing files
-                # Also prioritize by file upload time (more recent files first)
-                if valid_file_ids and metadata_list:
-                    filtered_items = []  # List of (doc, file_id) tuples
-                    for doc, meta in zip(file_documents, metadata_list):
-                        file_id = None
-                        if isinstance(meta, dict):
-                            file_id = meta.get("file_id")
-                        elif meta is not None:
-                            # Try to extract file_id from non-dict metadata
-                            try:
-                                if hasattr(meta, 'get'):
-                                    file_id = meta.get("file_id")
-                                elif hasattr(meta, '__dict__'):
-                                    file_id = getattr(meta, 'file_id', None)
-                            except:
-                                pass
-                        
-                        if file_id and str(file_id) in valid_file_ids:
-                            filtered_items.append((doc, file_id))
-                        elif file_id:
-                            logger.debug(f"Filtering out document for deleted file_id: {file_id}")
-                    
-                    if filtered_items:
-                        # ALWAYS sort by upload time (more recent files first)
-                        # Priority order: Most recent file gets highest priority regardless of semantic relevance
-                        if valid_file_ids and file_upload_times:
-                            try:
-                                # Sort ONLY by upload time - most recent first, ignoring semantic relevance
-                                # This ensures the newest file is always returned first
-                                filtered_items.sort(
-                                    key=lambda x: file_upload_times.get(x[1], datetime.min.replace(tzinfo=timezone.utc)),
-                                    reverse=True  # Most recent first
-                                )
-                                
-                                # Log which file is being returned first
-                                if filtered_items:
-                                    first_file_id = filtered_items[0][1]
-                                    first_upload_time = file_upload_times.get(first_file_id, None)
-                                    logger.info(f"Sorted {len(filtered_items)} items by upload time. First file: {first_file_id}, uploaded: {first_upload_time}")
-                                    
-                                    if prioritized_file_ids and len(prioritized_file_ids) > 0:
-                                        expected_first = prioritized_file_ids[0]
-                                        if first_file_id == expected_first:
-                                            logger.info(f"✅ Correct priority: Most recent file ({first_file_id}) is first")
-                                        else:
-                                            logger.warning(f"⚠️ Priority mismatch: Expected {expected_first}, got {first_file_id}")
-                            except Exception as e:
-                                logger.error(f"Could not sort by upload time: {e}", exc_info=True)
-                        else:
-                            logger.warning("Cannot sort by upload time: missing file_upload_times or valid_file_ids")
-                        
-                        # Extract documents in the sorted order (most recent first)
-                        filtered_docs = [doc for doc, _ in filtered_items]
-                        
-                        # Log which file IDs are being returned to verify order
-                        if filtered_items and len(filtered_items) > 0:
-                            first_file_ids = [fid for _, fid in filtered_items[:min(3, len(filtered_items))]]
-                            logger.info(f"Returning {len(filtered_docs)} documents from files (in order by upload time): {first_file_ids}")
-                            
-                            # Verify the first file is actually the most recent
-                            if len(first_file_ids) > 0 and file_upload_times:
-                                first_file_id = first_file_ids[0]
-                                first_time = file_upload_times.get(first_file_id)
-                                
-                                # Check all other files to ensure none is more recent
-                                all_times = [(fid, file_upload_times.get(fid)) for fid in first_file_ids if fid in file_upload_times]
-                                if all_times:
-                                    most_recent = max(all_times, key=lambda x: x[1] if x[1] else datetime.min.replace(tzinfo=timezone.utc))
-                                    if most_recent[0] != first_file_id:
-                                        logger.error(f"❌ ORDERING BUG: First file {first_file_id} is NOT the most recent! Most recent is {most_recent[0]}")
-                                    else:
-                                        logger.info(f"✅ Verified: First file {first_file_id} is the most recent")
-                        
-                        return filtered_docs[:n_results]
-                    else:
-                        logger.warning("All retrieved documents were for deleted files")
-                        return []
-                else:
-                    logger.info(f"Retrieved {len(file_documents)} file documents for query: {query[:50]}...")
-                    return file_documents[:n_results]
-            
-            # Fallback: if semantic search fails, return all files for this session (but only valid ones)
-            logger.warning(f"Semantic search returned no results, falling back to all files")
-            if all_files.get("documents"):
-                # Ensure we only return valid files even in fallback
-                if valid_file_ids:
-                    fallback_docs = []
-                    for i, doc in enumerate(all_files.get("documents", [])):
-                        meta = all_files.get("metadatas", [])[i] if i < len(all_files.get("metadatas", [])) else {}
-                        
-                        file_id = None
-                        if isinstance(meta, dict):
-                            file_id = meta.get("file_id")
-                        elif meta is not None:
-                            try:
-                                if hasattr(meta, 'get'):
-                                    file_id = meta.get("file_id")
-                                elif hasattr(meta, '__dict__'):
-                                    file_id = getattr(meta, 'file_id', None)
-                            except:
-                                pass
-                        
-                        if file_id and str(file_id) in valid_file_ids:
-                            fallback_docs.append(doc)
-                        elif file_id:
-                            logger.debug(f"Filtering out fallback document for deleted file_id: {file_id}")
-                    
-                    if fallback_docs:
-                        logger.info(f"Returning {len(fallback_docs)} valid files from fallback (filtered from {len(all_files.get('documents', []))})")
-                        return fallback_docs[:n_results]
-                    else:
-                        logger.warning("All fallback documents were for deleted files")
-                        return []
-                else:
-                    # No db provided, return all (but log warning)
-                    logger.warning("No db provided to filter deleted files, returning all documents")
-                    return all_files["documents"][:n_results]
-            
-            return []
         except Exception as e:
             logger.error(f"Error retrieving file content for session {session_id}: {e}", exc_info=True)
             return []
-
@@ -3,8 +3,9 @@ Metrics module for observability
 Provides metrics collection for performance, errors, and business metrics
 """
 import logging
+import math
 import time
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from functools import wraps
 from collections import defaultdict
 from datetime import datetime
@@ -22,36 +23,133 @@ except ImportError:
     logger.warning("Prometheus not available. Using simple metrics fallback.")
 
 
-class SimpleMetrics:
-    """Simple metrics fallback when Prometheus is not available"""
+class StreamingHistogram:
+    """
+    Fixed-size streaming histogram: values are counted in log-spaced buckets
+    (each 10% wider than the previous), so observe is O(1) and memory does not grow with
+    the number of observations. Quantiles are estimated from the buckets with
+    a relative error of a few percent; count, sum, min and max are exact.
+    """
+    
+    _GROWTH = 1.1
+    _LOG_GROWTH = math.log(_GROWTH)
+    _MIN_VALUE = 1e-9  # Values below this (including zero and negatives) share bucket 0
+    
+    __slots__ = ("count", "sum", "min", "max", "_buckets")
+    
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buckets: Dict[int, int] = {}
+    
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        index = self._bucket_index(value)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+    
+    @classmethod
+    def _bucket_index(cls, value: float) -> int:
+        if value <= cls._MIN_VALUE:
+            return 0
+        return 1 + int(math.log(value / cls._MIN_VALUE) / cls._LOG_GROWTH)
+    
+    @classmethod
+    def _bucket_value(cls, index: int) -> float:
+        """Representative value of a bucket (geometric middle of its bounds)"""
+        if index == 0:
+            return 0.0
+        return cls._MIN_VALUE * cls._GROWTH ** (index - 0.5)
+    
+    def quantiles(self, qs: Tuple[float, ...]) -> List[float]:
+        """Estimated values at the given quantiles (0-1), in one pass over the buckets"""
+        values = [0.0] * len(qs)
+        if not self.count:
+            return values
+        pending = sorted((q * self.count, i) for i, q in enumerate(qs))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            while pending and seen >= pending[0][0]:
+                # Clamp to the exact extremes: the bucket value may fall outside them
+                values[pending.pop(0)[1]] = min(max(self._bucket_value(index), self.min), self.max)
+        # The extremes are known exactly
+        for i, q in enumerate(qs):
+            if q <= 0:
+                values[i] = self.min
+            elif q >= 1:
+                values[i] = self.max
+        return values
+    
+    def snapshot(self) -> Dict[str, float]:
+        p50, p95, p99 = self.quantiles((0.5, 0.95, 0.99))
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0,
+            "max": self.max if self.count else 0,
+            "avg": self.sum / self.count if self.count else 0,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+
+
+class _MetricsShard:
+    """One lock stripe: the metrics whose key hashes to it"""
+    
+    __slots__ = ("lock", "counters", "histograms", "gauges")
     
     def __init__(self):
-        self._lock = threading.Lock()
+        self.lock = threading.Lock()
         self.counters: Dict[str, float] = defaultdict(float)
-        self.histograms: Dict[str, list] = defaultdict(list)
+        self.histograms: Dict[str, StreamingHistogram] = {}
         self.gauges: Dict[str, float] = {}
-        self.summaries: Dict[str, list] = defaultdict(list)
+
+
+class SimpleMetrics:
+    """
+    Simple metrics fallback when Prometheus is not available.
+    
+    Metrics are spread over lock stripes by key, so concurrent requests
+    updating different metrics don't contend on a single lock.
+    """
+    
+    def __init__(self, stripes: int = 16):
+        self._shards = [_MetricsShard() for _ in range(max(1, stripes))]
+    
+    def _shard(self, key: str) -> _MetricsShard:
+        return self._shards[hash(key) % len(self._shards)]
     
     def increment(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None):
         """Increment a counter"""
-        with self._lock:
-            key = self._make_key(name, labels)
-            self.counters[key] += value
+        key = self._make_key(name, labels)
+        shard = self._shard(key)
+        with shard.lock:
+            shard.counters[key] += value
     
     def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
         """Observe a value for histogram/summary"""
-        with self._lock:
-            key = self._make_key(name, labels)
-            self.histograms[key].append(value)
-            # Keep only last 1000 values to avoid memory issues
-            if len(self.histograms[key]) > 1000:
-                self.histograms[key] = self.histograms[key][-1000:]
+        key = self._make_key(name, labels)
+        shard = self._shard(key)
+        with shard.lock:
+            histogram = shard.histograms.get(key)
+            if histogram is None:
+                histogram = shard.histograms[key] = StreamingHistogram()
+            histogram.observe(value)
     
     def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
         """Set a gauge value"""
-        with self._lock:
-            key = self._make_key(name, labels)
-            self.gauges[key] = value
+        key = self._make_key(name, labels)
+        shard = self._shard(key)
+        with shard.lock:
+            shard.gauges[key] = value
     
     def _make_key(self, name: str, labels: Optional[Dict[str, str]]) -> str:
         """Create a key from name and labels"""
@@ -62,21 +160,13 @@ class SimpleMetrics:
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get all metrics as a dictionary"""
-        with self._lock:
-            return {
-                "counters": dict(self.counters),
-                "histograms": {
-                    k: {
-                        "count": len(v),
-                        "sum": sum(v),
-                        "min": min(v) if v else 0,
-                        "max": max(v) if v else 0,
-                        "avg": sum(v) / len(v) if v else 0
-                    }
-                    for k, v in self.histograms.items()
-                },
-                "gauges": dict(self.gauges)
-            }
+        metrics: Dict[str, Any] = {"counters": {}, "histograms": {}, "gauges": {}}
+        for shard in self._shards:
+            with shard.lock:
+                metrics["counters"].update(shard.counters)
+                metrics["histograms"].update((k, h.snapshot()) for k, h in shard.histograms.items())
+                metrics["gauges"].update(shard.gauges)
+        return metrics
 
 
 # Global metrics instance
@@ -109,6 +199,13 @@ def init_metrics():
     return True
 
 
+_DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labelnames(labels: Optional[Dict[str, str]]) -> tuple:
+    return tuple(sorted(labels)) if labels else ()
+
+
 def _get_or_create_counter(name: str, description: str = "", labelnames: tuple = ()) -> Any:
     """Get or create a Prometheus counter"""
     if not PROMETHEUS_AVAILABLE:
@@ -118,14 +215,16 @@ def _get_or_create_counter(name: str, description: str = "", labelnames: tuple =
     return _prometheus_counters[name]
 
 
-def _get_or_create_histogram(name: str, description: str = "", labelnames: tuple = ()) -> Any:
+def _get_or_create_histogram(
+    name: str, description: str = "", labelnames: tuple = (), buckets: Optional[tuple] = None
+) -> Any:
     """Get or create a Prometheus histogram"""
     if not PROMETHEUS_AVAILABLE:
         return None
     if name not in _prometheus_histograms:
         _prometheus_histograms[name] = Histogram(
             name, description, labelnames,
-            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+            buckets=buckets or _DEFAULT_BUCKETS
         )
     return _prometheus_histograms[name]
 
@@ -148,13 +247,41 @@ def _get_or_create_summary(name: str, description: str = "", labelnames: tuple =
     return _prometheus_summaries[name]
 
 
+def register_counter(name: str, description: str, labelnames: tuple = ()) -> None:
+    """Pre-register a counter family with its label names (before the first request)"""
+    _get_or_create_counter(name, description, tuple(labelnames))
+
+
+def register_histogram(
+    name: str, description: str, labelnames: tuple = (), buckets: Optional[tuple] = None
+) -> None:
+    """Pre-register a histogram family with its label names and buckets"""
+    _get_or_create_histogram(name, description, tuple(labelnames), buckets)
+
+
+def _child(metric: Any, name: str, labels: Optional[Dict[str, str]]) -> Any:
+    """
+    Labeled child of a Prometheus metric. Families are created with the label
+    names of their first use (or pre-registered); a call with different label
+    names is dropped with a warning instead of failing the caller.
+    """
+    if not labels:
+        if metric._labelnames:
+            logger.warning(f"Metric {name} called without its labels {metric._labelnames}")
+            return None
+        return metric
+    try:
+        return metric.labels(**labels)
+    except ValueError as e:
+        logger.warning(f"Metric {name} called with labels {sorted(labels)}: {e}")
+        return None
+
+
 def increment_counter(name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None):
     """Increment a counter metric"""
     if PROMETHEUS_AVAILABLE:
-        counter = _get_or_create_counter(name, f"Counter for {name}")
-        if labels:
-            counter.labels(**labels).inc(value)
-        else:
+        counter = _child(_get_or_create_counter(name, f"Counter for {name}", _labelnames(labels)), name, labels)
+        if counter is not None:
             counter.inc(value)
     else:
         if _simple_metrics:
@@ -164,10 +291,10 @@ def increment_counter(name: str, value: float = 1.0, labels: Optional[Dict[str,
 def observe_histogram(name: str, value: float, labels: Optional[Dict[str, str]] = None):
     """Observe a value in a histogram"""
     if PROMETHEUS_AVAILABLE:
-        histogram = _get_or_create_histogram(name, f"Histogram for {name}")
-        if labels:
-            histogram.labels(**labels).observe(value)
-        else:
+        histogram = _child(
+            _get_or_create_histogram(name, f"Histogram for {name}", _labelnames(labels)), name, labels
+        )
+        if histogram is not None:
             histogram.observe(value)
     else:
         if _simple_metrics:
@@ -177,10 +304,8 @@ def observe_histogram(name: str, value: float, labels: Optional[Dict[str, str]]
 def set_gauge(name: str, value: float, labels: Optional[Dict[str, str]] = None):
     """Set a gauge value"""
     if PROMETHEUS_AVAILABLE:
-        gauge = _get_or_create_gauge(name, f"Gauge for {name}")
-        if labels:
-            gauge.labels(**labels).set(value)
-        else:
+        gauge = _child(_get_or_create_gauge(name, f"Gauge for {name}", _labelnames(labels)), name, labels)
+        if gauge is not None:
             gauge.set(value)
     else:
         if _simple_metrics:
@@ -190,10 +315,8 @@ def set_gauge(name: str, value: float, labels: Optional[Dict[str, str]] = None):
 def observe_summary(name: str, value: float, labels: Optional[Dict[str, str]] = None):
     """Observe a value in a summary"""
     if PROMETHEUS_AVAILABLE:
-        summary = _get_or_create_summary(name, f"Summary for {name}")
-        if labels:
-            summary.labels(**labels).observe(value)
-        else:
+        summary = _child(_get_or_create_summary(name, f"Summary for {name}", _labelnames(labels)), name, labels)
+        if summary is not None:
             summary.observe(value)
     else:
         if _simple_metrics:
@@ -270,6 +393,9 @@ def get_metrics_export() -> tuple[bytes, str]:
                 lines.append(f"{name}_count {stats['count']}")
                 lines.append(f"{name}_sum {stats['sum']}")
                 lines.append(f"{name}_avg {stats['avg']}")
+                lines.append(f"{name}_p50 {stats['p50']}")
+                lines.append(f"{name}_p95 {stats['p95']}")
+                lines.append(f"{name}_p99 {stats['p99']}")
             for name, value in metrics_data.get("gauges", {}).items():
                 lines.append(f"# TYPE {name} gauge")
                 lines.append(f"{name} {value}")
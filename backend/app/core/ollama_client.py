@@ -1,26 +1,46 @@
 import httpx
 from typing import List, Dict, Optional, Any
 from app.core.config import settings
-from app.core.system_prompts import get_base_self_awareness_prompt
+from app.core.http_clients import (
+    BACKEND_OLLAMA_BACKGROUND,
+    CALL_BACKGROUND,
+    CALL_CHAT,
+    CALL_METADATA,
+    backend_for_url,
+    get_http_client,
+    llm_timeout,
+)
+from app.core.llm_scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, schedule_llm_call
+from app.core.system_prompts import (
+    build_prefix_cached_messages,
+    build_static_system_prompt,
+    build_volatile_context,
+)
 import json
 
 
 class OllamaClient:
-    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None, lane: Optional[str] = None):
         """
         Initialize Ollama client.
         
         Args:
             base_url: Ollama base URL (default: settings.ollama_base_url)
             model: Ollama model name (default: settings.ollama_model)
+            lane: Default scheduler lane (default: background for the background URL, else interactive)
         """
         self.base_url = base_url or settings.ollama_base_url
         self.model = model or settings.ollama_model
+        # Connections are pooled per backend and shared by all clients of that backend
+        self._backend = backend_for_url(self.base_url)
         # Use longer timeout for background agent (phi3:mini can be very slow)
         # Increased timeouts to handle Gmail API calls and LangGraph execution
-        actual_base_url = self.base_url
-        timeout_value = 600.0 if actual_base_url == settings.ollama_background_base_url else 300.0  # 10 minutes for background, 5 minutes for main
-        self.client = httpx.AsyncClient(timeout=timeout_value)
+        self._timeout = llm_timeout(CALL_BACKGROUND if self._backend == BACKEND_OLLAMA_BACKGROUND else CALL_CHAT)
+        self.lane = lane or (LANE_BACKGROUND if self._backend == BACKEND_OLLAMA_BACKGROUND else LANE_INTERACTIVE)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_http_client(self._backend)
 
     async def generate(
         self,
@@ -41,7 +61,8 @@ class OllamaClient:
         Returns:
             Response from Ollama API
         """
-        from app.core.tracing import trace_span, set_trace_attribute, add_trace_event
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute, add_trace_event
         from app.core.metrics import increment_counter, observe_histogram
         import time
         
@@ -61,8 +82,10 @@ class OllamaClient:
             "messages": messages,
             "stream": stream,
         }
+        if settings.ollama_keep_alive:
+            payload["keep_alive"] = settings.ollama_keep_alive
         
-        with trace_span("llm.generate", {
+        with stage("llm.generate", {
             "llm.model": self.model,
             "llm.stream": str(stream),
             "llm.messages_count": len(messages),
@@ -74,9 +97,14 @@ class OllamaClient:
             increment_counter("llm_requests_total", labels={"model": self.model, "stream": str(stream)})
             
             try:
-                response = await self.client.post(
-                    f"{self.base_url}/api/chat",
-                    json=payload,
+                response = await schedule_llm_call(
+                    self._backend,
+                    lambda: self.client.post(
+                        f"{self.base_url}/api/chat",
+                        json=payload,
+                        timeout=self._timeout,
+                    ),
+                    lane=self.lane,
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -142,89 +170,23 @@ Examples:
 
 Respond naturally and directly based on the data obtained from tools. Use clear, factual language and avoid unnecessary complexity."""
         
-        enhanced_system = system_prompt or base_system_prompt
-        
-        # Add self-awareness prompt
-        self_awareness_prompt = get_base_self_awareness_prompt()
-        
-        # Add time/location context if provided
-        time_context = getattr(self, '_time_context', None)
-        if time_context:
-            enhanced_system = self_awareness_prompt + "\n\n" + time_context + "\n\n" + enhanced_system
-        else:
-            enhanced_system = self_awareness_prompt + "\n\n" + enhanced_system
-        
-        if retrieved_memory:
-            # Format memory context more clearly
-            memory_context = "\n\n=== IMPORTANT: Context Information from Files and Memory ===\n"
-            memory_context += "The following information has been retrieved from uploaded files and previous conversations.\n"
-            memory_context += "You MUST use this information to answer questions accurately.\n\n"
-            
-            for i, mem in enumerate(retrieved_memory, 1):
-                # Truncate very long content to avoid timeout and token limits
-                # For file content, show enough to understand but not overwhelm the model
-                max_chars = 5000  # Increased from 2000, but still limited
-                if len(mem) > max_chars:
-                    memory_context += f"{i}. {mem[:max_chars]}... [content truncated - file is {len(mem)} chars total]\n\n"
-                else:
-                    memory_context += f"{i}. {mem}\n\n"
-            
-            memory_context += "\n=== End of Context Information ===\n"
-            
-            # Check if any memory contains file content
-            has_file_content = any("[Content from uploaded file" in mem or "uploaded file" in mem.lower() for mem in retrieved_memory)
-            
-            if has_file_content:
-                memory_context += "\n🚨🚨🚨 CRITICAL: DISTINGUERE TRA FILE CARICATI E FILE DRIVE 🚨🚨🚨\n\n"
-                memory_context += "=== FILE CARICATI NELLA SESSIONE (IN MEMORIA) ===\n"
-                memory_context += "I file con il prefisso '[Content from uploaded file]' sono stati CARICATI DIRETTAMENTE nella sessione corrente.\n"
-                memory_context += "Questi file sono GIÀ DISPONIBILI nel contesto e NON richiedono tool.\n\n"
-                memory_context += "QUANDO L'UTENTE CHIEDE DI:\n"
-                memory_context += "- 'riassumi il file', 'analizza il file', 'spiegami il file'\n"
-                memory_context += "- 'riassumi il documento', 'cosa contiene il file'\n"
-                memory_context += "- 'ultimo file', 'file caricato', 'file in memoria'\n"
-                memory_context += "→ Cerca '[Content from uploaded file]' nel contesto sopra e usa quel contenuto DIRETTAMENTE.\n"
-                memory_context += "→ NON usare tool - il contenuto è già disponibile.\n\n"
-                memory_context += "=== FILE SU GOOGLE DRIVE ===\n"
-                memory_context += "I file su Google Drive NON sono nel contesto e richiedono tool specifici.\n\n"
-                memory_context += "QUANDO L'UTENTE CHIEDE DI:\n"
-                memory_context += "- 'file su Drive', 'file su Google Drive', 'file Drive'\n"
-                memory_context += "- 'leggi il file [nome] su Drive', 'apri il file [nome] da Drive'\n"
-                memory_context += "- 'file con ID [id] su Drive', 'file Drive con nome [nome]'\n"
-                memory_context += "→ Usa il tool 'mcp_get_drive_file_content' o 'drive_get_file' per accedere al file.\n"
-                memory_context += "→ Questi file NON sono nel contesto e devono essere recuperati da Drive.\n\n"
-                memory_context += "REGOLA GENERALE:\n"
-                memory_context += "1. Se vedi '[Content from uploaded file]' → usa quel contenuto direttamente (NO tool)\n"
-                memory_context += "2. Se l'utente menziona 'Drive', 'Google Drive', o un nome file specifico non nel contesto → usa tool Drive\n"
-                memory_context += "3. Se l'utente dice solo 'il file' senza menzionare Drive → probabilmente si riferisce al file caricato\n\n"
-            else:
-                memory_context += "\n🚨 CRITICAL INSTRUCTIONS - DISTINGUERE TRA FILE CARICATI E FILE DRIVE:\n\n"
-                memory_context += "=== FILE CARICATI NELLA SESSIONE ===\n"
-                memory_context += "Se vedi '[Content from uploaded file]' nel contesto sopra, quello è un file CARICATO nella sessione.\n"
-                memory_context += "Usa quel contenuto DIRETTAMENTE senza tool.\n\n"
-                memory_context += "=== FILE SU GOOGLE DRIVE ===\n"
-                memory_context += "Se l'utente menziona 'Drive', 'Google Drive', o un nome file specifico non nel contesto:\n"
-                memory_context += "→ Usa 'mcp_get_drive_file_content' o 'drive_get_file' per accedere al file.\n\n"
-                memory_context += "REGOLA: File caricati = già nel contesto (NO tool). File Drive = richiede tool.\n\n"
-            enhanced_system += memory_context
-        
-        # Add tools description if provided
-        if tools_description:
-            enhanced_system += tools_description
-        
-        # Prepare messages
-        messages = []
-        if enhanced_system:
-            messages.append({"role": "system", "content": enhanced_system})
-        
-        messages.extend(session_context)
-        messages.append({"role": "user", "content": prompt})
+        # Static parts first (identical every turn, so Ollama can reuse the
+        # KV cache of the prefix), volatile parts (time, memory) next to the prompt
+        static_system = build_static_system_prompt(system_prompt or base_system_prompt, tools_description)
+        volatile_context = build_volatile_context(
+            time_context=getattr(self, '_time_context', None),
+            retrieved_memory=retrieved_memory,
+        )
+        messages = build_prefix_cached_messages(static_system, session_context, prompt, volatile_context)
         
         payload = {
             "model": self.model,
             "messages": messages,
             "stream": False,
         }
+        if settings.ollama_keep_alive:
+            # Keep the model (and its prompt cache) loaded between turns
+            payload["keep_alive"] = settings.ollama_keep_alive
         
         # Add tools if provided (native Ollama tool calling)
         if tools:
@@ -295,9 +257,14 @@ Respond naturally and directly based on the data obtained from tools. Use clear,
         if format:
             payload["format"] = format
         
-        response = await self.client.post(
-            f"{self.base_url}/api/chat",
-            json=payload,
+        response = await schedule_llm_call(
+            self._backend,
+            lambda: self.client.post(
+                f"{self.base_url}/api/chat",
+                json=payload,
+                timeout=self._timeout,
+            ),
+            lane=self.lane,
         )
         response.raise_for_status()
         result = response.json()
@@ -392,12 +359,15 @@ Respond naturally and directly based on the data obtained from tools. Use clear,
 
     async def list_models(self) -> List[str]:
         """List available Ollama models"""
-        response = await self.client.get(f"{self.base_url}/api/tags")
+        response = await self.client.get(f"{self.base_url}/api/tags", timeout=llm_timeout(CALL_METADATA))
         response.raise_for_status()
         data = response.json()
         return [model["name"] for model in data.get("models", [])]
 
     async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        """
+        Nothing to release per instance: the connection pool is shared and is
+        closed by close_http_clients() at shutdown.
+        """
+        return None
 
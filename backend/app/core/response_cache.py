@@ -0,0 +1,268 @@
+"""
+Semantic Response Cache - reuse answers to equivalent questions.
+
+Opt-in (`settings.response_cache_enabled`). An answer is stored per user
+together with the embedding of the normalized question and a fingerprint of
+the context it was generated from (calendar day, retrieved memory). A later
+question from the same user - in the same or another session - is answered
+from the cache, skipping planner and generation, only when:
+
+- the question embedding is within the similarity threshold,
+- the context fingerprint is identical (same day, memory/files have not changed),
+- the entry has not expired (shorter TTL for answers built on live tool data),
+- the user's data has not been invalidated since (write tools, file changes).
+
+Answers produced with tools that have side effects (send_email, archive...)
+are never cached. Messages that depend on the previous turns ("e domani?",
+"riformula quello") are neither looked up nor stored: the conversation
+history is deliberately not part of the key, since every answered question
+changes it.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import increment_counter
+from app.models.schemas import ChatResponse
+
+logger = logging.getLogger(__name__)
+
+# Tools that only read data: answers built on them can be cached (with the short TTL)
+_READ_ONLY_TOOLS = {
+    "get_calendar_events",
+    "get_emails",
+    "summarize_emails",
+    "web_search",
+    "web_fetch",
+    "customsearch_search",
+}
+_READ_ONLY_MCP_VERBS = ("get", "list", "search", "read", "fetch", "find", "query", "lookup", "view")
+
+# Follow-ups: messages that only make sense together with the previous turns
+_FOLLOW_UP_START_RE = re.compile(
+    r"^(e|ed|and|anche|invece|poi|allora|quindi|perché|perche|why|what about|how about|also)\b"
+)
+_FOLLOW_UP_RE = re.compile(
+    r"\b(quell[oaie]|lo stesso|la stessa|gli stessi|le stesse|sopra|precedente|di nuovo|ancora|"
+    r"riformula|ripeti|continua|approfondisci|that one|those|above|previous|again|the same|instead|"
+    r"elaborate|\w+(?:melo|mela|meli|mele|celo|cela|glielo))\b"
+    r"|\b(quest[oaie]|this|these|it)\b(?!\s+(settimana|mese|anno|weekend|mattina|pomeriggio|sera|"
+    r"week|month|year|morning|afternoon|evening))"
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = _PUNCTUATION_RE.sub(" ", (text or "").lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def context_fingerprint(items: Iterable[str]) -> str:
+    """Stable hash of the context an answer was generated from"""
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(str(item).encode("utf-8", errors="replace"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def is_follow_up(normalized_query: str) -> bool:
+    """True when a (normalized) message refers back to the conversation"""
+    return bool(_FOLLOW_UP_START_RE.match(normalized_query) or _FOLLOW_UP_RE.search(normalized_query))
+
+
+def is_read_only_tool(tool_name: str) -> bool:
+    """True for tools without side effects (their use does not invalidate cached answers)"""
+    if tool_name in _READ_ONLY_TOOLS:
+        return True
+    if tool_name.startswith("mcp_"):
+        verbs = tool_name[len("mcp_"):].split("_")
+        return any(verb in _READ_ONLY_MCP_VERBS for verb in verbs[:3])
+    return False
+
+
+@dataclass
+class CacheKey:
+    """Lookup key of a chat turn"""
+
+    user_id: UUID
+    normalized_query: str
+    embedding: np.ndarray  # unit vector
+    fingerprint: str
+    generation: int = 0  # User data generation when the turn started
+
+
+@dataclass
+class _CacheEntry:
+    normalized_query: str
+    embedding: np.ndarray
+    fingerprint: str
+    response: ChatResponse
+    expires_at: float
+    generation: int
+
+
+class SemanticResponseCache:
+    """Per-user LRU of answers, matched by query similarity and context fingerprint"""
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 600,
+        tool_ttl_seconds: float = 120,
+        max_entries_per_user: int = 200,
+    ) -> None:
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.tool_ttl_seconds = tool_ttl_seconds
+        self.max_entries_per_user = max(1, max_entries_per_user)
+        self._entries: Dict[UUID, "OrderedDict[int, _CacheEntry]"] = {}
+        self._generations: Dict[UUID, int] = {}
+        self._ids = 0
+
+    def lookup(self, key: CacheKey) -> Optional[ChatResponse]:
+        entries = self._entries.get(key.user_id)
+        if not entries:
+            increment_counter("response_cache_requests_total", labels={"outcome": "miss"})
+            return None
+
+        now = time.monotonic()
+        generation = self._generations.get(key.user_id, 0)
+        for entry_id in [i for i, e in entries.items() if e.expires_at <= now or e.generation != generation]:
+            del entries[entry_id]
+
+        best_id, best_score = None, -1.0
+        for entry_id, entry in entries.items():
+            if entry.fingerprint != key.fingerprint:
+                continue
+            if entry.normalized_query == key.normalized_query:
+                best_id, best_score = entry_id, 1.0
+                break
+            score = float(np.dot(entry.embedding, key.embedding))
+            if score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None or best_score < self.similarity_threshold:
+            increment_counter("response_cache_requests_total", labels={"outcome": "miss"})
+            return None
+
+        entries.move_to_end(best_id)
+        increment_counter("response_cache_requests_total", labels={"outcome": "hit"})
+        logger.info(f"⚡ Response cache hit for user {key.user_id} (similarity={best_score:.3f})")
+        return entries[best_id].response
+
+    def store(self, key: CacheKey, response: ChatResponse) -> bool:
+        """Cache an answer; answers from side-effecting tools or empty answers are skipped"""
+        tools_used: Sequence[str] = response.tools_used or []
+        if not (response.response or "").strip() or not all(is_read_only_tool(t) for t in tools_used):
+            increment_counter("response_cache_requests_total", labels={"outcome": "not_cacheable"})
+            return False
+        if key.generation != self.generation(key.user_id):
+            return False
+
+        ttl = self.tool_ttl_seconds if tools_used else self.ttl_seconds
+        entries = self._entries.setdefault(key.user_id, OrderedDict())
+        self._ids += 1
+        entries[self._ids] = _CacheEntry(
+            normalized_query=key.normalized_query,
+            embedding=key.embedding,
+            fingerprint=key.fingerprint,
+            # Activity and stage timings describe the turn that generated the answer
+            response=response.model_copy(update={"agent_activity": [], "timings": None}),
+            expires_at=time.monotonic() + ttl,
+            # An invalidation during generation makes the answer stale right away
+            generation=key.generation,
+        )
+        while len(entries) > self.max_entries_per_user:
+            entries.popitem(last=False)
+        return True
+
+    def generation(self, user_id: UUID) -> int:
+        return self._generations.get(user_id, 0)
+
+    def invalidate_user(self, user_id: Optional[UUID]) -> None:
+        """Drop every cached answer of a user (their data changed)"""
+        if user_id is None:
+            return
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        if self._entries.pop(user_id, None):
+            increment_counter("response_cache_invalidations_total")
+            logger.debug(f"🧹 Response cache invalidated for user {user_id}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+    def size(self, user_id: UUID) -> int:
+        return len(self._entries.get(user_id, ()))
+
+
+_response_cache: Optional[SemanticResponseCache] = None
+
+
+def get_response_cache() -> SemanticResponseCache:
+    """Process-wide response cache configured from settings"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = SemanticResponseCache(
+            similarity_threshold=settings.response_cache_similarity_threshold,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+            tool_ttl_seconds=settings.response_cache_tool_ttl_seconds,
+            max_entries_per_user=settings.response_cache_max_entries_per_user,
+        )
+    return _response_cache
+
+
+def invalidate_user_responses(user_id: Optional[UUID]) -> None:
+    """Invalidate cached answers of a user (no-op when the cache is disabled)"""
+    if settings.response_cache_enabled:
+        get_response_cache().invalidate_user(user_id)
+
+
+async def build_cache_key(
+    embedding_service,
+    user_id: UUID,
+    message: str,
+    context_items: List[str],
+    day: Optional[date] = None,
+) -> Optional[CacheKey]:
+    """
+    Key of a chat turn, or None when the message should not be cached
+    (too short to be self-contained, a follow-up of the previous turns, or
+    the embedding failed). The key covers the user, the day (answers resolve
+    "oggi"/"domani") and `context_items` (retrieved memory).
+    """
+    normalized = normalize_query(message)
+    if len(normalized.split()) < settings.response_cache_min_query_words or is_follow_up(normalized):
+        increment_counter("response_cache_requests_total", labels={"outcome": "skipped"})
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+        vector = await loop.run_in_executor(None, embedding_service.generate_embedding, normalized)
+    except Exception as e:
+        logger.warning(f"⚠️  Response cache: could not embed query: {e}")
+        return None
+    embedding = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(embedding))
+    if norm == 0.0:
+        return None
+    return CacheKey(
+        user_id=user_id,
+        normalized_query=normalized,
+        embedding=embedding / norm,
+        fingerprint=context_fingerprint([f"day:{(day or date.today()).isoformat()}", *context_items]),
+        generation=get_response_cache().generation(user_id),
+    )
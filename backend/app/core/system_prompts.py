@@ -4,9 +4,11 @@ System Prompts for Knowledge Navigator
 This module contains system prompts that provide the AI assistant with
 knowledge about its own architecture and capabilities.
 """
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 
+@lru_cache(maxsize=1)
 def get_base_self_awareness_prompt() -> str:
     """
     Generate a comprehensive but condensed self-awareness system prompt.
@@ -69,3 +71,99 @@ Se la documentazione interna è presente nel contesto ma NON è rilevante per la
 """
     return prompt.strip()
 
+
+# Instructions on uploaded files vs Google Drive files. Always part of the
+# static prefix (independent of whether memory was retrieved this turn) so the
+# prefix stays byte-identical between turns.
+FILE_SOURCE_INSTRUCTIONS = """🚨🚨🚨 CRITICAL: DISTINGUERE TRA FILE CARICATI E FILE DRIVE 🚨🚨🚨
+
+=== FILE CARICATI NELLA SESSIONE (IN MEMORIA) ===
+I file con il prefisso '[Content from uploaded file]' sono stati CARICATI DIRETTAMENTE nella sessione corrente.
+Questi file sono GIÀ DISPONIBILI nel contesto e NON richiedono tool.
+
+QUANDO L'UTENTE CHIEDE DI:
+- 'riassumi il file', 'analizza il file', 'spiegami il file'
+- 'riassumi il documento', 'cosa contiene il file'
+- 'ultimo file', 'file caricato', 'file in memoria'
+→ Cerca '[Content from uploaded file]' nelle informazioni di contesto del messaggio e usa quel contenuto DIRETTAMENTE.
+→ NON usare tool - il contenuto è già disponibile.
+
+=== FILE SU GOOGLE DRIVE ===
+I file su Google Drive NON sono nel contesto e richiedono tool specifici.
+
+QUANDO L'UTENTE CHIEDE DI:
+- 'file su Drive', 'file su Google Drive', 'file Drive'
+- 'leggi il file [nome] su Drive', 'apri il file [nome] da Drive'
+- 'file con ID [id] su Drive', 'file Drive con nome [nome]'
+→ Usa il tool 'mcp_get_drive_file_content' o 'drive_get_file' per accedere al file.
+→ Questi file NON sono nel contesto e devono essere recuperati da Drive.
+
+REGOLA GENERALE:
+1. Se vedi '[Content from uploaded file]' → usa quel contenuto direttamente (NO tool)
+2. Se l'utente menziona 'Drive', 'Google Drive', o un nome file specifico non nel contesto → usa tool Drive
+3. Se l'utente dice solo 'il file' senza menzionare Drive → probabilmente si riferisce al file caricato"""
+
+
+@lru_cache(maxsize=32)
+def build_static_system_prompt(system_prompt: str, tools_description: Optional[str] = None) -> str:
+    """
+    Build the static part of the system prompt: self-awareness, base
+    instructions, file-source rules and tool descriptions.
+
+    Nothing here changes between turns, so backends that reuse the KV cache
+    of a common prompt prefix (Ollama, llama.cpp `cache_prompt`, Gemini
+    implicit caching) only have to process it once. Volatile parts (time,
+    retrieved memory) go after the conversation history, see
+    `build_volatile_context`.
+    """
+    parts = [get_base_self_awareness_prompt(), system_prompt, FILE_SOURCE_INSTRUCTIONS]
+    static_prompt = "\n\n".join(part for part in parts if part)
+    if tools_description:
+        static_prompt += tools_description
+    return static_prompt
+
+
+def build_volatile_context(
+    time_context: Optional[str] = None,
+    retrieved_memory: Optional[List[str]] = None,
+    max_chars_per_item: int = 5000,
+) -> str:
+    """Build the per-turn context (current time, retrieved memory) placed next to the user prompt."""
+    sections = []
+    if time_context:
+        sections.append(time_context)
+    if retrieved_memory:
+        memory_context = "=== IMPORTANT: Context Information from Files and Memory ===\n"
+        memory_context += "The following information has been retrieved from uploaded files and previous conversations.\n"
+        memory_context += "You MUST use this information to answer questions accurately.\n\n"
+        for i, mem in enumerate(retrieved_memory, 1):
+            # Truncate very long content to avoid timeout and token limits
+            if len(mem) > max_chars_per_item:
+                memory_context += f"{i}. {mem[:max_chars_per_item]}... [content truncated - file is {len(mem)} chars total]\n\n"
+            else:
+                memory_context += f"{i}. {mem}\n\n"
+        memory_context += "=== End of Context Information ==="
+        sections.append(memory_context)
+    return "\n\n".join(sections)
+
+
+def build_prefix_cached_messages(
+    static_system: str,
+    session_context: Optional[List[Dict[str, str]]],
+    prompt: str,
+    volatile_context: str = "",
+) -> List[Dict[str, str]]:
+    """
+    Order messages so the prompt prefix is stable across turns:
+    static system prompt, then the conversation history, then the volatile
+    context together with the current user prompt.
+    """
+    messages = []
+    if static_system:
+        messages.append({"role": "system", "content": static_system})
+    if session_context:
+        messages.extend(session_context)
+    if volatile_context:
+        prompt = f"{volatile_context}\n\n=== User Message ===\n{prompt}"
+    messages.append({"role": "user", "content": prompt})
+    return messages
@@ -0,0 +1,153 @@
+"""
+Tool Index - shortlist the tools relevant to a message.
+
+With MCP servers connected the catalog holds dozens of tools (Google
+Workspace alone exposes ~50), and all of them used to be written into the
+planner prompt and sent as native tool schemas to the main model. The index
+embeds each tool's name and description once (cached by content, so a
+catalog refresh only embeds new or changed tools) and, per message, keeps:
+
+- the pinned core tools (calendar, email, web search...), always,
+- tools whose name is mentioned in the message,
+- the top-k tools by cosine similarity with the message.
+
+Small catalogs (not larger than pinned + top-k) are returned unchanged.
+The shortlist preserves the catalog order, so prompts stay stable for the
+prompt-prefix cache when the same tools are selected.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import increment_counter, observe_histogram
+
+logger = logging.getLogger(__name__)
+
+
+def tool_text(tool: Dict[str, Any]) -> str:
+    """Text embedded for a tool: its name (words split) and description"""
+    name = str(tool.get("name", ""))
+    readable = name.replace("mcp_", "").replace("_", " ")
+    return f"{readable}: {tool.get('description', '') or ''}".strip()
+
+
+def _tool_key(tool: Dict[str, Any]) -> str:
+    return hashlib.sha1(tool_text(tool).encode("utf-8")).hexdigest()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ToolIndex:
+    """Embedding cache for tool descriptions plus per-message shortlisting"""
+
+    def __init__(self, embedding_service: Any, max_entries: int = 2000) -> None:
+        self.embedding_service = embedding_service
+        self.max_entries = max_entries
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _embed_tools(self, tools: Sequence[Dict[str, Any]]) -> np.ndarray:
+        keys = [_tool_key(tool) for tool in tools]
+        with self._lock:
+            missing = {key: tool for key, tool in zip(keys, tools) if key not in self._vectors}
+        if missing:
+            vectors = self.embedding_service.generate_embeddings([tool_text(t) for t in missing.values()])
+            vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+            with self._lock:
+                if len(self._vectors) + len(missing) > self.max_entries:
+                    self._vectors.clear()  # Catalog churn (e.g. MCP servers swapped): start over
+                self._vectors.update(zip(missing.keys(), vectors))
+            logger.info(f"🧰 Embedded {len(missing)} tool descriptions")
+        with self._lock:
+            return np.stack([self._vectors[key] for key in keys])
+
+    def rank(self, message: str, tools: Sequence[Dict[str, Any]]) -> List[float]:
+        """Cosine similarity between the message and each tool (synchronous)"""
+        if not tools:
+            return []
+        matrix = self._embed_tools(tools)
+        query = _normalize(np.asarray(self.embedding_service.generate_embedding(message), dtype=np.float32))
+        return (matrix @ query).tolist()
+
+    def select(
+        self,
+        message: str,
+        tools: Sequence[Dict[str, Any]],
+        top_k: int,
+        pinned: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """Pinned + mentioned + top-k tools for a message, in catalog order (synchronous)"""
+        tools = list(tools)
+        pinned_set = set(pinned)
+        message_lower = message.lower()
+        keep = {
+            i for i, tool in enumerate(tools)
+            if tool.get("name") in pinned_set or (tool.get("name") and str(tool["name"]).lower() in message_lower)
+        }
+        candidates = [i for i in range(len(tools)) if i not in keep]
+        if len(candidates) <= top_k:
+            return tools
+
+        scores = self.rank(message, [tools[i] for i in candidates])
+        ranked = sorted(zip(scores, candidates), key=lambda entry: entry[0], reverse=True)
+        keep.update(i for _, i in ranked[:top_k])
+        return [tool for i, tool in enumerate(tools) if i in keep]
+
+    async def shortlist(
+        self,
+        message: str,
+        tools: Sequence[Dict[str, Any]],
+        top_k: Optional[int] = None,
+        pinned: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Shortlist the tools for a message. Embeddings run in the default
+        executor; on any error the full catalog is returned.
+        """
+        top_k = settings.tool_shortlist_top_k if top_k is None else top_k
+        pinned = settings.tool_shortlist_pinned_tools if pinned is None else pinned
+        tools = list(tools)
+        if not message.strip() or len(tools) <= top_k + len(pinned):
+            return tools
+        loop = asyncio.get_running_loop()
+        try:
+            selected = await loop.run_in_executor(None, self.select, message, tools, top_k, pinned)
+        except Exception as e:
+            logger.warning(f"⚠️  Tool shortlisting failed, using the full catalog: {e}")
+            increment_counter("tool_shortlist_errors_total")
+            return tools
+        observe_histogram("tool_shortlist_size", len(selected))
+        observe_histogram("tool_shortlist_pruned", len(tools) - len(selected))
+        logger.info(f"🧰 Tool shortlist: {len(selected)}/{len(tools)} tools")
+        return selected
+
+
+_tool_index: Optional[ToolIndex] = None
+
+
+def get_tool_index(embedding_service: Any) -> ToolIndex:
+    """Process-wide tool index (embeddings are shared across requests)"""
+    global _tool_index
+    if _tool_index is None:
+        _tool_index = ToolIndex(embedding_service)
+    return _tool_index
+
+
+async def shortlist_tools(
+    message: str,
+    tools: Sequence[Dict[str, Any]],
+    embedding_service: Any,
+) -> List[Dict[str, Any]]:
+    """Tools relevant to `message`; the full list when shortlisting is disabled"""
+    if not settings.tool_shortlist_enabled or embedding_service is None:
+        return list(tools)
+    return await get_tool_index(embedding_service).shortlist(message, tools)
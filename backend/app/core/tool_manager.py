@@ -11,6 +11,7 @@ from app.services.date_parser import DateParser
 from app.models.database import Integration, Session as SessionModel
 from app.core.config import settings
 from app.core.mcp_client import MCPClient
+from app.core.response_cache import invalidate_user_responses, is_read_only_tool
 import re
 import json
 import httpx
@@ -733,7 +734,8 @@ class ToolManager:
     ) -> Dict[str, Any]:
         """Execute a tool by name"""
         import logging
-        from app.core.tracing import trace_span, set_trace_attribute, add_trace_event
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute, add_trace_event
         from app.core.metrics import increment_counter, observe_histogram
         import time
         
@@ -765,10 +767,14 @@ class ToolManager:
                 # Continue execution if check fails (fail open for safety)
         
         logger.info(f"Executing tool: {tool_name} with parameters: {parameters}")
+
+        # Tools with side effects change the user's data: cached answers are stale
+        if not is_read_only_tool(tool_name):
+            invalidate_user_responses(getattr(current_user, "id", None))
         
         # Start tracing
         start_time = time.time()
-        with trace_span(f"tool.execute.{tool_name}", {
+        with stage("tool.execute", {
             "tool.name": tool_name,
             "tool.session_id": str(session_id) if session_id else None,
             "tool.auto_index": str(auto_index)
@@ -998,7 +1004,7 @@ class ToolManager:
             
             logger.info(f"📅 get_calendar_events result: {len(events)} eventi trovati tra {start_time} e {end_time}")
             if events:
-                logger.info(f"   Primo evento: {events[0].get('summary', 'N/A')} - {events[0].get('start', {}).get('dateTime', 'N/A')}")
+                logger.info(f"   Primo evento: {events[0].get('summary', 'N/A')} - {events[0].get('start', 'N/A')}")
             else:
                 logger.info(f"   Nessun evento trovato per il periodo richiesto")
             
@@ -2432,15 +2438,23 @@ Riassunto:"""
                         init_clients()
                         memory_manager = get_memory_manager()
                         web_indexer = WebIndexer(memory_manager)
-                        index_stats = await web_indexer.index_web_search_results(
-                            db=db,
-                            search_query=query,
-                            results=serializable_results,
-                            session_id=session_id,
-                            tenant_id=tenant_id,
-                        )
+                        if settings.web_index_async:
+                            # Index in background: the answer doesn't wait for embeddings/commits
+                            from app.core.dependencies import get_web_index_queue
+                            jobs = web_indexer.build_search_result_jobs(
+                                query, serializable_results, session_id, tenant_id=tenant_id
+                            )
+                            index_stats = {"queued": get_web_index_queue().enqueue(jobs), "total": len(serializable_results)}
+                        else:
+                            index_stats = await web_indexer.index_web_search_results(
+                                db=db,
+                                search_query=query,
+                                results=serializable_results,
+                                session_id=session_id,
+                                tenant_id=tenant_id,
+                            )
                         result_dict["indexing_stats"] = index_stats
-                        logger.info(f"Auto-indexed {index_stats.get('indexed', 0)} web search results")
+                        logger.info(f"Auto-indexed web search results: {index_stats}")
                     except Exception as e:
                         logger.warning(f"Failed to auto-index web search results: {e}", exc_info=True)
                 
@@ -2606,15 +2620,23 @@ Riassunto:"""
                     init_clients()
                     memory_manager = get_memory_manager()
                     web_indexer = WebIndexer(memory_manager)
-                    index_stats = await web_indexer.index_web_search_results(
-                        db=db,
-                        search_query=query,
-                        results=results_list,
-                        session_id=session_id,
-                        tenant_id=tenant_id,
-                    )
+                    if settings.web_index_async:
+                        # Index in background: the answer doesn't wait for embeddings/commits
+                        from app.core.dependencies import get_web_index_queue
+                        jobs = web_indexer.build_search_result_jobs(
+                            query, results_list, session_id, tenant_id=tenant_id
+                        )
+                        index_stats = {"queued": get_web_index_queue().enqueue(jobs), "total": len(results_list)}
+                    else:
+                        index_stats = await web_indexer.index_web_search_results(
+                            db=db,
+                            search_query=query,
+                            results=results_list,
+                            session_id=session_id,
+                            tenant_id=tenant_id,
+                        )
                     result_dict["indexing_stats"] = index_stats
-                    logger.info(f"Auto-indexed {index_stats.get('indexed', 0)} web search results")
+                    logger.info(f"Auto-indexed web search results: {index_stats}")
                 except Exception as e:
                     logger.warning(f"Failed to auto-index web search results: {e}", exc_info=True)
             
@@ -2752,13 +2774,20 @@ Link trovati: {', '.join(str(l) for l in links)[:200]}...
                         init_clients()
                         memory_manager = get_memory_manager()
                         web_indexer = WebIndexer(memory_manager)
-                        indexed = await web_indexer.index_web_fetch_result(
-                            db=db,
-                            url=url,
-                            result=result_dict["result"],
-                            session_id=session_id,
-                            tenant_id=tenant_id,
-                        )
+                        if settings.web_index_async:
+                            from app.core.dependencies import get_web_index_queue
+                            job = web_indexer.build_web_fetch_job(
+                                url, result_dict["result"], session_id, tenant_id=tenant_id
+                            )
+                            indexed = bool(job and get_web_index_queue().enqueue([job]))
+                        else:
+                            indexed = await web_indexer.index_web_fetch_result(
+                                db=db,
+                                url=url,
+                                result=result_dict["result"],
+                                session_id=session_id,
+                                tenant_id=tenant_id,
+                            )
                         if indexed:
                             result_dict["indexing_stats"] = {"indexed": True}
                             logger.info(f"Auto-indexed web fetch result for URL: {url}")
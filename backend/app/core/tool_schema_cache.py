@@ -0,0 +1,135 @@
+"""
+Tool Schema Cache - converted tool declarations for Gemini/Vertex.
+
+GeminiClient and VertexAIClient used to convert every tool's JSON schema to
+the provider format on each generate_with_context call. With 50+ MCP tools
+that work is measurable on every turn, while the tool list rarely changes
+between turns. Configured GenerativeModel instances are not cached: their
+system instruction embeds per-turn context, so they would never hit.
+
+Entries are keyed by a fingerprint of the tool list and kept in a bounded
+LRU shared by all client instances. Cached objects are treated as immutable
+by the clients.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import increment_counter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TYPE_MAP = {
+    "integer": "NUMBER",
+    "number": "NUMBER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
+
+
+def _gemini_type(json_type: Any) -> str:
+    return _TYPE_MAP.get(json_type, "STRING")
+
+
+def convert_parameters_to_gemini_schema(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert JSON Schema parameters to Gemini function calling schema"""
+    properties = params.get("properties", {})
+    required = params.get("required", [])
+
+    gemini_properties = {}
+    gemini_required = []
+
+    for prop_name, prop_schema in properties.items():
+        prop_type = prop_schema.get("type", "string")
+        gemini_prop = {
+            "type": _gemini_type(prop_type),
+            "description": prop_schema.get("description", ""),
+        }
+
+        # For arrays, preserve the items schema (required by Gemini)
+        if prop_type == "array":
+            items_schema = prop_schema.get("items")
+            if not items_schema:
+                # Array without items specified - default to STRING array
+                gemini_prop["items"] = {"type": "STRING"}
+            elif items_schema.get("type", "string") == "array":
+                # Nested array: one level of items is kept (arrays of arrays map to ARRAY of STRING)
+                nested = items_schema.get("items")
+                nested_type = _gemini_type(nested.get("type", "string")) if nested else "STRING"
+                if nested_type == "ARRAY":
+                    nested_type = "STRING"
+                gemini_prop["items"] = {"type": "ARRAY", "items": {"type": nested_type}}
+            else:
+                items_type = _gemini_type(items_schema.get("type", "string"))
+                gemini_prop["items"] = {"type": "STRING" if items_type == "ARRAY" else items_type}
+
+        gemini_properties[prop_name] = gemini_prop
+        if prop_name in required:
+            gemini_required.append(prop_name)
+
+    return {
+        "type": "OBJECT",
+        "properties": gemini_properties,
+        "required": gemini_required,
+    }
+
+
+def tools_fingerprint(tools: Optional[List[Dict[str, Any]]]) -> str:
+    """Stable hash of a tool list (names, descriptions and schemas, in order)"""
+    payload = json.dumps(tools or [], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ToolDeclarationCache:
+    """Bounded LRU of provider tool declarations"""
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Tuple[Hashable, ...], builder: Callable[[], T]) -> T:
+        """
+        Cached value for `key`, building it on a miss. The first element of
+        the key names the kind of entry (used as metric label).
+        """
+        kind = str(key[0])
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                increment_counter("tool_schema_cache_requests_total", labels={"kind": kind, "outcome": "hit"})
+                return self._entries[key]
+
+        value = builder()
+        increment_counter("tool_schema_cache_requests_total", labels={"kind": kind, "outcome": "miss"})
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_tool_declaration_cache: Optional[ToolDeclarationCache] = None
+
+
+def get_tool_declaration_cache() -> ToolDeclarationCache:
+    """Process-wide cache shared by all Gemini/Vertex client instances"""
+    global _tool_declaration_cache
+    if _tool_declaration_cache is None:
+        _tool_declaration_cache = ToolDeclarationCache(settings.tool_schema_cache_max_entries)
+    return _tool_declaration_cache
@@ -2,8 +2,15 @@
 Tracing module for observability using OpenTelemetry
 Provides distributed tracing for API calls, tool execution, and LLM interactions
 """
+import json
 import logging
-from typing import Optional, Dict, Any
+import random
+import secrets
+import threading
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional, Dict, Any, Deque, List, Tuple, Union
 from contextlib import contextmanager
 from functools import wraps
 import time
@@ -27,42 +34,80 @@ except ImportError:
     logger.warning("OpenTelemetry not available. Using simple tracing fallback.")
 
 
+# Open spans of the running task (innermost last). A tuple, so tasks spawned
+# from a request inherit its spans without seeing each other's children.
+_span_stack: ContextVar[Tuple[Dict[str, Any], ...]] = ContextVar("simple_tracer_span_stack", default=())
+
+
 class SimpleTracer:
-    """Simple tracing fallback when OpenTelemetry is not available"""
+    """
+    Simple tracing fallback when OpenTelemetry is not available.
+
+    The current span is task-local (contextvar), so concurrent requests get
+    correct parent/child relations. Finished spans go into a bounded ring
+    buffer; a sampling rate decided per trace keeps the buffer to a subset
+    of traces under load. Spans can be exported as OTLP/JSON.
+    """
+    
+    def __init__(self, max_spans: int = 2000, sample_rate: float = 1.0):
+        self._finished: Deque[Dict[str, Any]] = deque(maxlen=max(1, max_spans))
+        self._lock = threading.Lock()
+        self.sample_rate = sample_rate
+    
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        """Finished spans, oldest first (bounded)"""
+        with self._lock:
+            return list(self._finished)
     
-    def __init__(self):
-        self.spans: list = []
-        self.current_span: Optional[Dict[str, Any]] = None
+    @property
+    def current_span(self) -> Optional[Dict[str, Any]]:
+        stack = _span_stack.get()
+        return stack[-1] if stack else None
     
     def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
-        """Start a new span"""
+        """Start a new span as child of the task's current span"""
+        parent = self.current_span
+        if parent is not None:
+            trace_id, sampled = parent["trace_id"], parent["sampled"]
+        else:
+            trace_id, sampled = secrets.token_hex(16), random.random() < self.sample_rate
         span = {
             "name": name,
-            "attributes": attributes or {},
+            "trace_id": trace_id,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": parent["span_id"] if parent else None,
+            "sampled": sampled,
+            "attributes": dict(attributes or {}),
             "start_time": time.time(),
             "end_time": None,
             "status": "OK",
             "events": []
         }
-        self.current_span = span
+        _span_stack.set(_span_stack.get() + (span,))
         return span
     
     def end_span(self, span: Optional[Dict[str, Any]] = None, status: str = "OK"):
-        """End a span"""
+        """End a span (the task's current span by default)"""
         if span is None:
             span = self.current_span
         if span:
             span["end_time"] = time.time()
             span["duration"] = span["end_time"] - span["start_time"]
             span["status"] = status
-            self.spans.append(span)
-            self.current_span = None
+            stack = _span_stack.get()
+            if any(s is span for s in stack):
+                _span_stack.set(tuple(s for s in stack if s is not span))
+            if span["sampled"]:
+                with self._lock:
+                    self._finished.append(span)
             logger.debug(f"Span {span['name']} completed in {span['duration']:.3f}s")
     
     def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
         """Add an event to the current span"""
-        if self.current_span:
-            self.current_span["events"].append({
+        span = self.current_span
+        if span:
+            span["events"].append({
                 "name": name,
                 "attributes": attributes or {},
                 "time": time.time()
@@ -70,8 +115,77 @@ class SimpleTracer:
     
     def set_attribute(self, key: str, value: Any):
         """Set an attribute on the current span"""
-        if self.current_span:
-            self.current_span["attributes"][key] = value
+        span = self.current_span
+        if span:
+            span["attributes"][key] = value
+    
+    def clear(self):
+        with self._lock:
+            self._finished.clear()
+    
+    def export_otlp(self, service_name: str = "knowledge-navigator", trace_id: Optional[str] = None) -> Dict[str, Any]:
+        """Finished spans in OTLP/JSON format (optionally a single trace)"""
+        spans = [s for s in self.spans if trace_id is None or s["trace_id"] == trace_id]
+        return _otlp_payload(spans, service_name)
+    
+    def export_to_file(self, path: Union[str, Path], service_name: str = "knowledge-navigator") -> int:
+        """Append the finished spans to an OTLP/JSON lines file and clear the buffer"""
+        with self._lock:
+            spans = list(self._finished)
+            self._finished.clear()
+        if not spans:
+            return 0
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(_otlp_payload(spans, service_name), default=str) + "\n")
+        return len(spans)
+
+
+def _otlp_payload(spans: List[Dict[str, Any]], service_name: str) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(s) for s in spans],
+            }],
+        }]
+    }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Dict[str, Any]) -> Dict[str, Any]:
+    otlp = {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "name": span["name"],
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(int(span["start_time"] * 1e9)),
+        "endTimeUnixNano": str(int((span["end_time"] or span["start_time"]) * 1e9)),
+        "attributes": [_otlp_attribute(k, v) for k, v in span["attributes"].items()],
+        "events": [
+            {
+                "name": event["name"],
+                "timeUnixNano": str(int(event["time"] * 1e9)),
+                "attributes": [_otlp_attribute(k, v) for k, v in event["attributes"].items()],
+            }
+            for event in span["events"]
+        ],
+        "status": {"code": 2 if span["status"] == "ERROR" else 1},
+    }
+    if span.get("parent_span_id"):
+        otlp["parentSpanId"] = span["parent_span_id"]
+    return otlp
 
 
 # Global tracer instance
@@ -79,6 +193,28 @@ _tracer: Optional[Any] = None
 _simple_tracer: Optional[SimpleTracer] = None
 
 
+def _new_simple_tracer() -> SimpleTracer:
+    from app.core.config import settings
+    return SimpleTracer(max_spans=settings.tracing_max_spans, sample_rate=settings.tracing_sample_rate)
+
+
+def get_simple_tracer() -> Optional[SimpleTracer]:
+    """The fallback tracer, if in use (None with OpenTelemetry)"""
+    return _simple_tracer
+
+
+def export_simple_spans() -> int:
+    """Write buffered fallback spans to settings.tracing_export_path (OTLP/JSON lines)"""
+    from app.core.config import settings
+    if _simple_tracer is None or not settings.tracing_export_path:
+        return 0
+    try:
+        return _simple_tracer.export_to_file(settings.tracing_export_path)
+    except Exception as e:
+        logger.warning(f"Could not export spans to {settings.tracing_export_path}: {e}")
+        return 0
+
+
 def init_tracing(service_name: str = "knowledge-navigator", enable_console: bool = True):
     """
     Initialize tracing system
@@ -113,11 +249,11 @@ def init_tracing(service_name: str = "knowledge-navigator", enable_console: bool
             return True
         except Exception as e:
             logger.error(f"Failed to initialize OpenTelemetry: {e}", exc_info=True)
-            _simple_tracer = SimpleTracer()
+            _simple_tracer = _new_simple_tracer()
             logger.info("Using simple tracing fallback")
             return False
     else:
-        _simple_tracer = SimpleTracer()
+        _simple_tracer = _new_simple_tracer()
         logger.info("Using simple tracing fallback (OpenTelemetry not available)")
         return False
 
@@ -133,7 +269,7 @@ def get_tracer():
     else:
         # Initialize with defaults if not already initialized
         init_tracing()
-        return _simple_tracer if _simple_tracer else SimpleTracer()
+        return _simple_tracer if _simple_tracer else _new_simple_tracer()
 
 
 @contextmanager
@@ -224,6 +360,8 @@ def get_trace_id() -> Optional[str]:
         span = trace.get_current_span()
         if span and span.get_span_context().is_valid:
             return format(span.get_span_context().trace_id, '032x')
+    elif _simple_tracer and _simple_tracer.current_span:
+        return _simple_tracer.current_span["trace_id"]
     return None
 
 
@@ -233,5 +371,7 @@ def get_span_id() -> Optional[str]:
         span = trace.get_current_span()
         if span and span.get_span_context().is_valid:
             return format(span.get_span_context().span_id, '016x')
+    elif _simple_tracer and _simple_tracer.current_span:
+        return _simple_tracer.current_span["span_id"]
     return None
 
@@ -9,11 +9,13 @@ from fastapi import Depends, HTTPException, status, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import logging
+import time
 
 from app.db.database import get_db
 from app.models.database import User
 from app.core.auth import decode_token
 from app.core.tenant_context import get_tenant_id
+from app.core.latency_profile import record_stage
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,7 @@ async def get_current_user(
         HTTPException: If token is invalid or user not found
     """
     logger.debug(f"[get_current_user] Called with tenant_id={tenant_id}, has_auth={bool(authorization)}")
+    auth_start = time.perf_counter()
     
     if not authorization:
         raise HTTPException(
@@ -122,6 +125,7 @@ async def get_current_user(
         )
     
     logger.debug(f"[get_current_user] Returning user: {user.email}")
+    record_stage("auth", time.perf_counter() - auth_start)
     return user
 
 
@@ -0,0 +1,516 @@
+"""
+Vector Store - async access to the embedding collections.
+
+MemoryManager and the services that store embeddings use this module instead
+of calling a synchronous ChromaDB client on the event loop:
+
+- `ChromaVectorStore` holds one process-wide ChromaDB client (HTTP or Cloud),
+  so connections are reused across MemoryManager instances, and runs every
+  call in a dedicated, bounded thread pool. A slow vector query no longer
+  blocks the event loop, nor starves the default executor used for
+  embeddings and file I/O.
+- Adds and deletes by id issued concurrently on the same collection are
+  coalesced into one request within a short window. If the merged request
+  fails, each caller's part is retried on its own, so one bad payload only
+  fails its own caller.
+- A collection handle that the server no longer knows (the collection was
+  deleted or recreated elsewhere) is dropped and resolved again by name,
+  then the call is retried once.
+- `InMemoryVectorStore` is an in-process backend with the same API, used by
+  tests and load tests (`vector_store_backend="memory"`).
+
+All collection methods mirror ChromaDB's (arguments and result shapes) but
+are coroutines.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import increment_counter, observe_histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def is_not_found_error(error: Exception) -> bool:
+    """True for the errors ChromaDB raises on a collection that doesn't exist (anymore)"""
+    name = type(error).__name__
+    return "NotFound" in name or "InvalidCollection" in name or "does not exist" in str(error)
+
+
+class _WriteBatcher:
+    """
+    Coalesces adds / deletes-by-id submitted within `window` seconds into one
+    backend call. Callers still wait until their own data is written; when
+    the merged call fails, every caller's payload is retried separately.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[str, Dict[str, list]], Awaitable[None]],
+        window: float,
+        max_items: int,
+    ) -> None:
+        self._flush = flush
+        self._window = window
+        self._max_items = max(1, max_items)
+        self._pending: List[Tuple[str, Dict[str, list], asyncio.Future]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, op: str, payload: Dict[str, list]) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, payload, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+        await future
+
+    @staticmethod
+    def _signature(op: str, payload: Dict[str, list]) -> Tuple:
+        # Only requests carrying the same fields can be merged into one call
+        return (op,) + tuple(sorted(k for k, v in payload.items() if v is not None))
+
+    async def _drain(self) -> None:
+        await asyncio.sleep(self._window)
+        while self._pending:
+            op, first, _ = self._pending[0]
+            signature = self._signature(op, first)
+            group = []
+            size = 0
+            while self._pending and self._signature(self._pending[0][0], self._pending[0][1]) == signature:
+                item_size = len(self._pending[0][1]["ids"])
+                if group and size + item_size > self._max_items:
+                    break
+                group.append(self._pending.pop(0))
+                size += item_size
+
+            merged = {
+                field: [value for _, payload, _ in group for value in payload[field]]
+                for field in signature[1:]
+            }
+            try:
+                await self._flush(op, merged)
+            except Exception as e:
+                if len(group) == 1:
+                    self._settle(group[0][2], e)
+                else:
+                    logger.warning(f"⚠️  Batched vector store {op} of {size} items failed, retrying per caller: {e}")
+                    for _, payload, future in group:
+                        try:
+                            await self._flush(op, {field: payload[field] for field in signature[1:]})
+                        except Exception as item_error:
+                            self._settle(future, item_error)
+                        else:
+                            self._settle(future)
+            else:
+                for _, _, future in group:
+                    self._settle(future)
+            observe_histogram("vector_store_batch_size", size, labels={"op": op})
+
+    @staticmethod
+    def _settle(future: asyncio.Future, error: Optional[Exception] = None) -> None:
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+
+class VectorCollection:
+    """Async facade over a backend collection (ChromaDB or in-process)"""
+
+    def __init__(
+        self,
+        backend_collection: Any,
+        run: Callable[..., Awaitable[Any]],
+        batch_window: float = 0.0,
+        max_batch: int = 256,
+        resolve: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        self._collection = backend_collection
+        self._run = run
+        # Looks the backend collection up again by name (see `_call`)
+        self._resolve = resolve
+        self._batcher = (
+            _WriteBatcher(self._flush, batch_window, max_batch) if batch_window > 0 else None
+        )
+
+    @property
+    def name(self) -> str:
+        return self._collection.name
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return getattr(self._collection, "metadata", None) or {}
+
+    async def _call(self, method: str, **kwargs: Any) -> Any:
+        try:
+            return await self._run(getattr(self._collection, method), **kwargs)
+        except Exception as e:
+            if self._resolve is None or not is_not_found_error(e):
+                raise
+            # Deleted or recreated on the server: the cached handle points to an old collection id
+            logger.info(f"🔄 Collection '{self.name}' not found, resolving it again: {e}")
+            self._collection = await self._resolve()
+            return await self._run(getattr(self._collection, method), **kwargs)
+
+    async def _flush(self, op: str, payload: Dict[str, list]) -> None:
+        await self._call("add" if op == "add" else "delete", **payload)
+
+    async def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        payload = {"ids": list(ids), "embeddings": embeddings, "documents": documents, "metadatas": metadatas}
+        payload = {k: (list(v) if v is not None else None) for k, v in payload.items()}
+        if self._batcher is None:
+            await self._call("add", **{k: v for k, v in payload.items() if v is not None})
+        else:
+            await self._batcher.submit("add", payload)
+
+    async def upsert(self, ids: Sequence[str], **kwargs: Any) -> None:
+        await self._call("upsert", ids=list(ids), **kwargs)
+
+    async def get(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self._call("get", **kwargs)
+
+    async def query(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self._call("query", **kwargs)
+
+    async def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if where is not None or self._batcher is None:
+            kwargs: Dict[str, Any] = {"where": where} if where is not None else {}
+            if ids is not None:
+                kwargs["ids"] = list(ids)
+            await self._call("delete", **kwargs)
+        elif ids:
+            await self._batcher.submit("delete", {"ids": list(ids)})
+
+    async def count(self) -> int:
+        return await self._call("count")
+
+
+class VectorStore(ABC):
+    """Collections by name; subclasses provide the backend"""
+
+    @abstractmethod
+    async def get_collection(self, name: str) -> VectorCollection:
+        ...
+
+    @abstractmethod
+    async def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection:
+        ...
+
+    @abstractmethod
+    async def get_or_create_collection(
+        self, name: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> VectorCollection:
+        ...
+
+    @abstractmethod
+    async def delete_collection(self, name: str) -> None:
+        ...
+
+    @abstractmethod
+    async def heartbeat(self) -> bool:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+def _chroma_client_factory() -> Any:
+    import chromadb
+
+    if settings.chromadb_use_cloud and settings.chromadb_cloud_api_key:
+        logger.info("Using ChromaDB Cloud client for cloud deployment")
+        return chromadb.CloudClient(
+            api_key=settings.chromadb_cloud_api_key,
+            tenant=settings.chromadb_cloud_tenant,
+            database=settings.chromadb_cloud_database,
+        )
+    return chromadb.HttpClient(host=settings.chromadb_host, port=settings.chromadb_port)
+
+
+class ChromaVectorStore(VectorStore):
+    """ChromaDB backend: one shared client, calls run in a bounded thread pool"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = _chroma_client_factory,
+        max_workers: int = 8,
+        batch_window: float = 0.005,
+        max_batch: int = 256,
+    ) -> None:
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="vector-store")
+        self._batch_window = batch_window
+        self._max_batch = max_batch
+        # One facade per collection name: concurrent writers share its batcher,
+        # and repeated lookups skip the get_collection round-trip
+        self._collections: Dict[str, VectorCollection] = {}
+
+    def _get_client(self) -> Any:
+        # Created lazily in a worker thread: the client contacts the server on creation
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    async def _run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        except Exception:
+            increment_counter("vector_store_errors_total", labels={"backend": "chroma"})
+            raise
+
+    def _wrap(self, name: str, collection: Any) -> VectorCollection:
+        wrapped = VectorCollection(
+            collection,
+            self._run,
+            self._batch_window,
+            self._max_batch,
+            resolve=lambda: self._resolve(name, wrapped.metadata),
+        )
+        self._collections[name] = wrapped
+        return wrapped
+
+    async def _resolve(self, name: str, metadata: Dict[str, Any]) -> Any:
+        # Same as MemoryManager on a cold cache: a collection deleted on the server is created again
+        kwargs = {"metadata": metadata} if metadata else {}
+        return await self._run(lambda: self._get_client().get_or_create_collection(name=name, **kwargs))
+
+    async def get_collection(self, name: str) -> VectorCollection:
+        if name in self._collections:
+            return self._collections[name]
+        return self._wrap(name, await self._run(lambda: self._get_client().get_collection(name=name)))
+
+    async def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection:
+        kwargs = {"metadata": metadata} if metadata is not None else {}
+        return self._wrap(name, await self._run(lambda: self._get_client().create_collection(name=name, **kwargs)))
+
+    async def get_or_create_collection(
+        self, name: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> VectorCollection:
+        if name in self._collections:
+            return self._collections[name]
+        kwargs = {"metadata": metadata} if metadata is not None else {}
+        return self._wrap(
+            name, await self._run(lambda: self._get_client().get_or_create_collection(name=name, **kwargs))
+        )
+
+    async def delete_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+        await self._run(lambda: self._get_client().delete_collection(name=name))
+
+    async def heartbeat(self) -> bool:
+        await self._run(lambda: self._get_client().heartbeat())
+        return True
+
+    async def close(self) -> None:
+        self._collections.clear()
+        self._executor.shutdown(wait=False)
+
+
+# --- In-process backend -------------------------------------------------------
+
+def _match(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a ChromaDB `where` filter against one metadata dict"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_match(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_match(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > expected:
+                        return False
+                    if op == "$gte" and not value >= expected:
+                        return False
+                    if op == "$lt" and not value < expected:
+                        return False
+                    if op == "$lte" and not value <= expected:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class InMemoryCollection:
+    """Synchronous in-process collection with ChromaDB semantics (squared L2 distance)"""
+
+    def __init__(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.metadata = metadata or {}
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        with self._lock:
+            for i, item_id in enumerate(ids):
+                if item_id in self._items:
+                    continue  # ChromaDB ignores adds of existing ids
+                self._items[item_id] = self._item(i, embeddings, documents, metadatas)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        with self._lock:
+            for i, item_id in enumerate(ids):
+                self._items[item_id] = self._item(i, embeddings, documents, metadatas)
+
+    @staticmethod
+    def _item(i, embeddings, documents, metadatas) -> Dict[str, Any]:
+        return {
+            "embedding": np.asarray(embeddings[i], dtype=np.float32) if embeddings is not None else None,
+            "document": documents[i] if documents is not None else None,
+            "metadata": dict(metadatas[i]) if metadatas is not None and metadatas[i] else None,
+        }
+
+    def _select(self, ids=None, where=None) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            items = list(self._items.items())
+        if ids is not None:
+            wanted = set(ids)
+            items = [(i, item) for i, item in items if i in wanted]
+        return [(i, item) for i, item in items if _match(item["metadata"] or {}, where)]
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None, **_: Any) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas"]
+        items = self._select(ids, where)[offset or 0:]
+        if limit is not None:
+            items = items[:limit]
+        result: Dict[str, Any] = {"ids": [i for i, _ in items]}
+        result["documents"] = [item["document"] for _, item in items] if "documents" in include else None
+        result["metadatas"] = [item["metadata"] for _, item in items] if "metadatas" in include else None
+        result["embeddings"] = (
+            [item["embedding"].tolist() for _, item in items] if "embeddings" in include else None
+        )
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None, **_: Any) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas", "distances"]
+        candidates = [(i, item) for i, item in self._select(where=where) if item["embedding"] is not None]
+        result: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        for query_embedding in query_embeddings:
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            scored = sorted(
+                ((float(np.sum((item["embedding"] - vector) ** 2)), i, item) for i, item in candidates),
+                key=lambda entry: entry[0],
+            )[:n_results]
+            result["ids"].append([i for _, i, _ in scored])
+            result["documents"].append([item["document"] for _, _, item in scored])
+            result["metadatas"].append([item["metadata"] for _, _, item in scored])
+            result["distances"].append([distance for distance, _, _ in scored])
+            result["embeddings"].append([item["embedding"].tolist() for _, _, item in scored])
+        return {key: (value if key == "ids" or key in include else None) for key, value in result.items()}
+
+    def delete(self, ids=None, where=None) -> None:
+        targets = [i for i, _ in self._select(ids, where)]
+        with self._lock:
+            for item_id in targets:
+                self._items.pop(item_id, None)
+
+    def count(self) -> int:
+        return len(self._items)
+
+
+class InMemoryVectorStore(VectorStore):
+    """In-process backend (tests, load tests, offline development)"""
+
+    def __init__(self, batch_window: float = 0.0) -> None:
+        self._collections: Dict[str, InMemoryCollection] = {}
+        self._batch_window = batch_window
+
+    @staticmethod
+    async def _run(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return func(*args, **kwargs)
+
+    def _wrap(self, collection: InMemoryCollection) -> VectorCollection:
+        return VectorCollection(collection, self._run, self._batch_window)
+
+    async def get_collection(self, name: str) -> VectorCollection:
+        if name not in self._collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self._wrap(self._collections[name])
+
+    async def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection:
+        if name in self._collections:
+            raise ValueError(f"Collection {name} already exists.")
+        self._collections[name] = InMemoryCollection(name, metadata)
+        return self._wrap(self._collections[name])
+
+    async def get_or_create_collection(
+        self, name: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> VectorCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name, metadata)
+        return self._wrap(self._collections[name])
+
+    async def delete_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+
+    async def heartbeat(self) -> bool:
+        return True
+
+
+_vector_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    """Process-wide vector store configured from settings"""
+    global _vector_store
+    if _vector_store is None:
+        if settings.vector_store_backend == "memory":
+            logger.info("🧠 Using in-process vector store")
+            _vector_store = InMemoryVectorStore()
+        else:
+            _vector_store = ChromaVectorStore(
+                max_workers=settings.vector_store_max_workers,
+                batch_window=settings.vector_store_batch_window_ms / 1000.0,
+                max_batch=settings.vector_store_max_batch_size,
+            )
+    return _vector_store
+
+
+def set_vector_store(store: Optional[VectorStore]) -> None:
+    """Replace the process-wide vector store (tests, load tests)"""
+    global _vector_store
+    _vector_store = store
+
+
+async def close_vector_store() -> None:
+    """Close the process-wide vector store (app shutdown)"""
+    global _vector_store
+    if _vector_store is not None:
+        store, _vector_store = _vector_store, None
+        await store.close()
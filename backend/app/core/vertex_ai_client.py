@@ -8,6 +8,11 @@ import logging
 from typing import List, Dict, Optional, Any
 from app.core.config import settings
 from app.core.system_prompts import get_base_self_awareness_prompt
+from app.core.tool_schema_cache import (
+    convert_parameters_to_gemini_schema,
+    get_tool_declaration_cache,
+    tools_fingerprint,
+)
 import json
 import time
 
@@ -98,87 +103,70 @@ class VertexAIClient:
     
     def _convert_parameters_to_gemini_schema(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Convert JSON Schema parameters to Gemini function calling schema"""
-        # Gemini uses a simplified schema format
-        # Convert from JSON Schema to Gemini format
-        properties = params.get("properties", {})
-        required = params.get("required", [])
-        
-        gemini_properties = {}
-        gemini_required = []
-        
-        for prop_name, prop_schema in properties.items():
-            prop_type = prop_schema.get("type", "string")
-            prop_desc = prop_schema.get("description", "")
-            
-            # Map JSON Schema types to Gemini types
-            gemini_type = "STRING"
-            if prop_type == "integer" or prop_type == "number":
-                gemini_type = "NUMBER"
-            elif prop_type == "boolean":
-                gemini_type = "BOOLEAN"
-            elif prop_type == "array":
-                gemini_type = "ARRAY"
-            elif prop_type == "object":
-                gemini_type = "OBJECT"
-            
-            gemini_prop = {
-                "type": gemini_type,
-                "description": prop_desc
-            }
-            
-            # For arrays, preserve the items schema (required by Gemini)
-            if prop_type == "array":
-                if "items" in prop_schema:
-                    items_schema = prop_schema["items"]
-                    items_type = items_schema.get("type", "string")
-                    
-                    # Map items type to Gemini type
-                    if items_type == "array":
-                        # Nested array - preserve items recursively
-                        # For nested arrays, we need to create an ARRAY type with its own items
-                        nested_items_schema = {}
-                        if "items" in items_schema:
-                            nested_items_type = items_schema["items"].get("type", "string")
-                            nested_gemini_type = "STRING"
-                            if nested_items_type == "integer" or nested_items_type == "number":
-                                nested_gemini_type = "NUMBER"
-                            elif nested_items_type == "boolean":
-                                nested_gemini_type = "BOOLEAN"
-                            elif nested_items_type == "object":
-                                nested_gemini_type = "OBJECT"
-                            nested_items_schema = {"type": nested_gemini_type}
-                        else:
-                            # Nested array without items - default to STRING
-                            nested_items_schema = {"type": "STRING"}
-                        # Create ARRAY with nested items
-                        gemini_prop["items"] = {
-                            "type": "ARRAY",
-                            "items": nested_items_schema
-                        }
-                    else:
-                        # Simple array (not nested)
-                        gemini_items_type = "STRING"
-                        if items_type == "integer" or items_type == "number":
-                            gemini_items_type = "NUMBER"
-                        elif items_type == "boolean":
-                            gemini_items_type = "BOOLEAN"
-                        elif items_type == "object":
-                            gemini_items_type = "OBJECT"
-                        gemini_prop["items"] = {"type": gemini_items_type}
-                else:
-                    # Array without items specified - default to STRING array (required by Gemini)
-                    gemini_prop["items"] = {"type": "STRING"}
-            
-            gemini_properties[prop_name] = gemini_prop
-            
-            if prop_name in required:
-                gemini_required.append(prop_name)
-        
-        return {
-            "type": "OBJECT",
-            "properties": gemini_properties,
-            "required": gemini_required
-        }
+        return convert_parameters_to_gemini_schema(params)
+
+    def _build_vertex_tools(self, tools: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """Vertex AI Tool objects for a tool list (None if no tool could be converted)"""
+        vertex_tools_list = None
+        logger.info(f"🔧 Processing {len(tools)} tools for Vertex AI")
+        vertex_tools = []
+        for tool in tools:
+            tool_name = tool.get("name", "unknown")
+            if "function_declarations" in tool:
+                logger.info(f"   Tool {tool_name}: Already in function_declarations format")
+                vertex_tools.extend(tool["function_declarations"])
+            elif "name" in tool and "parameters" in tool:
+                logger.info(f"   Tool {tool_name}: Converting to function_declarations format")
+                try:
+                    # Convert parameters to Vertex AI schema format (same as Gemini)
+                    vertex_schema = self._convert_parameters_to_gemini_schema(tool["parameters"])
+                    vertex_tools.append({
+                        "name": tool["name"],
+                        "description": tool.get("description", ""),
+                        "parameters": vertex_schema,
+                    })
+                except Exception as e:
+                    logger.error(f"   ❌ Error converting tool {tool_name} parameters: {e}", exc_info=True)
+                    logger.error(f"   Tool params: {tool.get('parameters', {})}")
+                    # Fallback to original parameters
+                    vertex_tools.append({
+                        "name": tool["name"],
+                        "description": tool.get("description", ""),
+                        "parameters": tool["parameters"],
+                    })
+            else:
+                logger.warning(f"   Tool {tool_name}: Unknown format, skipping")
+                logger.warning(f"   Tool keys: {list(tool.keys())}")
+
+        # Convert to Vertex AI Tool objects (according to official docs)
+        if vertex_tools:
+            # Vertex AI requires Tool objects with FunctionDeclaration objects
+            function_declarations = []
+            for tool_dict in vertex_tools:
+                tool_name = tool_dict.get("name", "unknown")
+                try:
+                    # FunctionDeclaration accepts dict for parameters and converts to Schema automatically
+                    func_decl = FunctionDeclaration(
+                        name=tool_name,
+                        description=tool_dict.get("description", ""),
+                        parameters=tool_dict.get("parameters", {})
+                    )
+                    function_declarations.append(func_decl)
+                    logger.debug(f"   ✅ Created FunctionDeclaration for {tool_name}")
+                except Exception as e:
+                    logger.error(f"   ❌ Error creating FunctionDeclaration for {tool_name}: {e}", exc_info=True)
+                    logger.error(f"   Tool dict: {tool_dict}")
+                    # Skip this tool instead of adding dict (dict format won't work)
+                    continue
+
+            if function_declarations:
+                # Create Tool object with function_declarations (official format)
+                # According to docs, tools should be passed as parameter, not in config
+                vertex_tools_list = [Tool(function_declarations=function_declarations)]
+                logger.info(f"✅ Configured {len(function_declarations)} tools for Vertex AI: {[fd.name if hasattr(fd, 'name') else fd.get('name', 'unknown') for fd in function_declarations]}")
+        else:
+            logger.warning("⚠️  No valid tools found after conversion")
+        return vertex_tools_list
 
     async def list_models(self) -> List[str]:
         """List available Gemini models"""
@@ -241,7 +229,8 @@ class VertexAIClient:
     ) -> Dict[str, Any]:
         """Generate a response from Vertex AI (compatible with GeminiClient.generate)
         """
-        from app.core.tracing import trace_span, set_trace_attribute, add_trace_event
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute, add_trace_event
         from app.core.metrics import increment_counter, observe_histogram
         
         start_time = time.time()
@@ -273,7 +262,7 @@ class VertexAIClient:
         vertex_tools_list = None
 
         try:
-            with trace_span("vertex_ai.generate"):
+            with stage("vertex_ai.generate"):
                 set_trace_attribute("vertex_ai.model", self.model_name)
                 set_trace_attribute("vertex_ai.project", self.project_id)
                 
@@ -331,11 +320,12 @@ class VertexAIClient:
     ) -> str:
         """Generate response with full context (compatible with GeminiClient.generate_with_context)
         """
-        from app.core.tracing import trace_span, set_trace_attribute
+        from app.core.latency_profile import stage
+        from app.core.tracing import set_trace_attribute
         
         start_time = time.time()
         
-        with trace_span("vertex_ai.generate_with_context"):
+        with stage("vertex_ai.generate_with_context"):
             set_trace_attribute("vertex_ai.model", self.model_name)
             set_trace_attribute("vertex_ai.has_tools", bool(tools))
             
@@ -550,10 +540,11 @@ NON rispondere con informazioni generiche o ipotetiche. Usa SEMPRE i tool approp
             # Add time/location context if provided (like GeminiClient)
             time_context = getattr(self, '_time_context', None)
             if time_context:
-                # Combine self-awareness, time_context, and system_instruction
+                # Combine self-awareness, system_instruction and time_context; the time
+                # goes last so the static prefix stays cacheable (implicit context caching)
                 current_system = config.get("system_instruction", "")
                 if current_system:
-                    config["system_instruction"] = self_awareness_prompt + "\n\n" + time_context + "\n\n" + current_system
+                    config["system_instruction"] = self_awareness_prompt + "\n\n" + current_system + "\n\n" + time_context
                 else:
                     config["system_instruction"] = self_awareness_prompt + "\n\n" + time_context
             else:
@@ -569,64 +560,11 @@ NON rispondere con informazioni generiche o ipotetiche. Usa SEMPRE i tool approp
             
             vertex_tools_list = None  # Initialize before processing tools
             if tools:
-                logger.info(f"🔧 Processing {len(tools)} tools for Vertex AI")
-                vertex_tools = []
-                for tool in tools:
-                    tool_name = tool.get("name", "unknown")
-                    if "function_declarations" in tool:
-                        logger.info(f"   Tool {tool_name}: Already in function_declarations format")
-                        vertex_tools.extend(tool["function_declarations"])
-                    elif "name" in tool and "parameters" in tool:
-                        logger.info(f"   Tool {tool_name}: Converting to function_declarations format")
-                        try:
-                            # Convert parameters to Vertex AI schema format (same as Gemini)
-                            vertex_schema = self._convert_parameters_to_gemini_schema(tool["parameters"])
-                            vertex_tools.append({
-                                "name": tool["name"],
-                                "description": tool.get("description", ""),
-                                "parameters": vertex_schema,
-                            })
-                        except Exception as e:
-                            logger.error(f"   ❌ Error converting tool {tool_name} parameters: {e}", exc_info=True)
-                            logger.error(f"   Tool params: {tool.get('parameters', {})}")
-                            # Fallback to original parameters
-                            vertex_tools.append({
-                                "name": tool["name"],
-                                "description": tool.get("description", ""),
-                                "parameters": tool["parameters"],
-                            })
-                    else:
-                        logger.warning(f"   Tool {tool_name}: Unknown format, skipping")
-                        logger.warning(f"   Tool keys: {list(tool.keys())}")
-                
-                # Convert to Vertex AI Tool objects (according to official docs)
-                if vertex_tools:
-                    # Vertex AI requires Tool objects with FunctionDeclaration objects
-                    function_declarations = []
-                    for tool_dict in vertex_tools:
-                        tool_name = tool_dict.get("name", "unknown")
-                        try:
-                            # FunctionDeclaration accepts dict for parameters and converts to Schema automatically
-                            func_decl = FunctionDeclaration(
-                                name=tool_name,
-                                description=tool_dict.get("description", ""),
-                                parameters=tool_dict.get("parameters", {})
-                            )
-                            function_declarations.append(func_decl)
-                            logger.debug(f"   ✅ Created FunctionDeclaration for {tool_name}")
-                        except Exception as e:
-                            logger.error(f"   ❌ Error creating FunctionDeclaration for {tool_name}: {e}", exc_info=True)
-                            logger.error(f"   Tool dict: {tool_dict}")
-                            # Skip this tool instead of adding dict (dict format won't work)
-                            continue
-                    
-                    if function_declarations:
-                        # Create Tool object with function_declarations (official format)
-                        # According to docs, tools should be passed as parameter, not in config
-                        vertex_tools_list = [Tool(function_declarations=function_declarations)]
-                        logger.info(f"✅ Configured {len(function_declarations)} tools for Vertex AI: {[fd.name if hasattr(fd, 'name') else fd.get('name', 'unknown') for fd in function_declarations]}")
-                else:
-                    logger.warning("⚠️  No valid tools found after conversion")
+                # Tool/FunctionDeclaration objects are built once per tool list and reused
+                vertex_tools_list = get_tool_declaration_cache().get_or_build(
+                    ("vertex_tools", tools_fingerprint(tools)),
+                    lambda: self._build_vertex_tools(tools),
+                )
             
             try:
                 # Tools must be in config, not as direct parameter
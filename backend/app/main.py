@@ -15,9 +15,16 @@ from app.core.config import settings
 from app.api import sessions, files, memory, tools, web, notifications, apikeys, auth, users
 from app.api.integrations import calendars, emails
 from app.api import metrics as metrics_api
-from app.core.dependencies import init_clients, get_ollama_client, get_mcp_client, get_memory_manager
-from app.core.tracing import init_tracing
-from app.core.metrics import init_metrics, increment_counter, observe_histogram
+from app.core.dependencies import init_clients, get_mcp_client, get_memory_manager
+from app.core.tracing import init_tracing, trace_span, get_trace_id
+from app.core.latency_profile import start_profile
+from app.core.metrics import (
+    init_metrics,
+    increment_counter,
+    observe_histogram,
+    register_counter,
+    register_histogram,
+)
 
 # Configure logging
 # Log to both console and file
@@ -135,6 +142,13 @@ async def lifespan(app: FastAPI):
     
     # Initialize clients
     init_clients()
+
+    # Connect the agent activity stream to other workers (no-op for the in-memory backend)
+    from app.core.dependencies import get_agent_activity_stream
+    try:
+        await get_agent_activity_stream().start()
+    except Exception as e:
+        logging.warning(f"⚠️  Failed to start cross-worker activity relay, events stay local to this worker: {e}")
     
     # Initialize default tenant (for multi-tenancy)
     from app.db.database import get_db
@@ -235,12 +249,35 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logging.warning(f"Error stopping Event Monitor: {e}")
     
-    ollama = get_ollama_client()
+    try:
+        await get_agent_activity_stream().stop()
+    except Exception as e:
+        logging.warning(f"Error stopping agent activity stream: {e}")
+
+    # Index web pages still waiting in the background queue
+    from app.core.dependencies import get_web_index_queue
+    try:
+        await get_web_index_queue().stop()
+    except Exception as e:
+        logging.warning(f"Error stopping web index queue: {e}")
+
     mcp = get_mcp_client()
-    if ollama:
-        await ollama.close()
     if mcp:
         await mcp.close()
+
+    # Close the pooled HTTP connections shared by all LLM clients
+    from app.core.http_clients import close_http_clients
+    await close_http_clients()
+
+    # Release the vector store client and its worker threads
+    from app.core.vector_store import close_vector_store
+    await close_vector_store()
+
+    # Persist the buffered spans (fallback tracer) when an export file is configured
+    from app.core.tracing import export_simple_spans
+    exported = export_simple_spans()
+    if exported:
+        logging.info(f"✅ Exported {exported} spans to {settings.tracing_export_path}")
     logging.info("✅ Shutdown complete")
 
 
@@ -251,29 +288,42 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# HTTP metric families, registered up front with their label names
+register_counter("http_requests_total", "HTTP requests", ("method", "path", "status"))
+register_counter("http_requests_errors_total", "HTTP requests failed with an exception", ("method", "path", "error_type"))
+register_histogram("http_request_duration_seconds", "HTTP request duration", ("method", "path", "status"))
+register_histogram(
+    "http_middleware_overhead_seconds",
+    "Time spent in ObservabilityMiddleware outside the route handler",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+
+def _route_template(request: Request) -> str:
+    """
+    Matched route template (e.g. /api/sessions/{session_id}/chat) used as metric
+    label instead of the raw path, whose ids would create a series per session.
+    """
+    route = request.scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return template or "unmatched"
+
+
 # Observability middleware for tracing HTTP requests
 class ObservabilityMiddleware(BaseHTTPMiddleware):
     """Middleware to trace and measure HTTP requests"""
     
     async def dispatch(self, request: Request, call_next):
-        from app.core.tracing import trace_span, set_trace_attribute, get_trace_id
-        from app.core.metrics import increment_counter, observe_histogram
-        
         # Skip metrics endpoint to avoid recursion
         if request.url.path == "/metrics":
             return await call_next(request)
         
-        # Initialize logger at the beginning of the function
-        logger = logging.getLogger(__name__)
-        
-        start_time = time.time()
+        start_time = time.perf_counter()
         method = request.method
         path = request.url.path
         
         # Get trace ID from frontend if present
         frontend_trace_id = request.headers.get("X-Trace-ID")
-        
-        # Start trace span
         span_attributes = {
             "http.method": method,
             "http.path": path,
@@ -282,143 +332,53 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
         if frontend_trace_id:
             span_attributes["frontend.trace_id"] = frontend_trace_id
         
-        # Use trace_span but wrap it in try/except to avoid blocking
+        status_code = "500"
+        error_type = None
+        handler_time = 0.0
+        profile = start_profile()
         try:
             with trace_span(f"{method} {path}", span_attributes):
-                set_trace_attribute("http.method", method)
-                set_trace_attribute("http.path", path)
-                if frontend_trace_id:
-                    set_trace_attribute("frontend.trace_id", frontend_trace_id)
-                    # Log correlation for debugging
-                    logger.debug(f"Frontend trace ID received: {frontend_trace_id}")
-                
-                # Increment request counter
-                increment_counter("http_requests_total", labels={
-                    "method": method,
-                    "path": path,
-                    "status": "unknown"
-                })
-                
+                handler_start = time.perf_counter()
                 try:
-                    # Add timeout to prevent infinite blocking in middleware
-                    response = await asyncio.wait_for(
-                        call_next(request),
-                        timeout=600.0  # 10 minutes max - should be enough for chat requests
-                    )
-                    duration = time.time() - start_time
-                    
-                    # Record metrics
-                    status_code = response.status_code
-                    observe_histogram("http_request_duration_seconds", duration, labels={
-                        "method": method,
-                        "path": path,
-                        "status": str(status_code)
-                    })
-                    
-                    increment_counter("http_requests_total", value=1, labels={
-                        "method": method,
-                        "path": path,
-                        "status": str(status_code)
-                    })
-                    
-                    # Add trace ID to response headers
-                    trace_id = get_trace_id()
-                    if trace_id:
-                        response.headers["X-Trace-ID"] = trace_id
-                    
-                    return response
+                    # Timeout to prevent infinite blocking in middleware (10 minutes, enough for chat requests)
+                    response = await asyncio.wait_for(call_next(request), timeout=600.0)
                 except asyncio.TimeoutError:
-                    duration = time.time() - start_time
-                    logger.error(f"Request timeout after {duration:.2f}s: {method} {path}")
-                    observe_histogram("http_request_duration_seconds", duration, labels={
-                        "method": method,
-                        "path": path,
-                        "status": "504"
-                    })
-                    increment_counter("http_requests_errors_total", labels={
-                        "method": method,
-                        "path": path,
-                        "error_type": "TimeoutError"
-                    })
-                    from fastapi import HTTPException, status as http_status
-                    raise HTTPException(
-                        status_code=http_status.HTTP_504_GATEWAY_TIMEOUT,
-                        detail=f"Request timed out after {duration:.2f} seconds"
+                    handler_time = time.perf_counter() - handler_start
+                    status_code, error_type = "504", "TimeoutError"
+                    logging.error(f"Request timeout after {handler_time:.2f}s: {method} {path}")
+                    return JSONResponse(
+                        status_code=504,
+                        content={"detail": f"Request timed out after {handler_time:.2f} seconds"},
                     )
                 except Exception as e:
-                    duration = time.time() - start_time
-                    status_code = 500
-                    
-                    # Record error metrics
-                    observe_histogram("http_request_duration_seconds", duration, labels={
-                        "method": method,
-                        "path": path,
-                        "status": "500"
-                    })
-                    
-                    increment_counter("http_requests_errors_total", labels={
-                        "method": method,
-                        "path": path,
-                        "error_type": type(e).__name__
-                    })
-                    
+                    handler_time = time.perf_counter() - handler_start
+                    error_type = type(e).__name__
                     raise
-        except Exception as trace_error:
-            # If tracing fails, continue anyway - don't block requests
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Tracing error (continuing anyway): {trace_error}")
-            try:
-                response = await asyncio.wait_for(
-                    call_next(request),
-                    timeout=600.0
-                )
-                duration = time.time() - start_time
-                status_code = response.status_code
-                # Log metrics even if tracing failed
-                observe_histogram("http_request_duration_seconds", duration, labels={
-                    "method": method,
-                    "path": path,
-                    "status": str(status_code)
-                })
-                increment_counter("http_requests_total", value=1, labels={
-                    "method": method,
-                    "path": path,
-                    "status": str(status_code)
-                })
+                handler_time = time.perf_counter() - handler_start
+                status_code = str(response.status_code)
+                
+                # Add trace ID to response headers
+                trace_id = get_trace_id()
+                if trace_id:
+                    response.headers["X-Trace-ID"] = trace_id
+                if profile is not None and settings.latency_profile_server_timing:
+                    response.headers["Server-Timing"] = profile.server_timing()
                 return response
-            except asyncio.TimeoutError:
-                duration = time.time() - start_time
-                logger.error(f"Request timeout after {duration:.2f}s (fallback): {method} {path}")
-                observe_histogram("http_request_duration_seconds", duration, labels={
-                    "method": method,
-                    "path": path,
-                    "status": "504"
-                })
-                increment_counter("http_requests_errors_total", labels={
-                    "method": method,
-                    "path": path,
-                    "error_type": "TimeoutError"
-                })
-                from fastapi import HTTPException, status as http_status
-                raise HTTPException(
-                    status_code=http_status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail=f"Request timed out after {duration:.2f} seconds (fallback)"
-                )
-            except Exception as e:
-                duration = time.time() - start_time
-                status_code = 500
-                logger.error(f"Error in request (fallback): {e}", exc_info=True)
-                observe_histogram("http_request_duration_seconds", duration, labels={
-                    "method": method,
-                    "path": path,
-                    "status": "500"
-                })
+        finally:
+            if profile is not None:
+                profile.close()
+            duration = time.perf_counter() - start_time
+            route = _route_template(request)
+            labels = {"method": method, "path": route, "status": status_code}
+            observe_histogram("http_request_duration_seconds", duration, labels=labels)
+            increment_counter("http_requests_total", labels=labels)
+            if error_type:
                 increment_counter("http_requests_errors_total", labels={
                     "method": method,
-                    "path": path,
-                    "error_type": type(e).__name__
+                    "path": route,
+                    "error_type": error_type,
                 })
-                raise
+            observe_histogram("http_middleware_overhead_seconds", max(0.0, duration - handler_time))
 
 
 # CORS middleware
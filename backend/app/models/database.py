@@ -151,6 +151,11 @@ class File(Base):
     mime_type = Column(String(100))
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     session_metadata = Column("metadata", JSONB, default={})
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the bytes -> file_contents
+
+    __table_args__ = (
+        Index('ix_files_tenant_user_uploaded', 'tenant_id', 'user_id', 'uploaded_at'),  # File vivi di un utente, più recenti prima
+    )
 
     # Relationships
     tenant = relationship("Tenant", backref="files")
@@ -243,3 +248,66 @@ class Notification(Base):
     # Relationships
     tenant = relationship("Tenant", backref="notifications")
 
+
+
+class QueuedTask(Base):
+    """Durable TaskQueue entry, shared by all workers (claimed with SKIP LOCKED)"""
+    __tablename__ = "task_queue"
+
+    id = Column(String(36), primary_key=True)  # Task.id
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String(100), nullable=False)
+    origin = Column(String(100), nullable=False)
+    priority = Column(String(20), nullable=False)  # "critical", "high", "medium", "low"
+    priority_rank = Column(Integer, nullable=False)  # 4..1, for ORDER BY
+    status = Column(String(20), nullable=False)  # TaskStatus value
+    payload = Column(JSONB, default={})
+    claimed_by = Column(String(64), nullable=True)  # Worker that claimed the task
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index('ix_task_queue_claim', 'session_id', 'status', 'priority_rank', 'created_at'),
+        Index('ix_task_queue_status', 'status'),
+    )
+
+
+class FileContent(Base):
+    """Content-addressed file bytes shared by identical uploads within a tenant"""
+    __tablename__ = "file_contents"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    storage_path = Column(String(500), nullable=False)  # Filesystem path or gs:// path of the stored bytes
+    mime_type = Column(String(100))
+    extracted_text = Column(Text, nullable=True)
+    text_metadata = Column(JSONB, default={})
+    ref_count = Column(Integer, nullable=False, default=1)  # Number of File rows pointing here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IndexedEmail(Base):
+    """Lookup table of email message ids already indexed into long-term memory"""
+    __tablename__ = "indexed_emails"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    message_id = Column(String(255), primary_key=True)  # Gmail message id
+    memory_id = Column(UUID(as_uuid=True), ForeignKey("memory_long.id", ondelete="CASCADE"), nullable=True)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IndexedWebPage(Base):
+    """Lookup table of web pages indexed into long-term memory, keyed by canonical URL"""
+    __tablename__ = "indexed_web_pages"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    url_hash = Column(String(64), primary_key=True)  # sha256 of the canonical URL
+    canonical_url = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # sha256 of the normalized content
+    memory_id = Column(UUID(as_uuid=True), ForeignKey("memory_long.id", ondelete="SET NULL"), nullable=True)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_indexed_web_pages_content_hash', 'tenant_id', 'content_hash'),
+    )
@@ -200,6 +200,7 @@ class ChatResponse(BaseModel):
     agent_activity: List[AgentActivityEvent] = []
     day_transition_pending: bool = False  # True when day transition detected, frontend should show dialog
     new_session_id: Optional[str] = None  # ID of new day's session when day_transition_pending is True
+    timings: Optional[Dict[str, Any]] = None  # Per-stage latency breakdown (debug, see latency_profile_in_response)
 
 
 # Memory Info Schema
@@ -2,37 +2,104 @@ from __future__ import annotations
 
 import asyncio
 import json
-import threading
-from collections import defaultdict, deque
-from dataclasses import dataclass
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Deque, Dict, List, MutableSet, Optional
-from uuid import UUID
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+from uuid import UUID, uuid4
 
+from app.core.metrics import increment_counter
 
-@dataclass(frozen=True)
-class _Subscriber:
-    """Representation of a subscriber queue for cleanup purposes."""
+logger = logging.getLogger(__name__)
 
-    queue: asyncio.Queue
+_NULL_UUID = UUID("00000000-0000-0000-0000-000000000000")
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+
+
+class _SubscriberQueue(asyncio.Queue):
+    """asyncio.Queue that can replace a pending event instead of growing."""
+
+    def replace_pending(self, key: Any, event: Dict[str, Any]) -> bool:
+        """Replace the newest pending event with the same agent key, if any."""
+        pending: Deque[Dict[str, Any]] = self._queue  # type: ignore[attr-defined]
+        for index in range(len(pending) - 1, -1, -1):
+            if pending[index].get("agent_id") == key:
+                pending[index] = event
+                return True
+        return False
+
+
+@dataclass
+class _SessionShard:
+    """History and subscribers of a single session."""
+
+    history: Deque[Dict[str, Any]]
+    subscribers: Set[_SubscriberQueue] = field(default_factory=set)
+    last_activity: float = field(default_factory=time.monotonic)
+
+
+class ActivityBackend(ABC):
+    """
+    Cross-worker transport for activity events.
+
+    `publish` is called for every locally published event; events published
+    by other workers are handed to the `deliver` callback given to `start`.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[UUID, Dict[str, Any]], None]) -> None:
+        ...
+
+    @abstractmethod
+    def publish(self, session_id: UUID, event: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def stop(self) -> None:
+        ...
 
 
 class AgentActivityStream:
     """
     In-memory broker that fans out agent activity telemetry events to subscribers.
 
-    - Maintains a bounded history per session so newcomers can replay recent events.
-    - Uses asyncio.Queue per subscriber to avoid blocking producers.
-    - Designed to be lightweight until we adopt a persistent/event sourcing backend.
+    - State is sharded per session; each shard keeps a bounded history so
+      newcomers can replay recent events, and shards without subscribers
+      expire after `history_ttl_seconds` of inactivity.
+    - Uses a bounded queue per subscriber to avoid blocking producers. When a
+      subscriber falls behind, the pending event of the same agent is replaced
+      (`coalesce`) or the oldest pending event is dropped (`drop_oldest`).
+    - All state is owned by the event loop, so no locks are needed.
+    - An optional `ActivityBackend` relays events between workers.
     """
 
-    def __init__(self, history_size: int = 200, queue_size: int = 100) -> None:
+    def __init__(
+        self,
+        history_size: int = 200,
+        queue_size: int = 100,
+        history_ttl_seconds: int = 1800,
+        overflow_policy: str = OVERFLOW_COALESCE,
+        backend: Optional[ActivityBackend] = None,
+    ) -> None:
         self._history_size = max(1, history_size)
         self._queue_size = max(1, queue_size)
-        self._history: Dict[UUID, Deque[Dict[str, Any]]] = defaultdict(deque)
-        self._subscribers: Dict[UUID, MutableSet[_Subscriber]] = defaultdict(set)
-        self._async_lock = asyncio.Lock()  # Per register/unregister (async)
-        self._sync_lock = threading.Lock()  # Per publish/get_active_sessions (sync)
+        self._history_ttl = max(0, history_ttl_seconds)
+        self._overflow_policy = overflow_policy
+        self._shards: Dict[UUID, _SessionShard] = {}
+        self._backend = backend
+        self._last_sweep = time.monotonic()
+        self.stats: Dict[str, int] = {
+            "published": 0,
+            "delivered": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "expired_sessions": 0,
+        }
 
     @staticmethod
     def _serialize_event(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -43,121 +110,118 @@ class AgentActivityStream:
             serialised["timestamp"] = timestamp.isoformat()
         return serialised
 
+    async def start(self) -> None:
+        """Start the cross-worker backend, if configured."""
+        if self._backend:
+            await self._backend.start(self._deliver_local)
+
+    async def stop(self) -> None:
+        if self._backend:
+            await self._backend.stop()
+
+    def _shard(self, session_id: UUID) -> _SessionShard:
+        shard = self._shards.get(session_id)
+        if shard is None:
+            shard = _SessionShard(history=deque(maxlen=self._history_size))
+            self._shards[session_id] = shard
+        return shard
+
     async def register(self, session_id: UUID) -> asyncio.Queue:
         """
         Register a new subscriber for the given session.
         Returns the queue that will receive telemetry events.
         """
-        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
-        subscriber = _Subscriber(queue=queue)
-        async with self._async_lock:
-            with self._sync_lock:
-                self._subscribers[session_id].add(subscriber)
+        queue = _SubscriberQueue(maxsize=self._queue_size)
+        shard = self._shard(session_id)
+        shard.subscribers.add(queue)
+        shard.last_activity = time.monotonic()
         return queue
 
     async def unregister(self, session_id: UUID, queue: asyncio.Queue) -> None:
         """Remove a subscriber queue when the client disconnects."""
-        subscriber = _Subscriber(queue=queue)
-        async with self._async_lock:
-            with self._sync_lock:
-                subscribers = self._subscribers.get(session_id)
-                if subscribers and subscriber in subscribers:
-                    subscribers.remove(subscriber)
-                    if not subscribers:
-                        self._subscribers.pop(session_id, None)
+        shard = self._shards.get(session_id)
+        if shard is None:
+            return
+        shard.subscribers.discard(queue)  # type: ignore[arg-type]
+        shard.last_activity = time.monotonic()
 
     def publish(self, session_id: UUID, event: Dict[str, Any]) -> None:
-        """Publish a new telemetry event to all subscribers."""
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        # Check for null UUID (00000000-0000-0000-0000-000000000000)
-        null_uuid = UUID('00000000-0000-0000-0000-000000000000')
-        if session_id == null_uuid:
-            agent_id = event.get('agent_id', 'unknown') if isinstance(event, dict) else getattr(event, 'agent_id', 'unknown')
-            status = event.get('status', 'unknown') if isinstance(event, dict) else getattr(event, 'status', 'unknown')
-            logger.warning(f"⚠️⚠️⚠️  Attempted to publish telemetry with null UUID! agent_id={agent_id}, status={status}. This should not happen.")
-            import sys
-            import traceback
-            try:
-                # Get the full stack trace
-                stack_lines = traceback.format_stack()
-                if stack_lines:
-                    print(f"[TELEMETRY] ERROR: Attempted to publish with null UUID! agent_id={agent_id}, status={status}", file=sys.stderr)
-                    print(f"[TELEMETRY] Stack trace:", file=sys.stderr)
-                    for line in stack_lines:
-                        print(line, file=sys.stderr, end='')
-                else:
-                    # Fallback: use format_exc if format_stack is empty
-                    import sys as sys_module
-                    exc_type, exc_value, exc_traceback = sys_module.exc_info()
-                    if exc_traceback:
-                        stack_lines = traceback.format_tb(exc_traceback)
-                        for line in stack_lines:
-                            print(line, file=sys.stderr, end='')
-            except Exception as e:
-                logger.error(f"Failed to print stack trace: {e}", exc_info=True)
+        """Publish a new telemetry event to all subscribers (on every worker)."""
+        if session_id == _NULL_UUID:
+            logger.warning(
+                "⚠️  Attempted to publish telemetry with null UUID! agent_id=%s, status=%s",
+                event.get("agent_id", "unknown"),
+                event.get("status", "unknown"),
+                stack_info=True,
+            )
             return
-        
+
         serialised = self._serialize_event(event)
-        history = self._history[session_id]
-        history.append(serialised)
-        while len(history) > self._history_size:
-            history.popleft()
-
-        # Make a thread-safe copy of subscribers list
-        with self._sync_lock:
-            subscribers = list(self._subscribers.get(session_id, []))
-            all_sessions = list(self._subscribers.keys())
-        
-        # event is a dict (serialized), not a Pydantic model
-        agent_id = event.get('agent_id', 'unknown') if isinstance(event, dict) else getattr(event, 'agent_id', 'unknown')
-        status = event.get('status', 'unknown') if isinstance(event, dict) else getattr(event, 'status', 'unknown')
-        
-        if not subscribers:
-            # Log at DEBUG level to reduce log noise (no subscribers is normal when frontend is disconnected or session is closed)
-            logger.debug(f"⚠️  No subscribers for session {session_id}. Event will not be delivered: {agent_id} ({status}). Active sessions: {all_sessions}")
-            import sys
-            print(f"[TELEMETRY] No subscribers for session {session_id}, active sessions: {all_sessions}", file=sys.stderr)
-            return
-        
-        logger.info(f"📡 Publishing event to {len(subscribers)} subscriber(s) for session {session_id}: {agent_id} ({status})")
-        import sys
-        print(f"[TELEMETRY] Publishing event to {len(subscribers)} subscriber(s): {agent_id} ({status})", file=sys.stderr)
-
-        # Process subscribers outside the lock to avoid blocking
-        events_sent = 0
-        for subscriber in subscribers:
-            queue = subscriber.queue
+        self._deliver_local(session_id, serialised)
+        if self._backend:
+            self._backend.publish(session_id, serialised)
+
+    def _deliver_local(self, session_id: UUID, serialised: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        shard = self._shard(session_id)
+        shard.history.append(serialised)
+        shard.last_activity = now
+        self.stats["published"] += 1
+
+        agent_id = serialised.get("agent_id", "unknown")
+        for queue in tuple(shard.subscribers):
             try:
                 queue.put_nowait(serialised)
-                events_sent += 1
+                self.stats["delivered"] += 1
+                continue
             except asyncio.QueueFull:
-                # Drop the oldest pending event to make room for the newest one.
-                try:
-                    queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    pass
-                try:
-                    queue.put_nowait(serialised)
-                    events_sent += 1
-                except asyncio.QueueFull:
-                    # Give up if queue is still full.
-                    logger.warning(f"⚠️  Queue full for subscriber, dropping event: {agent_id} ({status})")
-                    continue
-        
-        if events_sent > 0:
-            logger.info(f"✅ Successfully sent event to {events_sent}/{len(subscribers)} subscribers: {agent_id} ({status})")
-            import sys
-            print(f"[TELEMETRY] Successfully queued event: {agent_id} ({status}) to {events_sent} subscriber(s)", file=sys.stderr)
-        else:
-            logger.warning(f"⚠️  Failed to send event to any subscriber: {agent_id} ({status})")
-            import sys
-            print(f"[TELEMETRY] FAILED to queue event: {agent_id} ({status})", file=sys.stderr)
+                pass
+
+            if self._overflow_policy == OVERFLOW_COALESCE and queue.replace_pending(agent_id, serialised):
+                self._record_overflow("coalesced")
+                continue
+
+            # Drop the oldest pending event to make room for the newest one.
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            try:
+                queue.put_nowait(serialised)
+            except asyncio.QueueFull:
+                pass
+            self._record_overflow("dropped")
+
+        if not shard.subscribers:
+            # No subscribers is normal when the frontend is disconnected or the session is closed
+            logger.debug("No subscribers for session %s, event kept in history only: %s", session_id, agent_id)
+
+        self._maybe_expire(now)
+
+    def _record_overflow(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        increment_counter("agent_activity_overflow_total", labels={"outcome": outcome})
+
+    def _maybe_expire(self, now: float) -> None:
+        # Sweep at most a few times per TTL window; shards with subscribers never expire
+        if now - self._last_sweep < max(1.0, self._history_ttl / 4):
+            return
+        self._last_sweep = now
+        expired = [
+            session_id
+            for session_id, shard in self._shards.items()
+            if not shard.subscribers and now - shard.last_activity >= self._history_ttl
+        ]
+        for session_id in expired:
+            self._shards.pop(session_id, None)
+        if expired:
+            self.stats["expired_sessions"] += len(expired)
+            logger.debug("Expired activity history for %d inactive session(s)", len(expired))
 
     def snapshot(self, session_id: UUID) -> List[Dict[str, Any]]:
         """Return the current history snapshot for the session."""
-        return list(self._history.get(session_id, []))
+        shard = self._shards.get(session_id)
+        return list(shard.history) if shard else []
 
     def as_sse_payload(self, event: Dict[str, Any], event_type: str = "agent_activity") -> str:
         """Format a telemetry event for Server-Sent Events."""
@@ -177,23 +241,89 @@ class AgentActivityStream:
             "events": history,
         }
         return f"data: {json.dumps(payload)}\n\n"
-    
+
     def get_active_sessions(self) -> List[UUID]:
-        """Return list of session IDs that have active subscribers."""
-        with self._sync_lock:
-            return list(self._subscribers.keys())
-    
+        """Return list of session IDs that have active subscribers on this worker."""
+        return [session_id for session_id, shard in self._shards.items() if shard.subscribers]
+
     def publish_to_all_active_sessions(self, event: Dict[str, Any]) -> None:
         """Publish an event to all sessions with active subscribers."""
-        # Get a snapshot of active sessions to avoid holding lock during publish
-        with self._sync_lock:
-            active_sessions = list(self._subscribers.keys())
-        
-        if not active_sessions:
-            return
-        
-        # Publish to each session (publish() will acquire its own lock)
-        for session_id in active_sessions:
+        for session_id in self.get_active_sessions():
             self.publish(session_id, event)
 
 
+class PostgresActivityBackend(ActivityBackend):
+    """
+    Relays activity events between workers with Postgres LISTEN/NOTIFY.
+
+    Events are sent in order by a single sender task; events that originate
+    from this worker are ignored when they come back through the channel.
+    """
+
+    # NOTIFY payloads are limited to 8000 bytes
+    _MAX_PAYLOAD_BYTES = 7900
+
+    def __init__(self, dsn: str, channel: str = "agent_activity", outbox_size: int = 1000) -> None:
+        self._dsn = dsn
+        self._channel = channel
+        self._worker_id = str(uuid4())
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=max(1, outbox_size))
+        self._listen_conn = None
+        self._send_conn = None
+        self._sender_task: Optional[asyncio.Task] = None
+        self._deliver: Optional[Callable[[UUID, Dict[str, Any]], None]] = None
+
+    async def start(self, deliver: Callable[[UUID, Dict[str, Any]], None]) -> None:
+        import asyncpg
+
+        self._deliver = deliver
+        self._listen_conn = await asyncpg.connect(self._dsn)
+        self._send_conn = await asyncpg.connect(self._dsn)
+        await self._listen_conn.add_listener(self._channel, self._on_notification)
+        self._sender_task = asyncio.create_task(self._sender(), name="agent-activity-sender")
+        logger.info("✅ Agent activity stream relaying across workers via Postgres channel %s", self._channel)
+
+    def publish(self, session_id: UUID, event: Dict[str, Any]) -> None:
+        if self._sender_task is None:
+            return
+        payload = json.dumps(
+            {"origin": self._worker_id, "session_id": str(session_id), "event": event},
+            default=str,
+        )
+        if len(payload.encode("utf-8")) > self._MAX_PAYLOAD_BYTES:
+            logger.debug("Activity event for session %s too large to relay, delivered locally only", session_id)
+            return
+        try:
+            self._outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            increment_counter("agent_activity_overflow_total", labels={"outcome": "relay_dropped"})
+
+    async def _sender(self) -> None:
+        while True:
+            payload = await self._outbox.get()
+            try:
+                await self._send_conn.execute("SELECT pg_notify($1, $2)", self._channel, payload)
+            except Exception as exc:
+                logger.warning("Failed to relay activity event: %s", exc)
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            if message.get("origin") == self._worker_id or self._deliver is None:
+                return
+            self._deliver(UUID(message["session_id"]), message["event"])
+        except Exception as exc:  # pragma: no cover - safeguard
+            logger.warning("Invalid activity notification: %s", exc)
+
+    async def stop(self) -> None:
+        if self._sender_task:
+            self._sender_task.cancel()
+            self._sender_task = None
+        for conn in (self._listen_conn, self._send_conn):
+            if conn is not None:
+                try:
+                    await conn.close()
+                except Exception:  # pragma: no cover - safeguard
+                    pass
+        self._listen_conn = None
+        self._send_conn = None
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
+import itertools
 import logging
+import time
 from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 from uuid import UUID
 
+from app.core.metrics import increment_counter, observe_histogram
 from app.services.task_queue import TaskQueue, Task, TaskStatus
 
 if TYPE_CHECKING:
@@ -18,6 +22,12 @@ logger = logging.getLogger(__name__)
 ScheduledTask = Tuple[UUID, Task]
 PollerCallable = Callable[[], Awaitable[List[ScheduledTask]]]
 
+# Deadline heap entry: (due_at, seq, kind, key). Entries are invalidated lazily:
+# an entry is only acted upon if it still matches the currently registered deadline.
+_Deadline = Tuple[datetime, int, str, str]
+_AGENT = "agent"
+_TASK_TIMEOUT = "task_timeout"
+
 
 @dataclass
 class ScheduledAgent:
@@ -27,11 +37,25 @@ class ScheduledAgent:
     last_run: datetime = field(
         default_factory=lambda: datetime.fromtimestamp(0, tz=UTC)
     )
+    last_duration_seconds: float = 0.0
+    run_count: int = 0
+
+    def next_run_at(self) -> datetime:
+        return self.last_run + timedelta(seconds=self.interval_seconds)
 
 
 class AgentScheduler:
     """
-    Periodically polls registered agents to produce tasks for the queue.
+    Runs registered agents and task timeouts from a single deadline heap.
+
+    Agents declare their next run (by default `last_run + interval_seconds`,
+    or explicitly via `schedule_agent`) and tasks register timeouts (e.g. a
+    WAITING_USER task that should be re-presented). The scheduler sleeps
+    until the earliest deadline or until a new, earlier one is registered, so
+    an idle system does not wake up or scan sessions.
+
+    Computed deadlines are rounded up to `tick_seconds` slots (a coarse timer
+    wheel) so deadlines that are close together share a single wakeup.
     """
 
     def __init__(
@@ -40,14 +64,29 @@ class AgentScheduler:
         tick_seconds: int = 30,
         dispatcher: Optional["TaskDispatcher"] = None,
         agent_activity_stream: Optional["AgentActivityStream"] = None,
+        waiting_task_timeout_seconds: int = 300,
     ) -> None:
         self._task_queue = task_queue
-        self._tick = max(5, tick_seconds)
+        self._tick = max(1, tick_seconds)
+        self._waiting_timeout = timedelta(seconds=max(0, waiting_task_timeout_seconds))
         self._agents: Dict[str, ScheduledAgent] = {}
         self._running = False
         self._dispatcher: Optional["TaskDispatcher"] = dispatcher
         self._agent_activity_stream = agent_activity_stream
 
+        self._deadlines: List[_Deadline] = []
+        self._seq = itertools.count()
+        self._agent_due: Dict[str, datetime] = {}
+        # task_id -> (session_id, due_at)
+        self._task_timeouts: Dict[str, Tuple[UUID, datetime]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+        task_queue.add_status_listener(self._on_task_status)
+        # Tasks already waiting (e.g. restored from a durable store) get their timeout now
+        for session_id in task_queue.session_ids():
+            for task in task_queue.list_tasks_by_status(session_id, TaskStatus.WAITING_USER):
+                self._on_task_status(session_id, task)
+
     def register_agent(self, agent: ScheduledAgent) -> None:
         logger.info(
             "Registered scheduled agent %s (interval=%ss)",
@@ -55,124 +94,117 @@ class AgentScheduler:
             agent.interval_seconds,
         )
         self._agents[agent.name] = agent
+        self._set_agent_deadline(agent.name, self._align(agent.next_run_at()))
 
     def register_dispatcher(self, dispatcher: "TaskDispatcher") -> None:
         self._dispatcher = dispatcher
 
+    # ------------------------------------------------------------------
+    # Deadlines
+    # ------------------------------------------------------------------
+
+    def schedule_agent(self, name: str, at: Optional[datetime] = None) -> None:
+        """Declare the next run of an agent; `at=None` runs it as soon as possible."""
+        if name not in self._agents:
+            logger.warning("Cannot schedule unknown agent %s", name)
+            return
+        self._set_agent_deadline(name, at or datetime.now(UTC))
+
+    def register_task_timeout(self, session_id: UUID, task_id: str, due_at: datetime) -> None:
+        """Trigger a dispatch for the task's session at `due_at` unless cancelled first."""
+        due_at = self._align(due_at)
+        current = self._task_timeouts.get(task_id)
+        if current is not None and current[1] == due_at:
+            return
+        self._task_timeouts[task_id] = (session_id, due_at)
+        self._push(due_at, _TASK_TIMEOUT, task_id)
+
+    def cancel_task_timeout(self, task_id: str) -> None:
+        # The heap entry becomes stale and is discarded when it surfaces
+        self._task_timeouts.pop(task_id, None)
+
+    def next_deadline(self) -> Optional[datetime]:
+        while self._deadlines:
+            due_at, _, kind, key = self._deadlines[0]
+            if self._is_current(due_at, kind, key):
+                return due_at
+            heapq.heappop(self._deadlines)
+        return None
+
+    def _on_task_status(self, session_id: UUID, task: Task) -> None:
+        if task.status == TaskStatus.WAITING_USER:
+            self.register_task_timeout(session_id, task.id, task.created_at + self._waiting_timeout)
+        elif task.id in self._task_timeouts:
+            self.cancel_task_timeout(task.id)
+
+    def _set_agent_deadline(self, name: str, due_at: datetime) -> None:
+        self._agent_due[name] = due_at
+        self._push(due_at, _AGENT, name)
+
+    def _push(self, due_at: datetime, kind: str, key: str) -> None:
+        entry = (due_at, next(self._seq), kind, key)
+        heapq.heappush(self._deadlines, entry)
+        # Only an earlier deadline than the one being slept on requires waking the loop
+        if self._wakeup is not None and self._deadlines[0] is entry:
+            self._wakeup.set()
+
+    def _is_current(self, due_at: datetime, kind: str, key: str) -> bool:
+        if kind == _AGENT:
+            return key in self._agents and self._agent_due.get(key) == due_at
+        current = self._task_timeouts.get(key)
+        return current is not None and current[1] == due_at
+
+    def _align(self, due_at: datetime) -> datetime:
+        timestamp = due_at.timestamp()
+        slot = -(-timestamp // self._tick) * self._tick
+        return datetime.fromtimestamp(slot, tz=UTC)
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
     async def run_forever(self) -> None:
         if self._running:
             return
 
         self._running = True
+        self._wakeup = asyncio.Event()
         try:
             while True:
                 await self._poll_agents()
-                await asyncio.sleep(self._tick)
+                self._wakeup.clear()
+                next_due = self.next_deadline()
+                timeout = None
+                if next_due is not None:
+                    timeout = max(0.0, (next_due - datetime.now(UTC)).total_seconds())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
         finally:
             self._running = False
+            self._wakeup = None
 
     async def _poll_agents(self) -> None:
-        if not self._agents:
-            return
-
+        """Run every agent and task timeout whose deadline has passed."""
         now = datetime.now(UTC)
         sessions_to_dispatch: Set[UUID] = set()
+        due_agents: List[ScheduledAgent] = []
 
-        for agent in self._agents.values():
-            due = agent.last_run + timedelta(seconds=agent.interval_seconds)
-            if now < due:
-                continue
-
-            logger.debug("Polling scheduled agent %s", agent.name)
-            
-            # DON'T publish activity event for polling - only publish when tasks are actually found
-            # This prevents the integrity agent from appearing active when there are no contradictions
-            
-            try:
-                tasks = await agent.poller()
-                
-                # Only publish activity event if tasks are actually found
-                # This ensures the integrity agent only appears active when there are real contradictions to process
-                if self._agent_activity_stream and tasks:
-                    logger.info(f"📋 Found {len(tasks)} tasks from {agent.name}, publishing activity events")
-                    self._publish_activity(
-                        agent_id="background_integrity_agent",
-                        agent_name="Background Integrity Agent",
-                        status="started",
-                        message=f"Found {len(tasks)} pending contradiction(s)",
-                    )
-                elif tasks:
-                    logger.debug(f"Found {len(tasks)} tasks from {agent.name}, but no activity stream available")
-                else:
-                    logger.debug(f"No tasks found from {agent.name}, skipping activity events")
-            except Exception as exc:  # pragma: no cover - safeguard
-                logger.warning(
-                    "Scheduled agent %s failed during poll: %s",
-                    agent.name,
-                    exc,
-                    exc_info=True,
-                )
-                if self._agent_activity_stream:
-                    self._publish_activity(
-                        agent_id="task_scheduler",
-                        agent_name="Task Scheduler",
-                        status="error",
-                        message=f"Error polling {agent.name}: {exc}",
-                    )
-                agent.last_run = now
+        while self._deadlines and self._deadlines[0][0] <= now:
+            due_at, _, kind, key = heapq.heappop(self._deadlines)
+            if not self._is_current(due_at, kind, key):
                 continue
+            if kind == _AGENT:
+                self._agent_due.pop(key, None)
+                due_agents.append(self._agents[key])
+            else:
+                session_id, _ = self._task_timeouts.pop(key)
+                if self._handle_task_timeout(session_id, key, now):
+                    sessions_to_dispatch.add(session_id)
 
-            for session_id, task in tasks:
-                self._task_queue.enqueue(session_id, task)
-                logger.info(
-                    "Agent %s enqueued task %s for session %s (task_id=%s)",
-                    agent.name,
-                    task.type,
-                    session_id,
-                    task.id,
-                )
-                sessions_to_dispatch.add(session_id)
-                
-                # Publish activity event for specific session
-                if self._agent_activity_stream:
-                    self._publish_activity_for_session(
-                        session_id,
-                        agent_id="background_integrity_agent",
-                        agent_name="Background Integrity Agent",
-                        status="started",
-                        message=f"Enqueued {task.type} task",
-                    )
-
-            # Publish completion event ONLY if tasks were found
-            # This prevents the integrity agent from appearing active when there are no contradictions
-            if self._agent_activity_stream and tasks:
-                self._publish_activity(
-                    agent_id="background_integrity_agent",
-                    agent_name="Background Integrity Agent",
-                    status="completed",
-                    message=f"Processed {len(tasks)} contradiction(s)",
-                )
-                # NOTE: task_scheduler events are now suppressed in _publish_activity
-                # to prevent the scheduler from appearing active when idle
-            # If no tasks found, don't publish any events - the agent should appear idle
-
-            agent.last_run = now
-
-        # Also check for old waiting_user tasks that need to be re-processed
-        if self._dispatcher:
-            for session_id, tasks in self._task_queue._tasks.items():
-                for task in tasks.values():
-                    if task.status == TaskStatus.WAITING_USER:
-                        age = now - task.created_at
-                        if age > timedelta(minutes=5):
-                            logger.info(
-                                "🔄 Scheduler: found old waiting task %s (age=%s) for session %s, triggering dispatcher",
-                                task.id,
-                                age,
-                                session_id,
-                            )
-                            sessions_to_dispatch.add(session_id)
-                            break  # Only trigger once per session
+        for agent in due_agents:
+            sessions_to_dispatch.update(await self._run_agent(agent, now))
 
         if self._dispatcher and sessions_to_dispatch:
             for session_id in sessions_to_dispatch:
@@ -185,7 +217,114 @@ class AgentScheduler:
                         exc,
                         exc_info=True,
                     )
-    
+
+    def _handle_task_timeout(self, session_id: UUID, task_id: str, now: datetime) -> bool:
+        task = self._task_queue.get_task(session_id, task_id)
+        if task is None or task.status != TaskStatus.WAITING_USER:
+            return False
+        # Still waiting: check again after another timeout period
+        self.register_task_timeout(session_id, task_id, now + self._waiting_timeout)
+        if not self._dispatcher:
+            return False
+        logger.info(
+            "🔄 Scheduler: waiting task %s timed out (age=%s) for session %s, triggering dispatcher",
+            task.id,
+            now - task.created_at,
+            session_id,
+        )
+        return True
+
+    async def _run_agent(self, agent: ScheduledAgent, now: datetime) -> Set[UUID]:
+        sessions_to_dispatch: Set[UUID] = set()
+        logger.debug("Polling scheduled agent %s", agent.name)
+
+        # DON'T publish activity event for polling - only publish when tasks are actually found
+        # This prevents the integrity agent from appearing active when there are no contradictions
+
+        started = time.perf_counter()
+        try:
+            tasks = await agent.poller()
+        except Exception as exc:  # pragma: no cover - safeguard
+            self._record_run(agent, now, started, outcome="error")
+            logger.warning(
+                "Scheduled agent %s failed during poll: %s",
+                agent.name,
+                exc,
+                exc_info=True,
+            )
+            if self._agent_activity_stream:
+                self._publish_activity(
+                    agent_id="task_scheduler",
+                    agent_name="Task Scheduler",
+                    status="error",
+                    message=f"Error polling {agent.name}: {exc}",
+                )
+            return sessions_to_dispatch
+        self._record_run(agent, now, started, outcome="tasks" if tasks else "idle")
+
+        # Only publish activity event if tasks are actually found
+        # This ensures the integrity agent only appears active when there are real contradictions to process
+        if self._agent_activity_stream and tasks:
+            logger.info(f"📋 Found {len(tasks)} tasks from {agent.name}, publishing activity events")
+            self._publish_activity(
+                agent_id="background_integrity_agent",
+                agent_name="Background Integrity Agent",
+                status="started",
+                message=f"Found {len(tasks)} pending contradiction(s)",
+            )
+        elif tasks:
+            logger.debug(f"Found {len(tasks)} tasks from {agent.name}, but no activity stream available")
+        else:
+            logger.debug(f"No tasks found from {agent.name}, skipping activity events")
+
+        for session_id, task in tasks:
+            self._task_queue.enqueue(session_id, task)
+            logger.info(
+                "Agent %s enqueued task %s for session %s (task_id=%s)",
+                agent.name,
+                task.type,
+                session_id,
+                task.id,
+            )
+            sessions_to_dispatch.add(session_id)
+
+            # Publish activity event for specific session
+            if self._agent_activity_stream:
+                self._publish_activity_for_session(
+                    session_id,
+                    agent_id="background_integrity_agent",
+                    agent_name="Background Integrity Agent",
+                    status="started",
+                    message=f"Enqueued {task.type} task",
+                )
+
+        # Publish completion event ONLY if tasks were found
+        # This prevents the integrity agent from appearing active when there are no contradictions
+        if self._agent_activity_stream and tasks:
+            self._publish_activity(
+                agent_id="background_integrity_agent",
+                agent_name="Background Integrity Agent",
+                status="completed",
+                message=f"Processed {len(tasks)} contradiction(s)",
+            )
+            # NOTE: task_scheduler events are now suppressed in _publish_activity
+            # to prevent the scheduler from appearing active when idle
+        # If no tasks found, don't publish any events - the agent should appear idle
+
+        return sessions_to_dispatch
+
+    def _record_run(self, agent: ScheduledAgent, now: datetime, started: float, *, outcome: str) -> None:
+        duration = time.perf_counter() - started
+        agent.last_run = now
+        agent.last_duration_seconds = duration
+        agent.run_count += 1
+        observe_histogram("agent_scheduler_run_duration_seconds", duration, {"agent": agent.name})
+        increment_counter("agent_scheduler_runs_total", labels={"agent": agent.name, "outcome": outcome})
+
+        # Keep an explicitly declared earlier run (schedule_agent during the poll), otherwise use the interval
+        if agent.name not in self._agent_due:
+            self._set_agent_deadline(agent.name, self._align(agent.next_run_at()))
+
     def _publish_activity(
         self,
         *,
@@ -219,7 +358,7 @@ class AgentScheduler:
         
         # Get active sessions before publishing
         active_sessions = self._agent_activity_stream.get_active_sessions()
-        logger.info(
+        logger.debug(
             "📡 Publishing activity event for %s (%s) to %d active session(s)",
             agent_id,
             status,
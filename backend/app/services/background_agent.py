@@ -169,18 +169,11 @@ async def fetch_pending_contradiction_tasks(
     """
     results: List[Tuple[UUID, Task]] = []
     
-    # Clear completed tasks for all sessions to avoid stale tasks blocking new ones
-    # This ensures we only check for active tasks (QUEUED, IN_PROGRESS, WAITING_USER)
-    total_before = sum(len(tasks) for tasks in task_queue._tasks.values())
-    for session_id in list(task_queue._tasks.keys()):
-        task_queue.clear_completed(session_id)
-    total_after = sum(len(tasks) for tasks in task_queue._tasks.values())
-    if total_before > 0:
-        logger.debug(
-            "🧹 Cleared completed tasks: %d total before, %d total after",
-            total_before,
-            total_after,
-        )
+    # Apply the finished-task retention policy (completed tasks never block new ones:
+    # lookups below only consider QUEUED, IN_PROGRESS and WAITING_USER)
+    pruned = task_queue.prune_finished()
+    if pruned:
+        logger.debug("🧹 Pruned %d finished tasks from the task queue", pruned)
 
     async with AsyncSessionLocal() as db_session:
         service = NotificationService(db_session)
@@ -212,16 +205,14 @@ async def fetch_pending_contradiction_tasks(
 
             # Check if there's already an active task for this contradiction
             # First, log the state of the queue for this session
-            session_tasks = task_queue._tasks.get(session_uuid, {})
-            active_tasks = [
-                t for t in session_tasks.values()
-                if t.status in [TaskStatus.QUEUED, TaskStatus.IN_PROGRESS, TaskStatus.WAITING_USER]
-            ]
             logger.info(
                 "🔍 Checking session %s: %d total tasks, %d active tasks",
                 session_uuid,
-                len(session_tasks),
-                len(active_tasks),
+                task_queue.count_tasks(session_uuid),
+                task_queue.count_tasks(
+                    session_uuid,
+                    statuses=[TaskStatus.QUEUED, TaskStatus.IN_PROGRESS, TaskStatus.WAITING_USER],
+                ),
             )
             
             existing_task = task_queue.find_task_by_type(
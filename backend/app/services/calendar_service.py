@@ -1,5 +1,9 @@
+import asyncio
+import logging
 import os
-from typing import List, Dict, Any, Optional, Sequence
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime, timezone, timedelta
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
@@ -24,6 +28,40 @@ from app.services.exceptions import IntegrationAuthError
 # include_granted_scopes=true (prevents warnings from becoming exceptions)
 os.environ.setdefault("OAUTHLIB_RELAX_TOKEN_SCOPE", "1")
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _GoogleEventCache:
+    """Formatted events of one Google calendar, kept in sync with syncToken."""
+
+    events: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    sync_token: Optional[str] = None
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
+    last_sync: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def covers(self, start_time: datetime, end_time: datetime) -> bool:
+        return (
+            self.window_start is not None
+            and self.window_end is not None
+            and self.window_start <= start_time
+            and end_time <= self.window_end
+        )
+
+
+# Shared by every CalendarService instance (tool manager, watcher, API), keyed by
+# (integration_id, calendar_id), so all readers hit the same synced copy.
+_google_event_caches: Dict[Tuple[str, str], _GoogleEventCache] = {}
+
+
+def invalidate_google_event_cache(integration_id: Optional[str] = None) -> None:
+    """Drop cached events (all integrations when integration_id is None)."""
+    for key in list(_google_event_caches.keys()):
+        if integration_id is None or key[0] == str(integration_id or "default"):
+            _google_event_caches.pop(key, None)
+
 
 class CalendarService:
     """Service for managing calendar integrations (Google, Apple, Microsoft)"""
@@ -98,17 +136,20 @@ class CalendarService:
         except Exception as exc:
             raise IntegrationAuthError("google_calendar", "invalid_credentials", str(exc)) from exc
         
+        loop = asyncio.get_running_loop()
         try:
             if creds.expired:
                 if creds.refresh_token:
-                    creds.refresh(Request())
+                    await loop.run_in_executor(None, creds.refresh, Request())
                 else:
                     raise IntegrationAuthError("google_calendar", "refresh_token_missing")
         except RefreshError as exc:
             raise IntegrationAuthError("google_calendar", "token_refresh_failed", str(exc)) from exc
         
         try:
-            service = build("calendar", "v3", credentials=creds)
+            service = await loop.run_in_executor(
+                None, lambda: build("calendar", "v3", credentials=creds, cache_discovery=False)
+            )
         except HttpError as exc:
             raise IntegrationAuthError("google_calendar", "api_unavailable", str(exc)) from exc
         
@@ -122,8 +163,16 @@ class CalendarService:
         max_results: int = 50,
         integration_id: Optional[str] = None,
         calendar_id: str = "primary",
+        use_cache: bool = True,
     ) -> List[Dict[str, Any]]:
-        """Get events from Google Calendar"""
+        """
+        Get events from Google Calendar.
+
+        Queries inside the cached window are answered from the per-integration
+        event cache, which is refreshed with an incremental syncToken request
+        once it is older than `calendar_cache_ttl_seconds`. Other windows are
+        fetched directly. All Google API I/O runs in the default executor.
+        """
         service_key = self._get_service_key("google", integration_id)
         service = self._services.get(service_key)
         
@@ -143,28 +192,27 @@ class CalendarService:
             end_time = end_time.replace(tzinfo=timezone.utc)
         
         try:
-            events_result = (
-                service.events()
-                .list(
-                    calendarId=calendar_id,
-                    timeMin=start_time.isoformat(),
-                    timeMax=end_time.isoformat(),
-                    maxResults=max_results,
-                    singleEvents=True,
-                    orderBy="startTime",
+            if use_cache and settings.calendar_cache_enabled:
+                cache = _google_event_caches.setdefault(
+                    (str(integration_id or "default"), calendar_id), _GoogleEventCache()
                 )
-                .execute()
+                async with cache.lock:
+                    await self._refresh_google_cache(service, cache, calendar_id)
+                    if cache.covers(start_time, end_time):
+                        return self._select_cached_events(cache, start_time, end_time, max_results)
+
+            items = await self._list_google_events(
+                service,
+                calendarId=calendar_id,
+                timeMin=start_time.isoformat(),
+                timeMax=end_time.isoformat(),
+                maxResults=max_results,
+                singleEvents=True,
+                orderBy="startTime",
             )
             
-            items = events_result.get("items", [])
-            
             # Format events for easier consumption
-            formatted_events = []
-            for event in items:
-                formatted = self._format_google_event(event)
-                formatted_events.append(formatted)
-            
-            return formatted_events
+            return [self._format_google_event(event) for event in items[:max_results]]
         except HttpError as exc:
             if exc.resp.status in (401, 403):
                 raise IntegrationAuthError("google_calendar", "unauthorized", str(exc)) from exc
@@ -173,6 +221,99 @@ class CalendarService:
             raise
         except Exception as e:
             raise ValueError(f"Error fetching Google Calendar events: {str(e)}")
+
+    async def _list_google_events(self, service: Any, *, paginate: bool = False, **params: Any) -> List[Dict[str, Any]]:
+        """Run events().list in the executor; returns items (and follows pages if requested)."""
+        items, _ = await self._list_google_events_with_token(service, paginate=paginate, **params)
+        return items
+
+    async def _list_google_events_with_token(
+        self, service: Any, *, paginate: bool = True, **params: Any
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        loop = asyncio.get_running_loop()
+        items: List[Dict[str, Any]] = []
+        page_token: Optional[str] = None
+        while True:
+            request = service.events().list(pageToken=page_token, **params)
+            response = await loop.run_in_executor(None, request.execute)
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not paginate or not page_token:
+                return items, response.get("nextSyncToken")
+
+    async def _refresh_google_cache(self, service: Any, cache: _GoogleEventCache, calendar_id: str) -> None:
+        """Bring the cache up to date: full windowed sync when needed, otherwise incremental."""
+        now = datetime.now(timezone.utc)
+        min_horizon = timedelta(days=7)
+        window_valid = cache.covers(now, now + min_horizon)
+        if window_valid and time.monotonic() - cache.last_sync < settings.calendar_cache_ttl_seconds:
+            return
+
+        if window_valid and cache.sync_token:
+            try:
+                changed, next_token = await self._list_google_events_with_token(
+                    service,
+                    calendarId=calendar_id,
+                    syncToken=cache.sync_token,
+                    singleEvents=True,
+                    showDeleted=True,
+                    maxResults=250,
+                )
+                for event in changed:
+                    if event.get("status") == "cancelled":
+                        cache.events.pop(event.get("id"), None)
+                    else:
+                        cache.events[event.get("id")] = self._format_google_event(event)
+                cache.sync_token = next_token or cache.sync_token
+                cache.last_sync = time.monotonic()
+                if changed:
+                    logger.debug("📅 Incremental calendar sync: %d changed event(s)", len(changed))
+                return
+            except HttpError as exc:
+                # 410 Gone: the sync token expired, fall back to a full sync
+                if exc.resp.status != 410:
+                    raise
+                logger.info("📅 Calendar sync token expired, running full sync")
+
+        window_start = now - timedelta(days=1)
+        window_end = now + timedelta(days=max(7, settings.calendar_cache_horizon_days))
+        items, next_token = await self._list_google_events_with_token(
+            service,
+            calendarId=calendar_id,
+            timeMin=window_start.isoformat(),
+            timeMax=window_end.isoformat(),
+            singleEvents=True,
+            maxResults=250,
+        )
+        cache.events = {
+            event.get("id"): self._format_google_event(event)
+            for event in items
+            if event.get("status") != "cancelled"
+        }
+        cache.sync_token = next_token
+        cache.window_start = window_start
+        cache.window_end = window_end
+        cache.last_sync = time.monotonic()
+        logger.debug("📅 Full calendar sync: %d event(s) cached", len(cache.events))
+
+    @staticmethod
+    def _select_cached_events(
+        cache: _GoogleEventCache,
+        start_time: datetime,
+        end_time: datetime,
+        max_results: int,
+    ) -> List[Dict[str, Any]]:
+        selected = []
+        for event in cache.events.values():
+            event_start = event.get("start_datetime")
+            event_end = event.get("end_datetime") or event_start
+            if event_start is None:
+                continue
+            # Same semantics as timeMin/timeMax: any overlap with the window
+            if event_end > start_time and event_start < end_time:
+                selected.append(event)
+        selected.sort(key=lambda event: event["start_datetime"])
+        return [dict(event) for event in selected[:max_results]]
     
     def _format_google_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Format Google Calendar event to a more readable format"""
@@ -2,6 +2,7 @@
 Cloud Storage Service for persistent file storage on Cloud Run.
 Uses Google Cloud Storage instead of ephemeral filesystem.
 """
+import asyncio
 import logging
 from pathlib import Path
 from typing import Optional
@@ -91,8 +92,12 @@ async def upload_file_to_cloud_storage(
         if content_type:
             blob.content_type = content_type
         
-        # Upload file content
-        blob.upload_from_string(file_content, content_type=content_type)
+        # Upload file content (blocking client call, keep it off the event loop)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: blob.upload_from_string(file_content, content_type=content_type),
+        )
         
         # Return GCS path
         gcs_path = f"gs://{bucket_name}/{blob_path}"
@@ -104,6 +109,49 @@ async def upload_file_to_cloud_storage(
         return None
 
 
+async def upload_path_to_cloud_storage(
+    local_path: Path,
+    user_id: UUID,
+    file_id: UUID,
+    filename: str,
+    content_type: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Upload a file from local disk to Cloud Storage with a chunked resumable upload.
+    The upload runs in a worker thread and streams from disk, so the file is never
+    loaded in memory. Returns the Cloud Storage path (gs://bucket/path) if successful.
+    """
+    client, bucket_name = _get_storage_client()
+    
+    if not client or not bucket_name:
+        logger.warning("⚠️  Cloud Storage not available, falling back to filesystem")
+        return None
+    
+    try:
+        bucket = client.bucket(bucket_name)
+        blob_path = _get_blob_path(user_id, file_id, filename)
+        # Setting chunk_size makes the client use a resumable upload in chunks
+        chunk_size = max(1, settings.cloud_storage_upload_chunk_size // (256 * 1024)) * 256 * 1024
+        blob = bucket.blob(blob_path, chunk_size=chunk_size)
+        
+        if content_type:
+            blob.content_type = content_type
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: blob.upload_from_filename(str(local_path), content_type=content_type),
+        )
+        
+        gcs_path = f"gs://{bucket_name}/{blob_path}"
+        logger.info(f"✅ File uploaded to Cloud Storage: {gcs_path}")
+        return gcs_path
+        
+    except Exception as e:
+        logger.error(f"❌ Error uploading file to Cloud Storage: {e}", exc_info=True)
+        return None
+
+
 async def download_file_from_cloud_storage(
     gcs_path: str,
 ) -> Optional[bytes]:
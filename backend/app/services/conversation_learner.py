@@ -12,6 +12,7 @@ import numpy as np
 from app.core.memory_manager import MemoryManager
 from app.core.ollama_client import OllamaClient
 from app.core.dependencies import get_ollama_client
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
@@ -83,14 +84,15 @@ Formato JSON:
 
 Se non ci sono conoscenze importanti da estrarre, restituisci {{"knowledge": []}}."""
 
-            response = await self.ollama_client.generate_with_context(
-                prompt=extraction_prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=extraction_prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             # Parse response (try to extract JSON)
             knowledge_items = self._parse_extraction_response(response)
@@ -10,6 +10,7 @@ import logging
 from app.core.memory_manager import MemoryManager
 from app.core.ollama_client import OllamaClient
 from app.core.dependencies import get_ollama_client
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
@@ -85,14 +86,15 @@ Conversazione:
 
 Riassunto (massimo 500 parole, mantieni tutti i dettagli importanti):"""
 
-            response = await self.ollama_client.generate_with_context(
-                prompt=summary_prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=summary_prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             return response.strip()
             
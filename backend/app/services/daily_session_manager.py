@@ -16,6 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.database import Session as SessionModel, User, Message as MessageModel
 from app.core.memory_manager import MemoryManager
 from app.core.ollama_client import OllamaClient
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
@@ -229,14 +230,15 @@ Crea un riassunto strutturato in italiano che includa:
 Riassunto:"""
         
         try:
-            summary_response = await self.ollama_client.generate_with_context(
-                prompt=summary_prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                summary_response = await self.ollama_client.generate_with_context(
+                    prompt=summary_prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             summary_text = summary_response if isinstance(summary_response, str) else str(summary_response)
             
@@ -3,12 +3,54 @@ Email Analyzer Service - Analyzes emails using LLM to detect actions and categor
 """
 import logging
 import json
-from typing import Dict, Any, Optional
+import re
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
 from app.core.ollama_client import OllamaClient
 from app.core.dependencies import get_ollama_client
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
+_VALID_CATEGORIES = ["direct", "mailing_list", "promotional", "update", "social", "unknown"]
+
+# Senders that never expect a reply
+_NO_REPLY_SENDER = re.compile(
+    r"(no-?reply|do-?not-?reply|newsletter|notifications?|mailer-daemon|marketing|news)@",
+    re.IGNORECASE,
+)
+_URGENT_KEYWORDS = ("urgent", "urgente", "asap", "immediate", "immediato", "important", "importante")
+
+# Analyses keyed by (integration id, Gmail message id): messages are immutable, so
+# entries never go stale, but message ids are only unique within one mailbox.
+# Emails analyzed without an integration id are not cached.
+_analysis_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+
+def _cache_key(integration_id: Optional[str], email_id: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not integration_id or not email_id:
+        return None
+    return (str(integration_id), str(email_id))
+
+
+def _get_cached_analysis(integration_id: Optional[str], email_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    key = _cache_key(integration_id, email_id)
+    if key is None or key not in _analysis_cache:
+        return None
+    _analysis_cache.move_to_end(key)
+    return dict(_analysis_cache[key])
+
+
+def _store_cached_analysis(integration_id: Optional[str], email_id: Optional[str], analysis: Dict[str, Any]) -> None:
+    key = _cache_key(integration_id, email_id)
+    if key is None or analysis.get("error"):
+        return
+    _analysis_cache[key] = dict(analysis)
+    _analysis_cache.move_to_end(key)
+    while len(_analysis_cache) > max(1, settings.email_analysis_cache_size):
+        _analysis_cache.popitem(last=False)
+
 
 class EmailAnalyzer:
     """Analyzes emails to detect required actions and categorize them"""
@@ -20,6 +62,7 @@ class EmailAnalyzer:
     async def analyze_email(
         self,
         email: Dict[str, Any],
+        integration_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Analyze email and return:
@@ -31,10 +74,21 @@ class EmailAnalyzer:
         
         Args:
             email: Email dict with keys: id, subject, from, to, snippet, body (optional), category (optional)
+            integration_id: Mailbox the email comes from (analyses are cached per mailbox)
             
         Returns:
             Analysis dict with category, requires_action, action_type, action_summary, urgency
         """
+        email_id = email.get("id")
+        cached = _get_cached_analysis(integration_id, email_id)
+        if cached is not None:
+            return cached
+
+        prefiltered = self._preclassify(email)
+        if prefiltered is not None:
+            _store_cached_analysis(integration_id, email_id, prefiltered)
+            return prefiltered
+
         # First, use Gmail category if available
         gmail_category = email.get("category", "unknown")
         
@@ -50,7 +104,7 @@ class EmailAnalyzer:
         # Always analyze for actions using LLM
         action_analysis = await self._analyze_actions_with_llm(email, category)
         
-        return {
+        analysis = {
             "category": category,
             "requires_action": action_analysis.get("requires_action", False),
             "action_type": action_analysis.get("action_type"),
@@ -58,6 +112,171 @@ class EmailAnalyzer:
             "urgency": action_analysis.get("urgency", "medium"),
             "reasoning": action_analysis.get("reasoning", ""),
         }
+        if not action_analysis.get("error"):
+            _store_cached_analysis(integration_id, email_id, analysis)
+        return analysis
+
+    async def analyze_emails(
+        self,
+        emails: List[Dict[str, Any]],
+        integration_id: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Triage several emails at once. Returns analyses keyed by email id.
+
+        Cached and rule-classified emails never reach the LLM; the rest are
+        classified `email_analysis_batch_size` at a time with one JSON-array
+        prompt. Emails missing from a batch response fall back to analyze_email.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[Dict[str, Any]] = []
+        for email in emails:
+            email_id = email.get("id")
+            if not email_id or email_id in results:
+                continue
+            cached = _get_cached_analysis(integration_id, email_id)
+            if cached is not None:
+                results[email_id] = cached
+                continue
+            prefiltered = self._preclassify(email)
+            if prefiltered is not None:
+                _store_cached_analysis(integration_id, email_id, prefiltered)
+                results[email_id] = prefiltered
+                continue
+            pending.append(email)
+
+        if pending:
+            logger.info(
+                f"📧 Email triage: {len(emails)} email, {len(emails) - len(pending)} da cache/regole, "
+                f"{len(pending)} all'LLM"
+            )
+
+        batch_size = max(1, settings.email_analysis_batch_size)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            batch_results = await self._analyze_batch_with_llm(batch) if len(batch) > 1 else {}
+            for email in batch:
+                email_id = email["id"]
+                analysis = batch_results.get(email_id)
+                if analysis is None:
+                    analysis = await self.analyze_email(email, integration_id=integration_id)
+                else:
+                    _store_cached_analysis(integration_id, email_id, analysis)
+                results[email_id] = analysis
+        return results
+
+    def _preclassify(self, email: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Cheap rule-based triage for obvious bulk mail. Returns an analysis
+        (no action, low urgency) or None when the email needs the LLM.
+        """
+        if not settings.email_analysis_prefilter_enabled:
+            return None
+
+        subject = (email.get("subject") or "").lower()
+        labels = email.get("labels") or []
+        if "IMPORTANT" in labels or "STARRED" in labels:
+            return None
+        if any(keyword in subject for keyword in _URGENT_KEYWORDS):
+            return None
+
+        category = email.get("category", "unknown")
+        bulk = bool(email.get("bulk"))
+        no_reply = bool(_NO_REPLY_SENDER.search(email.get("from") or ""))
+
+        if category in ("promotional", "social"):
+            reason = f"Gmail category '{category}'"
+        elif category in ("mailing_list", "update") and (bulk or no_reply):
+            reason = f"Gmail category '{category}' from a bulk/no-reply sender"
+        elif category == "unknown" and bulk and no_reply:
+            category = "mailing_list"
+            reason = "Bulk headers from a no-reply sender"
+        else:
+            return None
+
+        return {
+            "category": category,
+            "requires_action": False,
+            "action_type": None,
+            "action_summary": "",
+            "urgency": "low",
+            "reasoning": f"Pre-classified without LLM: {reason}",
+            "prefiltered": True,
+        }
+
+    async def _analyze_batch_with_llm(self, emails: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Classify several emails with one LLM call (JSON array answer)."""
+        blocks = []
+        for index, email in enumerate(emails, 1):
+            blocks.append(
+                f"""[{index}]
+Mittente: {email.get('from', 'Unknown')}
+Oggetto: {email.get('subject', 'No Subject')}
+Tipo email (Gmail): {email.get('category', 'unknown')}
+Contenuto: {email.get('snippet', email.get('body', ''))[:600]}"""
+            )
+        emails_text = "\n\n".join(blocks)
+
+        prompt = f"""Analizza queste {len(emails)} email e, per ciascuna, determina tipo, azione richiesta e urgenza.
+
+{emails_text}
+
+Per ogni email:
+- "category": "direct" | "mailing_list" | "promotional" | "update" | "social" | "unknown" (se il tipo Gmail è noto, usalo)
+- "requires_action": true/false
+- "action_type": "reply" | "calendar_event" | "task" | "info" | null
+- "action_summary": breve descrizione dell'azione richiesta ("" se nessuna)
+- "urgency": "high" (richieste urgenti, scadenze imminenti) | "medium" (richieste normali) | "low" (informative)
+- "reasoning": breve spiegazione
+
+Rispondi SOLO con un array JSON valido, un oggetto per email, nello stesso ordine, con "index" uguale al numero tra parentesi quadre:
+[
+  {{"index": 1, "category": "direct", "requires_action": true, "action_type": "reply", "action_summary": "...", "urgency": "medium", "reasoning": "..."}}
+]"""
+
+        try:
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
+        except Exception as e:
+            logger.warning(f"Error in batched email triage, falling back to single analysis: {e}")
+            return {}
+
+        text = response if isinstance(response, str) else str(response)
+        start_idx = text.find("[")
+        end_idx = text.rfind("]")
+        if start_idx == -1 or end_idx <= start_idx:
+            logger.warning("Batched email triage returned no JSON array, falling back to single analysis")
+            return {}
+        try:
+            entries = json.loads(text[start_idx:end_idx + 1])
+        except json.JSONDecodeError:
+            logger.warning("Batched email triage returned invalid JSON, falling back to single analysis")
+            return {}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get("index"))
+            except (TypeError, ValueError):
+                continue
+            if not 1 <= index <= len(emails):
+                continue
+            email = emails[index - 1]
+            gmail_category = email.get("category", "unknown")
+            category = gmail_category if gmail_category != "unknown" else str(entry.get("category", "unknown")).lower()
+            if category not in _VALID_CATEGORIES:
+                category = "unknown"
+            results[email["id"]] = {"category": category, **self._normalize_action_analysis(entry)}
+        return results
     
     async def _analyze_category_with_llm(self, email: Dict[str, Any]) -> str:
         """Use LLM to determine email category if Gmail labels not available"""
@@ -78,19 +297,19 @@ Determina se è:
 Rispondi solo con una delle parole chiave sopra."""
         
         try:
-            response = await self.ollama_client.generate_with_context(
-                prompt=prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             # Extract category from response
             response_lower = response.lower().strip()
-            valid_categories = ["direct", "mailing_list", "promotional", "update", "social", "unknown"]
-            for cat in valid_categories:
+            for cat in _VALID_CATEGORIES:
                 if cat in response_lower:
                     return cat
             
@@ -153,14 +372,15 @@ Se non c'è azione richiesta, usa:
 }}"""
         
         try:
-            response = await self.ollama_client.generate_with_context(
-                prompt=prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             # Try to parse JSON from response
             analysis = self._parse_llm_response(response)
@@ -174,25 +394,10 @@ Se non c'è azione richiesta, usa:
                     "action_summary": "",
                     "urgency": "low",
                     "reasoning": "Error parsing LLM response",
+                    "error": True,
                 }
             
-            # Normalize action_type
-            action_type = analysis.get("action_type")
-            if action_type == "null" or action_type is None:
-                action_type = None
-            
-            # Normalize urgency
-            urgency = analysis.get("urgency", "medium").lower()
-            if urgency not in ["high", "medium", "low"]:
-                urgency = "medium"
-            
-            return {
-                "requires_action": analysis.get("requires_action", False),
-                "action_type": action_type,
-                "action_summary": analysis.get("action_summary", ""),
-                "urgency": urgency,
-                "reasoning": analysis.get("reasoning", ""),
-            }
+            return self._normalize_action_analysis(analysis)
         except Exception as e:
             logger.error(f"Error analyzing email actions with LLM: {e}", exc_info=True)
             return {
@@ -201,7 +406,29 @@ Se non c'è azione richiesta, usa:
                 "action_summary": "",
                 "urgency": "low",
                 "reasoning": f"Error during analysis: {str(e)}",
+                "error": True,
             }
+
+    @staticmethod
+    def _normalize_action_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize action fields returned by the LLM"""
+        # Normalize action_type
+        action_type = analysis.get("action_type")
+        if action_type == "null" or action_type is None:
+            action_type = None
+        
+        # Normalize urgency
+        urgency = str(analysis.get("urgency") or "medium").lower()
+        if urgency not in ["high", "medium", "low"]:
+            urgency = "medium"
+        
+        return {
+            "requires_action": analysis.get("requires_action", False),
+            "action_type": action_type,
+            "action_summary": analysis.get("action_summary", ""),
+            "urgency": urgency,
+            "reasoning": analysis.get("reasoning", ""),
+        }
     
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse JSON from LLM response, handling various formats"""
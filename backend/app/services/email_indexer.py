@@ -1,15 +1,19 @@
 """
 Email Indexer Service - Indexes important emails into long-term memory
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from datetime import datetime, timezone
 import logging
 
+from app.core.config import settings
 from app.core.memory_manager import MemoryManager
 from app.core.ollama_client import OllamaClient
 from app.core.dependencies import get_ollama_client
+from app.models.database import IndexedEmail, MemoryLong, Session as SessionModel
 
 logger = logging.getLogger(__name__)
 
@@ -80,15 +84,13 @@ class EmailIndexer:
             
             # Get tenant_id from session if not provided
             if not tenant_id:
-                from app.models.database import Session as SessionModel
-                from sqlalchemy import select
                 session_result = await db.execute(
                     select(SessionModel.tenant_id).where(SessionModel.id == session_id)
                 )
                 tenant_id = session_result.scalar_one_or_none()
             
-            # Index in long-term memory
-            await self.memory_manager.add_long_term_memory(
+            # Index in long-term memory (similar memories are not added twice)
+            result = await self.memory_manager.add_long_term_memory(
                 db=db,
                 content=content,
                 learned_from_sessions=[session_id],
@@ -96,11 +98,22 @@ class EmailIndexer:
                 tenant_id=tenant_id,
             )
             
+            # Record the message id, also when an equivalent memory already existed,
+            # so that index_emails skips it by id from now on
+            if tenant_id and email.get("id"):
+                memory_id = result[1] if isinstance(result, tuple) else None
+                await self._record_indexed(db, tenant_id, [(email, UUID(str(memory_id)) if memory_id else None)])
+                await db.commit()
+            
             logger.info(f"Indexed email {email.get('id')} into long-term memory with importance {importance_score}")
             return True
             
         except Exception as e:
             logger.error(f"Error indexing email {email.get('id')}: {e}", exc_info=True)
+            try:
+                await db.rollback()
+            except Exception as rollback_error:
+                logger.warning(f"Rollback after failed email indexing failed: {rollback_error}")
             return False
     
     async def index_emails(
@@ -112,39 +125,212 @@ class EmailIndexer:
     ) -> Dict[str, Any]:
         """
         Index multiple emails into long-term memory.
+
+        Emails are filtered in one pass, message ids already present in the
+        `indexed_emails` lookup table (or repeated in the batch) are skipped,
+        and the rest are written in batches: one batched embedding call, one
+        ChromaDB add and one PostgreSQL transaction per batch. A batch that
+        fails is rolled back and retried email by email so one bad email doesn't
+        lose the rest.
+
+        A tenant that already has long-term memories but no rows in the lookup
+        table (indexed before the table existed) first gets one batched
+        similarity check: emails matching an existing memory are recorded as
+        indexed instead of being stored twice. New tenants skip the check.
         Returns statistics about indexing.
         """
         indexed_count = 0
         skipped_count = 0
+        already_indexed_count = 0
         errors = []
         
+        candidates: List[Dict[str, Any]] = []
+        seen_ids = set()
         for email in emails:
+            if not await self.should_index_email(email):
+                skipped_count += 1
+                continue
+            message_id = email.get("id")
+            if message_id and message_id in seen_ids:
+                skipped_count += 1
+                already_indexed_count += 1
+                continue
+            if message_id:
+                seen_ids.add(message_id)
+            candidates.append(email)
+        
+        tenant_id = None
+        pre_migration = False
+        if candidates:
+            tenant_id = await self._resolve_tenant_id(db, session_id)
+            if tenant_id and seen_ids:
+                try:
+                    indexed_ids = await self._load_indexed_ids(db, tenant_id, list(seen_ids))
+                    pre_migration = (
+                        not indexed_ids
+                        and not await self._has_indexed_emails(db, tenant_id)
+                        and await self._has_long_term_memories(db, tenant_id)
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not read indexed email ids, indexing all candidates: {e}")
+                    indexed_ids = set()
+                if indexed_ids:
+                    before = len(candidates)
+                    candidates = [email for email in candidates if email.get("id") not in indexed_ids]
+                    skipped_count += before - len(candidates)
+                    already_indexed_count += before - len(candidates)
+        
+        if pre_migration and candidates:
+            before = len(candidates)
+            candidates = await self._skip_pre_migration_duplicates(db, tenant_id, candidates)
+            skipped_count += before - len(candidates)
+            already_indexed_count += before - len(candidates)
+        
+        batch_size = max(1, settings.email_index_batch_size)
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
             try:
-                # Check if should index first
-                should_index = await self.should_index_email(email)
-                if not should_index:
-                    skipped_count += 1
-                    continue
-                
-                # Try to index
-                indexed = await self.index_email(db, email, session_id)
-                if indexed:
-                    indexed_count += 1
-                else:
-                    # If should_index is True but index_email returns False, it's an error
-                    errors.append(f"Email {email.get('id')}: Indexing failed")
-                    logger.error(f"Email {email.get('id')} should be indexed but indexing returned False")
+                indexed_count += await self._index_batch(db, batch, session_id, tenant_id)
+                continue
             except Exception as e:
-                errors.append(f"Email {email.get('id')}: {str(e)}")
-                logger.error(f"Error indexing email {email.get('id')}: {e}")
+                logger.warning(f"Batch indexing of {len(batch)} emails failed, retrying one by one: {e}")
+            
+            for email in batch:
+                try:
+                    indexed = await self.index_email(db, email, session_id, tenant_id=tenant_id)
+                    if indexed:
+                        indexed_count += 1
+                    else:
+                        # If should_index is True but index_email returns False, it's an error
+                        errors.append(f"Email {email.get('id')}: Indexing failed")
+                        logger.error(f"Email {email.get('id')} should be indexed but indexing returned False")
+                except Exception as e:
+                    errors.append(f"Email {email.get('id')}: {str(e)}")
+                    logger.error(f"Error indexing email {email.get('id')}: {e}")
+        
+        if indexed_count:
+            logger.info(f"📧 Indexed {indexed_count} emails into long-term memory ({already_indexed_count} already indexed)")
         
         return {
             "indexed": indexed_count,
             "skipped": skipped_count,
+            "already_indexed": already_indexed_count,
             "errors": errors,
             "total": len(emails),
         }
     
+    async def _resolve_tenant_id(self, db: AsyncSession, session_id: UUID) -> Optional[UUID]:
+        """Get the tenant of the session (falls back to the memory manager's tenant)"""
+        session_result = await db.execute(
+            select(SessionModel.tenant_id).where(SessionModel.id == session_id)
+        )
+        tenant_id = session_result.scalar_one_or_none()
+        return tenant_id or getattr(self.memory_manager, "tenant_id", None)
+    
+    async def _load_indexed_ids(self, db: AsyncSession, tenant_id: UUID, message_ids: List[str]) -> Set[str]:
+        """Return the subset of message ids already indexed for the tenant"""
+        result = await db.execute(
+            select(IndexedEmail.message_id).where(
+                IndexedEmail.tenant_id == tenant_id,
+                IndexedEmail.message_id.in_(message_ids),
+            )
+        )
+        return set(result.scalars().all())
+    
+    async def _has_indexed_emails(self, db: AsyncSession, tenant_id: UUID) -> bool:
+        """True if the lookup table has at least one row for the tenant"""
+        result = await db.execute(
+            select(IndexedEmail.message_id).where(IndexedEmail.tenant_id == tenant_id).limit(1)
+        )
+        return result.scalar_one_or_none() is not None
+    
+    async def _has_long_term_memories(self, db: AsyncSession, tenant_id: UUID) -> bool:
+        """True if the tenant has at least one long-term memory"""
+        result = await db.execute(
+            select(MemoryLong.id).where(MemoryLong.tenant_id == tenant_id).limit(1)
+        )
+        return result.scalar_one_or_none() is not None
+    
+    async def _skip_pre_migration_duplicates(
+        self,
+        db: AsyncSession,
+        tenant_id: UUID,
+        emails: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Record emails already stored as memories before the lookup table existed
+        (one batched similarity query) and return the others.
+        """
+        try:
+            _, matches = await self.memory_manager.find_near_duplicates(
+                [self._build_email_content(email) for email in emails],
+                tenant_id=tenant_id,
+            )
+            duplicates = [(email, match) for email, match in zip(emails, matches) if isinstance(match, str)]
+            if not duplicates:
+                return emails
+            result = await db.execute(
+                select(MemoryLong.embedding_id, MemoryLong.id).where(
+                    MemoryLong.tenant_id == tenant_id,
+                    MemoryLong.embedding_id.in_([match for _, match in duplicates]),
+                )
+            )
+            memory_ids = {embedding_id: memory_id for embedding_id, memory_id in result.all()}
+            await self._record_indexed(db, tenant_id, [(email, memory_ids.get(match)) for email, match in duplicates])
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"Similarity check of pre-migration emails failed, indexing all candidates: {e}")
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+            return emails
+        logger.info(f"📧 {len(duplicates)} emails were already in long-term memory, recorded as indexed")
+        duplicate_ids = {id(email) for email, _ in duplicates}
+        return [email for email in emails if id(email) not in duplicate_ids]
+    
+    async def _record_indexed(
+        self,
+        db: AsyncSession,
+        tenant_id: UUID,
+        indexed: List[Tuple[Dict[str, Any], Optional[UUID]]],
+    ) -> None:
+        """Stage lookup rows for (email, memory id) pairs in the current transaction"""
+        rows = [
+            {"tenant_id": tenant_id, "message_id": email["id"], "memory_id": memory_id}
+            for email, memory_id in indexed
+            if email.get("id")
+        ]
+        if rows:
+            await db.execute(
+                pg_insert(IndexedEmail).values(rows).on_conflict_do_nothing()
+            )
+    
+    async def _index_batch(
+        self,
+        db: AsyncSession,
+        emails: List[Dict[str, Any]],
+        session_id: UUID,
+        tenant_id: Optional[UUID],
+    ) -> int:
+        """Write a batch of emails to long-term memory and the lookup table in one transaction"""
+        contents = [self._build_email_content(email) for email in emails]
+        importance_scores = [await self._calculate_importance(email) for email in emails]
+        
+        async def record_indexed(memories: List[Any]) -> None:
+            if tenant_id:
+                await self._record_indexed(db, tenant_id, [(email, memory.id) for email, memory in zip(emails, memories)])
+        
+        memories = await self.memory_manager.add_long_term_memories(
+            db=db,
+            contents=contents,
+            learned_from_sessions=[session_id],
+            importance_scores=importance_scores,
+            tenant_id=tenant_id,
+            before_commit=record_indexed,
+        )
+        return len(memories)
+    
     def _build_email_content(self, email: Dict[str, Any]) -> str:
         """Build formatted content string for email indexing"""
         content_parts = []
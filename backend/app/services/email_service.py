@@ -183,6 +183,12 @@ class EmailService:
                     "thread_id": msg_detail.get("threadId", ""),
                     "labels": label_ids,
                     "category": self._extract_category(label_ids),
+                    # Bulk/mailing-list headers, used to pre-classify mail without the LLM
+                    "bulk": bool(
+                        headers.get("List-Unsubscribe")
+                        or headers.get("List-Id")
+                        or headers.get("Precedence", "").lower() in ("bulk", "list", "junk")
+                    ),
                 }
                 
                 # Extract body if requested
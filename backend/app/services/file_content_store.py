@@ -0,0 +1,100 @@
+"""
+File Content Store - Content-addressed index of uploaded file bytes.
+
+Identical uploads within a tenant (same sha256) share one stored copy and its
+extracted text. Each File row holds a reference; the stored bytes are only
+deleted when the last reference is released. Passage embeddings live in
+ChromaDB (see FileRetriever.index_file).
+"""
+from typing import Any, Dict, Optional
+from uuid import UUID
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import FileContent
+
+logger = logging.getLogger(__name__)
+
+
+class FileContentStore:
+    """Service for reference-counted, content-addressed file contents"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _get_for_update(self, tenant_id: UUID, sha256: str) -> Optional[FileContent]:
+        result = await self.db.execute(
+            select(FileContent)
+            .where(FileContent.tenant_id == tenant_id, FileContent.sha256 == sha256)
+            .with_for_update()
+        )
+        return result.scalar_one_or_none()
+
+    async def acquire(self, tenant_id: UUID, sha256: str) -> Optional[FileContent]:
+        """
+        Take a new reference on existing content, if any.
+        The caller commits together with the File row that holds the reference.
+        """
+        content = await self._get_for_update(tenant_id, sha256)
+        if content is None:
+            return None
+        content.ref_count = (content.ref_count or 0) + 1
+        logger.info(f"♻️  Reusing stored content {sha256[:12]} (refs={content.ref_count})")
+        return content
+
+    async def register(
+        self,
+        tenant_id: UUID,
+        sha256: str,
+        *,
+        size: int,
+        storage_path: str,
+        mime_type: Optional[str],
+        extracted_text: Optional[str],
+        text_metadata: Optional[Dict[str, Any]],
+    ) -> FileContent:
+        """
+        Record newly stored content with one reference.
+
+        If a concurrent upload registered the same content first, a reference
+        is taken on that row instead and the caller's copy becomes redundant
+        (check `storage_path` on the returned row).
+        """
+        content = FileContent(
+            tenant_id=tenant_id,
+            sha256=sha256,
+            size=size,
+            storage_path=storage_path,
+            mime_type=mime_type,
+            extracted_text=extracted_text,
+            text_metadata=text_metadata or {},
+            ref_count=1,
+        )
+        try:
+            async with self.db.begin_nested():
+                self.db.add(content)
+        except IntegrityError:
+            existing = await self.acquire(tenant_id, sha256)
+            if existing is not None:
+                return existing
+            raise
+        return content
+
+    async def release(self, tenant_id: UUID, sha256: str) -> Optional[str]:
+        """
+        Drop a reference. Returns the storage path when this was the last one
+        (the caller deletes the bytes), otherwise None.
+        """
+        content = await self._get_for_update(tenant_id, sha256)
+        if content is None:
+            return None
+        content.ref_count = (content.ref_count or 1) - 1
+        if content.ref_count > 0:
+            logger.info(f"🔗 Content {sha256[:12]} still referenced by {content.ref_count} file(s)")
+            return None
+        storage_path = content.storage_path
+        await self.db.delete(content)
+        return storage_path
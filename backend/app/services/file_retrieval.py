@@ -0,0 +1,388 @@
+"""
+File Retrieval - passage-level retrieval over a user's uploaded files.
+
+Uploaded text is indexed in ChromaDB as overlapping passages (one embedding
+each, with user_id / file_id / chunk_index / content_hash metadata). At query
+time the user's live files come from Postgres (one indexed query on `files`),
+ChromaDB is only asked for the top passages of those files (metadata filter,
+run in a worker thread) and passages are ranked by similarity and upload
+recency. Whole-file requests ("riassumi il file") read the extracted text
+kept in `file_contents` instead of downloading documents from ChromaDB.
+"""
+import asyncio
+import logging
+import math
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.database import File as FileModel, FileContent
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+_WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+
+# Requests about a whole file (summary, analysis...) rather than a specific fact in it
+_WHOLE_FILE_KEYWORDS = [
+    "riassunto", "riassumere", "summary", "summarize", "analizza", "analyze",
+    "ultimo file", "last file", "most recent file", "latest file",
+    "il file", "the file", "questo file", "this file",
+    "contenuto del file", "file content", "contenuto file", "contenuto caricato",
+    "spiegami", "explain", "descrivi", "describe", "cosa consiste", "what is",
+    "nel documento", "in the document", "nel file", "in the file",
+    "documento", "document", "pdf", ".pdf",
+    "caricato in memoria", "uploaded file", "file caricato", "file in memoria",
+]
+
+
+def is_whole_file_request(query: str) -> bool:
+    query_lower = query.lower()
+    return any(keyword in query_lower for keyword in _WHOLE_FILE_KEYWORDS)
+
+
+def split_passages(text: str, size: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
+    """
+    Split text into overlapping passages of about `size` characters,
+    cutting at paragraph or sentence boundaries when possible.
+    """
+    size = max(100, size or settings.file_passage_chars)
+    overlap = min(overlap if overlap is not None else settings.file_passage_overlap_chars, size // 2)
+    text = (text or "").strip()
+    if len(text) <= size:
+        return [text] if text else []
+
+    passages = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            window_start = start + size // 2
+            cut = max(text.rfind("\n\n", window_start, end), text.rfind(". ", window_start, end))
+            if cut > start:
+                end = cut + 1
+        passage = text[start:end].strip()
+        if passage:
+            passages.append(passage)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return passages
+
+
+def recency_score(uploaded_at: Optional[datetime], now: datetime, half_life_days: float) -> float:
+    """1.0 for a file uploaded now, halved every `half_life_days`"""
+    if uploaded_at is None or half_life_days <= 0:
+        return 0.0
+    if uploaded_at.tzinfo is None:
+        uploaded_at = uploaded_at.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - uploaded_at).total_seconds() / 86400)
+    return math.pow(0.5, age_days / half_life_days)
+
+
+def _lexical_overlap(query: str, text: str) -> float:
+    terms = {w.lower() for w in _WORD_RE.findall(query)}
+    if not terms:
+        return 0.0
+    words = {w.lower() for w in _WORD_RE.findall(text)}
+    return len(terms & words) / len(terms)
+
+
+def _truncate_document(text: str) -> str:
+    limit = settings.file_retrieval_max_document_chars
+    if len(text) <= limit:
+        return text
+    return text[:limit] + (
+        f"\n\n[Content truncated - original was {len(text)} characters. "
+        f"This is a large file, focusing on the beginning.]"
+    )
+
+
+@dataclass
+class LiveFile:
+    """A file the user currently has (row of the files table)"""
+
+    id: str
+    filename: str
+    uploaded_at: Optional[datetime]
+    content_hash: Optional[str]
+
+
+@dataclass
+class Passage:
+    file_id: str
+    filename: str
+    text: str
+    chunk_index: int
+    similarity: float
+    score: float = 0.0
+
+
+class FileRetriever:
+    """Index and retrieve passages of uploaded files"""
+
+    def __init__(self, memory_manager: Any):
+        self.memory = memory_manager
+
+    @staticmethod
+    async def _run(func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _collection(self, tenant_id: Optional[UUID]):
+        return await self.memory._get_collection("file_embeddings", tenant_id or self.memory.tenant_id)
+
+    async def index_file(
+        self,
+        *,
+        tenant_id: UUID,
+        user_id: UUID,
+        file_id: UUID,
+        filename: str,
+        text: str,
+        content_hash: Optional[str] = None,
+        session_id: Optional[UUID] = None,
+    ) -> int:
+        """
+        Index the passages of an uploaded file. Passage embeddings of an identical
+        upload (same content_hash) are reused instead of recomputed.
+        Returns the number of passages written.
+        """
+        passages = split_passages(text)
+        collection = await self._collection(tenant_id)
+        if not passages or collection is None:
+            return 0
+
+        embeddings = None
+        if content_hash:
+            embeddings = await self._reusable_embeddings(collection, content_hash, passages)
+        if embeddings is None:
+            embeddings = await self._run(self.memory.embedding_service.generate_embeddings, passages)
+
+        metadata: Dict[str, Any] = {
+            "user_id": str(user_id),
+            "file_id": str(file_id),
+            "filename": filename,
+            "chunk_count": len(passages),
+        }
+        if content_hash:
+            metadata["content_hash"] = content_hash
+        if session_id:
+            metadata["session_id"] = str(session_id)
+
+        await collection.add(
+            ids=[f"file_{file_id}_{i}" for i in range(len(passages))],
+            embeddings=embeddings,
+            documents=passages,
+            metadatas=[{**metadata, "chunk_index": i} for i in range(len(passages))],
+        )
+        logger.info(f"📄 Indexed {len(passages)} passages for file {filename} ({file_id})")
+        return len(passages)
+
+    async def _reusable_embeddings(self, collection, content_hash: str, passages: List[str]) -> Optional[List[Any]]:
+        try:
+            existing = await collection.get(
+                where={"content_hash": content_hash},
+                include=["embeddings", "documents", "metadatas"],
+            )
+        except Exception as e:
+            logger.debug(f"Could not look up passages for content {content_hash[:12]}: {e}")
+            return None
+
+        # Passages of one earlier copy, in chunk order
+        by_chunk: Dict[int, Any] = {}
+        source_file = None
+        embeddings = existing.get("embeddings")
+        if embeddings is None:
+            return None
+        for doc, meta, embedding in zip(existing.get("documents") or [], existing.get("metadatas") or [], embeddings):
+            meta = meta or {}
+            source_file = source_file or meta.get("file_id")
+            if meta.get("file_id") == source_file and "chunk_index" in meta:
+                by_chunk[int(meta["chunk_index"])] = (doc, embedding)
+        if len(by_chunk) != len(passages):
+            return None
+        if any(by_chunk.get(i, (None,))[0] != passage for i, passage in enumerate(passages)):
+            return None
+        logger.info(f"♻️  Reusing {len(passages)} passage embeddings of content {content_hash[:12]}")
+        return [list(by_chunk[i][1]) for i in range(len(passages))]
+
+    async def live_files(self, db: AsyncSession, user_id: UUID, tenant_id: UUID) -> List[LiveFile]:
+        """The user's files, most recent first (ix_files_tenant_user_uploaded)"""
+        result = await db.execute(
+            select(FileModel.id, FileModel.filename, FileModel.uploaded_at, FileModel.content_hash)
+            .where(FileModel.tenant_id == tenant_id, FileModel.user_id == user_id)
+            .order_by(FileModel.uploaded_at.desc())
+            .limit(settings.file_retrieval_max_files)
+        )
+        return [
+            LiveFile(id=str(file_id), filename=filename, uploaded_at=uploaded_at, content_hash=content_hash)
+            for file_id, filename, uploaded_at, content_hash in result.all()
+        ]
+
+    async def retrieve(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: UUID,
+        tenant_id: UUID,
+        query: str,
+        n_results: int = 5,
+    ) -> List[str]:
+        """
+        File content relevant to `query`: the whole text of the requested (or most
+        recent) file for whole-file requests, then the best-ranked passages.
+        """
+        files = await self.live_files(db, user_id, tenant_id)
+        if not files:
+            return []
+        files_by_id = {f.id: f for f in files}
+
+        target: Optional[LiveFile] = None
+        requested = _UUID_RE.search(query)
+        if requested and requested.group(0).lower() in files_by_id:
+            target = files_by_id[requested.group(0).lower()]
+        elif is_whole_file_request(query):
+            target = files[0]
+
+        results: List[str] = []
+        if target is not None:
+            text = await self._whole_file_text(db, tenant_id, target)
+            if text:
+                results.append(f"[File: {target.filename}]\n{_truncate_document(text)}")
+
+        passages = await self._search_passages(
+            tenant_id, user_id, query, files_by_id, exclude_file_id=target.id if target else None
+        )
+        if not passages and not results:
+            # Passages not indexed (e.g. vector store reset): rank the stored text of recent files
+            passages = await self._stored_text_passages(db, tenant_id, query, files[:n_results])
+
+        for passage in passages[: max(0, n_results - len(results))]:
+            results.append(f"[File: {passage.filename}]\n{passage.text}")
+        logger.info(
+            f"📄 File retrieval for user {user_id}: {len(files)} live files, "
+            f"{len(results)} results{' (whole file ' + target.filename + ')' if target else ''}"
+        )
+        return results
+
+    async def _search_passages(
+        self,
+        tenant_id: UUID,
+        user_id: UUID,
+        query: str,
+        files_by_id: Dict[str, LiveFile],
+        exclude_file_id: Optional[str] = None,
+    ) -> List[Passage]:
+        collection = await self._collection(tenant_id)
+        if collection is None:
+            return []
+        file_ids = [fid for fid in files_by_id if fid != exclude_file_id]
+        if not file_ids:
+            return []
+
+        query_embedding = await self._run(self.memory.embedding_service.generate_embedding, query)
+        n_candidates = max(1, settings.file_retrieval_candidates)
+
+        async def _query(where: Dict[str, Any]):
+            return await collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_candidates,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+
+        try:
+            results = await _query(
+                {"$and": [{"user_id": {"$eq": str(user_id)}}, {"file_id": {"$in": file_ids}}]}
+            )
+        except Exception as e:
+            # Older ChromaDB servers without $in: filter by user only, live files checked below
+            logger.debug(f"File passage query with $in failed ({e}), retrying with user filter")
+            try:
+                results = await _query({"user_id": str(user_id)})
+            except Exception as fallback_error:
+                logger.error(f"❌ File passage query failed: {fallback_error}", exc_info=True)
+                return []
+
+        space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+        now = datetime.now(timezone.utc)
+        weight = min(1.0, max(0.0, settings.file_retrieval_recency_weight))
+        passages: Dict[Any, Passage] = {}
+        documents = (results.get("documents") or [[]])[0]
+        metadatas = (results.get("metadatas") or [[]])[0]
+        distances = (results.get("distances") or [[]])[0]
+        for doc, meta, distance in zip(documents, metadatas, distances):
+            meta = meta or {}
+            file_id = str(meta.get("file_id", ""))
+            live_file = files_by_id.get(file_id)
+            if live_file is None or file_id == exclude_file_id or not doc:
+                continue
+            similarity = self.memory._distance_to_similarity(distance, space) or 0.0
+            if "chunk_index" not in meta and len(doc) > settings.file_passage_chars:
+                # Legacy whole-document embedding: keep its best passage
+                doc = max(split_passages(doc), key=lambda p: _lexical_overlap(query, p))
+            chunk_index = int(meta.get("chunk_index", 0))
+            score = (1 - weight) * similarity + weight * recency_score(
+                live_file.uploaded_at, now, settings.file_retrieval_recency_half_life_days
+            )
+            key = (file_id, chunk_index)
+            if key not in passages or passages[key].score < score:
+                passages[key] = Passage(file_id, live_file.filename, doc, chunk_index, similarity, score)
+        return sorted(passages.values(), key=lambda p: p.score, reverse=True)
+
+    async def _whole_file_text(self, db: AsyncSession, tenant_id: UUID, live_file: LiveFile) -> Optional[str]:
+        if live_file.content_hash:
+            result = await db.execute(
+                select(FileContent.extracted_text).where(
+                    FileContent.tenant_id == tenant_id,
+                    FileContent.sha256 == live_file.content_hash,
+                )
+            )
+            text = result.scalar_one_or_none()
+            if text:
+                return text
+
+        # Files uploaded before file_contents existed: read the indexed document(s)
+        collection = await self._collection(tenant_id)
+        if collection is None:
+            return None
+        try:
+            stored = await collection.get(where={"file_id": live_file.id}, include=["documents", "metadatas"])
+        except Exception as e:
+            logger.warning(f"⚠️  Could not read indexed content of file {live_file.id}: {e}")
+            return None
+        chunks = sorted(
+            zip(stored.get("metadatas") or [], stored.get("documents") or []),
+            key=lambda item: int((item[0] or {}).get("chunk_index", 0)),
+        )
+        return "\n".join(doc for _, doc in chunks if doc) or None
+
+    async def _stored_text_passages(
+        self, db: AsyncSession, tenant_id: UUID, query: str, files: List[LiveFile]
+    ) -> List[Passage]:
+        hashes = {f.content_hash: f for f in files if f.content_hash}
+        if not hashes:
+            return []
+        result = await db.execute(
+            select(FileContent.sha256, FileContent.extracted_text).where(
+                FileContent.tenant_id == tenant_id,
+                FileContent.sha256.in_(list(hashes)),
+            )
+        )
+        passages = []
+        for sha256, text in result.all():
+            live_file = hashes[sha256]
+            for i, passage in enumerate(split_passages(text or "")):
+                overlap = _lexical_overlap(query, passage)
+                passages.append(Passage(live_file.id, live_file.filename, passage, i, overlap, overlap))
+        passages.sort(key=lambda p: p.score, reverse=True)
+        return passages
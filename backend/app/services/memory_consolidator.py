@@ -14,6 +14,7 @@ from app.core.ollama_client import OllamaClient
 from app.core.dependencies import get_ollama_client
 from app.models.database import MemoryLong
 from app.services.embedding_service import EmbeddingService
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
@@ -97,9 +98,8 @@ class MemoryConsolidator:
                 for mem in to_remove:
                     try:
                         # Remove from ChromaDB
-                        self.memory_manager.long_term_memory_collection.delete(
-                            ids=[mem.embedding_id]
-                        )
+                        collection = await self.memory_manager.long_term_memory_collection()
+                        await collection.delete(ids=[mem.embedding_id])
                         
                         # Remove from database
                         await db.delete(mem)
@@ -205,9 +205,8 @@ class MemoryConsolidator:
                     # Remove old memories
                     for mem in memories:
                         try:
-                            self.memory_manager.long_term_memory_collection.delete(
-                                ids=[mem.embedding_id]
-                            )
+                            collection = await self.memory_manager.long_term_memory_collection()
+                            await collection.delete(ids=[mem.embedding_id])
                             await db.delete(mem)
                         except Exception as e:
                             logger.warning(f"Error removing old memory {mem.id}: {e}")
@@ -273,14 +272,15 @@ Crea un riassunto che:
 
 Riassunto:"""
 
-            response = await self.ollama_client.generate_with_context(
-                prompt=prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                return_raw=False,
-            )
+            with llm_lane(LANE_BACKGROUND):
+                response = await self.ollama_client.generate_with_context(
+                    prompt=prompt,
+                    session_context=[],
+                    retrieved_memory=None,
+                    tools=None,
+                    tools_description=None,
+                    return_raw=False,
+                )
             
             return response.strip()
             
@@ -219,7 +219,7 @@ class CalendarWatcher:
                                 "summary": event.get("summary", "Untitled Event"),
                                 "title": event.get("summary", "Untitled Event"),  # Alias per compatibilità
                                 "start_time": start_time.isoformat(),
-                                "end_time": event.get("end_time"),
+                                "end_time": event.get("end_time") or event.get("end"),
                                 "location": event.get("location"),
                                 "reminder_minutes": reminder_minutes,
                                 "reminder_key": reminder_key,  # Chiave per deduplicazione
@@ -258,8 +258,15 @@ class CalendarWatcher:
     
     def _parse_event_start(self, event: Dict[str, Any]) -> Optional[datetime]:
         """Parse event start time from Google Calendar event format"""
+        # Events returned by CalendarService are already formatted with a parsed start
+        start_datetime = event.get("start_datetime")
+        if isinstance(start_datetime, datetime):
+            if start_datetime.tzinfo is None:
+                start_datetime = start_datetime.replace(tzinfo=timezone.utc)
+            return start_datetime
+
         start = event.get("start")
-        if not start:
+        if not start or not isinstance(start, dict):
             return None
         
         # Google Calendar può avere "dateTime" o "date"
@@ -314,6 +314,16 @@ class EmailPoller:
         except Exception as e:
             logger.warning(f"⚠️  Error checking sent email threads: {e}")
         
+        # Triage all new emails together (cache + rules + batched LLM calls)
+        batch_analyses: Dict[str, Dict[str, Any]] = {}
+        if self.email_analyzer:
+            try:
+                batch_analyses = await self.email_analyzer.analyze_emails(
+                    new_messages, integration_id=str(integration.id)
+                )
+            except Exception as e:
+                logger.warning(f"Batched email triage failed, analyzing emails one by one: {e}")
+        
         # Crea notifiche per ogni nuova email
         for msg in new_messages:
             try:
@@ -332,7 +342,10 @@ class EmailPoller:
                     try:
                         # Analyze email using snippet (usually sufficient for action detection)
                         # Full body can be fetched later if needed for more detailed analysis
-                        analysis = await self.email_analyzer.analyze_email(msg)
+                        analysis = batch_analyses.get(email_id)
+                        if analysis is None:
+                            analysis = await self.email_analyzer.analyze_email(msg, integration_id=str(integration.id))
+                        analysis = dict(analysis)
                         
                         # If this is a reply to assistant-sent email, always mark as requiring action
                         if is_reply_to_assistant:
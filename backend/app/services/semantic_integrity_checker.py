@@ -2,8 +2,11 @@
 Semantic Integrity Checker - Detects contradictions in long-term memory
 """
 from typing import List, Dict, Any, Optional
+from collections import OrderedDict
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
+import asyncio
+import hashlib
 import logging
 import re
 import json
@@ -12,9 +15,135 @@ from app.core.memory_manager import MemoryManager
 from app.core.ollama_client import OllamaClient
 from app.services.embedding_service import EmbeddingService
 from app.core.config import settings
+from app.core.metrics import increment_counter
+from app.core.llm_scheduler import LANE_BACKGROUND, llm_lane
 
 logger = logging.getLogger(__name__)
 
+# Shared reasoning guidelines used by both the single-pair and the multi-pair prompts
+_CONTRADICTION_GUIDELINES = """1. **Direct Contradictions**: Opposite claims about the same thing
+2. **Temporal Contradictions**: Incompatible dates/events for the same entity
+3. **Numerical Contradictions**: Incompatible values for the same property at the same time
+4. **Status Contradictions**: Mutually exclusive states
+5. **Preference Contradictions**: Opposite preferences (likes vs dislikes, loves vs hates)
+6. **Relationship Contradictions**: Incompatible relationships
+7. **Factual Contradictions**: Incompatible facts about the same entity
+
+**CRITICAL: CONSERVATIVE APPROACH**
+- If you are NOT 95% certain this is a logical contradiction → respond with "is_contradiction": false
+- Better to miss a contradiction than to flag a false positive
+- Always consider temporal and situational context
+- Distinguish between explicit contradictions and complementary information
+
+**CRITICAL: TAXONOMIC RELATIONSHIPS**
+Contradictions can occur at different levels of a taxonomy (hierarchy):
+- If one statement is about a CATEGORY and the other about an INSTANCE or SUBCATEGORY of that category, and they express opposite preferences/claims → CONTRADICTION
+- You must reason about whether the entities mentioned are taxonomically related (category-instance, category-subcategory, or semantically equivalent)
+- Consider: if someone likes a category but hates an instance of that category, that is a contradiction
+- Consider: if someone likes a general concept but hates a specific manifestation of that concept, that is a contradiction
+
+**EXAMPLES OF TAXONOMIC CONTRADICTIONS:**
+- "Likes pasta" vs "Hates spaghetti" → CONTRADICTION (spaghetti is a type of pasta)
+- "Loves Italian food" vs "Hates ravioli" → CONTRADICTION (ravioli is Italian food)
+- "Enjoys music" vs "Hates jazz" → CONTRADICTION (jazz is a type of music)
+- "Likes animals" vs "Hates dogs" → CONTRADICTION (dogs are animals)
+
+**IMPORTANT:** When analyzing preferences, you MUST check if the entities are taxonomically related. If one is a category and the other is an instance/subcategory of that category, and the preferences are opposite, it IS a contradiction.
+
+**EXAMPLES OF NON-CONTRADICTIONS (be conservative):**
+- "Likes pasta" vs "Ate pizza yesterday" → NO CONTRADICTION (different temporal contexts, different foods)
+- "Likes Italian food" vs "Likes pizza" → NO CONTRADICTION (complementary, not contradictory)
+- "Born in 1990" vs "Age 35" → NO CONTRADICTION (compatible if calculated correctly)
+- "Likes pasta at lunch" vs "Hates pasta at dinner" → NO CONTRADICTION (different contexts)
+- "Mentioned eating pasta" vs "Likes pasta" → NO CONTRADICTION (casual mention vs explicit preference)
+
+**Reasoning Process:**
+1. Identify what each statement is about (entity, category, instance, property)
+2. Determine if they refer to the same or taxonomically related things
+3. Check if the claims/preferences are opposite
+4. Consider if they logically exclude each other
+
+**NOT contradictions:**
+- Complementary information
+- Additional details that don't conflict
+- Information about different time periods
+- Different but compatible aspects
+
+**ARE contradictions:**
+- Statements that logically exclude each other
+- Opposite preferences for the same or taxonomically related things
+- Incompatible facts about the same entity"""
+
+# Words ignored when measuring entity overlap (function words and generic preference verbs, IT/EN)
+_OVERLAP_STOPWORDS = {
+    "about", "also", "been", "from", "have", "into", "like", "likes", "love", "loves", "hate", "hates",
+    "prefer", "prefers", "that", "their", "there", "they", "this", "user", "very", "were", "what",
+    "when", "which", "with", "would", "your",
+    "anche", "ama", "amano", "come", "dalla", "della", "delle", "degli", "dello", "detesta", "fatto",
+    "molto", "nella", "nelle", "negli", "odia", "piace", "piacciono", "preferisce", "preferisco",
+    "quando", "quella", "quello", "questa", "questo", "sono", "stato", "utente", "essere",
+}
+
+# One semaphore per background LLM backend: the checker is instantiated per BackgroundAgent,
+# but all instances share the same inference box, so the bound must be process-wide.
+_backend_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# LRU cache of already-judged (new, existing) pairs: pair hash -> verdict
+_pair_verdict_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _get_backend_semaphore(client: Any) -> asyncio.Semaphore:
+    """Return the semaphore bounding concurrent integrity calls to the client's backend"""
+    backend_key = getattr(client, "base_url", None) or type(client).__name__
+    semaphore = _backend_semaphores.get(backend_key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, settings.integrity_llm_concurrency))
+        _backend_semaphores[backend_key] = semaphore
+    return semaphore
+
+
+def _pair_hash(new_memory: str, existing_memory: str) -> str:
+    """Stable hash of a (new, existing) pair, insensitive to case and whitespace"""
+    normalized = "\n".join(
+        " ".join(text.lower().split()) for text in (new_memory, existing_memory)
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _get_cached_verdict(new_memory: str, existing_memory: str) -> Optional[Dict[str, Any]]:
+    key = _pair_hash(new_memory, existing_memory)
+    verdict = _pair_verdict_cache.get(key)
+    if verdict is None:
+        return None
+    _pair_verdict_cache.move_to_end(key)
+    return dict(verdict)
+
+
+def _store_cached_verdict(new_memory: str, existing_memory: str, verdict: Dict[str, Any]) -> None:
+    max_size = settings.integrity_pair_cache_size
+    if max_size <= 0 or verdict.get("error") or verdict.get("heuristic"):
+        # Never cache failures or keyword guesses on unparsable answers:
+        # the pair must be re-judged once the backend answers properly
+        return
+    key = _pair_hash(new_memory, existing_memory)
+    _pair_verdict_cache[key] = dict(verdict)
+    _pair_verdict_cache.move_to_end(key)
+    while len(_pair_verdict_cache) > max_size:
+        _pair_verdict_cache.popitem(last=False)
+
+
+def _parse_verdict(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a JSON verdict returned by the LLM"""
+    # Handle typo in LLM response: "is_contriction" -> "is_contradiction"
+    is_contradiction = parsed.get("is_contradiction", parsed.get("is_contriction", False))
+    return {
+        "is_contradiction": is_contradiction,
+        "confidence": float(parsed.get("confidence", 0.0)),
+        "explanation": parsed.get("explanation", ""),
+        "which_correct": parsed.get("which_correct", "unknown"),
+        "contradiction_type": parsed.get("contradiction_type", "none"),
+    }
+
 
 class SemanticIntegrityChecker:
     """Service for checking semantic integrity and detecting contradictions"""
@@ -24,6 +153,20 @@ class SemanticIntegrityChecker:
         self.ollama_client = ollama_client
         self.embedding_service = EmbeddingService()
         self.enabled = self.ollama_client is not None
+        # Pair outcomes since this checker was created (LLM calls avoided = everything but "llm")
+        self.stats: Dict[str, int] = {
+            "skipped_type": 0,
+            "skipped_similarity": 0,
+            "cached": 0,
+            "llm": 0,
+        }
+    
+    def _record_pairs(self, outcome: str, count: int = 1) -> None:
+        """Track how candidate pairs were resolved (locally and in metrics)"""
+        if count <= 0:
+            return
+        self.stats[outcome] = self.stats.get(outcome, 0) + count
+        increment_counter("integrity_pairs_total", value=count, labels={"outcome": outcome})
     
     async def check_contradictions(
         self,
@@ -90,11 +233,12 @@ class SemanticIntegrityChecker:
             # 2. Pre-filter: Extract type from new knowledge and existing memories
             new_knowledge_type = new_knowledge.get("type", "").lower() if isinstance(new_knowledge, dict) else ""
             
-            # 3. Analyze similar memories with LLM (with pre-filtering by type)
-            # Since llama.cpp is fast, we can afford to use LLM for all cases, but we filter by type first
-            contradictions = []
+            # 3. Pre-filter by type and by similarity/entity overlap, then analyze the remaining pairs with LLM
+            candidates: List[str] = []
+            new_entities = self._extract_entities(clean_content)
             
-            for memory_content in similar_memories:
+            for similar_memory in similar_memories:
+                memory_content = similar_memory.get("content", "")
                 # Clean memory content (remove type prefix)
                 clean_memory = re.sub(r'^\[.*?\]\s*', '', memory_content).strip()
                 
@@ -107,25 +251,31 @@ class SemanticIntegrityChecker:
                 if new_knowledge_type and existing_memory_type:
                     if new_knowledge_type != existing_memory_type:
                         logger.debug(f"⏭️  Skipping comparison: different types (new={new_knowledge_type}, existing={existing_memory_type})")
+                        self._record_pairs("skipped_type")
                         continue
                 
                 # Also skip if one is preference and other is fact (even if types not explicitly set)
                 if (new_knowledge_type == "preference" and existing_memory_type == "fact") or \
                    (new_knowledge_type == "fact" and existing_memory_type == "preference"):
                     logger.debug(f"⏭️  Skipping comparison: incompatible types (preference vs fact)")
+                    self._record_pairs("skipped_type")
                     continue
                 
-                logger.info(f"Analyzing potential contradiction with LLM (types: new={new_knowledge_type or 'unknown'}, existing={existing_memory_type or 'unknown'})...")
-                logger.info(f"  New: '{clean_content[:100]}...'")
-                logger.info(f"  Existing: '{clean_memory[:100]}...'")
-                
-                # Use LLM for complete semantic analysis
-                contradiction = await self._analyze_with_llm(
-                    clean_content,
-                    clean_memory,
-                    threshold
-                )
+                # Cheap numeric stage: unrelated statements cannot contradict each other
+                similarity = similar_memory.get("similarity")
+                overlap = self._entity_overlap(new_entities, self._extract_entities(clean_memory))
+                if not self._could_contradict(similarity, overlap):
+                    logger.debug(f"⏭️  Skipping comparison: unrelated statements (similarity={similarity:.2f}, entity_overlap={overlap:.2f})")
+                    self._record_pairs("skipped_similarity")
+                    continue
                 
+                candidates.append(clean_memory)
+            
+            logger.info(f"Analyzing {len(candidates)} potential contradictions with LLM (type={new_knowledge_type or 'unknown'})")
+            verdicts = await self._analyze_candidates(clean_content, candidates, threshold)
+            
+            contradictions = []
+            for clean_memory, contradiction in zip(candidates, verdicts):
                 logger.info(f"LLM analysis result: is_contradiction={contradiction.get('is_contradiction')}, confidence={contradiction.get('confidence', 0):.2f}, threshold={threshold:.2f}")
                 
                 if contradiction.get("is_contradiction") and contradiction.get("confidence", 0) >= threshold:
@@ -151,8 +301,13 @@ class SemanticIntegrityChecker:
                 "error": str(e),
             }
     
-    async def _find_similar_memories(self, content: str, n_results: int = 10, min_importance: float = None) -> List[str]:
-        """Find similar memories using semantic search, optionally filtered by importance"""
+    async def _find_similar_memories(self, content: str, n_results: int = 10, min_importance: float = None) -> List[Dict[str, Any]]:
+        """
+        Find similar memories using semantic search, optionally filtered by importance.
+        
+        Returns:
+            List of dicts with "content" and "similarity" (cosine similarity to content, may be None)
+        """
         try:
             logger.info(f"Searching for similar memories to: '{content[:100]}...' (min_importance={min_importance})")
             # Use long-term memory retrieval with optional importance filter
@@ -160,8 +315,9 @@ class SemanticIntegrityChecker:
                 content,
                 n_results=n_results,
                 min_importance=min_importance,
+                include_metadata=True,
             )
-            logger.info(f"Found {len(similar)} similar memories: {[s[:50] + '...' if len(s) > 50 else s for s in similar[:3]]}")
+            logger.info(f"Found {len(similar)} similar memories: {[s['content'][:50] for s in similar[:3]]}")
             return similar
         except Exception as e:
             logger.error(f"Error finding similar memories: {e}", exc_info=True)
@@ -170,17 +326,19 @@ class SemanticIntegrityChecker:
     def _extract_entities(self, text: str) -> Dict[str, Any]:
         """
         Extract basic entities from text (language-agnostic).
-        Only extracts dates and numbers - semantic analysis is done by LLM.
+        Only extracts dates, numbers and keywords - semantic analysis is done by LLM.
         
         Returns:
             Dict with extracted entities: {
                 "dates": [...],  # Extracted dates (various formats)
                 "numbers": [...],  # Extracted numbers
+                "keywords": [...],  # Significant lowercase words (used for overlap pre-filter)
             }
         """
         entities = {
             "dates": [],
             "numbers": [],
+            "keywords": [],
         }
         
         # Extract dates (various formats) - language-agnostic patterns
@@ -207,8 +365,170 @@ class SemanticIntegrityChecker:
         numbers = re.findall(number_pattern, text)
         entities["numbers"] = [float(n) if '.' in n else int(n) for n in numbers]
         
+        # Extract keywords (words of 4+ letters, minus stopwords) - unicode-aware
+        words = re.findall(r"[^\W\d_]{4,}", text.lower())
+        entities["keywords"] = sorted({w for w in words if w not in _OVERLAP_STOPWORDS})
+        
         return entities
     
+    @staticmethod
+    def _entity_overlap(new_entities: Dict[str, Any], existing_entities: Dict[str, Any]) -> float:
+        """Overlap coefficient of the keyword sets (0.0 = nothing shared, 1.0 = one contains the other)"""
+        new_keywords = set(new_entities.get("keywords", []))
+        existing_keywords = set(existing_entities.get("keywords", []))
+        if not new_keywords or not existing_keywords:
+            return 0.0
+        return len(new_keywords & existing_keywords) / min(len(new_keywords), len(existing_keywords))
+    
+    @staticmethod
+    def _could_contradict(similarity: Optional[float], entity_overlap: float) -> bool:
+        """
+        Numeric pre-filter deciding whether a pair is worth an LLM call.
+        A pair is kept if it is semantically close OR shares entities.
+        """
+        if not settings.integrity_prefilter_enabled or similarity is None:
+            return True
+        if similarity >= settings.integrity_prefilter_min_similarity:
+            return True
+        return entity_overlap >= settings.integrity_prefilter_min_entity_overlap
+    
+    
+    async def _analyze_candidates(
+        self,
+        new_memory: str,
+        candidates: List[str],
+        confidence_threshold: float,
+    ) -> List[Dict[str, Any]]:
+        """
+        Judge every (new, candidate) pair, reusing cached verdicts.
+        
+        Uncached pairs are analyzed concurrently (bounded by the backend semaphore),
+        either one pair per LLM call or several pairs per call when
+        integrity_pairs_per_prompt > 1.
+        
+        Returns:
+            One verdict per candidate, in the same order
+        """
+        verdicts: List[Optional[Dict[str, Any]]] = [None] * len(candidates)
+        pending: List[int] = []
+        
+        for index, existing_memory in enumerate(candidates):
+            cached = _get_cached_verdict(new_memory, existing_memory)
+            if cached is not None:
+                logger.debug(f"♻️  Reusing cached verdict for pair: '{existing_memory[:50]}...'")
+                verdicts[index] = cached
+            else:
+                pending.append(index)
+        
+        self._record_pairs("cached", len(candidates) - len(pending))
+        self._record_pairs("llm", len(pending))
+        
+        if pending:
+            pairs_per_prompt = max(1, settings.integrity_pairs_per_prompt)
+            groups = [pending[i:i + pairs_per_prompt] for i in range(0, len(pending), pairs_per_prompt)]
+            
+            async def _analyze_group(group: List[int]) -> List[Dict[str, Any]]:
+                existing = [candidates[i] for i in group]
+                if len(existing) == 1:
+                    return [await self._analyze_with_llm(new_memory, existing[0], confidence_threshold)]
+                return await self._analyze_batch_with_llm(new_memory, existing, confidence_threshold)
+            
+            results = await asyncio.gather(*(_analyze_group(group) for group in groups))
+            
+            for group, group_verdicts in zip(groups, results):
+                for index, verdict in zip(group, group_verdicts):
+                    _store_cached_verdict(new_memory, candidates[index], verdict)
+                    verdicts[index] = verdict
+        
+        return verdicts
+    
+    async def _analyze_batch_with_llm(
+        self,
+        new_memory: str,
+        existing_memories: List[str],
+        confidence_threshold: float,
+    ) -> List[Dict[str, Any]]:
+        """
+        Use a single LLM call to judge several (new, existing) pairs.
+        Pairs missing from the response (or an unparsable response) fall back
+        to single-pair analysis.
+        
+        Returns:
+            One verdict per existing memory, in the same order
+        """
+        if not self.ollama_client:
+            return [
+                await self._analyze_with_llm(new_memory, existing, confidence_threshold)
+                for existing in existing_memories
+            ]
+
+        verdicts: List[Optional[Dict[str, Any]]] = [None] * len(existing_memories)
+        try:
+            pairs_text = "\n\n".join(
+                f"PAIR {index}:\nEXISTING STATEMENT: \"{existing}\"\nNEW STATEMENT: \"{new_memory}\""
+                for index, existing in enumerate(existing_memories, start=1)
+            )
+            prompt = f"""Analyze, for each pair below, if the two statements logically contradict each other. Judge every pair independently.
+
+{pairs_text}
+
+For each pair, determine if there is a LOGICAL CONTRADICTION between its statements. You must reason carefully about:
+
+{_CONTRADICTION_GUIDELINES}
+
+Think step by step, then respond ONLY with a valid JSON array (no other text), with exactly one object per pair:
+[
+    {{
+        "pair": 1,
+        "is_contradiction": true/false,
+        "confidence": 0.0-1.0,
+        "explanation": "brief explanation of your reasoning and the contradiction type or why there is no contradiction",
+        "contradiction_type": "direct|temporal|numerical|status|preference|relationship|factual|none"
+    }}
+]"""
+
+            logger.info(f"Calling LLM for batched contradiction analysis ({len(existing_memories)} pairs)")
+            async with _get_backend_semaphore(self.ollama_client):
+                with llm_lane(LANE_BACKGROUND):
+                    response = await self.ollama_client.generate_with_context(
+                        prompt=prompt,
+                        session_context=[],
+                        retrieved_memory=None,
+                        tools=None,
+                        tools_description=None,
+                        format=None,  # No strict JSON mode for faster response
+                        return_raw=False,
+                    )
+            
+            logger.info(f"LLM raw batched response (first 500 chars): {response[:500]}")
+            
+            json_match = re.search(r'\[.*\]', response, re.DOTALL)
+            parsed = json.loads(json_match.group() if json_match else response)
+            if not isinstance(parsed, list):
+                raise ValueError("Batched contradiction response is not a JSON array")
+            
+            for position, item in enumerate(parsed):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    index = int(item.get("pair", position + 1)) - 1
+                except (TypeError, ValueError):
+                    index = position
+                if 0 <= index < len(verdicts) and verdicts[index] is None:
+                    verdicts[index] = _parse_verdict(item)
+        except Exception as e:
+            logger.warning(f"Batched contradiction analysis failed, falling back to single pairs: {e}")
+        
+        missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        if missing:
+            fallback = await asyncio.gather(*(
+                self._analyze_with_llm(new_memory, existing_memories[i], confidence_threshold)
+                for i in missing
+            ))
+            for index, verdict in zip(missing, fallback):
+                verdicts[index] = verdict
+        
+        return verdicts
     
     async def _analyze_with_llm(
         self,
@@ -233,6 +553,7 @@ class SemanticIntegrityChecker:
                 "confidence": 0.0,
                 "explanation": "Background LLM unavailable",
                 "which_correct": "unknown",
+                "error": "Background LLM unavailable",
             }
 
         try:
@@ -245,58 +566,7 @@ NEW STATEMENT: "{new_memory}"
 
 Determine if there is a LOGICAL CONTRADICTION between these statements. You must reason carefully about:
 
-1. **Direct Contradictions**: Opposite claims about the same thing
-2. **Temporal Contradictions**: Incompatible dates/events for the same entity
-3. **Numerical Contradictions**: Incompatible values for the same property at the same time
-4. **Status Contradictions**: Mutually exclusive states
-5. **Preference Contradictions**: Opposite preferences (likes vs dislikes, loves vs hates)
-6. **Relationship Contradictions**: Incompatible relationships
-7. **Factual Contradictions**: Incompatible facts about the same entity
-
-**CRITICAL: CONSERVATIVE APPROACH**
-- If you are NOT 95% certain this is a logical contradiction → respond with "is_contradiction": false
-- Better to miss a contradiction than to flag a false positive
-- Always consider temporal and situational context
-- Distinguish between explicit contradictions and complementary information
-
-**CRITICAL: TAXONOMIC RELATIONSHIPS**
-Contradictions can occur at different levels of a taxonomy (hierarchy):
-- If one statement is about a CATEGORY and the other about an INSTANCE or SUBCATEGORY of that category, and they express opposite preferences/claims → CONTRADICTION
-- You must reason about whether the entities mentioned are taxonomically related (category-instance, category-subcategory, or semantically equivalent)
-- Consider: if someone likes a category but hates an instance of that category, that is a contradiction
-- Consider: if someone likes a general concept but hates a specific manifestation of that concept, that is a contradiction
-
-**EXAMPLES OF TAXONOMIC CONTRADICTIONS:**
-- "Likes pasta" vs "Hates spaghetti" → CONTRADICTION (spaghetti is a type of pasta)
-- "Loves Italian food" vs "Hates ravioli" → CONTRADICTION (ravioli is Italian food)
-- "Enjoys music" vs "Hates jazz" → CONTRADICTION (jazz is a type of music)
-- "Likes animals" vs "Hates dogs" → CONTRADICTION (dogs are animals)
-
-**IMPORTANT:** When analyzing preferences, you MUST check if the entities are taxonomically related. If one is a category and the other is an instance/subcategory of that category, and the preferences are opposite, it IS a contradiction.
-
-**EXAMPLES OF NON-CONTRADICTIONS (be conservative):**
-- "Likes pasta" vs "Ate pizza yesterday" → NO CONTRADICTION (different temporal contexts, different foods)
-- "Likes Italian food" vs "Likes pizza" → NO CONTRADICTION (complementary, not contradictory)
-- "Born in 1990" vs "Age 35" → NO CONTRADICTION (compatible if calculated correctly)
-- "Likes pasta at lunch" vs "Hates pasta at dinner" → NO CONTRADICTION (different contexts)
-- "Mentioned eating pasta" vs "Likes pasta" → NO CONTRADICTION (casual mention vs explicit preference)
-
-**Reasoning Process:**
-1. Identify what each statement is about (entity, category, instance, property)
-2. Determine if they refer to the same or taxonomically related things
-3. Check if the claims/preferences are opposite
-4. Consider if they logically exclude each other
-
-**NOT contradictions:**
-- Complementary information
-- Additional details that don't conflict
-- Information about different time periods
-- Different but compatible aspects
-
-**ARE contradictions:**
-- Statements that logically exclude each other
-- Opposite preferences for the same or taxonomically related things
-- Incompatible facts about the same entity
+{_CONTRADICTION_GUIDELINES}
 
 Think step by step, then respond ONLY with valid JSON (no other text):
 {{
@@ -306,17 +576,19 @@ Think step by step, then respond ONLY with valid JSON (no other text):
     "contradiction_type": "direct|temporal|numerical|status|preference|relationship|factual|none"
 }}"""
 
-            logger.info(f"Calling LLM for contradiction analysis (model: {self.ollama_client.model}, base_url: {self.ollama_client.base_url})")
+            logger.info(f"Calling LLM for contradiction analysis (model: {getattr(self.ollama_client, 'model', 'unknown')}, base_url: {getattr(self.ollama_client, 'base_url', 'n/a')})")
             # Don't use format="json" for phi3:mini - it's too slow, parse JSON from text response instead
-            response = await self.ollama_client.generate_with_context(
-                prompt=prompt,
-                session_context=[],
-                retrieved_memory=None,
-                tools=None,
-                tools_description=None,
-                format=None,  # No strict JSON mode for faster response
-                return_raw=False,
-            )
+            async with _get_backend_semaphore(self.ollama_client):
+                with llm_lane(LANE_BACKGROUND):
+                    response = await self.ollama_client.generate_with_context(
+                        prompt=prompt,
+                        session_context=[],
+                        retrieved_memory=None,
+                        tools=None,
+                        tools_description=None,
+                        format=None,  # No strict JSON mode for faster response
+                        return_raw=False,
+                    )
             
             logger.info(f"LLM raw response (first 500 chars): {response[:500]}")
             
@@ -331,16 +603,7 @@ Think step by step, then respond ONLY with valid JSON (no other text):
                     parsed = json.loads(response)
                     logger.info(f"Parsed JSON (direct): {parsed}")
                 
-                # Handle typo in LLM response: "is_contriction" -> "is_contradiction"
-                is_contradiction = parsed.get("is_contradiction", parsed.get("is_contriction", False))
-                
-                return {
-                    "is_contradiction": is_contradiction,
-                    "confidence": float(parsed.get("confidence", 0.0)),
-                    "explanation": parsed.get("explanation", ""),
-                    "which_correct": parsed.get("which_correct", "unknown"),
-                    "contradiction_type": parsed.get("contradiction_type", "none"),
-                }
+                return _parse_verdict(parsed)
             except json.JSONDecodeError:
                 # Fallback: try to parse from text
                 is_contradiction = "sì" in response.lower() or "yes" in response.lower() or "true" in response.lower()
@@ -349,6 +612,7 @@ Think step by step, then respond ONLY with valid JSON (no other text):
                     "confidence": 0.7 if is_contradiction else 0.0,  # Lower confidence if can't parse
                     "explanation": response[:200],  # First 200 chars
                     "which_correct": "unknown",
+                    "heuristic": True,  # Not a JSON verdict: never cached
                 }
                 
         except Exception as e:
@@ -358,5 +622,5 @@ Think step by step, then respond ONLY with valid JSON (no other text):
                 "confidence": 0.0,
                 "explanation": f"Error: {str(e)}",
                 "which_correct": "unknown",
+                "error": str(e),
             }
-
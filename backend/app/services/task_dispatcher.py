@@ -102,13 +102,13 @@ class TaskDispatcher:
                 "🚀 Dispatcher: checking session %s for queued tasks", session_id
             )
             
-            # First, check for queued tasks (highest priority)
-            queued = self._task_queue.find_task_by_status(
-                session_id, TaskStatus.QUEUED
-            )
+            # First, claim the next queued task (highest priority). With a durable
+            # queue the claim is atomic across workers (SKIP LOCKED).
+            queued = await self._task_queue.claim_next(session_id)
+            claimed = queued is not None
             if queued:
                 logger.info(
-                    "✅ Dispatcher: found queued task %s (%s) for session %s, processing...",
+                    "✅ Dispatcher: claimed queued task %s (%s) for session %s, processing...",
                     queued.id,
                     queued.type,
                     session_id,
@@ -159,24 +159,26 @@ class TaskDispatcher:
             if not queued:
                 return
 
-            # Mark task as IN_PROGRESS before processing to prevent duplicate processing
-            try:
-                self._task_queue.update_task(
-                    session_id,
-                    queued.id,
-                    status=TaskStatus.IN_PROGRESS,
-                )
-                logger.info(
-                    "📌 Dispatcher: marked task %s as IN_PROGRESS before processing",
-                    queued.id,
-                )
-            except Exception as exc:
-                logger.warning(
-                    "⚠️  Dispatcher: failed to mark task %s as IN_PROGRESS: %s",
-                    queued.id,
-                    exc,
-                )
-                # Continue anyway - the task might have been processed by another instance
+            # Mark re-presented waiting tasks as IN_PROGRESS before processing to prevent
+            # duplicate processing (claimed tasks are already IN_PROGRESS)
+            if not claimed:
+                try:
+                    self._task_queue.update_task(
+                        session_id,
+                        queued.id,
+                        status=TaskStatus.IN_PROGRESS,
+                    )
+                    logger.info(
+                        "📌 Dispatcher: marked task %s as IN_PROGRESS before processing",
+                        queued.id,
+                    )
+                except Exception as exc:
+                    logger.warning(
+                        "⚠️  Dispatcher: failed to mark task %s as IN_PROGRESS: %s",
+                        queued.id,
+                        exc,
+                    )
+                    # Continue anyway - the task might have been processed by another instance
 
             config = TASK_PROMPTS.get(queued.type, DEFAULT_TASK_PROMPT)
 
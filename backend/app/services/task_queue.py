@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from enum import Enum
-from typing import Any, Dict, Iterable, List, Optional, Callable
+from typing import Any, Deque, Dict, Iterable, List, Optional, Callable, Set, Tuple, TYPE_CHECKING
 from uuid import UUID, uuid4
 
+if TYPE_CHECKING:
+    from app.services.task_store import TaskStore
+
+logger = logging.getLogger(__name__)
+
 
 class TaskPriority(str, Enum):
     CRITICAL = "critical"
@@ -29,6 +39,14 @@ _PRIORITY_ORDER = {
     TaskPriority.LOW: 1,
 }
 
+_FINISHED_STATUSES = frozenset({TaskStatus.COMPLETED, TaskStatus.FAILED})
+
+# Heap entry: (-priority rank, created_at, insertion seq, task_id, index version)
+_HeapEntry = Tuple[int, datetime, int, str, int]
+
+# Called with (session_id, task) whenever a task enters a status
+StatusListener = Callable[[UUID, "Task"], None]
+
 
 @dataclass
 class Task:
@@ -56,45 +74,88 @@ class Task:
 
 class TaskQueue:
     """
-    In-memory priority queue for inter-agent coordination.
+    Priority queue for inter-agent coordination.
 
     Tasks are stored per session and selected by priority + FIFO order.
+    Every (session, status) pair keeps a heap with lazy invalidation, so
+    `start_next` and `find_task_by_status` are O(log n) instead of sorting
+    all tasks. Finished tasks are pruned automatically (bounded count per
+    session and TTL).
+
+    An optional `TaskStore` makes the queue durable: mutations are written
+    behind to the store, `restore()` reloads active tasks on startup and
+    `claim_next()` claims work atomically so several workers can share it.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        store: Optional["TaskStore"] = None,
+        max_finished_per_session: int = 50,
+        finished_ttl_seconds: int = 3600,
+        worker_id: Optional[str] = None,
+    ) -> None:
         self._tasks: Dict[UUID, Dict[str, Task]] = {}
+        # session -> status -> task_id -> Task (exact membership)
+        self._by_status: Dict[UUID, Dict[TaskStatus, Dict[str, Task]]] = {}
+        # session -> status -> heap ordered by priority + FIFO (may hold stale entries)
+        self._heaps: Dict[UUID, Dict[TaskStatus, List[_HeapEntry]]] = {}
+        # session -> type -> task_id -> Task (insertion order)
+        self._by_type: Dict[UUID, Dict[str, Dict[str, Task]]] = {}
+        # session -> (finished_at, task_id) in completion order
+        self._finished: Dict[UUID, Deque[Tuple[datetime, str]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._indexed_status: Dict[str, TaskStatus] = {}
+        self._seq = itertools.count()
+
+        self._max_finished = max(0, max_finished_per_session)
+        self._finished_ttl = timedelta(seconds=max(0, finished_ttl_seconds))
+
+        self._store = store
+        self._worker_id = worker_id or str(uuid4())
+        self._dirty: Dict[str, Tuple[UUID, Task]] = {}
+        self._deleted: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._status_listeners: List[StatusListener] = []
+
+    # ------------------------------------------------------------------
+    # Read API
+    # ------------------------------------------------------------------
 
     def iter_tasks(self, session_id: UUID) -> Iterable[Task]:
         return self._tasks.get(session_id, {}).values()
 
-    def enqueue(self, session_id: UUID, task: Task) -> Task:
-        session_tasks = self._tasks.setdefault(session_id, {})
-        session_tasks[task.id] = task
-        return task
+    def session_ids(self) -> List[UUID]:
+        return list(self._tasks.keys())
 
     def list_tasks(self, session_id: UUID) -> List[Task]:
         return list(self._tasks.get(session_id, {}).values())
 
+    def list_tasks_by_status(self, session_id: UUID, status: TaskStatus) -> List[Task]:
+        return list(self._by_status.get(session_id, {}).get(status, {}).values())
+
+    def count_tasks(
+        self,
+        session_id: Optional[UUID] = None,
+        statuses: Optional[Iterable[TaskStatus]] = None,
+    ) -> int:
+        sessions = [session_id] if session_id is not None else list(self._tasks.keys())
+        total = 0
+        for sid in sessions:
+            if statuses is None:
+                total += len(self._tasks.get(sid, {}))
+            else:
+                by_status = self._by_status.get(sid, {})
+                total += sum(len(by_status.get(status, {})) for status in statuses)
+        return total
+
+    def get_task(self, session_id: UUID, task_id: str) -> Optional[Task]:
+        return self._tasks.get(session_id, {}).get(task_id)
+
     def find_task_by_status(
         self, session_id: UUID, status: TaskStatus
     ) -> Optional[Task]:
-        session_tasks = self._tasks.get(session_id)
-        if not session_tasks:
-            return None
-
-        candidates = [
-            task for task in session_tasks.values() if task.status == status
-        ]
-        if not candidates:
-            return None
-
-        candidates.sort(
-            key=lambda task: (
-                -_PRIORITY_ORDER.get(task.priority, 0),
-                task.created_at,
-            )
-        )
-        return candidates[0]
+        return self._peek(session_id, status)
 
     def find_task_by_type(
         self,
@@ -102,15 +163,13 @@ class TaskQueue:
         task_type: str,
         statuses: Optional[Iterable[TaskStatus]] = None,
     ) -> Optional[Task]:
-        session_tasks = self._tasks.get(session_id)
-        if not session_tasks:
+        typed_tasks = self._by_type.get(session_id, {}).get(task_type)
+        if not typed_tasks:
             return None
 
         statuses_set = set(statuses) if statuses else None
 
-        for task in session_tasks.values():
-            if task.type != task_type:
-                continue
+        for task in typed_tasks.values():
             if statuses_set and task.status not in statuses_set:
                 continue
             return task
@@ -126,31 +185,26 @@ class TaskQueue:
             self.find_task_by_type(session_id, task_type, statuses=statuses) is not None
         )
 
-    def start_next(self, session_id: UUID) -> Optional[Task]:
-        session_tasks = self._tasks.get(session_id)
-        if not session_tasks:
-            return None
+    # ------------------------------------------------------------------
+    # Write API
+    # ------------------------------------------------------------------
 
-        queued = [
-            task for task in session_tasks.values() if task.status == TaskStatus.QUEUED
-        ]
-        if not queued:
+    def enqueue(self, session_id: UUID, task: Task) -> Task:
+        self._insert(session_id, task)
+        self._persist(session_id, task)
+        self._prune_finished(session_id)
+        return task
+
+    def start_next(self, session_id: UUID) -> Optional[Task]:
+        next_task = self._peek(session_id, TaskStatus.QUEUED)
+        if not next_task:
             return None
 
-        queued.sort(
-            key=lambda task: (
-                -_PRIORITY_ORDER.get(task.priority, 0),
-                task.created_at,
-            )
-        )
-        next_task = queued[0]
-        next_task.status = TaskStatus.IN_PROGRESS
         next_task.updated_at = datetime.now(UTC)
+        self._set_status(session_id, next_task, TaskStatus.IN_PROGRESS)
+        self._persist(session_id, next_task)
         return next_task
 
-    def get_task(self, session_id: UUID, task_id: str) -> Optional[Task]:
-        return self._tasks.get(session_id, {}).get(task_id)
-
     def update_task(
         self,
         session_id: UUID,
@@ -163,12 +217,16 @@ class TaskQueue:
         if not task:
             return None
 
+        # Before the status change: finished tasks are indexed by updated_at
+        task.updated_at = datetime.now(UTC)
         if status:
-            task.status = status
+            self._set_status(session_id, task, status)
         if payload_updates:
             task.payload.update(payload_updates)
 
-        task.updated_at = datetime.now(UTC)
+        self._persist(session_id, task)
+        if status in _FINISHED_STATUSES:
+            self._prune_finished(session_id)
         return task
 
     def complete_task(
@@ -186,14 +244,254 @@ class TaskQueue:
         )
 
     def clear_completed(self, session_id: UUID) -> None:
+        completed = self.list_tasks_by_status(session_id, TaskStatus.COMPLETED)
+        for task in completed:
+            self._remove(session_id, task.id)
+
+    def add_status_listener(self, listener: StatusListener) -> None:
+        """Register a callback invoked whenever a task is inserted or changes status."""
+        self._status_listeners.append(listener)
+
+    def prune_finished(self) -> int:
+        """Apply the retention policy to every session. Returns the number of removed tasks."""
+        removed = 0
+        for session_id in list(self._finished.keys()):
+            removed += self._prune_finished(session_id)
+        return removed
+
+    # ------------------------------------------------------------------
+    # Durable backend
+    # ------------------------------------------------------------------
+
+    @property
+    def is_durable(self) -> bool:
+        return self._store is not None
+
+    async def restore(self) -> List[Tuple[UUID, Task]]:
+        """Load active tasks from the durable store (no-op for in-memory queues)."""
+        if not self._store:
+            return []
+
+        restored: List[Tuple[UUID, Task]] = []
+        for session_id, task in await self._store.load_active():
+            if self.get_task(session_id, task.id):
+                continue
+            self._insert(session_id, task)
+            restored.append((session_id, task))
+        if restored:
+            logger.info("🔄 Restored %d active tasks from durable task store", len(restored))
+        return restored
+
+    async def claim_next(self, session_id: UUID) -> Optional[Task]:
+        """
+        Atomically claim the next queued task for this worker.
+
+        With a durable store the claim goes through the database (SKIP LOCKED),
+        so the same task is never handed to two workers; otherwise it is
+        equivalent to `start_next`.
+        """
+        if not self._store:
+            return self.start_next(session_id)
+
+        # Make locally enqueued tasks visible to the claim query first
+        await self.flush()
+        claimed = await self._store.claim_next(session_id, self._worker_id)
+        if not claimed:
+            return None
+
+        local = self.get_task(session_id, claimed.id)
+        if local is None:
+            self._insert(session_id, claimed)
+            return claimed
+
+        local.payload = claimed.payload
+        local.updated_at = claimed.updated_at
+        self._set_status(session_id, local, TaskStatus.IN_PROGRESS)
+        return local
+
+    async def flush(self) -> None:
+        """Write pending changes to the durable store."""
+        if not self._store:
+            return
+
+        while self._dirty or self._deleted:
+            dirty = list(self._dirty.values())
+            deleted = list(self._deleted)
+            self._dirty.clear()
+            self._deleted.clear()
+            try:
+                if dirty:
+                    await self._store.save_many(dirty)
+                if deleted:
+                    await self._store.delete_many(deleted)
+            except Exception as exc:
+                logger.warning("Failed to persist task queue changes: %s", exc, exc_info=True)
+                # Re-queue without overwriting newer snapshots taken meanwhile
+                for session_id, task in dirty:
+                    self._dirty.setdefault(task.id, (session_id, task))
+                self._deleted.update(deleted)
+                return
+
+    def _persist(self, session_id: UUID, task: Task) -> None:
+        if not self._store:
+            return
+        self._deleted.discard(task.id)
+        self._dirty[task.id] = (session_id, task)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (sync caller): changes are written on the next flush()
+            return
+        self._flush_task = loop.create_task(self.flush())
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _insert(self, session_id: UUID, task: Task) -> None:
+        existing = self.get_task(session_id, task.id)
+        if existing is not None and existing is not task:
+            self._remove(session_id, task.id, persist=False)
+
+        self._tasks.setdefault(session_id, {})[task.id] = task
+        self._by_type.setdefault(session_id, {}).setdefault(task.type, {})[task.id] = task
+        self._index_status(session_id, task)
+
+    def _remove(self, session_id: UUID, task_id: str, *, persist: bool = True) -> None:
         session_tasks = self._tasks.get(session_id)
+        if not session_tasks or task_id not in session_tasks:
+            return
+
+        task = session_tasks.pop(task_id)
+        status = self._indexed_status.pop(task_id, None)
+        if status is not None:
+            self._by_status.get(session_id, {}).get(status, {}).pop(task_id, None)
+        self._versions.pop(task_id, None)
+        typed = self._by_type.get(session_id, {}).get(task.type)
+        if typed is not None:
+            typed.pop(task_id, None)
+            if not typed:
+                del self._by_type[session_id][task.type]
+
+        if persist and self._store:
+            self._dirty.pop(task_id, None)
+            self._deleted.add(task_id)
+            self._schedule_flush()
+
         if not session_tasks:
+            self._drop_session(session_id)
+
+    def _drop_session(self, session_id: UUID) -> None:
+        self._tasks.pop(session_id, None)
+        self._by_status.pop(session_id, None)
+        self._heaps.pop(session_id, None)
+        self._by_type.pop(session_id, None)
+        self._finished.pop(session_id, None)
+
+    def _set_status(self, session_id: UUID, task: Task, status: TaskStatus) -> None:
+        if task.status == status and self._indexed_status.get(task.id) == status:
             return
-        remaining = {
-            task_id: task
-            for task_id, task in session_tasks.items()
-            if task.status != TaskStatus.COMPLETED
-        }
-        self._tasks[session_id] = remaining
+        previous = self._indexed_status.get(task.id)
+        if previous is not None:
+            self._by_status.get(session_id, {}).get(previous, {}).pop(task.id, None)
+        task.status = status
+        self._index_status(session_id, task)
+
+    def _index_status(self, session_id: UUID, task: Task) -> None:
+        status = task.status
+        version = self._versions.get(task.id, 0) + 1
+        self._versions[task.id] = version
+        self._indexed_status[task.id] = status
+        self._by_status.setdefault(session_id, {}).setdefault(status, {})[task.id] = task
+        self._notify_status(session_id, task)
+
+        if status in _FINISHED_STATUSES:
+            self._finished.setdefault(session_id, deque()).append(
+                (task.updated_at or datetime.now(UTC), task.id)
+            )
+            return
+
+        heap = self._heaps.setdefault(session_id, {}).setdefault(status, [])
+        heapq.heappush(
+            heap,
+            (
+                -_PRIORITY_ORDER.get(task.priority, 0),
+                task.created_at,
+                next(self._seq),
+                task.id,
+                version,
+            ),
+        )
+        live = len(self._by_status[session_id][status])
+        if len(heap) > 4 * live + 16:
+            self._rebuild_heap(session_id, status)
+
+    def _notify_status(self, session_id: UUID, task: Task) -> None:
+        for listener in self._status_listeners:
+            try:
+                listener(session_id, task)
+            except Exception as exc:  # pragma: no cover - safeguard
+                logger.warning("Task status listener failed: %s", exc, exc_info=True)
+
+    def _rebuild_heap(self, session_id: UUID, status: TaskStatus) -> None:
+        heap = [
+            entry
+            for entry in self._heaps[session_id][status]
+            if self._is_live(session_id, status, entry)
+        ]
+        heapq.heapify(heap)
+        self._heaps[session_id][status] = heap
+
+    def _is_live(self, session_id: UUID, status: TaskStatus, entry: _HeapEntry) -> bool:
+        task_id, version = entry[3], entry[4]
+        return (
+            task_id in self._by_status.get(session_id, {}).get(status, {})
+            and self._versions.get(task_id) == version
+        )
 
+    def _peek(self, session_id: UUID, status: TaskStatus) -> Optional[Task]:
+        if status in _FINISHED_STATUSES:
+            # Finished tasks are not heap-indexed; keep the historical ordering
+            candidates = self.list_tasks_by_status(session_id, status)
+            if not candidates:
+                return None
+            return min(
+                candidates,
+                key=lambda task: (-_PRIORITY_ORDER.get(task.priority, 0), task.created_at),
+            )
+
+        heap = self._heaps.get(session_id, {}).get(status)
+        while heap:
+            entry = heap[0]
+            if self._is_live(session_id, status, entry):
+                return self._tasks[session_id][entry[3]]
+            heapq.heappop(heap)
+        return None
 
+    def _prune_finished(self, session_id: UUID) -> int:
+        finished = self._finished.get(session_id)
+        if not finished:
+            return 0
+
+        cutoff = datetime.now(UTC) - self._finished_ttl
+        removed = 0
+        while finished:
+            finished_at, task_id = finished[0]
+            task = self.get_task(session_id, task_id)
+            stale = task is None or task.status not in _FINISHED_STATUSES
+            over_limit = len(finished) > self._max_finished
+            expired = finished_at <= cutoff
+            if not (stale or over_limit or expired):
+                break
+            finished.popleft()
+            if not stale:
+                self._remove(session_id, task_id)
+                removed += 1
+            if session_id not in self._finished:
+                break
+        return removed
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import QueuedTask
+from app.services.task_queue import (
+    Task,
+    TaskPriority,
+    TaskStatus,
+    _FINISHED_STATUSES,
+    _PRIORITY_ORDER,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStore(ABC):
+    """
+    Durable backend for TaskQueue.
+
+    The queue keeps its in-memory indexes as the source of truth for reads
+    and writes changes behind to the store; the store is consulted on
+    startup (`load_active`) and for cross-worker claiming (`claim_next`).
+    """
+
+    @abstractmethod
+    async def save_many(self, items: List[Tuple[UUID, Task]]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_many(self, task_ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def load_active(self) -> List[Tuple[UUID, Task]]:
+        ...
+
+    @abstractmethod
+    async def claim_next(self, session_id: UUID, worker_id: str) -> Optional[Task]:
+        ...
+
+
+def _row_to_task(row: QueuedTask) -> Task:
+    return Task(
+        id=row.id,
+        type=row.type,
+        origin=row.origin,
+        priority=TaskPriority(row.priority),
+        status=TaskStatus(row.status),
+        payload=dict(row.payload or {}),
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+
+
+class PostgresTaskStore(TaskStore):
+    """TaskStore on the `task_queue` table, claiming with FOR UPDATE SKIP LOCKED."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]) -> None:
+        self._session_factory = session_factory
+
+    async def save_many(self, items: List[Tuple[UUID, Task]]) -> None:
+        if not items:
+            return
+        rows = [
+            {
+                "id": task.id,
+                "session_id": session_id,
+                "type": task.type,
+                "origin": task.origin,
+                "priority": task.priority.value,
+                "priority_rank": _PRIORITY_ORDER.get(task.priority, 0),
+                "status": task.status.value,
+                "payload": task.payload,
+                "created_at": task.created_at,
+                "updated_at": task.updated_at,
+            }
+            for session_id, task in items
+        ]
+        stmt = pg_insert(QueuedTask).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QueuedTask.id],
+            set_={
+                "status": stmt.excluded.status,
+                "payload": stmt.excluded.payload,
+                "priority": stmt.excluded.priority,
+                "priority_rank": stmt.excluded.priority_rank,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            # Never let a stale local snapshot overwrite a newer row (e.g. a claim by another worker)
+            where=QueuedTask.updated_at <= stmt.excluded.updated_at,
+        )
+        async with self._session_factory() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def delete_many(self, task_ids: List[str]) -> None:
+        if not task_ids:
+            return
+        async with self._session_factory() as db:
+            await db.execute(delete(QueuedTask).where(QueuedTask.id.in_(task_ids)))
+            await db.commit()
+
+    async def load_active(self) -> List[Tuple[UUID, Task]]:
+        finished = [status.value for status in _FINISHED_STATUSES]
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(QueuedTask)
+                .where(QueuedTask.status.notin_(finished))
+                .order_by(QueuedTask.created_at)
+            )
+            return [(row.session_id, _row_to_task(row)) for row in result.scalars().all()]
+
+    async def claim_next(self, session_id: UUID, worker_id: str) -> Optional[Task]:
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(QueuedTask)
+                .where(
+                    QueuedTask.session_id == session_id,
+                    QueuedTask.status == TaskStatus.QUEUED.value,
+                )
+                .order_by(QueuedTask.priority_rank.desc(), QueuedTask.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            row = result.scalar_one_or_none()
+            if row is None:
+                return None
+
+            row.status = TaskStatus.IN_PROGRESS.value
+            row.claimed_by = worker_id
+            row.updated_at = datetime.now(UTC)
+            await db.commit()
+            logger.debug("Worker %s claimed task %s for session %s", worker_id, row.id, session_id)
+            return _row_to_task(row)
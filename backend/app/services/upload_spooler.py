@@ -0,0 +1,113 @@
+"""
+Upload Spooler - streams an uploaded file to a temporary file on disk.
+
+The request body is copied in fixed-size chunks (in a worker thread) while
+the SHA-256 digest and size are computed, so an upload never has to be held
+in memory and the size limit is enforced as soon as it is exceeded.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large. Max size: {max_size} bytes")
+        self.max_size = max_size
+
+
+@dataclass
+class SpooledUpload:
+    """An upload spooled to disk, with its size and content hash."""
+
+    path: Path
+    size: int
+    sha256: str
+    filename: str
+    content_type: Optional[str]
+
+    async def move_to(self, destination: Path) -> Path:
+        """Move the spooled file to its final location (rename when on the same filesystem)."""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, shutil.move, str(self.path), str(destination))
+        self.path = destination
+        return destination
+
+    def cleanup(self) -> None:
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError as exc:
+            logger.warning(f"⚠️  Could not remove spooled upload {self.path}: {exc}")
+
+
+def _spool_dir() -> Path:
+    # Spool next to the uploads so moving the file into place is a rename
+    spool_dir = settings.upload_spool_dir or settings.upload_dir / "tmp"
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    return spool_dir
+
+
+def _copy_to_spool(source: BinaryIO, suffix: str, max_size: int, chunk_size: int):
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(suffix=suffix, dir=_spool_dir())
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return Path(tmp_name), size, digest.hexdigest()
+
+
+async def spool_upload(
+    source: BinaryIO,
+    filename: str,
+    content_type: Optional[str] = None,
+    max_size: Optional[int] = None,
+) -> SpooledUpload:
+    """
+    Copy a file-like upload body to a temporary file in chunks, off the event loop.
+
+    Raises UploadTooLargeError (and removes the partial file) when the body is
+    larger than `max_size` (default: settings.max_file_size).
+    """
+    limit = max_size if max_size is not None else settings.max_file_size
+    chunk_size = max(64 * 1024, settings.upload_chunk_size)
+    loop = asyncio.get_running_loop()
+    path, size, sha256 = await loop.run_in_executor(
+        None,
+        _copy_to_spool,
+        source,
+        Path(filename or "").suffix,
+        limit,
+        chunk_size,
+    )
+    return SpooledUpload(
+        path=path,
+        size=size,
+        sha256=sha256,
+        filename=filename,
+        content_type=content_type,
+    )
@@ -1,17 +1,96 @@
 """
 Web Content Indexer Service - Indexes web content into long-term memory
+
+Pages are deduplicated by canonical URL and content hash before anything is
+embedded, then by embedding similarity against the tenant's long-term memory
+and the rest of the batch, and written in batches (one embedding call, one
+ChromaDB add and one PostgreSQL transaction per batch). A URL re-indexed after
+its freshness window replaces the memory written for it the previous time.
+`WebIndexQueue` runs the indexing in the background so tool calls don't wait
+for it.
 """
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from sqlalchemy import select, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from datetime import datetime, timezone
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import asyncio
+import hashlib
 import logging
 import re
+import time
 
+from app.core.config import settings
 from app.core.memory_manager import MemoryManager
+from app.core.metrics import increment_counter
+from app.models.database import IndexedWebPage, MemoryLong, Session as SessionModel, Tenant
 
 logger = logging.getLogger(__name__)
 
+# Query parameters that don't change the page content
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid"}
+
+# Per-tenant freshness (hours) read from tenant metadata, cached for a few minutes
+_FRESHNESS_CACHE_TTL_SECONDS = 300
+_tenant_freshness_cache: Dict[UUID, Tuple[float, float]] = {}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different links to the same page compare equal:
+    lowercase scheme/host, no default port, fragment or tracking parameters,
+    sorted query string and no trailing slash.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    if not parts.scheme or not parts.netloc:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if (scheme == "http" and host.endswith(":80")) or (scheme == "https" and host.endswith(":443")):
+        host = host.rsplit(":", 1)[0]
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def content_hash(text: str) -> str:
+    """Hash of the content with whitespace and case normalized"""
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class WebIndexJob:
+    """A web page waiting to be written to long-term memory"""
+
+    url: str
+    content_text: str  # Formatted text stored in memory
+    content_hash: str  # Hash of the page content (without query/title decoration)
+    session_id: UUID
+    tenant_id: Optional[UUID] = None
+    importance_score: float = 0.6
+    replaces_memory_id: Optional[UUID] = None  # Memory of the previous indexing of the URL (set on re-index)
+
+    @property
+    def canonical_url(self) -> str:
+        return canonicalize_url(self.url)
+
+    @property
+    def url_hash(self) -> str:
+        return hashlib.sha256(self.canonical_url.encode("utf-8")).hexdigest()
+
 
 class WebIndexer:
     """Service for indexing web content into long-term memory"""
@@ -67,6 +146,61 @@ class WebIndexer:
             # Fallback: return first 2000 chars of snapshot
             return snapshot[:2000]
     
+    def build_search_result_jobs(
+        self,
+        search_query: str,
+        results: List[Dict[str, Any]],
+        session_id: UUID,
+        importance_score: float = 0.6,
+        tenant_id: Optional[UUID] = None,
+    ) -> List[WebIndexJob]:
+        """Build index jobs for the top 5 web search results"""
+        jobs = []
+        for result in results[:5]:  # Limit to top 5 results
+            title = result.get('title', 'N/A')
+            url = result.get('url', 'N/A')
+            content = result.get('content', '')
+            
+            # Build content for indexing
+            content_text = f"Web Search Result: {title}\nURL: {url}\n"
+            if content:
+                # Truncate content to avoid overwhelming memory
+                content_preview = content[:2000] if len(content) > 2000 else content
+                content_text += f"Content: {content_preview}\n"
+            
+            content_text += f"Search Query: {search_query}"
+            jobs.append(WebIndexJob(
+                url=url,
+                content_text=content_text,
+                content_hash=content_hash(f"{title}\n{content}"),
+                session_id=session_id,
+                tenant_id=tenant_id,
+                importance_score=importance_score,
+            ))
+        return jobs
+    
+    def build_web_fetch_job(
+        self,
+        url: str,
+        result: Dict[str, Any],
+        session_id: UUID,
+        importance_score: float = 0.7,
+        tenant_id: Optional[UUID] = None,
+    ) -> Optional[WebIndexJob]:
+        """Build an index job for a fetched page (None if it has no content)"""
+        title = result.get('title', 'N/A')
+        content = result.get('content', '')
+        if not content:
+            return None
+        return WebIndexJob(
+            url=url,
+            content_text=f"Web Page: {title}\nURL: {url}\n\nContent:\n{content[:5000]}",  # Limit to 5000 chars
+            content_hash=content_hash(content),
+            session_id=session_id,
+            tenant_id=tenant_id,
+            importance_score=importance_score,
+        )
+    
     async def index_web_search_results(
         self,
         db: AsyncSession,
@@ -79,54 +213,12 @@ class WebIndexer:
         """
         Index web search results into long-term memory.
         """
-        indexed_count = 0
-        errors = []
-        
-        for result in results[:5]:  # Limit to top 5 results
-            try:
-                title = result.get('title', 'N/A')
-                url = result.get('url', 'N/A')
-                content = result.get('content', '')
-                
-                # Build content for indexing
-                content_text = f"Web Search Result: {title}\nURL: {url}\n"
-                if content:
-                    # Truncate content to avoid overwhelming memory
-                    content_preview = content[:2000] if len(content) > 2000 else content
-                    content_text += f"Content: {content_preview}\n"
-                
-                content_text += f"Search Query: {search_query}"
-                
-                # Get tenant_id from session if not provided
-                if not tenant_id:
-                    from app.models.database import Session as SessionModel
-                    from sqlalchemy import select
-                    session_result = await db.execute(
-                        select(SessionModel.tenant_id).where(SessionModel.id == session_id)
-                    )
-                    tenant_id = session_result.scalar_one_or_none()
-                
-                # Index in long-term memory
-                await self.memory_manager.add_long_term_memory(
-                    db=db,
-                    content=content_text,
-                    learned_from_sessions=[session_id],
-                    importance_score=importance_score,
-                    tenant_id=tenant_id,
-                )
-                
-                indexed_count += 1
-                logger.info(f"Indexed web search result: {title}")
-                
-            except Exception as e:
-                errors.append(f"Result {result.get('url', 'unknown')}: {str(e)}")
-                logger.error(f"Error indexing web search result: {e}")
-        
-        return {
-            "indexed": indexed_count,
-            "errors": errors,
-            "total": len(results),
-        }
+        jobs = self.build_search_result_jobs(
+            search_query, results, session_id, importance_score=importance_score, tenant_id=tenant_id
+        )
+        stats = await self.index_jobs(db, jobs)
+        stats["total"] = len(results)
+        return stats
     
     async def index_web_fetch_result(
         self,
@@ -141,41 +233,292 @@ class WebIndexer:
         Index a single web fetch result into long-term memory.
         Returns True if indexed, False otherwise.
         """
+        job = self.build_web_fetch_job(url, result, session_id, importance_score=importance_score, tenant_id=tenant_id)
+        if job is None:
+            logger.debug(f"No content to index for URL: {url}")
+            return False
         try:
-            title = result.get('title', 'N/A')
-            content = result.get('content', '')
-            
-            if not content:
-                logger.debug(f"No content to index for URL: {url}")
-                return False
-            
-            # Build content for indexing
-            content_text = f"Web Page: {title}\nURL: {url}\n\nContent:\n{content[:5000]}"  # Limit to 5000 chars
-            
-            # Get tenant_id from session if not provided
-            if not tenant_id:
-                from app.models.database import Session as SessionModel
-                from sqlalchemy import select
-                session_result = await db.execute(
-                    select(SessionModel.tenant_id).where(SessionModel.id == session_id)
-                )
-                tenant_id = session_result.scalar_one_or_none()
+            stats = await self.index_jobs(db, [job])
+        except Exception as e:
+            logger.error(f"Error indexing web fetch result for {url}: {e}", exc_info=True)
+            return False
+        if stats["indexed"]:
+            logger.info(f"Indexed web page: {result.get('title', 'N/A')} ({url})")
+        return stats["indexed"] > 0
+    
+    async def index_jobs(self, db: AsyncSession, jobs: List[WebIndexJob]) -> Dict[str, Any]:
+        """
+        Write web pages to long-term memory, skipping duplicates.
+
+        A page is skipped when its canonical URL or content hash already
+        appeared earlier in the batch, when the tenant already indexed the same
+        content (under any URL), or when the URL was indexed within the
+        tenant's freshness window. Everything else is written in one batch per
+        tenant/session; a failing batch is rolled back and retried page by page,
+        recording each page in the lookup table as it is written.
+        """
+        indexed_count = 0
+        skipped_count = 0
+        errors = []
+        
+        groups: Dict[Tuple[Optional[UUID], UUID], List[WebIndexJob]] = {}
+        seen = set()
+        tenant_by_session: Dict[UUID, Optional[UUID]] = {}
+        for job in jobs:
+            if job.tenant_id is None:
+                if job.session_id not in tenant_by_session:
+                    tenant_by_session[job.session_id] = await self._resolve_tenant_id(db, job.session_id)
+                job.tenant_id = tenant_by_session[job.session_id]
+            url_key = (job.tenant_id, job.url_hash)
+            content_key = (job.tenant_id, job.content_hash)
+            if url_key in seen or content_key in seen:
+                skipped_count += 1
+                continue
+            seen.update((url_key, content_key))
+            groups.setdefault((job.tenant_id, job.session_id), []).append(job)
+        
+        for (tenant_id, session_id), group in groups.items():
+            if tenant_id:
+                group, stale = await self._filter_indexed(db, tenant_id, group)
+                skipped_count += stale
+            if not group:
+                continue
+            try:
+                indexed, near_duplicates = await self._write_batch(db, tenant_id, session_id, group)
+                indexed_count += indexed
+                skipped_count += near_duplicates
+                continue
+            except Exception as e:
+                logger.warning(f"Batch indexing of {len(group)} web pages failed, retrying one by one: {e}")
+                await self._rollback(db)
             
-            # Index in long-term memory
-            await self.memory_manager.add_long_term_memory(
+            for job in group:
+                try:
+                    result = await self.memory_manager.add_long_term_memory(
+                        db=db,
+                        content=job.content_text,
+                        learned_from_sessions=[session_id],
+                        importance_score=job.importance_score,
+                        tenant_id=tenant_id,
+                    )
+                    if tenant_id:
+                        memory_id = result[1] if isinstance(result, tuple) else None
+                        memory_id = UUID(str(memory_id)) if memory_id else None
+                        await self._record_indexed(db, tenant_id, [(job, memory_id)])
+                        await db.commit()
+                        if job.replaces_memory_id and job.replaces_memory_id != memory_id:
+                            await self._delete_replaced(db, tenant_id, [job.replaces_memory_id])
+                    indexed_count += 1
+                except Exception as e:
+                    errors.append(f"Result {job.url}: {str(e)}")
+                    logger.error(f"Error indexing web result {job.url}: {e}")
+                    await self._rollback(db)
+        
+        if indexed_count or skipped_count:
+            increment_counter("web_index_pages_total", value=indexed_count, labels={"outcome": "indexed"})
+            increment_counter("web_index_pages_total", value=skipped_count, labels={"outcome": "skipped"})
+            logger.info(f"🌐 Indexed {indexed_count} web pages ({skipped_count} duplicates or still fresh)")
+        
+        return {
+            "indexed": indexed_count,
+            "skipped": skipped_count,
+            "errors": errors,
+            "total": len(jobs),
+        }
+    
+    async def _rollback(self, db: AsyncSession) -> None:
+        """Discard rows staged by a failed write so the next commit doesn't persist them"""
+        try:
+            await db.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback after failed web indexing failed: {e}")
+    
+    async def _resolve_tenant_id(self, db: AsyncSession, session_id: UUID) -> Optional[UUID]:
+        session_result = await db.execute(
+            select(SessionModel.tenant_id).where(SessionModel.id == session_id)
+        )
+        tenant_id = session_result.scalar_one_or_none()
+        return tenant_id or getattr(self.memory_manager, "tenant_id", None)
+    
+    async def _freshness_hours(self, db: AsyncSession, tenant_id: UUID) -> float:
+        """Freshness window of the tenant (metadata "web_index_freshness_hours" or the global default)"""
+        now = time.monotonic()
+        cached = _tenant_freshness_cache.get(tenant_id)
+        if cached and now - cached[0] < _FRESHNESS_CACHE_TTL_SECONDS:
+            return cached[1]
+        hours = float(settings.web_index_freshness_hours)
+        try:
+            result = await db.execute(select(Tenant.tenant_metadata).where(Tenant.id == tenant_id))
+            metadata = result.scalar_one_or_none() or {}
+            if isinstance(metadata, dict) and metadata.get("web_index_freshness_hours") is not None:
+                hours = float(metadata["web_index_freshness_hours"])
+        except Exception as e:
+            logger.debug(f"Could not read web index freshness for tenant {tenant_id}: {e}")
+        _tenant_freshness_cache[tenant_id] = (now, hours)
+        return hours
+    
+    async def _filter_indexed(
+        self,
+        db: AsyncSession,
+        tenant_id: UUID,
+        jobs: List[WebIndexJob],
+    ) -> Tuple[List[WebIndexJob], int]:
+        """
+        Drop pages the tenant already has (same content) or indexed too recently (same URL).
+        Kept pages whose URL was indexed before remember the memory they replace.
+        """
+        result = await db.execute(
+            select(IndexedWebPage).where(
+                IndexedWebPage.tenant_id == tenant_id,
+                or_(
+                    IndexedWebPage.url_hash.in_([job.url_hash for job in jobs]),
+                    IndexedWebPage.content_hash.in_([job.content_hash for job in jobs]),
+                ),
+            )
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return jobs, 0
+        
+        known_hashes = {row.content_hash for row in rows}
+        indexed_by_url = {row.url_hash: row for row in rows}
+        fresh_after = datetime.now(timezone.utc) - timedelta(hours=await self._freshness_hours(db, tenant_id))
+        
+        kept = []
+        for job in jobs:
+            if job.content_hash in known_hashes:
+                continue
+            previous = indexed_by_url.get(job.url_hash)
+            if previous is not None:
+                if previous.indexed_at is not None and previous.indexed_at >= fresh_after:
+                    continue
+                job.replaces_memory_id = previous.memory_id
+            kept.append(job)
+        return kept, len(jobs) - len(kept)
+    
+    async def _record_indexed(
+        self,
+        db: AsyncSession,
+        tenant_id: UUID,
+        indexed: List[Tuple[WebIndexJob, Optional[UUID]]],
+    ) -> None:
+        """Stage lookup rows for (page, memory id) pairs in the current transaction"""
+        if not indexed:
+            return
+        rows = [
+            {
+                "tenant_id": tenant_id,
+                "url_hash": job.url_hash,
+                "canonical_url": job.canonical_url,
+                "content_hash": job.content_hash,
+                "memory_id": memory_id,
+                "indexed_at": datetime.now(timezone.utc),
+            }
+            for job, memory_id in indexed
+        ]
+        statement = pg_insert(IndexedWebPage).values(rows)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[IndexedWebPage.tenant_id, IndexedWebPage.url_hash],
+                set_={
+                    "content_hash": statement.excluded.content_hash,
+                    "memory_id": statement.excluded.memory_id,
+                    "indexed_at": statement.excluded.indexed_at,
+                },
+            )
+        )
+    
+    async def _write_batch(
+        self,
+        db: AsyncSession,
+        tenant_id: Optional[UUID],
+        session_id: UUID,
+        jobs: List[WebIndexJob],
+    ) -> Tuple[int, int]:
+        """
+        Write a batch of pages to long-term memory.
+
+        Pages nearly identical to an existing memory or to an earlier page of the
+        batch are not written again: their lookup row points at that memory.
+        Memories of re-indexed URLs that nothing points at anymore are deleted
+        once the batch is committed.
+
+        Returns:
+            (indexed, skipped as near-duplicates)
+        """
+        embeddings, matches = await self.memory_manager.find_near_duplicates(
+            [job.content_text for job in jobs],
+            tenant_id=tenant_id,
+            similarity_threshold=settings.web_index_similarity_threshold,
+        )
+        new_indexes = [index for index, match in enumerate(matches) if match is None]
+        existing_ids = await self._memory_ids_by_embedding(
+            db, [match for match in matches if isinstance(match, str)]
+        )
+        memory_ids: List[Optional[UUID]] = [None] * len(jobs)
+        
+        async def record_indexed(memories: List[Any]) -> None:
+            for index, memory in zip(new_indexes, memories):
+                memory_ids[index] = memory.id
+            for index, match in enumerate(matches):
+                if isinstance(match, str):
+                    memory_ids[index] = existing_ids.get(match)
+                elif isinstance(match, int):
+                    memory_ids[index] = memory_ids[match]
+            if tenant_id:
+                await self._record_indexed(db, tenant_id, list(zip(jobs, memory_ids)))
+        
+        if new_indexes:
+            memories = await self.memory_manager.add_long_term_memories(
                 db=db,
-                content=content_text,
+                contents=[jobs[index].content_text for index in new_indexes],
                 learned_from_sessions=[session_id],
-                importance_score=importance_score,
+                importance_scores=[jobs[index].importance_score for index in new_indexes],
                 tenant_id=tenant_id,
+                before_commit=record_indexed,
+                embeddings=[embeddings[index] for index in new_indexes],
             )
-            
-            logger.info(f"Indexed web page: {title} ({url})")
-            return True
-            
+            if not memories:
+                return 0, 0
+        else:
+            await record_indexed([])
+            await db.commit()
+        
+        if tenant_id:
+            replaced = {
+                job.replaces_memory_id
+                for job, memory_id in zip(jobs, memory_ids)
+                if job.replaces_memory_id and job.replaces_memory_id != memory_id
+            }
+            await self._delete_replaced(db, tenant_id, list(replaced))
+        return len(new_indexes), len(jobs) - len(new_indexes)
+    
+    async def _memory_ids_by_embedding(self, db: AsyncSession, embedding_ids: List[str]) -> Dict[str, UUID]:
+        if not embedding_ids:
+            return {}
+        result = await db.execute(
+            select(MemoryLong.embedding_id, MemoryLong.id).where(MemoryLong.embedding_id.in_(embedding_ids))
+        )
+        return {embedding_id: memory_id for embedding_id, memory_id in result.all()}
+    
+    async def _delete_replaced(self, db: AsyncSession, tenant_id: UUID, memory_ids: List[UUID]) -> None:
+        """Delete memories of re-indexed URLs, unless another indexed page still points at them"""
+        if not memory_ids:
+            return
+        try:
+            result = await db.execute(
+                select(IndexedWebPage.memory_id).where(
+                    IndexedWebPage.tenant_id == tenant_id,
+                    IndexedWebPage.memory_id.in_(memory_ids),
+                )
+            )
+            still_used = set(result.scalars().all())
+            unused = [memory_id for memory_id in memory_ids if memory_id not in still_used]
+            if unused:
+                await self.memory_manager.delete_long_term_memories(db, unused, tenant_id=tenant_id)
         except Exception as e:
-            logger.error(f"Error indexing web fetch result for {url}: {e}", exc_info=True)
-            return False
+            logger.warning(f"Could not delete {len(memory_ids)} replaced web memories: {e}")
+            await self._rollback(db)
     
     async def index_browser_snapshot(
         self,
@@ -215,3 +558,115 @@ class WebIndexer:
             logger.error(f"Error indexing browser snapshot for {url}: {e}", exc_info=True)
             return False
 
+
+
+class WebIndexQueue:
+    """
+    Background queue that indexes web pages off the request path.
+
+    Tool calls enqueue jobs and return immediately; a single worker collects
+    jobs into batches (up to `batch_size`, waiting at most `flush_interval`
+    seconds) and indexes each batch with its own database session. When the
+    queue is full, new jobs are dropped rather than slowing down the caller.
+    """
+
+    def __init__(
+        self,
+        indexer_factory: Callable[[], WebIndexer],
+        session_factory: Callable[[], Any],
+        max_size: int = 500,
+        batch_size: int = 20,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self._indexer_factory = indexer_factory
+        self._session_factory = session_factory
+        self._max_size = max(1, max_size)
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0.0, flush_interval)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._collecting: List[WebIndexJob] = []  # Taken off the queue, batch not full yet
+        self._in_flight: Optional[asyncio.Task] = None  # Batch being indexed
+
+    def enqueue(self, jobs: List[WebIndexJob]) -> int:
+        """Queue jobs for indexing (starting the worker if needed). Returns how many were queued."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_size)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(), name="web-index-queue")
+        queued = 0
+        for job in jobs:
+            try:
+                self._queue.put_nowait(job)
+                queued += 1
+            except asyncio.QueueFull:
+                increment_counter("web_index_pages_total", labels={"outcome": "dropped"})
+        if queued < len(jobs):
+            logger.warning(f"⚠️  Web index queue full, dropped {len(jobs) - queued} pages")
+        return queued
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _next_batch(self) -> List[WebIndexJob]:
+        batch = self._collecting = [await self._queue.get()]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            # Shielded: cancelling the worker in stop() must not abort a batch halfway
+            self._in_flight = asyncio.create_task(self._process(batch))
+            await asyncio.shield(self._in_flight)
+            self._in_flight = None
+
+    async def _process(self, batch: List[WebIndexJob]) -> None:
+        try:
+            indexer = self._indexer_factory()
+            async with self._session_factory() as db:
+                await indexer.index_jobs(db, batch)
+        except Exception as e:
+            logger.warning(f"Failed to index {len(batch)} web pages in background: {e}", exc_info=True)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """
+        Stop the worker, let the batch being indexed finish, then index what is
+        still queued; both within `drain_timeout` seconds overall.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        in_flight = self._in_flight
+        remaining: List[WebIndexJob] = []
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+            remaining.extend(self._collecting)
+            self._collecting = []
+        if in_flight is not None and not in_flight.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(in_flight), timeout=max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                logger.warning("⚠️  Web index batch still running at shutdown")
+        self._in_flight = None
+        while self._queue is not None and not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if not remaining:
+            return
+        try:
+            await asyncio.wait_for(self._process(remaining), timeout=max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️  Dropped {len(remaining)} queued web pages at shutdown")
@@ -100,7 +100,7 @@ async def test_contradiction_detection():
             )
             print(f"Memorie simili trovate: {len(similar)}")
             for i, mem in enumerate(similar, 1):
-                print(f"  {i}. {mem[:100]}...")
+                print(f"  {i}. {mem['content'][:100]}... (similarity: {mem.get('similarity')})")
         
         print("=" * 80)
 
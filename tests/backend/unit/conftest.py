@@ -3,11 +3,14 @@ Pytest configuration and fixtures
 """
 import pytest
 import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.db.database import Base, get_db
 from app.core.config import settings
+from app.core.memory_manager import MemoryManager
 
 
 # Create in-memory database for testing
@@ -47,6 +50,54 @@ def override_get_db(db_session):
     return _get_db
 
 
+def _query_result(scalar=None, rows=()):
+    """Mock result of `db.execute` for scalar_one_or_none() and scalars().all()"""
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = scalar
+    result.scalars.return_value.all.return_value = list(rows)
+    return result
+
+
+@pytest.fixture
+def query_result():
+    """Factory of mock query results, for `db.execute.side_effect` sequences"""
+    return _query_result
+
+
+@pytest.fixture
+def mock_db_factory():
+    """Factory of mock database sessions whose queries all return the given scalar and rows"""
+    def factory(scalar=None, rows=()):
+        db = AsyncMock()
+        db.execute.return_value = _query_result(scalar, rows)
+        # Session.add / add_all are synchronous
+        db.add = MagicMock()
+        db.add_all = MagicMock()
+        return db
+    return factory
+
+
+@pytest.fixture
+def mock_db(mock_db_factory):
+    """Mock database session returning no tenant and no rows"""
+    return mock_db_factory()
+
+
+@pytest.fixture
+def mock_memory_manager():
+    """Mock memory manager; batched adds return one row (with an id) per content, no near duplicates"""
+    manager = MagicMock(spec=MemoryManager)
+    manager.add_long_term_memory = AsyncMock()
+    manager.add_long_term_memories = AsyncMock(
+        side_effect=lambda **kwargs: [MagicMock(id=uuid4()) for _ in kwargs["contents"]]
+    )
+    manager.find_near_duplicates = AsyncMock(
+        side_effect=lambda contents, **kwargs: ([[1.0]] * len(contents), [None] * len(contents))
+    )
+    manager.delete_long_term_memories = AsyncMock(return_value=0)
+    return manager
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Create event loop for async tests"""
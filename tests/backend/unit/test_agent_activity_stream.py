@@ -0,0 +1,82 @@
+import time
+from datetime import datetime, UTC
+from uuid import uuid4
+
+import pytest
+
+from app.services.agent_activity_stream import (
+    AgentActivityStream,
+    OVERFLOW_COALESCE,
+    OVERFLOW_DROP_OLDEST,
+)
+
+
+def _event(agent_id: str, status: str) -> dict:
+    return {
+        "agent_id": agent_id,
+        "agent_name": agent_id,
+        "status": status,
+        "timestamp": datetime.now(UTC),
+    }
+
+
+@pytest.mark.asyncio
+async def test_publish_delivers_and_keeps_bounded_history() -> None:
+    stream = AgentActivityStream(history_size=2)
+    session_id = uuid4()
+    queue = await stream.register(session_id)
+
+    for status in ("started", "waiting", "completed"):
+        stream.publish(session_id, _event("planner", status))
+
+    assert [event["status"] for event in stream.snapshot(session_id)] == ["waiting", "completed"]
+    assert queue.qsize() == 3
+    assert isinstance((await queue.get())["timestamp"], str)
+    assert stream.get_active_sessions() == [session_id]
+
+    await stream.unregister(session_id, queue)
+    assert stream.get_active_sessions() == []
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_overflow_policies() -> None:
+    session_id = uuid4()
+
+    coalescing = AgentActivityStream(queue_size=2, overflow_policy=OVERFLOW_COALESCE)
+    queue = await coalescing.register(session_id)
+    coalescing.publish(session_id, _event("planner", "started"))
+    coalescing.publish(session_id, _event("tool", "started"))
+    coalescing.publish(session_id, _event("planner", "completed"))
+
+    pending = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert [(e["agent_id"], e["status"]) for e in pending] == [
+        ("planner", "completed"),
+        ("tool", "started"),
+    ]
+    assert coalescing.stats["coalesced"] == 1
+
+    dropping = AgentActivityStream(queue_size=2, overflow_policy=OVERFLOW_DROP_OLDEST)
+    queue = await dropping.register(session_id)
+    for status in ("a", "b", "c"):
+        dropping.publish(session_id, _event("planner", status))
+
+    pending = [queue.get_nowait()["status"] for _ in range(queue.qsize())]
+    assert pending == ["b", "c"]
+    assert dropping.stats["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_inactive_history_expires() -> None:
+    stream = AgentActivityStream(history_ttl_seconds=0)
+    idle_session = uuid4()
+    live_session = uuid4()
+    await stream.register(live_session)
+
+    stream.publish(idle_session, _event("planner", "completed"))
+    time.sleep(0.01)
+    stream._last_sweep -= 10  # force the next publish to sweep
+    stream.publish(live_session, _event("planner", "started"))
+
+    assert stream.snapshot(idle_session) == []
+    assert len(stream.snapshot(live_session)) == 1
+    assert stream.stats["expired_sessions"] == 1
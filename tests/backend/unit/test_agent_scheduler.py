@@ -1,10 +1,10 @@
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
 from uuid import uuid4
 
 import pytest
 
 from app.services.agent_scheduler import AgentScheduler, ScheduledAgent
-from app.services.task_queue import TaskQueue, Task, TaskPriority
+from app.services.task_queue import TaskQueue, Task, TaskPriority, TaskStatus
 
 
 @pytest.mark.asyncio
@@ -50,3 +50,68 @@ async def test_agent_scheduler_enqueues_tasks() -> None:
     assert tasks[0].payload["value"] == 1
     assert dispatcher_calls == [session_id]
 
+
+
+@pytest.mark.asyncio
+async def test_agent_scheduler_only_runs_due_agents() -> None:
+    queue = TaskQueue()
+    calls = []
+
+    async def poller():
+        calls.append(datetime.now(UTC))
+        return []
+
+    scheduler = AgentScheduler(task_queue=queue, tick_seconds=1)
+    scheduler.register_agent(
+        ScheduledAgent(name="hourly", interval_seconds=3600, poller=poller)
+    )
+
+    await scheduler._poll_agents()  # type: ignore[attr-defined]
+    await scheduler._poll_agents()  # type: ignore[attr-defined]
+    assert len(calls) == 1
+
+    # The next run is declared ahead, nothing is polled until then
+    next_due = scheduler.next_deadline()
+    assert next_due is not None and next_due > datetime.now(UTC) + timedelta(minutes=59)
+
+    # An explicit schedule brings the run forward
+    scheduler.schedule_agent("hourly")
+    await scheduler._poll_agents()  # type: ignore[attr-defined]
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_agent_scheduler_waiting_task_timeout() -> None:
+    queue = TaskQueue()
+    session_id = uuid4()
+    dispatcher_calls = []
+
+    class FakeDispatcher:
+        def schedule_dispatch(self, sid):
+            dispatcher_calls.append(sid)
+
+    scheduler = AgentScheduler(
+        task_queue=queue,
+        tick_seconds=1,
+        dispatcher=FakeDispatcher(),
+        waiting_task_timeout_seconds=300,
+    )
+
+    fresh = Task(type="example", payload={}, origin="test")
+    old = Task(
+        type="example",
+        payload={},
+        origin="test",
+        created_at=datetime.now(UTC) - timedelta(minutes=10),
+    )
+    queue.enqueue(session_id, fresh)
+    queue.enqueue(session_id, old)
+    queue.update_task(session_id, fresh.id, status=TaskStatus.WAITING_USER)
+    queue.update_task(session_id, old.id, status=TaskStatus.WAITING_USER)
+
+    await scheduler._poll_agents()  # type: ignore[attr-defined]
+    assert dispatcher_calls == [session_id]
+
+    # Once the user answers the timeout is cancelled and never fires
+    queue.complete_task(session_id, fresh.id)
+    assert scheduler.next_deadline() > datetime.now(UTC) + timedelta(minutes=4)
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.services import calendar_service as calendar_module
+from app.services.calendar_service import CalendarService
+
+
+def _google_event(event_id: str, start: datetime, summary: str, status: str = "confirmed") -> Dict[str, Any]:
+    return {
+        "id": event_id,
+        "summary": summary,
+        "status": status,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(hours=1)).isoformat()},
+    }
+
+
+class FakeEventsResource:
+    def __init__(self, service: "FakeCalendarService") -> None:
+        self._service = service
+
+    def list(self, **params: Any):
+        self._service.calls.append({k: v for k, v in params.items() if v is not None})
+        service = self._service
+
+        class _Request:
+            def execute(self_inner) -> Dict[str, Any]:
+                if "syncToken" in params:
+                    if service.expire_token:
+                        raise HttpError(httplib2.Response({"status": 410}), b"gone")
+                    changes, service.changes = service.changes, []
+                    return {"items": changes, "nextSyncToken": "token-2"}
+                return {"items": list(service.stored), "nextSyncToken": "token-1"}
+
+        return _Request()
+
+
+class FakeCalendarService:
+    def __init__(self, events: List[Dict[str, Any]]) -> None:
+        self.stored = events
+        self.changes: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self.expire_token = False
+
+    def events(self) -> FakeEventsResource:  # mimics googleapiclient's resource()
+        return FakeEventsResource(self)
+
+
+@pytest.fixture(autouse=True)
+def _calendar_cache(monkeypatch):
+    calendar_module.invalidate_google_event_cache()
+    monkeypatch.setattr(calendar_module.settings, "calendar_cache_enabled", True)
+    monkeypatch.setattr(calendar_module.settings, "calendar_cache_ttl_seconds", 0)
+    monkeypatch.setattr(calendar_module.settings, "calendar_cache_horizon_days", 30)
+    yield
+    calendar_module.invalidate_google_event_cache()
+
+
+def _service_with(events: List[Dict[str, Any]]) -> tuple[CalendarService, FakeCalendarService]:
+    service = CalendarService()
+    fake = FakeCalendarService(events)
+    service._services[service._get_service_key("google", "integration-1")] = fake
+    return service, fake
+
+
+@pytest.mark.asyncio
+async def test_events_are_served_from_cache_with_incremental_sync() -> None:
+    now = datetime.now(timezone.utc)
+    service, fake = _service_with([
+        _google_event("a", now + timedelta(hours=1), "Standup"),
+        _google_event("b", now + timedelta(days=3), "Review"),
+    ])
+
+    events = await service.get_google_events(
+        start_time=now, end_time=now + timedelta(hours=2), integration_id="integration-1"
+    )
+    assert [event["summary"] for event in events] == ["Standup"]
+    assert "timeMin" in fake.calls[0] and "syncToken" not in fake.calls[0]
+
+    # Changes arrive through the sync token; no windowed re-download
+    fake.changes = [
+        _google_event("a", now + timedelta(hours=1), "Standup", status="cancelled"),
+        _google_event("c", now + timedelta(hours=1, minutes=30), "Lunch"),
+    ]
+    events = await service.get_google_events(
+        start_time=now, end_time=now + timedelta(days=7), integration_id="integration-1"
+    )
+    assert [event["summary"] for event in events] == ["Lunch", "Review"]
+    assert fake.calls[1]["syncToken"] == "token-1"
+    assert len(fake.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_sync_token_triggers_full_sync() -> None:
+    now = datetime.now(timezone.utc)
+    service, fake = _service_with([_google_event("a", now + timedelta(hours=1), "Standup")])
+
+    await service.get_google_events(integration_id="integration-1")
+    fake.expire_token = True
+    events = await service.get_google_events(integration_id="integration-1")
+
+    assert [event["summary"] for event in events] == ["Standup"]
+    assert "timeMin" in fake.calls[-1]
+
+
+@pytest.mark.asyncio
+async def test_windows_outside_cache_are_fetched_directly() -> None:
+    now = datetime.now(timezone.utc)
+    far = now + timedelta(days=90)
+    service, fake = _service_with([_google_event("x", far, "Conference")])
+
+    events = await service.get_google_events(
+        start_time=far - timedelta(days=1), end_time=far + timedelta(days=1), integration_id="integration-1"
+    )
+    assert [event["summary"] for event in events] == ["Conference"]
+    assert fake.calls[-1]["orderBy"] == "startTime"
+
+
+@pytest.mark.asyncio
+async def test_deleting_an_integration_drops_its_cached_events(mock_db_factory) -> None:
+    from app.api.integrations.calendars import delete_calendar_integration
+
+    integration_id = uuid4()
+    calendar_module._google_event_caches[(str(integration_id), "primary")] = calendar_module._GoogleEventCache()
+    calendar_module._google_event_caches[("other", "primary")] = calendar_module._GoogleEventCache()
+
+    await delete_calendar_integration(integration_id, db=mock_db_factory(scalar=MagicMock()), tenant_id=uuid4())
+
+    assert list(calendar_module._google_event_caches) == [("other", "primary")]
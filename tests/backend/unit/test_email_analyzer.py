@@ -0,0 +1,113 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services import email_analyzer as analyzer_module
+from app.services.email_analyzer import EmailAnalyzer
+
+
+class FakeLLMClient:
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+
+    async def generate_with_context(self, prompt: str, **kwargs: Any) -> str:
+        self.prompts.append(prompt)
+        if "[1]" in prompt:
+            count = prompt.count("Mittente:")
+            return json.dumps([
+                {
+                    "index": index,
+                    "category": "direct",
+                    "requires_action": True,
+                    "action_type": "reply",
+                    "action_summary": "Rispondere",
+                    "urgency": "HIGH",
+                    "reasoning": "domanda diretta",
+                }
+                for index in range(1, count + 1)
+            ])
+        return json.dumps({
+            "requires_action": False,
+            "action_type": None,
+            "action_summary": "",
+            "urgency": "low",
+            "reasoning": "single",
+        })
+
+
+def _email(email_id: str, **overrides: Any) -> Dict[str, Any]:
+    email = {
+        "id": email_id,
+        "from": "Mario Rossi <mario@example.com>",
+        "subject": f"Domanda {email_id}",
+        "snippet": "Puoi confermare?",
+        "category": "direct",
+        "labels": [],
+    }
+    email.update(overrides)
+    return email
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    analyzer_module._analysis_cache.clear()
+    monkeypatch.setattr(analyzer_module.settings, "email_analysis_batch_size", 10)
+    monkeypatch.setattr(analyzer_module.settings, "email_analysis_prefilter_enabled", True)
+    monkeypatch.setattr(analyzer_module.settings, "email_analysis_cache_size", 100)
+    yield
+    analyzer_module._analysis_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_emails_are_triaged_in_one_batched_call() -> None:
+    llm = FakeLLMClient()
+    analyzer = EmailAnalyzer(ollama_client=llm)
+    emails = [_email(str(i)) for i in range(5)]
+
+    results = await analyzer.analyze_emails(emails, integration_id="mailbox-1")
+
+    assert len(llm.prompts) == 1
+    assert set(results) == {e["id"] for e in emails}
+    assert results["0"]["urgency"] == "high"
+    assert results["0"]["action_type"] == "reply"
+
+    # Analyses are cached by mailbox and message id
+    await analyzer.analyze_emails(emails, integration_id="mailbox-1")
+    assert await analyzer.analyze_email(emails[0], integration_id="mailbox-1") == results["0"]
+    assert len(llm.prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_analyses_are_not_shared_across_mailboxes() -> None:
+    llm = FakeLLMClient()
+    analyzer = EmailAnalyzer(ollama_client=llm)
+
+    first = await analyzer.analyze_email(_email("same-id"), integration_id="mailbox-1")
+    other = await analyzer.analyze_email(_email("same-id", subject="Altro"), integration_id="mailbox-2")
+    await analyzer.analyze_email(_email("same-id"), integration_id=None)
+    await analyzer.analyze_email(_email("same-id"), integration_id=None)
+
+    assert first == other  # Same fake answer, but each mailbox asked the LLM
+    assert len(llm.prompts) == 4
+    assert set(analyzer_module._analysis_cache) == {("mailbox-1", "same-id"), ("mailbox-2", "same-id")}
+
+
+@pytest.mark.asyncio
+async def test_bulk_mail_is_preclassified_without_llm() -> None:
+    llm = FakeLLMClient()
+    analyzer = EmailAnalyzer(ollama_client=llm)
+    emails = [
+        _email("promo", category="promotional"),
+        _email("newsletter", category="unknown", bulk=True, **{"from": "news@shop.example"}),
+        _email("urgent-promo", category="promotional", subject="URGENTE: fattura"),
+    ]
+
+    results = await analyzer.analyze_emails(emails)
+
+    assert results["promo"]["prefiltered"] is True
+    assert results["promo"]["requires_action"] is False
+    assert results["newsletter"]["category"] == "mailing_list"
+    # Urgent subjects always reach the LLM (single email -> single analysis)
+    assert "prefiltered" not in results["urgent-promo"]
+    assert len(llm.prompts) == 1
@@ -2,20 +2,11 @@
 Test suite for Email Indexer Service
 """
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import patch
 from uuid import uuid4
 from datetime import datetime
 
 from app.services.email_indexer import EmailIndexer
-from app.core.memory_manager import MemoryManager
-
-
-@pytest.fixture
-def mock_memory_manager():
-    """Create a mock memory manager"""
-    manager = MagicMock(spec=MemoryManager)
-    manager.add_long_term_memory = AsyncMock()
-    return manager
 
 
 @pytest.fixture
@@ -93,10 +84,10 @@ async def test_calculate_importance(email_indexer, sample_email):
 
 
 @pytest.mark.asyncio
-async def test_index_email_success(email_indexer, sample_email, mock_memory_manager):
+async def test_index_email_success(email_indexer, sample_email, mock_memory_manager, mock_db):
     """Test successful email indexing"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db
     
     result = await email_indexer.index_email(
         db=db,
@@ -114,10 +105,10 @@ async def test_index_email_success(email_indexer, sample_email, mock_memory_mana
 
 
 @pytest.mark.asyncio
-async def test_index_email_skipped(email_indexer, sample_email_no_body, mock_memory_manager):
+async def test_index_email_skipped(email_indexer, sample_email_no_body, mock_memory_manager, mock_db):
     """Test that unimportant emails are skipped"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db
     
     result = await email_indexer.index_email(
         db=db,
@@ -130,10 +121,10 @@ async def test_index_email_skipped(email_indexer, sample_email_no_body, mock_mem
 
 
 @pytest.mark.asyncio
-async def test_index_emails_multiple(email_indexer, sample_email, sample_email_no_body, mock_memory_manager):
+async def test_index_emails_multiple(email_indexer, sample_email, sample_email_no_body, mock_memory_manager, mock_db):
     """Test indexing multiple emails"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db
     
     emails = [sample_email, sample_email_no_body]
     result = await email_indexer.index_emails(
@@ -146,13 +137,15 @@ async def test_index_emails_multiple(email_indexer, sample_email, sample_email_n
     assert result["skipped"] == 1
     assert result["total"] == 2
     assert len(result["errors"]) == 0
+    mock_memory_manager.add_long_term_memories.assert_called_once()
+    mock_memory_manager.add_long_term_memory.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_index_email_error_handling(email_indexer, sample_email, mock_memory_manager):
+async def test_index_email_error_handling(email_indexer, sample_email, mock_memory_manager, mock_db):
     """Test error handling in email indexing"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db
     
     # Make memory manager raise an exception
     mock_memory_manager.add_long_term_memory.side_effect = Exception("Database error")
@@ -167,11 +160,13 @@ async def test_index_email_error_handling(email_indexer, sample_email, mock_memo
 
 
 @pytest.mark.asyncio
-async def test_index_emails_with_errors(email_indexer, sample_email, mock_memory_manager):
+async def test_index_emails_with_errors(email_indexer, sample_email, mock_memory_manager, mock_db):
     """Test indexing emails with some errors"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db
     
+    # The batch write fails, so emails are retried one by one
+    mock_memory_manager.add_long_term_memories.side_effect = Exception("Batch error")
     # First email fails, second succeeds
     mock_memory_manager.add_long_term_memory.side_effect = [
         Exception("Error 1"),
@@ -188,3 +183,106 @@ async def test_index_emails_with_errors(email_indexer, sample_email, mock_memory
     assert result["total"] == 2
     assert len(result["errors"]) > 0
 
+
+
+@pytest.mark.asyncio
+async def test_index_emails_skips_already_indexed_ids(email_indexer, sample_email, mock_memory_manager, mock_db, query_result):
+    """Test that message ids in the lookup table or repeated in the batch are not indexed again"""
+    session_id = uuid4()
+    tenant_id = uuid4()
+    other_email = dict(sample_email, id="email789")
+    mock_db.execute.return_value = query_result(tenant_id, ["email123"])
+    
+    stats = await email_indexer.index_emails(
+        db=mock_db,
+        emails=[sample_email, other_email, dict(other_email)],
+        session_id=session_id,
+    )
+    
+    assert stats["indexed"] == 1
+    assert stats["already_indexed"] == 2
+    assert stats["skipped"] == 2
+    call_kwargs = mock_memory_manager.add_long_term_memories.call_args[1]
+    assert len(call_kwargs["contents"]) == 1
+    assert call_kwargs["tenant_id"] == tenant_id
+    assert call_kwargs["learned_from_sessions"] == [session_id]
+
+
+@pytest.mark.asyncio
+async def test_index_emails_splits_batches(email_indexer, sample_email, mock_memory_manager, mock_db):
+    """Test that candidates are written in batches of email_index_batch_size"""
+    emails = [dict(sample_email, id=f"email{i}") for i in range(5)]
+    
+    with patch("app.services.email_indexer.settings") as mock_settings:
+        mock_settings.email_index_batch_size = 2
+        stats = await email_indexer.index_emails(db=mock_db, emails=emails, session_id=uuid4())
+    
+    assert stats["indexed"] == 5
+    batch_sizes = [len(call[1]["contents"]) for call in mock_memory_manager.add_long_term_memories.call_args_list]
+    assert batch_sizes == [2, 2, 1]
+
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_falls_back_and_records_indexed_ids(email_indexer, sample_email, mock_memory_manager, mock_db, query_result):
+    """Test that the per-email fallback also writes the lookup rows"""
+    tenant_id = uuid4()
+    memory_id = uuid4()
+    # tenant lookup, indexed ids (none of these), then the fallback's lookup inserts
+    mock_db.execute.side_effect = [query_result(tenant_id), query_result(rows=["older"]), query_result(), query_result()]
+    mock_memory_manager.add_long_term_memories.side_effect = Exception("ChromaDB unavailable")
+    mock_memory_manager.add_long_term_memory.return_value = (True, str(memory_id))
+    
+    stats = await email_indexer.index_emails(
+        db=mock_db,
+        emails=[sample_email, dict(sample_email, id="email789")],
+        session_id=uuid4(),
+    )
+    
+    assert stats["indexed"] == 2
+    assert stats["errors"] == []
+    assert mock_memory_manager.add_long_term_memory.await_count == 2
+    inserts = [call.args[0] for call in mock_db.execute.call_args_list[2:]]
+    assert [insert.compile().params["message_id_m0"] for insert in inserts] == ["email123", "email789"]
+    assert inserts[0].compile().params["memory_id_m0"] == memory_id
+    assert mock_db.commit.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_pre_migration_tenant_skips_emails_already_in_memory(email_indexer, sample_email, mock_memory_manager, mock_db, query_result):
+    """Test that a tenant with memories but no lookup rows gets one batched similarity check"""
+    tenant_id = uuid4()
+    existing_id = uuid4()
+    other_email = dict(sample_email, id="email789", subject="Another topic")
+    memory_lookup = query_result()
+    memory_lookup.all.return_value = [("long_1", existing_id)]
+    # tenant, indexed ids, "any lookup row?", "any memory?", memory ids of the matches, lookup insert
+    mock_db.execute.side_effect = [
+        query_result(tenant_id), query_result(), query_result(None), query_result(uuid4()), memory_lookup, query_result(),
+    ]
+    # The first email was indexed before the lookup table existed
+    mock_memory_manager.find_near_duplicates.side_effect = lambda contents, **kwargs: ([[1.0]] * len(contents), ["long_1", None])
+    
+    stats = await email_indexer.index_emails(db=mock_db, emails=[sample_email, other_email], session_id=uuid4())
+    
+    assert stats["indexed"] == 1
+    assert stats["already_indexed"] == 1
+    mock_memory_manager.find_near_duplicates.assert_awaited_once()
+    mock_memory_manager.add_long_term_memory.assert_not_called()
+    assert len(mock_memory_manager.add_long_term_memories.call_args[1]["contents"]) == 1
+    insert = mock_db.execute.call_args_list[5].args[0]
+    assert insert.compile().params["message_id_m0"] == "email123"
+    assert insert.compile().params["memory_id_m0"] == existing_id
+
+
+@pytest.mark.asyncio
+async def test_new_tenant_takes_the_batched_path(email_indexer, sample_email, mock_memory_manager, mock_db, query_result):
+    """Test that a tenant without memories is not similarity-checked"""
+    # tenant, indexed ids, "any lookup row?", "any memory?"
+    mock_db.execute.side_effect = [query_result(uuid4()), query_result(), query_result(None), query_result(None)]
+    
+    stats = await email_indexer.index_emails(db=mock_db, emails=[sample_email], session_id=uuid4())
+    
+    assert stats["indexed"] == 1
+    mock_memory_manager.find_near_duplicates.assert_not_called()
+    mock_memory_manager.add_long_term_memories.assert_awaited_once()
@@ -0,0 +1,54 @@
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import FileContent
+from app.services.file_content_store import FileContentStore
+
+
+def _db_returning(content):
+    db = MagicMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = content
+    db.execute = AsyncMock(return_value=result)
+    db.delete = AsyncMock()
+    return db
+
+
+def _content(ref_count: int) -> FileContent:
+    return FileContent(
+        tenant_id=uuid4(),
+        sha256="a" * 64,
+        size=10,
+        storage_path="/uploads/users/u1/first.pdf",
+        extracted_text="quarterly numbers",
+        ref_count=ref_count,
+    )
+
+
+@pytest.mark.asyncio
+async def test_acquire_reuses_existing_content() -> None:
+    content = _content(ref_count=1)
+    store = FileContentStore(_db_returning(content))
+
+    reused = await store.acquire(content.tenant_id, content.sha256)
+
+    assert reused is content
+    assert reused.ref_count == 2
+    assert await FileContentStore(_db_returning(None)).acquire(uuid4(), "b" * 64) is None
+
+
+@pytest.mark.asyncio
+async def test_release_deletes_only_last_reference() -> None:
+    shared = _content(ref_count=2)
+    db = _db_returning(shared)
+    assert await FileContentStore(db).release(shared.tenant_id, shared.sha256) is None
+    assert shared.ref_count == 1
+    db.delete.assert_not_awaited()
+
+    last = _content(ref_count=1)
+    db = _db_returning(last)
+    assert await FileContentStore(db).release(last.tenant_id, last.sha256) == "/uploads/users/u1/first.pdf"
+    db.delete.assert_awaited_once_with(last)
@@ -0,0 +1,123 @@
+"""
+Tests for passage-level file retrieval
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.services.file_retrieval import FileRetriever, recency_score, split_passages
+
+
+def _db_with_files(files, extracted_text=None):
+    files_result = MagicMock()
+    files_result.all.return_value = files
+    text_result = MagicMock()
+    text_result.scalar_one_or_none.return_value = extracted_text
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[files_result, text_result])
+    return db
+
+
+def _collection(**methods):
+    collection = MagicMock()
+    collection.metadata = {}
+    for name in ("add", "get", "query"):
+        setattr(collection, name, AsyncMock(return_value=methods.get(name)))
+    return collection
+
+
+def _memory(collection):
+    memory = MagicMock()
+    memory.tenant_id = None
+    memory._get_collection = AsyncMock(return_value=collection)
+    memory.embedding_service.generate_embedding.return_value = [0.1, 0.2]
+    memory.embedding_service.generate_embeddings.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+    memory._distance_to_similarity.side_effect = lambda distance, space="l2": 1.0 - distance / 2.0
+    return memory
+
+
+def test_split_passages_overlap_and_short_text():
+    assert split_passages("breve testo", size=100) == ["breve testo"]
+    assert split_passages("   ") == []
+
+    text = " ".join(f"parola{i}" for i in range(400))
+    passages = split_passages(text, size=300, overlap=50)
+    assert len(passages) > 1
+    assert all(len(p) <= 300 for p in passages)
+    # Consecutive passages overlap
+    assert passages[0][-20:].split()[-1] in passages[1]
+
+
+def test_recency_score_halves_every_half_life():
+    now = datetime.now(timezone.utc)
+    assert recency_score(now, now, 30) == pytest.approx(1.0)
+    assert recency_score(now - timedelta(days=30), now, 30) == pytest.approx(0.5)
+    assert recency_score(None, now, 30) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_retrieve_queries_only_live_files_and_ranks_by_relevance_and_recency():
+    now = datetime.now(timezone.utc)
+    recent_id, old_id = uuid4(), uuid4()
+    db = _db_with_files([
+        (recent_id, "recente.pdf", now, "hash-recent"),
+        (old_id, "vecchio.pdf", now - timedelta(days=365), "hash-old"),
+    ])
+    collection = _collection(query={
+        "documents": [["passaggio vecchio", "passaggio recente", "file cancellato"]],
+        "metadatas": [[
+            {"file_id": str(old_id), "chunk_index": 0},
+            {"file_id": str(recent_id), "chunk_index": 3},
+            {"file_id": str(uuid4()), "chunk_index": 0},
+        ]],
+        "distances": [[0.30, 0.32, 0.0]],
+    })
+    retriever = FileRetriever(_memory(collection))
+
+    results = await retriever.retrieve(db, user_id=uuid4(), tenant_id=uuid4(), query="budget trimestrale 2024")
+
+    where = collection.query.call_args.kwargs["where"]
+    assert {"file_id": {"$in": [str(recent_id), str(old_id)]}} in where["$and"]
+    collection.get.assert_not_awaited()  # No full download of the user's documents
+    assert results == ["[File: recente.pdf]\npassaggio recente", "[File: vecchio.pdf]\npassaggio vecchio"]
+
+
+@pytest.mark.asyncio
+async def test_whole_file_request_reads_stored_text_of_latest_file():
+    file_id = uuid4()
+    db = _db_with_files([(file_id, "report.pdf", datetime.now(timezone.utc), "hash")], extracted_text="Testo completo")
+    collection = _collection(query={"documents": [[]], "metadatas": [[]], "distances": [[]]})
+    retriever = FileRetriever(_memory(collection))
+
+    results = await retriever.retrieve(db, user_id=uuid4(), tenant_id=uuid4(), query="fammi un riassunto del file")
+
+    assert results == ["[File: report.pdf]\nTesto completo"]
+
+
+@pytest.mark.asyncio
+async def test_index_file_reuses_passages_of_identical_content():
+    passages = split_passages("Primo paragrafo.\n\nSecondo paragrafo.", size=1000)
+    collection = _collection(get={
+        "documents": passages,
+        "metadatas": [{"file_id": "other", "chunk_index": i} for i in range(len(passages))],
+        "embeddings": [[0.5, 0.5] for _ in passages],
+    })
+    memory = _memory(collection)
+    retriever = FileRetriever(memory)
+
+    count = await retriever.index_file(
+        tenant_id=uuid4(),
+        user_id=uuid4(),
+        file_id=uuid4(),
+        filename="copia.txt",
+        text="Primo paragrafo.\n\nSecondo paragrafo.",
+        content_hash="same-hash",
+    )
+
+    assert count == len(passages)
+    memory.embedding_service.generate_embeddings.assert_not_called()
+    added = collection.add.call_args.kwargs
+    assert added["embeddings"] == [[0.5, 0.5] for _ in passages]
+    assert added["metadatas"][0]["content_hash"] == "same-hash"
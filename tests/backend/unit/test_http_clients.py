@@ -0,0 +1,69 @@
+"""
+Tests for the shared LLM HTTP client registry
+"""
+import pytest
+
+from app.core import http_clients
+from app.core.config import settings
+from app.core.http_clients import (
+    BACKEND_LLAMA_CPP,
+    BACKEND_OLLAMA,
+    BACKEND_OLLAMA_BACKGROUND,
+    CALL_BACKGROUND,
+    CALL_CHAT,
+    CALL_METADATA,
+    HttpClientRegistry,
+    backend_for_url,
+    llm_timeout,
+)
+from app.core.llama_cpp_client import LlamaCppClient
+from app.core.ollama_client import OllamaClient
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Fresh registry installed as the module-level one"""
+    fresh = HttpClientRegistry()
+    monkeypatch.setattr(http_clients, "_registry", fresh)
+    return fresh
+
+
+@pytest.mark.asyncio
+async def test_clients_of_same_backend_share_one_pool(registry):
+    main = OllamaClient(base_url=settings.ollama_base_url)
+    planner = OllamaClient(base_url=settings.ollama_base_url, model="planner")
+    background = OllamaClient(base_url=settings.ollama_background_base_url)
+    
+    assert main.client is planner.client
+    assert background.client is not main.client
+    assert LlamaCppClient().client is registry.get(BACKEND_LLAMA_CPP)
+    
+    # Closing a client instance must not close the shared pool
+    await main.close()
+    assert not planner.client.is_closed
+    
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_registry_close_and_reopen(registry):
+    client = registry.get(BACKEND_OLLAMA)
+    await registry.aclose()
+    
+    assert client.is_closed
+    reopened = registry.get(BACKEND_OLLAMA)
+    assert reopened is not client and not reopened.is_closed
+    await registry.aclose()
+
+
+def test_background_limits_and_timeouts():
+    assert backend_for_url(settings.ollama_background_base_url) == BACKEND_OLLAMA_BACKGROUND
+    assert backend_for_url(settings.ollama_base_url) == BACKEND_OLLAMA
+    assert llm_timeout(CALL_CHAT).read == settings.llm_chat_timeout_seconds
+    assert llm_timeout(CALL_BACKGROUND).read == settings.llm_background_timeout_seconds
+    assert llm_timeout(CALL_METADATA).read == settings.llm_metadata_timeout_seconds
+    assert llm_timeout(CALL_METADATA).connect <= settings.llm_http_connect_timeout_seconds
+    
+    limits = http_clients._limits(BACKEND_OLLAMA_BACKGROUND)
+    assert limits.max_connections == settings.llm_background_http_max_connections
+    assert limits.max_keepalive_connections <= limits.max_connections
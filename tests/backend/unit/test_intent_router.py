@@ -0,0 +1,144 @@
+"""
+Tests for the fast-path intent router
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.agents.intent_router import (
+    ROUTE_NO_TOOLS,
+    ROUTE_PLANNER,
+    ROUTE_SINGLE_TOOL,
+    IntentRouter,
+)
+
+_TOOLS = ["get_emails", "get_calendar_events", "web_search", "send_email"]
+_EXAMPLES = {
+    ROUTE_NO_TOOLS: ["poesia"],
+    "get_calendar_events": ["scaletta"],
+    ROUTE_PLANNER: ["riepilogo"],
+}
+_VOCABULARY = ["poesia", "scaletta", "riepilogo"]
+
+
+def _embed(text):
+    text = text.lower()
+    return [1.0 if word in text else 0.0 for word in _VOCABULARY] + [0.05]
+
+
+def _router():
+    service = MagicMock()
+    service.generate_embedding.side_effect = _embed
+    service.generate_embeddings.side_effect = lambda texts: [_embed(t) for t in texts]
+    return IntentRouter(service, examples=_EXAMPLES)
+
+
+@pytest.mark.parametrize(
+    "message, route, tool, inputs",
+    [
+        ("Ciao, come stai?", ROUTE_NO_TOOLS, None, {}),
+        ("Ci sono email non lette?", ROUTE_SINGLE_TOOL, "get_emails", {"query": "is:unread"}),
+        ("Cosa ho domani?", ROUTE_SINGLE_TOOL, "get_calendar_events", {"query": "Cosa ho domani?"}),
+        ("Cerca le ultime notizie su Python", ROUTE_SINGLE_TOOL, "web_search",
+         {"query": "Cerca le ultime notizie su Python"}),
+        ("Invia una mail a Marco", ROUTE_PLANNER, None, {}),
+        ("Leggi le email e dimmi gli eventi in calendario", ROUTE_PLANNER, None, {}),
+    ],
+)
+def test_rules(message, route, tool, inputs):
+    decision = _router().rule_decision(message, _TOOLS)
+    assert decision.route == route
+    assert decision.tool == tool
+    assert decision.inputs == inputs
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "spiegami la ricerca operativa",
+        "qual è l'evento più importante della storia romana",
+        "come posso ritrovare la concentrazione?",
+        "riassumi i findings dello studio",
+        "come funziona il protocollo della posta elettronica?",
+    ],
+)
+def test_knowledge_questions_are_not_routed_to_a_tool(message):
+    router = _router()
+    assert router.rule_decision(message, _TOOLS) is None
+    assert router.classify(message, _TOOLS).route != ROUTE_SINGLE_TOOL
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "come si scrive un verbale di riunione?",
+        "what is a meeting agenda template?",
+        "quali impegni di spesa prevede il bilancio?",
+        "cerca nel documento la parola contratto",
+        "trova il file che ho caricato ieri",
+        "help me find the bug in this function",
+        "ho un problema a configurare la posta su Outlook",
+    ],
+)
+def test_non_tool_requests_do_not_skip_the_planner(message):
+    router = _router()
+    decision = router.rule_decision(message, _TOOLS)
+    assert decision is None or decision.route != ROUTE_SINGLE_TOOL
+    assert router.classify(message, _TOOLS).route != ROUTE_SINGLE_TOOL
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["mostrami le mail di Marco", "leggi le email di ieri", "mostrami le mie email sul progetto Apollo"],
+)
+def test_email_filters_the_rules_cannot_extract_go_to_the_planner(message):
+    assert _router().rule_decision(message, _TOOLS).route == ROUTE_PLANNER
+
+
+def test_calendar_words_need_a_personal_or_time_cue():
+    router = _router()
+    assert router.rule_decision("che riunioni ho domani?", _TOOLS).tool == "get_calendar_events"
+    assert router.rule_decision("mostrami il mio calendario", _TOOLS).tool == "get_calendar_events"
+    assert router.rule_decision("il calendario gregoriano", _TOOLS) is None
+
+
+def test_search_keywords_match_whole_words():
+    router = _router()
+    for message in ("Trovami un ristorante a Roma", "find the latest Python release", "fai una ricerca sul meteo"):
+        assert router.rule_decision(message, _TOOLS).tool == "web_search"
+
+
+def test_rules_leave_unclear_messages_and_unavailable_tools_to_the_classifier():
+    router = _router()
+    assert router.rule_decision("scrivi una poesia sul mare", _TOOLS) is None
+    assert router.rule_decision("Ci sono email non lette?", ["web_search"]) is None
+
+
+def test_centroid_classifier_uses_confidence_thresholds():
+    router = _router()
+
+    assert router.classify("scrivi una poesia sul mare", _TOOLS).route == ROUTE_NO_TOOLS
+
+    decision = router.classify("mostrami la scaletta di venerdì", _TOOLS)
+    assert (decision.route, decision.source, decision.tool) == (ROUTE_SINGLE_TOOL, "centroid", "get_calendar_events")
+
+    # Not close to any intent: full planner
+    assert router.classify("qualcosa di diverso", _TOOLS).route == ROUTE_PLANNER
+
+
+def test_single_tool_decision_becomes_a_one_step_plan():
+    analysis = _router().classify("Ci sono email non lette?", _TOOLS).to_analysis()
+    assert analysis["needs_plan"] is True
+    assert analysis["steps"] == [
+        {"description": "Recupero le email", "action": "tool", "tool": "get_emails", "inputs": {"query": "is:unread"}}
+    ]
+    assert _router().classify("buongiorno!", _TOOLS).to_analysis()["needs_plan"] is False
+
+
+@pytest.mark.asyncio
+async def test_router_errors_fall_back_to_planner():
+    router = _router()
+    router.embedding_service.generate_embeddings.side_effect = RuntimeError("model not loaded")
+    decision = await router.route("qualcosa di diverso", _TOOLS)
+    assert decision.route == ROUTE_PLANNER
+    assert decision.source == "default"
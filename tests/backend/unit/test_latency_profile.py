@@ -0,0 +1,73 @@
+"""
+Tests for the per-request latency profile
+"""
+import asyncio
+import importlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import latency_profile
+from app.core.config import settings
+from app.core.latency_profile import RequestProfile, get_current_profile, stage, staged, start_profile
+
+
+@pytest.mark.asyncio
+async def test_stages_accumulate_in_the_request_profile():
+    profile = start_profile()
+
+    async def node(state):
+        with stage("llm.generate"):
+            await asyncio.sleep(0)
+        return state
+
+    timed_node = staged("graph.tool_loop", node)
+    assert await timed_node({"a": 1}) == {"a": 1}
+    await timed_node({})
+    with pytest.raises(RuntimeError):
+        with stage("memory.long_term"):
+            raise RuntimeError("chroma down")
+
+    breakdown = profile.breakdown()
+    assert [(s["name"], s["count"]) for s in breakdown["stages"]] == [
+        ("llm.generate", 2), ("graph.tool_loop", 2), ("memory.long_term", 1),
+    ]
+    assert get_current_profile() is profile
+
+
+def test_server_timing_header_and_closed_profile():
+    profile = RequestProfile()
+    profile.record("memory.long_term", 0.0123)
+    profile.record("graph.tool loop", 0.5)
+    profile.close()
+    profile.record("late", 1.0)
+
+    header = profile.server_timing()
+    assert header.startswith("memory.long_term;dur=12.3, graph.tool_loop;dur=500.0, total;dur=")
+    assert "late" not in header
+
+
+def test_middleware_adds_server_timing_header(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("app.main")
+    monkeypatch.setattr(settings, "latency_profile_server_timing", True)
+
+    app = FastAPI()
+
+    @app.get("/chat")
+    async def chat():
+        with stage("agent"):
+            pass
+        return get_current_profile().breakdown()
+
+    app.add_middleware(module.ObservabilityMiddleware)
+    response = TestClient(app).get("/chat")
+
+    assert response.json()["stages"][0]["name"] == "agent"
+    assert response.headers["Server-Timing"].startswith("agent;dur=")
+
+
+def test_profiling_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "latency_profile_enabled", False)
+    assert latency_profile.start_profile() is None
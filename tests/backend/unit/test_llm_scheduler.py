@@ -0,0 +1,109 @@
+"""
+Tests for the LLM request scheduler
+"""
+import asyncio
+
+import pytest
+
+from app.core.llm_scheduler import (
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+    LANE_PLANNER,
+    LLMRequestCancelled,
+    LLMScheduler,
+    bind_disconnect_check,
+    llm_lane,
+)
+
+
+async def _blocked_call(gate: asyncio.Event, order: list, name: str):
+    order.append(name)
+    await gate.wait()
+    return name
+
+
+@pytest.mark.asyncio
+async def test_waiting_requests_are_admitted_by_lane_priority():
+    scheduler = LLMScheduler(capacities={"ollama": 1}, background_limit=1, poll_interval=0.01)
+    gate = asyncio.Event()
+    order = []
+    
+    running = asyncio.create_task(scheduler.run("ollama", lambda: _blocked_call(gate, order, "first")))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(
+        scheduler.run("ollama", lambda: _blocked_call(gate, order, "background"), lane=LANE_BACKGROUND)
+    )
+    planner = asyncio.create_task(
+        scheduler.run("ollama", lambda: _blocked_call(gate, order, "planner"), lane=LANE_PLANNER)
+    )
+    interactive = asyncio.create_task(scheduler.run("ollama", lambda: _blocked_call(gate, order, "interactive")))
+    await asyncio.sleep(0.01)
+    assert scheduler.stats("ollama") == {"active": 1, "waiting": 3, "capacity": 1}
+    
+    gate.set()
+    await asyncio.gather(running, background, planner, interactive)
+    
+    assert order == ["first", "interactive", "planner", "background"]
+    assert scheduler.stats("ollama")["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_background_lane_cannot_take_every_slot():
+    scheduler = LLMScheduler(capacities={"ollama": 2}, background_limit=1, poll_interval=0.01)
+    gate = asyncio.Event()
+    order = []
+    
+    with llm_lane(LANE_BACKGROUND):
+        first = asyncio.create_task(scheduler.run("ollama", lambda: _blocked_call(gate, order, "bg1")))
+        second = asyncio.create_task(scheduler.run("ollama", lambda: _blocked_call(gate, order, "bg2")))
+    await asyncio.sleep(0.01)
+    
+    # One background request runs, the other waits although a slot is free
+    assert order == ["bg1"]
+    result = await asyncio.wait_for(
+        scheduler.run("ollama", lambda: asyncio.sleep(0, result="chat"), lane=LANE_INTERACTIVE),
+        timeout=1,
+    )
+    assert result == "chat"
+    
+    gate.set()
+    await asyncio.gather(first, second)
+    assert order == ["bg1", "bg2"]
+
+
+@pytest.mark.asyncio
+async def test_disconnected_client_cancels_queued_and_running_calls():
+    scheduler = LLMScheduler(capacities={"ollama": 1}, poll_interval=0.01)
+    disconnected = False
+    
+    async def is_disconnected():
+        return disconnected
+    
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+    
+    async def slow_generation():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    async def request():
+        bind_disconnect_check(is_disconnected)
+        return await scheduler.run("ollama", slow_generation)
+    
+    running = asyncio.create_task(request())
+    queued = asyncio.create_task(request())
+    await started.wait()
+    assert scheduler.stats("ollama")["waiting"] == 1
+    
+    disconnected = True
+    with pytest.raises(LLMRequestCancelled):
+        await running
+    with pytest.raises(LLMRequestCancelled):
+        await queued
+    
+    assert cancelled.is_set()
+    assert scheduler.stats("ollama") == {"active": 0, "waiting": 0, "capacity": 1}
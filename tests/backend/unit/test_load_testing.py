@@ -0,0 +1,91 @@
+"""
+Tests for the load-test harness
+"""
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from app.core.load_testing import (
+    FakeEmbeddingService,
+    LoadTestConfig,
+    parse_server_timing,
+    run_http_load_test,
+    run_in_process_load_test,
+)
+
+
+@pytest.mark.asyncio
+async def test_in_process_load_test_reports_stages_lag_and_pool_wait(tmp_path):
+    config = LoadTestConfig(
+        users=3,
+        turns_per_user=2,
+        token_latency=0.0,
+        first_token_latency=0.001,
+        database_url=f"sqlite+aiosqlite:///{tmp_path / 'load.db'}",
+        db_pool_size=2,
+    )
+    report = await run_in_process_load_test(config)
+
+    assert report.errors == {}
+    assert report.turns == 6
+    data = report.to_dict()
+    assert data["latency"]["count"] == 6
+    assert data["db_pool_wait"]["count"] == 6
+    assert data["event_loop_lag"] is not None
+    assert data["stages"]["graph.tool_loop"]["count"] == 6
+    assert data["stages"]["llm.generate_with_context"]["count"] >= 6
+    assert "graph.tool_loop" in report.to_text()
+
+
+def test_parse_server_timing():
+    header = "auth;dur=1.5, memory.long_term;dur=12.0, tool.execute;desc=x;dur=80, total;dur=100"
+    assert parse_server_timing(header) == [
+        {"name": "auth", "duration_ms": 1.5},
+        {"name": "memory.long_term", "duration_ms": 12.0},
+        {"name": "tool.execute", "duration_ms": 80.0},
+    ]
+    assert parse_server_timing(None) == []
+
+
+def test_fake_embeddings_are_deterministic_and_normalized():
+    service = FakeEmbeddingService(dimensions=32)
+    first = service.generate_embedding("ciao mondo")
+    assert first == service.generate_embeddings(["ciao mondo"])[0]
+    assert sum(v * v for v in first) == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_http_load_test_uses_one_user_and_session_per_simulated_user():
+    created = {}
+    chats = []
+    deleted = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"]
+        if request.method == "POST" and request.url.path == "/api/sessions/":
+            created[token] = str(uuid4())
+            return httpx.Response(201, json={"id": created[token]})
+        if request.method == "POST":
+            chats.append((token, request.url.path))
+            return httpx.Response(200, json={}, headers={"Server-Timing": "graph.tool_loop;dur=5, total;dur=9"})
+        deleted.append((token, request.url.path))
+        return httpx.Response(204)
+
+    config = LoadTestConfig(users=2, turns_per_user=2, base_url="http://backend", auth_tokens=["t0", "t1"])
+    report = await run_http_load_test(config, transport=httpx.MockTransport(handler))
+
+    assert report.errors == {}
+    assert sorted(chats) == sorted(
+        [(f"Bearer {token}", f"/api/sessions/{created[f'Bearer {token}']}/chat") for token in ("t0", "t1")] * 2
+    )
+    assert sorted(deleted) == sorted((token, f"/api/sessions/{session}") for token, session in created.items())
+    data = report.to_dict()
+    assert data["stages"]["graph.tool_loop"]["count"] == 4
+    assert "event_loop_lag" not in data and "db_pool_wait" not in data
+
+
+@pytest.mark.asyncio
+async def test_http_load_test_requires_a_token_per_user():
+    with pytest.raises(ValueError):
+        await run_http_load_test(LoadTestConfig(users=3, base_url="http://backend", auth_tokens=["t0"]))
@@ -0,0 +1,116 @@
+"""
+Tests for MemoryManager retrieval over the in-memory vector store
+"""
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.core.memory_manager import MemoryManager
+from app.core.vector_store import InMemoryVectorStore
+
+
+@pytest.mark.asyncio
+async def test_retrieve_internal_knowledge_returns_ranked_chunks_with_similarity():
+    manager = MemoryManager(vector_store=InMemoryVectorStore())
+    manager.embedding_service = MagicMock()
+    manager.embedding_service.generate_embedding.return_value = [1.0, 0.0]
+
+    collection = await manager.internal_knowledge_collection()
+    await collection.add(
+        ids=["memory_0", "tools_0", "note_0"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]],
+        documents=["Il sistema di memoria ha tre livelli", "I tool disponibili", "nota utente"],
+        metadatas=[
+            {"type": "internal_knowledge", "document": "INTERNAL_MEMORY_SYSTEM.md", "chunk_index": 0},
+            {"type": "internal_knowledge", "document": "INTERNAL_TOOLS.md", "chunk_index": 0},
+            {"type": "user_note"},
+        ],
+    )
+
+    results = await manager.retrieve_internal_knowledge("come funziona la memoria?", n_results=5)
+
+    assert [r["metadata"]["document"] for r in results] == ["INTERNAL_MEMORY_SYSTEM.md", "INTERNAL_TOOLS.md"]
+    assert results[0]["distance"] == pytest.approx(0.0)
+    assert results[0]["similarity"] == pytest.approx(1.0)
+    assert results[1]["similarity"] == pytest.approx(0.0)
+
+
+@pytest.mark.asyncio
+async def test_add_long_term_memories_rolls_back_when_staging_fails():
+    tenant_id = uuid4()
+    manager = MemoryManager(tenant_id=tenant_id, vector_store=InMemoryVectorStore())
+    manager.embedding_service = MagicMock()
+    manager.embedding_service.generate_embeddings.return_value = [[1.0, 0.0], [0.0, 1.0]]
+    db = AsyncMock()
+    db.add_all = MagicMock()
+
+    async def failing_before_commit(memories):
+        raise RuntimeError("lookup insert failed")
+
+    with pytest.raises(RuntimeError):
+        await manager.add_long_term_memories(
+            db=db,
+            contents=["uno", "due"],
+            learned_from_sessions=[uuid4()],
+            importance_scores=[0.5, 0.5],
+            tenant_id=tenant_id,
+            before_commit=failing_before_commit,
+        )
+
+    db.rollback.assert_awaited_once()
+    db.commit.assert_not_awaited()
+    collection = await manager._get_collection("long_term_memory", tenant_id)
+    assert await collection.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_add_long_term_memories_removes_embeddings_when_commit_fails():
+    tenant_id = uuid4()
+    manager = MemoryManager(tenant_id=tenant_id, vector_store=InMemoryVectorStore())
+    manager.embedding_service = MagicMock()
+    manager.embedding_service.generate_embeddings.return_value = [[1.0, 0.0]]
+    db = AsyncMock()
+    db.add_all = MagicMock()
+    db.commit.side_effect = RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        await manager.add_long_term_memories(
+            db=db, contents=["uno"], learned_from_sessions=[uuid4()], importance_scores=[0.5], tenant_id=tenant_id
+        )
+
+    db.rollback.assert_awaited_once()
+    collection = await manager._get_collection("long_term_memory", tenant_id)
+    assert await collection.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_find_near_duplicates_matches_store_and_batch():
+    tenant_id = uuid4()
+    manager = MemoryManager(tenant_id=tenant_id, vector_store=InMemoryVectorStore())
+    manager.embedding_service = MagicMock()
+    manager.embedding_service.generate_embeddings.return_value = [[1.0, 0.0], [0.0, 1.0], [0.01, 1.0]]
+    collection = await manager._get_collection("long_term_memory", tenant_id)
+    await collection.add(ids=["long_old"], embeddings=[[1.0, 0.0]], documents=["vecchia notizia"])
+
+    embeddings, matches = await manager.find_near_duplicates(["notizia", "altra", "altra!"], tenant_id=tenant_id)
+
+    assert len(embeddings) == 3
+    assert matches == ["long_old", None, 1]
+
+
+@pytest.mark.asyncio
+async def test_delete_long_term_memories_removes_rows_and_embeddings():
+    tenant_id = uuid4()
+    manager = MemoryManager(tenant_id=tenant_id, vector_store=InMemoryVectorStore())
+    collection = await manager._get_collection("long_term_memory", tenant_id)
+    await collection.add(ids=["long_old", "long_keep"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["vecchia", "nuova"])
+    db = AsyncMock()
+    db.execute.return_value = MagicMock(rowcount=1)
+    db.execute.return_value.scalars.return_value.all.return_value = ["long_old"]
+
+    deleted = await manager.delete_long_term_memories(db, [uuid4()], tenant_id=tenant_id)
+
+    assert deleted == 1
+    db.commit.assert_awaited_once()
+    assert (await collection.get())["ids"] == ["long_keep"]
@@ -0,0 +1,58 @@
+"""
+Tests for the fallback metrics (streaming histograms, lock striping)
+"""
+import random
+import threading
+
+import pytest
+
+from app.core.metrics import SimpleMetrics, StreamingHistogram
+
+
+def test_streaming_histogram_quantiles_are_close_to_exact():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-3, 1) for _ in range(20000)]
+    histogram = StreamingHistogram()
+    for value in values:
+        histogram.observe(value)
+
+    ordered = sorted(values)
+    for q, estimate in zip((0.5, 0.95, 0.99), histogram.quantiles((0.5, 0.95, 0.99))):
+        exact = ordered[int(q * len(ordered)) - 1]
+        assert estimate == pytest.approx(exact, rel=0.06)
+
+    stats = histogram.snapshot()
+    assert stats["count"] == len(values)
+    assert stats["sum"] == pytest.approx(sum(values))
+    assert (stats["min"], stats["max"]) == (min(values), max(values))
+    # Memory bounded by the value range, not by the number of observations
+    assert len(histogram._buckets) < 200
+
+
+def test_streaming_histogram_edge_values():
+    histogram = StreamingHistogram()
+    assert histogram.snapshot()["p99"] == 0.0
+    for value in (0.0, -1.0, 3.0):
+        histogram.observe(value)
+    assert histogram.quantiles((0.0, 0.5, 1.0)) == [-1.0, 0.0, 3.0]
+
+
+def test_simple_metrics_concurrent_updates():
+    metrics = SimpleMetrics(stripes=4)
+
+    def worker(n):
+        for i in range(1000):
+            metrics.increment("requests_total", labels={"worker": str(n % 2)})
+            metrics.observe("request_seconds", i / 1000)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.get_metrics()
+    assert snapshot["counters"] == {"requests_total{worker=0}": 2000, "requests_total{worker=1}": 2000}
+    stats = snapshot["histograms"]["request_seconds"]
+    assert stats["count"] == 4000
+    assert stats["p50"] == pytest.approx(0.5, rel=0.06)
@@ -0,0 +1,65 @@
+"""
+Tests for the HTTP observability middleware
+"""
+import importlib
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    # app.main configures a log file relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("app.main")
+    counter, histogram = MagicMock(), MagicMock()
+    monkeypatch.setattr(module, "increment_counter", counter)
+    monkeypatch.setattr(module, "observe_histogram", histogram)
+    return module, counter, histogram
+
+
+def _client(module):
+    app = FastAPI()
+
+    @app.get("/api/sessions/{session_id}/messages")
+    async def messages(session_id: str):
+        return {"session_id": session_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(module.ObservabilityMiddleware)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_requests_are_labeled_by_route_template_and_counted_once(main_module):
+    module, counter, histogram = main_module
+    client = _client(module)
+
+    for _ in range(2):
+        assert client.get(f"/api/sessions/{uuid4()}/messages").status_code == 200
+    client.get(f"/unknown/{uuid4()}")
+
+    totals = [c for c in counter.call_args_list if c.args[0] == "http_requests_total"]
+    assert [c.kwargs["labels"] for c in totals] == [
+        {"method": "GET", "path": "/api/sessions/{session_id}/messages", "status": "200"},
+        {"method": "GET", "path": "/api/sessions/{session_id}/messages", "status": "200"},
+        {"method": "GET", "path": "unmatched", "status": "404"},
+    ]
+    overheads = [c for c in histogram.call_args_list if c.args[0] == "http_middleware_overhead_seconds"]
+    assert len(overheads) == 3
+    assert all(c.args[1] >= 0 for c in overheads)
+
+
+def test_handler_errors_are_counted_with_template_label(main_module):
+    module, counter, _ = main_module
+    client = _client(module)
+
+    assert client.get("/boom").status_code == 500
+
+    errors = [c for c in counter.call_args_list if c.args[0] == "http_requests_errors_total"]
+    assert errors[0].kwargs["labels"] == {"method": "GET", "path": "/boom", "error_type": "RuntimeError"}
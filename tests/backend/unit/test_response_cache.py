@@ -0,0 +1,174 @@
+"""
+Tests for the semantic response cache
+"""
+from datetime import date
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.core.response_cache import (
+    CacheKey,
+    SemanticResponseCache,
+    build_cache_key,
+    context_fingerprint,
+    get_response_cache,
+    is_follow_up,
+    is_read_only_tool,
+    normalize_query,
+)
+from app.core.config import settings
+from app.core.load_testing import LoadTestConfig, run_in_process_load_test
+from app.models.schemas import ChatResponse
+
+
+def _key(user_id, vector, fingerprint="ctx", query="quali riunioni ho domani", generation=0):
+    embedding = np.asarray(vector, dtype=np.float32)
+    return CacheKey(
+        user_id=user_id,
+        normalized_query=query,
+        embedding=embedding / np.linalg.norm(embedding),
+        fingerprint=fingerprint,
+        generation=generation,
+    )
+
+
+def _response(text="Domani hai due riunioni", tools_used=None):
+    return ChatResponse(response=text, session_id=uuid4(), tools_used=tools_used or [])
+
+
+def test_normalize_query_and_fingerprint():
+    assert normalize_query("  Quali riunioni ho DOMANI?! ") == "quali riunioni ho domani"
+    assert context_fingerprint(["a", "b"]) == context_fingerprint(["a", "b"])
+    assert context_fingerprint(["a", "b"]) != context_fingerprint(["ab"])
+
+
+def test_read_only_tool_classification():
+    assert is_read_only_tool("get_calendar_events")
+    assert is_read_only_tool("mcp_list_drive_files")
+    assert not is_read_only_tool("send_email")
+    assert not is_read_only_tool("mcp_create_event")
+
+
+def test_similar_query_with_same_context_hits():
+    cache = SemanticResponseCache(similarity_threshold=0.95)
+    user_id = uuid4()
+    assert cache.store(_key(user_id, [1.0, 0.0, 0.0]), _response())
+
+    hit = cache.lookup(_key(user_id, [1.0, 0.05, 0.0], query="riunioni di domani"))
+    assert hit is not None
+    assert hit.response == "Domani hai due riunioni"
+
+    # Different user, different memory/context or a distant question: miss
+    assert cache.lookup(_key(uuid4(), [1.0, 0.0, 0.0])) is None
+    assert cache.lookup(_key(user_id, [1.0, 0.0, 0.0], fingerprint="changed")) is None
+    assert cache.lookup(_key(user_id, [0.0, 1.0, 0.0], query="altro")) is None
+
+
+def test_expired_and_invalidated_entries_miss():
+    cache = SemanticResponseCache(ttl_seconds=0)
+    user_id = uuid4()
+    cache.store(_key(user_id, [1.0, 0.0]), _response())
+    assert cache.lookup(_key(user_id, [1.0, 0.0])) is None
+
+    cache = SemanticResponseCache()
+    cache.store(_key(user_id, [1.0, 0.0]), _response())
+    cache.invalidate_user(user_id)
+    assert cache.lookup(_key(user_id, [1.0, 0.0], generation=1)) is None
+
+    # A turn that started before the invalidation is not stored
+    assert not cache.store(_key(user_id, [1.0, 0.0], generation=0), _response())
+
+
+def test_answers_from_side_effecting_tools_are_not_cached():
+    cache = SemanticResponseCache()
+    user_id = uuid4()
+    assert not cache.store(_key(user_id, [1.0, 0.0]), _response(tools_used=["send_email"]))
+    assert cache.store(_key(user_id, [1.0, 0.0]), _response(tools_used=["get_emails"]))
+    assert cache.size(user_id) == 1
+
+
+def test_lru_bound_per_user():
+    cache = SemanticResponseCache(max_entries_per_user=2)
+    user_id = uuid4()
+    for i in range(3):
+        cache.store(_key(user_id, [1.0, float(i)], query=f"q{i}"), _response())
+    assert cache.size(user_id) == 2
+
+
+@pytest.mark.asyncio
+async def test_build_cache_key_skips_short_messages():
+    embedding_service = MagicMock()
+    embedding_service.generate_embedding.return_value = [3.0, 4.0]
+
+    assert await build_cache_key(embedding_service, uuid4(), "ok grazie", []) is None
+
+    key = await build_cache_key(embedding_service, uuid4(), "Quali riunioni ho domani?", ["memoria"])
+    assert key.normalized_query == "quali riunioni ho domani"
+    assert np.isclose(np.linalg.norm(key.embedding), 1.0)
+    embedding_service.generate_embedding.assert_called_once_with("quali riunioni ho domani")
+
+
+@pytest.mark.parametrize(
+    "message, follow_up",
+    [
+        ("quali riunioni ho questa settimana", False),
+        ("riassumi il documento sul progetto apollo", False),
+        ("e domani cosa ho", True),
+        ("puoi riformulare quello che hai detto", True),
+        ("spiegamelo in modo più semplice", True),
+        ("what about this one", True),
+    ],
+)
+def test_follow_ups_are_detected(message, follow_up):
+    assert is_follow_up(normalize_query(message)) is follow_up
+
+
+@pytest.mark.asyncio
+async def test_cache_key_depends_on_day_not_on_session():
+    embedding_service = MagicMock()
+    embedding_service.generate_embedding.return_value = [1.0, 0.0]
+    user_id = uuid4()
+    message = "Quali riunioni ho questa settimana?"
+
+    monday = await build_cache_key(embedding_service, user_id, message, ["memoria"], day=date(2026, 10, 19))
+    again = await build_cache_key(embedding_service, user_id, message, ["memoria"], day=date(2026, 10, 19))
+    tuesday = await build_cache_key(embedding_service, user_id, message, ["memoria"], day=date(2026, 10, 20))
+
+    assert monday.fingerprint == again.fingerprint
+    assert monday.fingerprint != tuesday.fingerprint
+    assert await build_cache_key(embedding_service, user_id, "e la settimana prossima invece?", []) is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_in_the_same_session_is_served_from_cache(tmp_path, monkeypatch):
+    """Q -> A -> the same Q through run_langgraph_chat: the second turn skips the graph"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    get_response_cache().clear()
+    config = LoadTestConfig(
+        users=1,
+        turns_per_user=2,
+        messages=["Quali sono i punti principali del progetto Apollo?"],
+        token_latency=0.0,
+        first_token_latency=0.0,
+        database_url=f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}",
+    )
+
+    report = await run_in_process_load_test(config)
+
+    assert report.errors == {}
+    assert report.turns == 2
+    assert report.to_dict()["stages"]["graph.tool_loop"]["count"] == 1
+    get_response_cache().clear()
+
+
+def test_stored_answer_drops_turn_specific_fields():
+    cache = SemanticResponseCache()
+    user_id = uuid4()
+    response = _response().model_copy(update={"timings": {"total_ms": 12.0, "stages": []}})
+
+    assert cache.store(_key(user_id, [1.0, 0.0]), response)
+
+    assert cache.lookup(_key(user_id, [1.0, 0.0])).timings is None
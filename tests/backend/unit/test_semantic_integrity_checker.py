@@ -0,0 +1,235 @@
+"""
+Test suite for SemanticIntegrityChecker pre-filtering and concurrent / batched LLM analysis
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.config import settings
+from app.core.memory_manager import MemoryManager
+from app.services import semantic_integrity_checker as sic
+from app.services.semantic_integrity_checker import SemanticIntegrityChecker
+
+
+class FakeLLMClient:
+    """Background LLM stand-in that records calls and peak concurrency"""
+
+    def __init__(self, base_url: str, responder):
+        self.base_url = base_url
+        self.model = "fake"
+        self.responder = responder
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_with_context(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return self.responder(prompt)
+        finally:
+            self.in_flight -= 1
+
+
+def _verdict(is_contradiction: bool, confidence: float) -> dict:
+    return {
+        "is_contradiction": is_contradiction,
+        "confidence": confidence,
+        "explanation": "test",
+        "contradiction_type": "preference" if is_contradiction else "none",
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_integrity_state(monkeypatch):
+    """Isolate module-level cache and integrity settings between tests"""
+    sic._pair_verdict_cache.clear()
+    monkeypatch.setattr(settings, "integrity_llm_concurrency", 2)
+    monkeypatch.setattr(settings, "integrity_pairs_per_prompt", 1)
+    monkeypatch.setattr(settings, "integrity_pair_cache_size", 100)
+    monkeypatch.setattr(settings, "integrity_prefilter_enabled", True)
+    monkeypatch.setattr(settings, "integrity_prefilter_min_similarity", 0.35)
+    monkeypatch.setattr(settings, "integrity_prefilter_min_entity_overlap", 0.5)
+    yield
+    sic._pair_verdict_cache.clear()
+
+
+@pytest.fixture
+def mock_memory_manager():
+    manager = MagicMock(spec=MemoryManager)
+    manager.retrieve_long_term_memory = AsyncMock(return_value=[
+        {"content": "[PREFERENCE] Likes pasta", "similarity": 0.8},
+        {"content": "[PREFERENCE] Enjoys jazz", "similarity": 0.6},
+        {"content": "[PREFERENCE] Loves dogs", "similarity": 0.5},
+    ])
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_pairs_analyzed_concurrently_within_backend_limit(mock_memory_manager):
+    def responder(prompt):
+        is_contradiction = 'EXISTING STATEMENT: "Likes pasta"' in prompt
+        return json.dumps(_verdict(is_contradiction, 0.95 if is_contradiction else 0.1))
+
+    client = FakeLLMClient("http://concurrency-test", responder)
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+
+    result = await checker.check_contradictions(
+        {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"},
+        db=None,
+    )
+
+    assert len(client.prompts) == 3
+    assert client.max_in_flight == 2
+    assert result["has_contradiction"] is True
+    assert [c["existing_memory"] for c in result["contradictions"]] == ["Likes pasta"]
+
+
+@pytest.mark.asyncio
+async def test_multi_pair_prompt_judges_pairs_in_one_call(mock_memory_manager, monkeypatch):
+    monkeypatch.setattr(settings, "integrity_pairs_per_prompt", 5)
+
+    def responder(prompt):
+        return json.dumps([
+            {"pair": 1, **_verdict(True, 0.97)},
+            {"pair": 2, **_verdict(False, 0.0)},
+            {"pair": 3, **_verdict(False, 0.0)},
+        ])
+
+    client = FakeLLMClient("http://batch-test", responder)
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+
+    result = await checker.check_contradictions(
+        {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"},
+        db=None,
+    )
+
+    assert len(client.prompts) == 1
+    assert "PAIR 3:" in client.prompts[0]
+    assert result["has_contradiction"] is True
+    assert result["contradictions"][0]["existing_memory"] == "Likes pasta"
+
+
+@pytest.mark.asyncio
+async def test_multi_pair_prompt_falls_back_for_missing_pairs(mock_memory_manager, monkeypatch):
+    monkeypatch.setattr(settings, "integrity_pairs_per_prompt", 5)
+
+    def responder(prompt):
+        if "PAIR 1:" in prompt:
+            return json.dumps([{"pair": 1, **_verdict(False, 0.0)}])
+        return json.dumps(_verdict(False, 0.0))
+
+    client = FakeLLMClient("http://fallback-test", responder)
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+
+    result = await checker.check_contradictions(
+        {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"},
+        db=None,
+    )
+
+    # One batched call plus one single-pair call for each pair the model skipped
+    assert len(client.prompts) == 3
+    assert result["has_contradiction"] is False
+
+
+@pytest.mark.asyncio
+async def test_judged_pairs_are_cached(mock_memory_manager):
+    client = FakeLLMClient("http://cache-test", lambda prompt: json.dumps(_verdict(False, 0.0)))
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+    knowledge = {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"}
+
+    await checker.check_contradictions(knowledge, db=None)
+    assert len(client.prompts) == 3
+
+    # Another checker instance (one per BackgroundAgent) shares the cache
+    other = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+    await other.check_contradictions(knowledge, db=None)
+    assert len(client.prompts) == 3
+    assert other.stats["cached"] == 3
+    assert other.stats["llm"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_verdicts_are_not_cached(mock_memory_manager):
+    class FailingClient(FakeLLMClient):
+        async def generate_with_context(self, prompt, **kwargs):
+            self.prompts.append(prompt)
+            raise RuntimeError("backend down")
+
+    client = FailingClient("http://failing-test", responder=None)
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+    knowledge = {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"}
+
+    result = await checker.check_contradictions(knowledge, db=None)
+    assert result["has_contradiction"] is False
+    assert len(sic._pair_verdict_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_heuristic_verdicts_are_not_cached(mock_memory_manager):
+    client = FakeLLMClient("http://heuristic-test", lambda prompt: "Yes, these statements contradict.")
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+    knowledge = {"content": "[PREFERENCE] Hates spaghetti", "type": "preference"}
+
+    await checker.check_contradictions(knowledge, db=None)
+    await checker.check_contradictions(knowledge, db=None)
+
+    assert len(sic._pair_verdict_cache) == 0
+    assert len(client.prompts) == 6
+
+
+@pytest.mark.asyncio
+async def test_prefilter_discards_unrelated_pairs(mock_memory_manager):
+    mock_memory_manager.retrieve_long_term_memory.return_value = [
+        {"content": "[PREFERENCE] Likes pasta", "similarity": 0.55},
+        {"content": "[PREFERENCE] Prefers trains to planes", "similarity": 0.12},
+        {"content": "[PREFERENCE] Hates spaghetti carbonara", "similarity": 0.20},
+        {"content": "[PREFERENCE] Prefers window seats", "similarity": None},
+    ]
+    client = FakeLLMClient("http://prefilter-test", lambda prompt: json.dumps(_verdict(False, 0.0)))
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+
+    await checker.check_contradictions(
+        {"content": "[PREFERENCE] Loves spaghetti", "type": "preference"},
+        db=None,
+    )
+
+    judged = [p for p in client.prompts if 'EXISTING STATEMENT: "Prefers trains to planes"' in p]
+    assert judged == []
+    # Kept: close in embedding space, shares "spaghetti", no similarity available
+    assert len(client.prompts) == 3
+    assert checker.stats["skipped_similarity"] == 1
+    assert checker.stats["llm"] == 3
+
+
+@pytest.mark.asyncio
+async def test_type_prefilter_is_counted(mock_memory_manager):
+    mock_memory_manager.retrieve_long_term_memory.return_value = [
+        {"content": "[FACT] Lives in Teramo", "similarity": 0.7},
+    ]
+    client = FakeLLMClient("http://type-test", lambda prompt: json.dumps(_verdict(False, 0.0)))
+    checker = SemanticIntegrityChecker(mock_memory_manager, ollama_client=client)
+
+    await checker.check_contradictions(
+        {"content": "[PREFERENCE] Loves Teramo", "type": "preference"},
+        db=None,
+    )
+
+    assert client.prompts == []
+    assert checker.stats["skipped_type"] == 1
+
+
+def test_entity_overlap_ignores_stopwords():
+    checker = SemanticIntegrityChecker(MagicMock(spec=MemoryManager), ollama_client=None)
+
+    pasta = checker._extract_entities("Likes pasta")
+    dogs = checker._extract_entities("Likes dogs")
+    coffee_new = checker._extract_entities("Non mi piace il caffè")
+    coffee_old = checker._extract_entities("Preferisco il caffè")
+
+    assert checker._entity_overlap(pasta, dogs) == 0.0
+    assert checker._entity_overlap(coffee_new, coffee_old) == 1.0
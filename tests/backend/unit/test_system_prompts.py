@@ -0,0 +1,68 @@
+"""
+Tests for the cache-friendly prompt layout
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
+
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+from app.core.system_prompts import (
+    build_prefix_cached_messages,
+    build_static_system_prompt,
+    build_volatile_context,
+)
+
+
+def test_static_prefix_is_identical_across_turns():
+    first = build_static_system_prompt("You are helpful.", "\n\nTools: a, b")
+    second = build_static_system_prompt("You are helpful.", "\n\nTools: a, b")
+    
+    assert first is second  # Cached, not rebuilt
+    assert first.endswith("Tools: a, b")
+
+
+def test_volatile_context_goes_after_history():
+    history = [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+    volatile = build_volatile_context(time_context="Now: 10:42", retrieved_memory=["fact"])
+    
+    turn_1 = build_prefix_cached_messages("STATIC", history, "question", volatile)
+    turn_2 = build_prefix_cached_messages(
+        "STATIC",
+        history + [{"role": "user", "content": "question"}, {"role": "assistant", "content": "answer"}],
+        "next",
+        build_volatile_context(time_context="Now: 10:43"),
+    )
+    
+    assert turn_1[:3] == turn_2[:3]
+    assert turn_1[-1]["role"] == "user"
+    assert "Now: 10:42" in turn_1[-1]["content"] and "1. fact" in turn_1[-1]["content"]
+    assert turn_1[-1]["content"].endswith("question")
+    assert "Now:" not in turn_1[0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_ollama_payload_uses_stable_prefix_and_keep_alive():
+    response = MagicMock()
+    response.json.return_value = {"message": {"content": "ok"}}
+    http_client = MagicMock()
+    http_client.post = AsyncMock(return_value=response)
+    
+    with patch.object(OllamaClient, "client", new_callable=PropertyMock, return_value=http_client):
+        client = OllamaClient(base_url=settings.ollama_base_url)
+        client._time_context = "Now: 10:42"
+        await client.generate_with_context(
+            prompt="question",
+            session_context=[],
+            retrieved_memory=["memory-item-42"],
+            tools_description="\n\nTools: a",
+        )
+    
+    payload = http_client.post.call_args[1]["json"]
+    system, user = payload["messages"]
+    assert system["content"].endswith("Tools: a")
+    assert "Now:" not in system["content"] and "memory-item-42" not in system["content"]
+    assert user["content"].endswith("question") and "Now: 10:42" in user["content"]
+    assert payload["keep_alive"] == settings.ollama_keep_alive
@@ -1,5 +1,8 @@
+from datetime import UTC, datetime, timedelta
 from uuid import uuid4
 
+import pytest
+
 from app.services.task_queue import TaskQueue, Task, TaskPriority, TaskStatus
 
 
@@ -80,3 +83,119 @@ def test_find_task_by_status() -> None:
     assert queue.task_exists(session_id, "example")
     assert not queue.task_exists(session_id, "nonexistent")
 
+
+
+def test_status_changes_keep_index_consistent() -> None:
+    session_id = uuid4()
+    queue = TaskQueue()
+
+    high = Task(type="example", payload={}, origin="a", priority=TaskPriority.HIGH)
+    low = Task(type="example", payload={}, origin="b", priority=TaskPriority.LOW)
+    queue.enqueue(session_id, high)
+    queue.enqueue(session_id, low)
+
+    # Bounce the high priority task through several statuses
+    queue.update_task(session_id, high.id, status=TaskStatus.WAITING_USER)
+    queue.update_task(session_id, high.id, status=TaskStatus.QUEUED)
+    queue.update_task(session_id, high.id, status=TaskStatus.IN_PROGRESS)
+
+    assert queue.start_next(session_id) is low
+    assert queue.start_next(session_id) is None
+    assert queue.count_tasks(session_id, statuses=[TaskStatus.IN_PROGRESS]) == 2
+    assert queue.find_task_by_status(session_id, TaskStatus.WAITING_USER) is None
+
+
+def test_finished_tasks_are_pruned_automatically() -> None:
+    session_id = uuid4()
+    queue = TaskQueue(max_finished_per_session=2)
+
+    tasks = [Task(type="example", payload={}, origin="a") for _ in range(4)]
+    for task in tasks:
+        queue.enqueue(session_id, task)
+    for task in tasks:
+        queue.complete_task(session_id, task.id)
+
+    remaining = queue.list_tasks(session_id)
+    assert remaining == tasks[2:]
+
+    # A session whose tasks all expire is dropped entirely
+    expiring = TaskQueue(finished_ttl_seconds=0)
+    task = Task(type="example", payload={}, origin="a")
+    expiring.enqueue(session_id, task)
+    expiring.complete_task(session_id, task.id)
+    assert expiring.session_ids() == []
+
+
+def test_finished_at_is_the_completion_time() -> None:
+    session_id = uuid4()
+    queue = TaskQueue(finished_ttl_seconds=3600)
+
+    # Last touched long before it completes: the TTL runs from completion
+    task = Task(type="example", payload={}, origin="a")
+    task.updated_at = datetime.now(UTC) - timedelta(days=1)
+    queue.enqueue(session_id, task)
+    queue.complete_task(session_id, task.id)
+
+    assert queue.get_task(session_id, task.id) is task
+    other = Task(type="example", payload={}, origin="a")
+    queue.enqueue(session_id, other)
+    assert queue.get_task(session_id, task.id) is task
+
+
+class InMemoryTaskStore:
+    """TaskStore stand-in keeping rows in a dict"""
+
+    def __init__(self) -> None:
+        self.rows = {}
+
+    async def save_many(self, items):
+        for session_id, task in items:
+            self.rows[task.id] = (session_id, Task(**{**task.__dict__, "payload": dict(task.payload)}))
+
+    async def delete_many(self, task_ids):
+        for task_id in task_ids:
+            self.rows.pop(task_id, None)
+
+    async def load_active(self):
+        return [
+            (sid, task) for sid, task in self.rows.values()
+            if task.status not in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+        ]
+
+    async def claim_next(self, session_id, worker_id):
+        queued = [
+            task for sid, task in self.rows.values()
+            if sid == session_id and task.status == TaskStatus.QUEUED
+        ]
+        if not queued:
+            return None
+        task = min(queued, key=lambda t: t.created_at)
+        task.status = TaskStatus.IN_PROGRESS
+        return Task(**task.__dict__)
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_restores_and_claims() -> None:
+    session_id = uuid4()
+    store = InMemoryTaskStore()
+
+    first_worker = TaskQueue(store=store)
+    task = Task(type="example", payload={"value": 1}, origin="agent")
+    first_worker.enqueue(session_id, task)
+    await first_worker.flush()
+    assert store.rows[task.id][1].status == TaskStatus.QUEUED
+
+    # A second worker (or a restart) sees the task and claims it exactly once
+    second_worker = TaskQueue(store=store)
+    restored = await second_worker.restore()
+    assert [t.id for _, t in restored] == [task.id]
+
+    claimed = await second_worker.claim_next(session_id)
+    assert claimed is not None and claimed.id == task.id
+    assert claimed.status == TaskStatus.IN_PROGRESS
+    assert await first_worker.claim_next(session_id) is None
+
+    second_worker.complete_task(session_id, task.id, payload_updates={"result": "ok"})
+    await second_worker.flush()
+    assert store.rows[task.id][1].status == TaskStatus.COMPLETED
+    assert await TaskQueue(store=store).restore() == []
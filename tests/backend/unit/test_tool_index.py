@@ -0,0 +1,71 @@
+"""
+Tests for tool shortlisting
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.tool_index import ToolIndex, tool_text
+
+_VOCABULARY = ["calendar", "email", "drive", "sheet", "maps", "task", "doc", "form"]
+
+
+def _embed(text):
+    text = text.lower()
+    return [1.0 if word in text else 0.0 for word in _VOCABULARY] + [0.1]
+
+
+def _embedding_service():
+    service = MagicMock()
+    service.generate_embedding.side_effect = _embed
+    service.generate_embeddings.side_effect = lambda texts: [_embed(t) for t in texts]
+    return service
+
+
+def _tools():
+    names = ["get_emails", "mcp_drive_search", "mcp_sheet_read", "mcp_maps_directions",
+             "mcp_task_list", "mcp_doc_create", "mcp_form_get"]
+    return [{"name": name, "description": f"Tool for {name.split('_')[1]}"} for name in names]
+
+
+def test_tool_text_uses_readable_name_and_description():
+    assert tool_text({"name": "mcp_list_drive_files", "description": "Lists files"}) == "list drive files: Lists files"
+
+
+@pytest.mark.asyncio
+async def test_shortlist_keeps_pinned_mentioned_and_most_similar_tools_in_catalog_order():
+    index = ToolIndex(_embedding_service())
+
+    selected = await index.shortlist(
+        "trova il foglio sheet del budget, poi usa mcp_form_get",
+        _tools(),
+        top_k=1,
+        pinned=["get_emails"],
+    )
+
+    assert [t["name"] for t in selected] == ["get_emails", "mcp_sheet_read", "mcp_form_get"]
+
+
+@pytest.mark.asyncio
+async def test_tool_descriptions_are_embedded_once():
+    service = _embedding_service()
+    index = ToolIndex(service)
+
+    await index.shortlist("sheet", _tools(), top_k=2, pinned=[])
+    await index.shortlist("maps", _tools(), top_k=2, pinned=[])
+
+    service.generate_embeddings.assert_called_once()
+    assert service.generate_embedding.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_small_catalog_and_embedding_errors_return_all_tools():
+    service = _embedding_service()
+    index = ToolIndex(service)
+    tools = _tools()
+
+    assert await index.shortlist("sheet", tools[:3], top_k=2, pinned=["get_emails"]) == tools[:3]
+    service.generate_embeddings.assert_not_called()
+
+    service.generate_embeddings.side_effect = RuntimeError("model not loaded")
+    assert await index.shortlist("sheet", tools, top_k=2, pinned=[]) == tools
@@ -0,0 +1,72 @@
+"""
+Tests for the Gemini/Vertex tool declaration cache
+"""
+from unittest.mock import MagicMock
+
+from app.core.gemini_client import GeminiClient
+from app.core.tool_schema_cache import (
+    ToolDeclarationCache,
+    convert_parameters_to_gemini_schema,
+    tools_fingerprint,
+)
+
+
+def _tools():
+    return [
+        {
+            "name": "get_emails",
+            "description": "Legge le email",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Filtro Gmail"},
+                    "max_results": {"type": "integer"},
+                    "labels": {"type": "array"},
+                    "matrix": {"type": "array", "items": {"type": "array", "items": {"type": "boolean"}}},
+                },
+                "required": ["query"],
+            },
+        },
+        {"name": "web_fetch", "description": "Scarica una pagina", "parameters": {"properties": {}}},
+    ]
+
+
+def test_convert_parameters_to_gemini_schema():
+    schema = convert_parameters_to_gemini_schema(_tools()[0]["parameters"])
+    assert schema["type"] == "OBJECT"
+    assert schema["required"] == ["query"]
+    assert schema["properties"]["query"] == {"type": "STRING", "description": "Filtro Gmail"}
+    assert schema["properties"]["max_results"]["type"] == "NUMBER"
+    assert schema["properties"]["labels"]["items"] == {"type": "STRING"}
+    assert schema["properties"]["matrix"]["items"] == {"type": "ARRAY", "items": {"type": "BOOLEAN"}}
+
+
+def test_fingerprint_changes_with_tool_list():
+    tools = _tools()
+    assert tools_fingerprint(tools) == tools_fingerprint(_tools())
+    tools[0]["description"] = "Legge la posta"
+    assert tools_fingerprint(tools) != tools_fingerprint(_tools())
+    assert tools_fingerprint(None) == tools_fingerprint([])
+
+
+def test_cache_builds_once_per_key_and_evicts_least_recently_used():
+    cache = ToolDeclarationCache(max_entries=2)
+    builder = MagicMock(side_effect=lambda: object())
+
+    first = cache.get_or_build(("gemini_tools", "a"), builder)
+    assert cache.get_or_build(("gemini_tools", "a"), builder) is first
+    assert builder.call_count == 1
+
+    cache.get_or_build(("gemini_tools", "b"), builder)
+    cache.get_or_build(("gemini_tools", "a"), builder)  # "a" becomes most recent
+    cache.get_or_build(("gemini_tools", "c"), builder)  # evicts "b"
+    assert len(cache) == 2
+    cache.get_or_build(("gemini_tools", "b"), builder)
+    assert builder.call_count == 4
+
+
+def test_gemini_tool_declarations():
+    client = GeminiClient.__new__(GeminiClient)
+    declarations = client._build_gemini_tools(_tools())
+    assert [d["function_declarations"][0]["name"] for d in declarations] == ["get_emails", "web_fetch"]
+    assert declarations[0]["function_declarations"][0]["parameters"]["required"] == ["query"]
@@ -0,0 +1,65 @@
+"""
+Tests for the fallback tracer (task-local span stack, ring buffer, OTLP export)
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.tracing import SimpleTracer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_keep_their_own_parent_chain():
+    tracer = SimpleTracer()
+
+    async def request(name):
+        root = tracer.start_span(name)
+        await asyncio.sleep(0)
+        child = tracer.start_span(f"{name}.child")
+        await asyncio.sleep(0)
+        assert tracer.current_span is child
+        tracer.end_span(child)
+        tracer.end_span(root)
+        return root, child
+
+    results = await asyncio.gather(*(request(f"req{i}") for i in range(5)))
+
+    for root, child in results:
+        assert root["parent_span_id"] is None
+        assert child["parent_span_id"] == root["span_id"]
+        assert child["trace_id"] == root["trace_id"]
+    assert len({root["trace_id"] for root, _ in results}) == 5
+    assert tracer.current_span is None
+
+
+def test_ring_buffer_and_sampling():
+    tracer = SimpleTracer(max_spans=3)
+    for i in range(10):
+        tracer.end_span(tracer.start_span(f"op{i}"))
+    assert [s["name"] for s in tracer.spans] == ["op7", "op8", "op9"]
+
+    unsampled = SimpleTracer(sample_rate=0.0)
+    root = unsampled.start_span("root")
+    unsampled.end_span(unsampled.start_span("child"))
+    unsampled.end_span(root)
+    assert unsampled.spans == []
+
+
+def test_otlp_export(tmp_path):
+    tracer = SimpleTracer()
+    root = tracer.start_span("chat", {"session_id": "abc", "tokens": 12})
+    tracer.end_span(tracer.start_span("llm"), status="ERROR")
+    tracer.end_span(root)
+
+    spans = tracer.export_otlp(trace_id=root["trace_id"])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {s["name"]: s for s in spans}
+    assert by_name["llm"]["parentSpanId"] == root["span_id"]
+    assert by_name["llm"]["status"] == {"code": 2}
+    assert "parentSpanId" not in by_name["chat"]
+    assert {"key": "tokens", "value": {"intValue": "12"}} in by_name["chat"]["attributes"]
+
+    path = tmp_path / "spans.jsonl"
+    assert tracer.export_to_file(path) == 2
+    assert tracer.spans == []
+    assert len(json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]) == 2
@@ -0,0 +1,40 @@
+import hashlib
+import io
+
+import pytest
+
+from app.services import upload_spooler
+from app.services.upload_spooler import UploadTooLargeError, spool_upload
+
+
+@pytest.fixture(autouse=True)
+def _spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_spooler.settings, "upload_spool_dir", tmp_path / "spool")
+    monkeypatch.setattr(upload_spooler.settings, "upload_chunk_size", 64 * 1024)
+    yield tmp_path
+
+
+@pytest.mark.asyncio
+async def test_spool_upload_streams_to_disk_and_hashes(tmp_path) -> None:
+    body = b"x" * (200 * 1024 + 17)
+
+    spooled = await spool_upload(io.BytesIO(body), "report.pdf", "application/pdf", max_size=1024 * 1024)
+
+    assert spooled.size == len(body)
+    assert spooled.sha256 == hashlib.sha256(body).hexdigest()
+    assert spooled.path.suffix == ".pdf"
+    assert spooled.path.read_bytes() == body
+
+    destination = tmp_path / "users" / "u1" / "file.pdf"
+    await spooled.move_to(destination)
+    assert destination.read_bytes() == body
+    assert list((tmp_path / "spool").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_spool_upload_rejects_oversized_body(tmp_path) -> None:
+    with pytest.raises(UploadTooLargeError):
+        await spool_upload(io.BytesIO(b"y" * (300 * 1024)), "big.txt", max_size=100 * 1024)
+
+    # The partial spool file is removed
+    assert list((tmp_path / "spool").iterdir()) == []
@@ -0,0 +1,151 @@
+"""
+Tests for the async vector store adapter
+"""
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.vector_store import ChromaVectorStore, InMemoryVectorStore, VectorCollection
+
+
+@pytest.mark.asyncio
+async def test_in_memory_collection_filters_and_ranks():
+    store = InMemoryVectorStore()
+    collection = await store.create_collection("file_embeddings")
+    await collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.9, 0.1]],
+        documents=["uno", "due", "tre"],
+        metadatas=[{"file_id": "f1"}, {"file_id": "f2"}, {"file_id": "f3"}],
+    )
+
+    results = await collection.query(
+        query_embeddings=[[1.0, 0.0]],
+        n_results=5,
+        where={"$and": [{"file_id": {"$in": ["f1", "f2"]}}, {"file_id": {"$ne": "f2"}}]},
+        include=["documents", "distances"],
+    )
+    assert results["documents"] == [["uno"]]
+    assert results["metadatas"] is None
+
+    await collection.delete(where={"file_id": "f1"})
+    assert (await collection.get(where={"file_id": "f1"}))["ids"] == []
+    assert await collection.count() == 2
+
+    with pytest.raises(ValueError):
+        await store.get_collection("missing")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_adds_are_coalesced_into_one_backend_call():
+    backend = MagicMock()
+    calls = []
+
+    async def run(func, *args, **kwargs):
+        calls.append(kwargs)
+        return func(*args, **kwargs)
+
+    collection = VectorCollection(backend, run, batch_window=0.01)
+    await asyncio.gather(*[
+        collection.add(ids=[f"id{i}"], embeddings=[[float(i)]], documents=[f"doc{i}"])
+        for i in range(5)
+    ])
+
+    backend.add.assert_called_once()
+    assert backend.add.call_args.kwargs["ids"] == [f"id{i}" for i in range(5)]
+    assert "metadatas" not in backend.add.call_args.kwargs
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_reported_to_every_caller():
+    backend = MagicMock()
+    backend.delete.side_effect = RuntimeError("chroma down")
+
+    async def run(func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    collection = VectorCollection(backend, run, batch_window=0.01)
+    results = await asyncio.gather(
+        collection.delete(ids=["a"]), collection.delete(ids=["b"]), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert [call.kwargs["ids"] for call in backend.delete.call_args_list] == [["a", "b"], ["a"], ["b"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_caller():
+    backend = MagicMock()
+
+    def add(ids, **kwargs):
+        if "bad" in ids:
+            raise ValueError("dimension mismatch")
+
+    backend.add.side_effect = add
+
+    async def run(func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    collection = VectorCollection(backend, run, batch_window=0.01)
+    results = await asyncio.gather(
+        collection.add(ids=["a"], embeddings=[[1.0]]),
+        collection.add(ids=["bad"], embeddings=[[1.0, 2.0]]),
+        collection.add(ids=["c"], embeddings=[[3.0]]),
+        return_exceptions=True,
+    )
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], ValueError)
+    assert backend.add.call_args_list[0].kwargs["ids"] == ["a", "bad", "c"]
+    assert backend.add.call_count == 4
+
+
+class NotFoundError(Exception):
+    """Stand-in for chromadb.errors.NotFoundError"""
+
+
+@pytest.mark.asyncio
+async def test_stale_collection_handle_is_resolved_again():
+    stale = MagicMock(metadata={"hnsw:space": "cosine"})
+    stale.query.side_effect = NotFoundError("Collection [1234] does not exist")
+    fresh = MagicMock()
+    fresh.query.return_value = {"ids": [["x"]]}
+    client = MagicMock()
+    client.get_collection.return_value = stale
+    client.get_or_create_collection.return_value = fresh
+    store = ChromaVectorStore(client_factory=MagicMock(return_value=client), max_workers=1, batch_window=0)
+
+    try:
+        collection = await store.get_collection("long_term_memory")
+        assert await collection.query(query_embeddings=[[1.0]]) == {"ids": [["x"]]}
+        assert await collection.query(query_embeddings=[[1.0]]) == {"ids": [["x"]]}
+    finally:
+        await store.close()
+
+    client.get_or_create_collection.assert_called_once_with(name="long_term_memory", metadata={"hnsw:space": "cosine"})
+    stale.query.assert_called_once()
+    assert fresh.query.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_chroma_store_shares_client_and_runs_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    threads = []
+    client = MagicMock()
+    client.get_collection.side_effect = lambda name: threads.append(threading.get_ident()) or MagicMock(name=name)
+    factory = MagicMock(return_value=client)
+    store = ChromaVectorStore(client_factory=factory, max_workers=2, batch_window=0)
+
+    try:
+        first = await store.get_collection("long_term_memory")
+        second = await store.get_collection("long_term_memory")
+        await store.get_collection("session_memory")
+    finally:
+        await store.close()
+
+    assert first is second  # Cached facade, no second round-trip
+    factory.assert_called_once()
+    assert client.get_collection.call_count == 2
+    assert threads and all(t != loop_thread for t in threads)
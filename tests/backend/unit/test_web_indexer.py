@@ -1,20 +1,13 @@
 """
 Test suite for Web Content Indexer Service
 """
+import asyncio
 import pytest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock
 from uuid import uuid4
 
-from app.services.web_indexer import WebIndexer
-from app.core.memory_manager import MemoryManager
-
-
-@pytest.fixture
-def mock_memory_manager():
-    """Create a mock memory manager"""
-    manager = MagicMock(spec=MemoryManager)
-    manager.add_long_term_memory = AsyncMock()
-    return manager
+from app.services.web_indexer import WebIndexer, WebIndexQueue, canonicalize_url, content_hash
 
 
 @pytest.fixture
@@ -62,10 +55,10 @@ async def test_extract_text_from_snapshot(web_indexer, sample_snapshot):
 
 
 @pytest.mark.asyncio
-async def test_index_web_search_results(web_indexer, sample_search_results, mock_memory_manager):
+async def test_index_web_search_results(web_indexer, sample_search_results, mock_memory_manager, mock_db_factory):
     """Test indexing web search results"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     search_query = "test query"
     
     result = await web_indexer.index_web_search_results(
@@ -79,15 +72,16 @@ async def test_index_web_search_results(web_indexer, sample_search_results, mock
     assert result["total"] == 2
     assert len(result["errors"]) == 0
     
-    # Verify memory manager was called
-    assert mock_memory_manager.add_long_term_memory.call_count == 2
+    # Verify both results were written in a single batch
+    mock_memory_manager.add_long_term_memories.assert_called_once()
+    assert len(mock_memory_manager.add_long_term_memories.call_args[1]["contents"]) == 2
 
 
 @pytest.mark.asyncio
-async def test_index_web_search_results_limit(web_indexer, mock_memory_manager):
+async def test_index_web_search_results_limit(web_indexer, mock_memory_manager, mock_db_factory):
     """Test that indexing is limited to top 5 results"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     
     # Create 10 results
     results = [
@@ -104,14 +98,14 @@ async def test_index_web_search_results_limit(web_indexer, mock_memory_manager):
     
     # Should only index top 5
     assert result["indexed"] == 5
-    assert mock_memory_manager.add_long_term_memory.call_count == 5
+    assert len(mock_memory_manager.add_long_term_memories.call_args[1]["contents"]) == 5
 
 
 @pytest.mark.asyncio
-async def test_index_web_fetch_result(web_indexer, mock_memory_manager):
+async def test_index_web_fetch_result(web_indexer, mock_memory_manager, mock_db_factory):
     """Test indexing web fetch result"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     url = "https://example.com/page"
     
     fetch_result = {
@@ -128,19 +122,19 @@ async def test_index_web_fetch_result(web_indexer, mock_memory_manager):
     )
     
     assert result is True
-    mock_memory_manager.add_long_term_memory.assert_called_once()
+    mock_memory_manager.add_long_term_memories.assert_called_once()
     
     # Check call arguments
-    call_args = mock_memory_manager.add_long_term_memory.call_args
+    call_args = mock_memory_manager.add_long_term_memories.call_args
     assert call_args[1]["learned_from_sessions"] == [session_id]
-    assert "Test Page" in call_args[1]["content"]
+    assert "Test Page" in call_args[1]["contents"][0]
 
 
 @pytest.mark.asyncio
-async def test_index_web_fetch_result_no_content(web_indexer, mock_memory_manager):
+async def test_index_web_fetch_result_no_content(web_indexer, mock_memory_manager, mock_db_factory):
     """Test that web fetch results without content are not indexed"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     
     fetch_result = {
         "title": "Test Page",
@@ -156,14 +150,14 @@ async def test_index_web_fetch_result_no_content(web_indexer, mock_memory_manage
     )
     
     assert result is False
-    mock_memory_manager.add_long_term_memory.assert_not_called()
+    mock_memory_manager.add_long_term_memories.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_index_browser_snapshot(web_indexer, sample_snapshot, mock_memory_manager):
+async def test_index_browser_snapshot(web_indexer, sample_snapshot, mock_memory_manager, mock_db_factory):
     """Test indexing browser snapshot"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     url = "https://example.com"
     
     result = await web_indexer.index_browser_snapshot(
@@ -178,10 +172,10 @@ async def test_index_browser_snapshot(web_indexer, sample_snapshot, mock_memory_
 
 
 @pytest.mark.asyncio
-async def test_index_browser_snapshot_insufficient_content(web_indexer, mock_memory_manager):
+async def test_index_browser_snapshot_insufficient_content(web_indexer, mock_memory_manager, mock_db_factory):
     """Test that snapshots with insufficient content are not indexed"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     
     # Very short snapshot
     short_snapshot = "x" * 10
@@ -198,11 +192,13 @@ async def test_index_browser_snapshot_insufficient_content(web_indexer, mock_mem
 
 
 @pytest.mark.asyncio
-async def test_index_web_search_results_error_handling(web_indexer, sample_search_results, mock_memory_manager):
+async def test_index_web_search_results_error_handling(web_indexer, sample_search_results, mock_memory_manager, mock_db_factory):
     """Test error handling in web search results indexing"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     
+    # The batch write fails, so results are retried one by one
+    mock_memory_manager.add_long_term_memories.side_effect = Exception("Batch error")
     # Make memory manager raise exception on second call
     mock_memory_manager.add_long_term_memory.side_effect = [
         None,  # First succeeds
@@ -221,11 +217,12 @@ async def test_index_web_search_results_error_handling(web_indexer, sample_searc
 
 
 @pytest.mark.asyncio
-async def test_index_web_fetch_result_error_handling(web_indexer, mock_memory_manager):
+async def test_index_web_fetch_result_error_handling(web_indexer, mock_memory_manager, mock_db_factory):
     """Test error handling in web fetch indexing"""
     session_id = uuid4()
-    db = AsyncMock()
+    db = mock_db_factory()
     
+    mock_memory_manager.add_long_term_memories.side_effect = Exception("Batch error")
     mock_memory_manager.add_long_term_memory.side_effect = Exception("Database error")
     
     fetch_result = {
@@ -243,3 +240,177 @@ async def test_index_web_fetch_result_error_handling(web_indexer, mock_memory_ma
     
     assert result is False
 
+
+
+def test_canonicalize_url():
+    """Test that trivially different URLs of the same page compare equal"""
+    canonical = canonicalize_url("https://example.com/page")
+    assert canonicalize_url("HTTPS://www.Example.com:443/page/") == canonical
+    assert canonicalize_url("https://example.com/page?utm_source=x&gclid=1#section") == canonical
+    assert canonicalize_url("https://example.com/page?b=2&a=1") == canonicalize_url("https://example.com/page?a=1&b=2")
+    assert canonicalize_url("https://example.com/other") != canonical
+
+
+@pytest.mark.asyncio
+async def test_index_web_search_results_dedups_within_batch(web_indexer, mock_memory_manager, mock_db):
+    """Test that the same page (by canonical URL or content) is embedded only once"""
+    results = [
+        {"title": "Article", "url": "https://example.com/a", "content": "Same text"},
+        {"title": "Article", "url": "https://www.example.com/a/?utm_source=feed", "content": "Other text"},
+        {"title": "Article", "url": "https://mirror.example.org/a", "content": "Same  TEXT"},
+    ]
+    
+    result = await web_indexer.index_web_search_results(
+        db=mock_db, search_query="q", results=results, session_id=uuid4()
+    )
+    
+    assert result["indexed"] == 1
+    assert result["skipped"] == 2
+    assert len(mock_memory_manager.add_long_term_memories.call_args[1]["contents"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_index_web_search_results_freshness_policy(web_indexer, mock_memory_manager, mock_db_factory):
+    """Test that known content is skipped and changed pages are re-indexed only when stale"""
+    tenant_id = uuid4()
+    now = datetime.now(timezone.utc)
+    results = [
+        {"title": "Known", "url": "https://example.com/known", "content": "Unchanged"},
+        {"title": "Fresh", "url": "https://example.com/fresh", "content": "Changed recently"},
+        {"title": "Stale", "url": "https://example.com/stale", "content": "Changed long ago"},
+    ]
+    jobs = web_indexer.build_search_result_jobs("q", results, uuid4(), tenant_id=tenant_id)
+    stale_memory_id = uuid4()
+    rows = [
+        MagicMock(url_hash=jobs[0].url_hash, content_hash=jobs[0].content_hash, indexed_at=now - timedelta(days=30), memory_id=uuid4()),
+        MagicMock(url_hash=jobs[1].url_hash, content_hash=content_hash("old"), indexed_at=now - timedelta(hours=1), memory_id=uuid4()),
+        MagicMock(url_hash=jobs[2].url_hash, content_hash=content_hash("old"), indexed_at=now - timedelta(days=30), memory_id=stale_memory_id),
+    ]
+    db = mock_db_factory(rows=rows)
+    
+    result = await web_indexer.index_jobs(db, jobs)
+    
+    assert result["indexed"] == 1
+    assert result["skipped"] == 2
+    contents = mock_memory_manager.add_long_term_memories.call_args[1]["contents"]
+    assert len(contents) == 1 and "Stale" in contents[0]
+    # the memory written the previous time for the stale URL is replaced
+    mock_memory_manager.delete_long_term_memories.assert_awaited_once_with(db, [stale_memory_id], tenant_id=tenant_id)
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_pages_point_at_the_existing_memory(web_indexer, mock_memory_manager, mock_db_factory):
+    """Test that pages similar to a stored memory or to an earlier page of the batch are not written again"""
+    tenant_id = uuid4()
+    existing_id = uuid4()
+    new_id = uuid4()
+    results = [
+        {"title": "Original", "url": "https://example.com/a", "content": "Release notes 1.0"},
+        {"title": "Syndicated", "url": "https://news.example.org/a", "content": "Release notes 1.0 (copy)"},
+        {"title": "Mirror", "url": "https://mirror.example.net/a", "content": "Release notes 1.0 mirror"},
+    ]
+    jobs = web_indexer.build_search_result_jobs("q", results, uuid4(), tenant_id=tenant_id)
+    mock_memory_manager.find_near_duplicates.side_effect = None
+    mock_memory_manager.find_near_duplicates.return_value = ([[1.0, 0.0], [0.9, 0.1], [1.0, 0.01]], [None, "long_old", 0])
+    
+    async def add_long_term_memories(**kwargs):
+        memories = [MagicMock(id=new_id)]
+        await kwargs["before_commit"](memories)
+        return memories
+    
+    mock_memory_manager.add_long_term_memories.side_effect = add_long_term_memories
+    db = mock_db_factory()
+    db.execute.return_value.all.return_value = [("long_old", existing_id)]
+    
+    result = await web_indexer.index_jobs(db, jobs)
+    
+    assert result["indexed"] == 1
+    assert result["skipped"] == 2
+    call = mock_memory_manager.add_long_term_memories.call_args[1]
+    assert len(call["contents"]) == 1 and "Original" in call["contents"][0]
+    assert call["embeddings"] == [[1.0, 0.0]]
+    upsert = next(
+        c.args[0].compile().params for c in db.execute.call_args_list if "url_hash_m0" in c.args[0].compile().params
+    )
+    assert [upsert[f"memory_id_m{i}"] for i in range(3)] == [new_id, existing_id, new_id]
+    mock_memory_manager.delete_long_term_memories.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_web_index_queue_batches_jobs_in_background(web_indexer):
+    """Test that queued jobs are indexed by the worker in one batch"""
+    web_indexer.index_jobs = AsyncMock()
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=MagicMock())
+    session.__aexit__ = AsyncMock(return_value=False)
+    queue = WebIndexQueue(
+        indexer_factory=lambda: web_indexer,
+        session_factory=lambda: session,
+        batch_size=10,
+        flush_interval=0.05,
+    )
+    results = [{"title": f"A{i}", "url": f"https://example.com/{i}", "content": f"C{i}"} for i in range(3)]
+    
+    queued = queue.enqueue(web_indexer.build_search_result_jobs("q", results, uuid4()))
+    assert queued == 3
+    
+    for _ in range(50):
+        if web_indexer.index_jobs.await_count:
+            break
+        await asyncio.sleep(0.02)
+    await queue.stop()
+    
+    web_indexer.index_jobs.assert_awaited_once()
+    assert len(web_indexer.index_jobs.call_args[0][1]) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_rolled_back_and_retry_records_pages(web_indexer, sample_search_results, mock_memory_manager, mock_db_factory):
+    """Test that the page-by-page retry starts from a clean transaction and writes the lookup rows"""
+    tenant_id = uuid4()
+    memory_id = uuid4()
+    db = mock_db_factory(scalar=tenant_id)
+    mock_memory_manager.add_long_term_memories.side_effect = Exception("Batch error")
+    mock_memory_manager.add_long_term_memory.return_value = (True, str(memory_id))
+    jobs = web_indexer.build_search_result_jobs("q", sample_search_results, uuid4(), tenant_id=tenant_id)
+    
+    result = await web_indexer.index_jobs(db, jobs)
+    
+    assert result["indexed"] == 2
+    db.rollback.assert_awaited_once()
+    assert db.commit.await_count == 2
+    # lookup query, then one upsert per retried page
+    upserts = [call.args[0].compile().params for call in db.execute.call_args_list[1:]]
+    assert [params["url_hash_m0"] for params in upserts] == [job.url_hash for job in jobs]
+    assert upserts[0]["memory_id_m0"] == memory_id
+
+
+@pytest.mark.asyncio
+async def test_web_index_queue_stop_finishes_running_batch_before_draining(web_indexer):
+    """Test that stop() waits for the batch being indexed and then indexes the rest of the queue"""
+    started = asyncio.Event()
+    indexed_batches = []
+    
+    async def slow_index_jobs(db, jobs):
+        started.set()
+        await asyncio.sleep(0.1)
+        indexed_batches.append(len(jobs))
+    
+    web_indexer.index_jobs = slow_index_jobs
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=MagicMock())
+    session.__aexit__ = AsyncMock(return_value=False)
+    queue = WebIndexQueue(
+        indexer_factory=lambda: web_indexer,
+        session_factory=lambda: session,
+        batch_size=2,
+        flush_interval=1.0,
+    )
+    results = [{"title": f"A{i}", "url": f"https://example.com/{i}", "content": f"C{i}"} for i in range(5)]
+    
+    queue.enqueue(web_indexer.build_search_result_jobs("q", results, uuid4()))
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await queue.stop()
+    
+    assert indexed_batches == [2, 3]
+    assert queue.pending() == 0